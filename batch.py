@@ -0,0 +1,99 @@
+import csv
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+#####################################
+# BATCHED PARAMETERIZED SHORT READS #
+#####################################
+
+# Each short read used to answer one --person_id / --message_id: a full
+# oblivious join followed by an `==` filter. Given several ids, the short reads
+# now run the join once and a single IN-list filter (operator1.py
+# --filter_in_op1) that keeps the rows of every id in the same oblivious pass.
+# The batch result is written to --output_path as before, then split into one
+# CSV per id, <output stem>_<id>.csv. Each per-id .time file holds the batch's
+# enclave time divided by the batch size (the amortized cost of one query),
+# followed by batch_size=, batch_time= and the amortized critical path.
+# Repeated ids are dropped before the batch is built. With a single id the
+# short reads behave exactly as before.
+
+
+def filter_args(ids: Sequence[int]) -> List[str]:
+    """operator1.py arguments selecting the rows of the given ids: `==` for one id, an IN list otherwise."""
+    if len(ids) == 1:
+        return ["--filter_threshold_op1", str(ids[0]), "--filter_condition_op1", "=="]
+    return ["--filter_in_op1"] + [str(id_) for id_ in ids]
+
+
+def batch_output_path(output_path: str, id_: int) -> Path:
+    """The per-id output of a batch: <stem>_<id><suffix> next to output_path."""
+    path = Path(output_path)
+    return path.with_name(f"{path.stem}_{id_}{path.suffix}")
+
+
+def split_csv_by_key(
+    csv_path: Path,
+    key_col: str,
+    ids: Sequence[int],
+    path_fn: Callable[[int], Path]
+) -> Dict[int, Path]:
+    """
+    Writes the rows of csv_path whose key_col equals each id to path_fn(id),
+    keeping the header. Every id gets a file, even when no row matched it.
+    Rows whose key is not an id (e.g. an UNMAPPED_<id> left by reverse
+    relabeling) are skipped with a warning.
+    """
+    skipped: List[str] = []
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f_in:
+        reader = csv.reader(f_in, delimiter='|')
+        header = next(reader)
+        key_index = header.index(key_col)
+        rows: Dict[int, List[List[str]]] = {id_: [] for id_ in ids}
+        for row in reader:
+            try:
+                key = int(row[key_index])
+            except ValueError:
+                skipped.append(row[key_index])
+                continue
+            matched = rows.get(key)
+            if matched is not None:
+                matched.append(row)
+    if skipped:
+        print(f"Warning: Skipping {len(skipped)} row(s) of {csv_path} whose {key_col} is not an id, e.g. {skipped[0]!r}")
+
+    paths = {}
+    for id_, id_rows in rows.items():
+        paths[id_] = Path(path_fn(id_))
+        with open(paths[id_], 'w', newline='', encoding='utf-8') as f_out:
+            writer = csv.writer(f_out, delimiter='|')
+            writer.writerow(header)
+            writer.writerows(id_rows)
+    return paths
+
+
+def write_batch_time_files(paths: Dict[int, Path], total_time: float, critical_time: float):
+    """Writes a .time file next to each per-id output with the batch's amortized enclave time."""
+    batch_size = len(paths)
+    for path in paths.values():
+        with open(Path(path).with_suffix(".time"), "w") as tf:
+            tf.write(f"{total_time / batch_size}\n")
+            tf.write(f"batch_size={batch_size}\n")
+            tf.write(f"batch_time={total_time}\n")
+            tf.write(f"critical_path={critical_time / batch_size}\n")
+
+
+def split_batch_output(
+    output_path: str,
+    key_col: str,
+    ids: Sequence[int],
+    total_time: float,
+    critical_time: float
+) -> Dict[int, Path]:
+    """Splits a batch result into one CSV (and .time file) per id. Returns {id: csv path}."""
+    paths = split_csv_by_key(Path(output_path), key_col, ids, lambda id_: batch_output_path(output_path, id_))
+    write_batch_time_files(paths, total_time, critical_time)
+    print(f"Split the batch of {len(paths)} queries into per-id outputs "
+          f"({total_time / len(paths)}s amortized enclave time per query):")
+    for id_, path in paths.items():
+        print(f"  {id_}: {path}")
+    return paths
@@ -0,0 +1,6 @@
+# bench/__main__.py
+
+from bench.cli import main
+
+if __name__ == "__main__":
+    main()
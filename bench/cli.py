@@ -0,0 +1,73 @@
+# bench/cli.py
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench.plot import plot_results
+from bench.results import METRICS, compare, print_summary, read_results, scenario_result, write_results
+from bench.runner import run_scenario
+from bench.scenarios import SUITES, load_suite
+
+###################
+# BENCHMARK SUITE #
+###################
+
+# python -m bench --suite <name or specs.json> runs a suite of declarative
+# scenarios (see bench/scenarios.py) with warmup and repeated trials, prints
+# the median / p95 / stddev of each, writes them to a JSON results file and,
+# with --compare, reports the change against an earlier results file.
+# Plotting is optional (--plot). bench/__main__.py runs main().
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict]:
+    parser = argparse.ArgumentParser(description="Runs a benchmark suite of operator scenarios.")
+    parser.add_argument("--suite", default="smoke", help=f"Built-in suite ({', '.join(SUITES)}) or a JSON file of scenario specs.")
+    parser.add_argument("--set", nargs='*', default=[], metavar="FIELD=VALUE", help="Override a field in every spec, e.g. threads=4 or batch_size=8 (JSON values, lists expand).")
+    parser.add_argument("--trials", type=int, default=5, help="Recorded runs per scenario.")
+    parser.add_argument("--warmup", type=int, default=1, help="Unrecorded runs per scenario before the trials.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file.")
+    parser.add_argument("--data_dir", default="bench_data", help="Directory for generated synthetic inputs (reused across runs).")
+    parser.add_argument("--work_dir", default="bench_work", help="Directory for operator outputs and logs.")
+    parser.add_argument("--compare", default=None, help="Earlier JSON results file to compare the medians with.")
+    parser.add_argument("--metric", choices=METRICS, default="total", help="Time compared with --compare.")
+    parser.add_argument("--plot", default=None, help="Also plot the results to this image (needs matplotlib).")
+    parser.add_argument("--plot_x", default="data_length", help="Scenario field on the plot's x axis.")
+    parser.add_argument("--list", action="store_true", help="List the scenarios without running them.")
+    args = parser.parse_args(argv)
+    if args.trials < 1 or args.warmup < 0:
+        parser.error("--trials must be at least 1 and --warmup at least 0")
+
+    overrides = {}
+    for assignment in args.set:
+        field, _, value = assignment.partition("=")
+        try:
+            overrides[field] = json.loads(value)
+        except json.JSONDecodeError:
+            overrides[field] = value
+    scenarios = load_suite(args.suite, overrides)
+    print(f"Suite {args.suite}: {len(scenarios)} scenarios, {args.warmup} warmup + {args.trials} trials each.")
+    if args.list:
+        for scenario in scenarios:
+            print(f"  {scenario.name}")
+        return []
+
+    results = []
+    for index, scenario in enumerate(scenarios, 1):
+        print(f"[{index}/{len(scenarios)}] {scenario.name}...", flush=True)
+        trials, error = run_scenario(scenario, Path(args.data_dir), Path(args.work_dir), args.trials, args.warmup)
+        results.append(scenario_result(scenario.as_dict(), trials, error))
+        # Rewritten after every scenario, so an interrupted suite keeps its finished results.
+        write_results(Path(args.output), args.suite, args.trials, args.warmup, results)
+    print_summary(results)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(read_results(Path(args.compare)), results, args.metric)
+    if args.plot:
+        plot_results(results, Path(args.plot), args.plot_x)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# bench/generators.py
+
+import csv
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from bench.scenarios import Scenario
+from synth_data.fast_gen import ZipfKeys, chunks, random_strings, write_kks_input, write_rows
+
+####################
+# BENCHMARK INPUTS #
+####################
+
+# Turns a scenario into the inputs of its operator: a dict of the table paths
+# and column arguments the engine's run_* function takes.
+#
+# The synthetic generator writes pipe-separated tables like the LDBC ones into
+# the data directory with the vectorized generator of synth_data/fast_gen.py.
+# Every payload is exactly payload_size characters, and the file name holds
+# every setting the table depends on, so a table is generated once and reused
+# by every later run:
+#
+#   filter     rows(id, payload), keeping the ids below scale / 2
+#   aggregate  rows(grp, amount, payload) with scale / 100 groups
+#   fk_join    pk(id, payload) with scale / 10 rows, fk(ref, payload) with
+#              scale rows referencing the pk ids
+#   nfk_join   two tables of scale rows whose keys are drawn from scale / 10 values
+#   kks_join   the join_kks input ("<n1> <n2>", then two sorted "key data"
+#              tables) of scale / 2 rows per table, written by
+#              synth_data/fast_gen.py's kks format
+#
+# Group ids, refs and nfk keys follow the scenario's skew (a Zipf exponent, 0
+# is uniform; both nfk tables share their hot keys), and only a match_rate share
+# of the fk and nfk2 keys exist on the other side.
+#
+# The ldbc generator uses the tables in dataset_dir with the columns of the
+# short reads (and of the old test_payload_*.py sweeps). Filter thresholds and
+# short read ids are sampled with the scenario's seed.
+
+
+SYNTHETIC_TABLES = ("filter", "aggregate", "pk", "fk", "nfk1", "nfk2")
+
+
+def _table_name(table: str, scale: int, payload_size: int, skew: float, match_rate: float, seed: int) -> str:
+    parts = [table, f"n{scale}", f"p{payload_size}"]
+    if table in ("aggregate", "fk", "nfk1", "nfk2") and skew:
+        parts.append(f"z{skew:g}")
+    if table in ("fk", "nfk2") and match_rate != 1:
+        parts.append(f"m{match_rate:g}")
+    parts.append(f"s{seed}")
+    return "_".join(parts) + ".csv"
+
+
+def synthetic_table(
+    data_dir: Path,
+    table: str,
+    scale: int,
+    payload_size: int,
+    seed: int,
+    skew: float = 0.0,
+    match_rate: float = 1.0
+) -> Path:
+    """Path of a synthetic table (see the comment above), generated if it is not there yet."""
+    if table not in SYNTHETIC_TABLES:
+        raise ValueError(f"Unknown synthetic table '{table}'")
+    path = Path(data_dir) / _table_name(table, scale, payload_size, skew, match_rate, seed)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Generating {path}...")
+    keys = np.arange(max(1, scale // 10))
+    num_rows = len(keys) if table == "pk" else scale
+    refs = None
+    if table == "aggregate":
+        refs = ZipfKeys(np.arange(max(1, scale // 100)), skew, 1.0, seed)
+    elif table in ("fk", "nfk1", "nfk2"):
+        refs = ZipfKeys(keys, skew, 1.0 if table == "nfk1" else match_rate, seed)
+    header = {"filter": "id|payload", "aggregate": "grp|amount|payload", "pk": "id|payload"}.get(table, "ref|payload")
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(header + "\n")
+        for rng, start, count in chunks(num_rows, seed, SYNTHETIC_TABLES.index(table)):
+            payloads = random_strings(rng, count, payload_size)
+            if table == "aggregate":
+                write_rows(f, "%d|%d|%s", refs.draw(rng, count), rng.integers(1, 1001, count), payloads)
+            elif refs is not None:
+                write_rows(f, "%d|%s", refs.draw(rng, count), payloads)
+            else:
+                write_rows(f, "%d|%s", np.arange(start, start + count), payloads)
+    tmp_path.replace(path)
+    return path
+
+
+def kks_input(data_dir: Path, scale: int, seed: int, skew: float = 0.0, match_rate: float = 1.0) -> Path:
+    """Path of a join_kks input of scale rows, generated if it is not there yet."""
+    parts = ["kks", f"n{scale}"]
+    if skew:
+        parts.append(f"z{skew:g}")
+    if match_rate != 1:
+        parts.append(f"m{match_rate:g}")
+    path = Path(data_dir) / ("_".join(parts + [f"s{seed}"]) + ".txt")
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Generating {path}...")
+    half = max(1, scale // 2)
+    tmp_path = path.with_suffix(".tmp")
+    write_kks_input(tmp_path, half, half, ZipfKeys(np.arange(1, half + 1), skew, match_rate, seed), seed)
+    tmp_path.replace(path)
+    return path
+
+
+def sample_ids(table_path: Path, column: str, count: int, seed: int) -> List[int]:
+    """count distinct values of an LDBC table's id column, sampled with seed."""
+    with open(table_path, "r", newline="", encoding="utf-8-sig") as f:
+        values = list(dict.fromkeys(row[column] for row in csv.DictReader(f, delimiter="|") if row[column]))
+    return [int(value) for value in random.Random(seed).sample(values, min(count, len(values)))]
+
+
+def synthetic_inputs(scenario: Scenario, data_dir: Path) -> Dict:
+    def table(name: str) -> str:
+        return str(synthetic_table(
+            data_dir, name, scenario.scale, scenario.payload_size, scenario.seed, scenario.skew, scenario.match_rate
+        ))
+
+    if scenario.operator == "filter":
+        return {"filepath": table("filter"), "filter_col": "id", "payload_cols": ["payload"],
+                "filter_threshold": scenario.scale // 2, "filter_condition": ">"}
+    if scenario.operator == "aggregate":
+        return {"filepath": table("aggregate"), "group_by_col": "grp", "agg_col": "amount", "payload_cols": ["payload"]}
+    if scenario.operator == "fk_join":
+        return {"table1_path": table("pk"), "key1": "id", "payload1_cols": ["payload"],
+                "table2_path": table("fk"), "key2": "ref", "payload2_cols": ["payload"]}
+    if scenario.operator == "nfk_join":
+        return {"table1_path": table("nfk1"), "key1": "ref", "payload1_cols": ["payload"],
+                "table2_path": table("nfk2"), "key2": "ref", "payload2_cols": ["payload"]}
+    if scenario.operator == "kks_join":
+        return {"input_path": str(kks_input(data_dir, scenario.scale, scenario.seed, scenario.skew, scenario.match_rate))}
+    raise ValueError(f"The synthetic generator has no inputs for '{scenario.operator}'")
+
+
+def ldbc_inputs(scenario: Scenario) -> Dict:
+    ldbc_dir = Path(scenario.dataset_dir)
+    person, post = ldbc_dir / "Person.csv", ldbc_dir / "Post.csv"
+    if scenario.operator == "filter":
+        [message_id] = sample_ids(post, "id", 1, scenario.seed)
+        return {"filepath": str(post), "filter_col": "id", "payload_cols": ["content", "creationDate"],
+                "filter_threshold": message_id, "filter_condition": "=="}
+    if scenario.operator == "aggregate":
+        return {"filepath": str(post), "group_by_col": "CreatorPersonId", "agg_col": "length", "payload_cols": ["id"]}
+    if scenario.operator == "fk_join":
+        return {"table1_path": str(person), "key1": "id",
+                "payload1_cols": ["firstName", "lastName", "email", "LocationCityId"],
+                "table2_path": str(post), "key2": "CreatorPersonId",
+                "payload2_cols": ["creationDate", "content", "imageFile"]}
+    if scenario.operator == "nfk_join":
+        return {"table1_path": str(ldbc_dir / "Person_knows_Person.csv"), "key1": "Person2Id",
+                "payload1_cols": ["Person1Id", "creationDate"],
+                "table2_path": str(person), "key2": "id", "payload2_cols": ["firstName", "lastName"]}
+    # short_read: Short Reads 1-3 take person ids, 4-7 message ids.
+    id_flag, id_table = ("--person_id", person) if scenario.query < 4 else ("--message_id", post)
+    return {"query": scenario.query, "LDBC_dir_path": str(ldbc_dir), "id_flag": id_flag,
+            "ids": sample_ids(id_table, "id", scenario.batch_size, scenario.seed)}
+
+
+def scenario_inputs(scenario: Scenario, data_dir: Path) -> Dict:
+    """The operator inputs of a scenario (see the comment above)."""
+    if scenario.generator == "ldbc":
+        return ldbc_inputs(scenario)
+    return synthetic_inputs(scenario, data_dir)
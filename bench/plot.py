@@ -0,0 +1,51 @@
+# bench/plot.py
+
+from pathlib import Path
+from typing import Dict, List
+
+##################
+# BENCHMARK PLOT #
+##################
+
+# Optional: matplotlib is only imported when a plot is asked for, so the suite
+# runs and writes its JSON results without it. One line per combination of the
+# scenario fields other than x, with the median as the point and the p95 as
+# the upper error bar.
+
+
+def plot_results(results: List[Dict], path: Path, x: str = "data_length", metric: str = "enclave"):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping the plot (the JSON results are complete without it).")
+        return
+
+    ignored = {x, "name", "label", "seed"}
+    lines: Dict[str, List] = {}
+    for result in results:
+        scenario, stats = result["scenario"], result["summary"][metric]
+        if not stats.get("n") or not isinstance(scenario.get(x), (int, float)):
+            continue
+        varying = [key for key in scenario if key not in ignored and len({str(r["scenario"].get(key)) for r in results}) > 1]
+        label = ", ".join(f"{key}={scenario[key]}" for key in varying) or scenario["operator"]
+        lines.setdefault(label, []).append((scenario[x], stats["median"], stats["p95"]))
+
+    if not lines:
+        print(f"No numeric '{x}' values to plot.")
+        return
+    fig, ax = plt.subplots(figsize=(12, 7))
+    for label, points in sorted(lines.items()):
+        points.sort()
+        xs, medians, p95s = zip(*points)
+        ax.errorbar(xs, medians, yerr=[[0] * len(points), [p - m for p, m in zip(p95s, medians)]],
+                    marker="o", capsize=3, label=label)
+    ax.set_xlabel(x)
+    ax.set_ylabel(f"{metric} time (s), median and p95")
+    ax.set_xscale("log")
+    ax.grid(True, which="both", ls="--")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"Plot saved to {path}")
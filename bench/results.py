@@ -0,0 +1,122 @@
+# bench/results.py
+
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from engine import available_cpus
+
+#####################
+# BENCHMARK RESULTS #
+#####################
+
+# A results file is one JSON document:
+#
+#   {"suite": ..., "created": ..., "git_commit": ..., "host": {...},
+#    "trials": N, "warmup": W,
+#    "results": [{"scenario": {...}, "trials": [{"enclave", "total", "stages", "phases"}, ...],
+#                 "summary": {"enclave": {...}, "total": {...}, "phases": {"sort": {...}, ...}},
+#                 "error": null}, ...]}
+#
+# The phases are the host's phase times (see engine.OPERATOR_PHASES). Every
+# summary holds n, mean, median, p95, stddev (sample standard deviation), min
+# and max in seconds. Two results files are compared scenario by scenario
+# on the median; a change is only reported as a speedup or slowdown when the
+# medians differ by more than both runs' spread (the larger stddev), so noise
+# between runs on one machine is not read as a change.
+
+METRICS = ("enclave", "total")
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return {"n": 0}
+    return {
+        "n": int(len(values)),
+        "mean": float(values.mean()),
+        "median": float(np.median(values)),
+        "p95": float(np.percentile(values, 95)),
+        "stddev": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+
+
+def scenario_result(scenario: Dict, trials: List[Dict], error: Optional[str] = None) -> Dict:
+    summary = {metric: summarize([trial[metric] for trial in trials]) for metric in METRICS}
+    phases = dict.fromkeys(name for trial in trials for name in trial.get("phases", {}))
+    summary["phases"] = {name: summarize([trial["phases"].get(name, 0.0) for trial in trials]) for name in phases}
+    return {"scenario": scenario, "trials": trials, "summary": summary, "error": error}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: Path, suite: str, trials: int, warmup: int, results: List[Dict]):
+    document = {
+        "suite": suite,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "host": {"platform": platform.platform(), "cpus": available_cpus(), "hostname": platform.node(),
+                 "warm_workers": os.environ.get("OBLIVIATOR_WARM_WORKERS", "0")},
+        "trials": trials,
+        "warmup": warmup,
+        "results": results,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(document, f, indent=2)
+    tmp_path.replace(path)
+
+
+def read_results(path: Path) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def print_summary(results: List[Dict]):
+    print(f"\n{'scenario':<48} {'metric':<8} {'median':>10} {'p95':>10} {'stddev':>10} {'n':>4}")
+    for result in results:
+        if result.get("error"):
+            print(f"{result['scenario']['name']:<48} failed: {result['error']}")
+        for metric in METRICS:
+            stats = result["summary"][metric]
+            if not stats.get("n"):
+                continue
+            print(f"{result['scenario']['name']:<48} {metric:<8} {stats['median']:>9.4f}s {stats['p95']:>9.4f}s "
+                  f"{stats['stddev']:>9.4f}s {stats['n']:>4}")
+        phases = result["summary"].get("phases")
+        if phases:
+            print(f"{'':<48} phases   " + ", ".join(f"{name} {stats['median']:.4f}s" for name, stats in phases.items()))
+
+
+def compare(baseline: Dict, results: List[Dict], metric: str = "total"):
+    """Prints the median change of every scenario that is also in the baseline results."""
+    before = {result["scenario"]["name"]: result["summary"][metric] for result in baseline["results"]}
+    print(f"\nCompared with {baseline.get('git_commit') or 'baseline'} ({metric} time, medians):")
+    for result in results:
+        name, after = result["scenario"]["name"], result["summary"][metric]
+        if name not in before or not before[name].get("n") or not after.get("n"):
+            continue
+        old, new = before[name]["median"], after["median"]
+        noise = max(before[name]["stddev"], after["stddev"])
+        verdict = "within noise"
+        if abs(new - old) > noise:
+            verdict = "faster" if new < old else "slower"
+        ratio = new / old if old else float("inf")
+        print(f"  {name:<48} {old:>9.4f}s -> {new:>9.4f}s  x{ratio:.3f}  {verdict}")
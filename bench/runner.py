@@ -0,0 +1,181 @@
+# bench/runner.py
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from bench.generators import scenario_inputs
+from bench.scenarios import Scenario
+from engine import (
+    StageTimer, make_temp_dir, read_phase_times, read_time_file, run_fk_join, run_nfk_join, run_operator1,
+    run_operator2
+)
+
+####################
+# BENCHMARK RUNNER #
+####################
+
+# Runs every scenario `warmup` times without recording (to build the operator,
+# fill the build cache and warm the page cache), then `trials` times. Each
+# trial records two times:
+#
+#   enclave  the enclave time the host reports (the .time file), the number the
+#            old scripts and the paper figures use
+#   total    the wall time of the whole pipeline (formatting, relabeling,
+#            build, enclave run, reconstruction)
+#
+# plus the time of each pipeline stage and the phase times the host reports
+# (sort, aggregate, compact, read_input, ... see engine.OPERATOR_PHASES). Operators run in this process through
+# engine.py with the result cache bypassed, so every trial runs the enclave;
+# short reads run as their own process, like ldbc_test.py ran them, with the
+# result cache switched off. kks_join scenarios build the join_kks program of
+# their variant (make -B, as join_kks/test_scripts/perf_test.py did; only when
+# the previous scenario built another one) and time it on its input: enclave is
+# the "Total runtime" it prints and its other "<label>: <seconds>s" lines are
+# the phases. Everything the operators print goes to one log per scenario in
+# the work directory.
+
+KKS_DIR = Path(__file__).resolve().parent.parent / "join_kks"
+# variant: (make arguments, program)
+KKS_BUILDS = {
+    "merge_join": (["merge_join"], "./merge_join"),
+    "prototype": (["prototype", "SUBTIME=1"], "./prototype"),
+    "sgx": (["sgx", "SGX_PRERELEASE=1", "SGX_DEBUG=0"], "./app"),
+    "sgx_l3": (["sgx", "SGX_PRERELEASE=1", "SGX_DEBUG=0", "L3=1"], "./app"),
+}
+_kks_built: Optional[str] = None
+
+
+def _run_operator(scenario: Scenario, inputs: Dict, work_dir: Path, output_path: Path) -> Dict:
+    timer = StageTimer(scenario.operator)
+    time_path = output_path.with_suffix(".time")
+    time_path.unlink(missing_ok=True)
+    temp_dir = make_temp_dir(str(work_dir / f"tmp_{scenario.operator}"))
+    common = {"variant": scenario.variant, "threads": scenario.threads, "use_cache": False, "timer": timer}
+    no_map = scenario.payload_mode == "direct"
+    try:
+        if scenario.operator == "filter":
+            run_operator1(
+                inputs["filepath"], inputs["filter_col"], inputs["payload_cols"], temp_dir, output_path,
+                no_map=no_map, filter_threshold=inputs["filter_threshold"],
+                filter_condition=inputs["filter_condition"], data_length=scenario.data_length, **common
+            )
+        elif scenario.operator == "aggregate":
+            run_operator2(
+                inputs["filepath"], inputs["group_by_col"], inputs["agg_col"], inputs["payload_cols"],
+                temp_dir, output_path, **common
+            )
+        elif scenario.operator == "fk_join":
+            run_fk_join(
+                inputs["table1_path"], inputs["key1"], inputs["payload1_cols"],
+                inputs["table2_path"], inputs["key2"], inputs["payload2_cols"], temp_dir, output_path,
+                no_map=no_map, data_length=scenario.data_length, **common
+            )
+        else:
+            run_nfk_join(
+                inputs["table1_path"], inputs["key1"], inputs["payload1_cols"],
+                inputs["table2_path"], inputs["key2"], inputs["payload2_cols"], temp_dir, output_path,
+                data_length=scenario.data_length, **common
+            )
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    if not time_path.exists():
+        raise RuntimeError(f"{scenario.operator} did not write {time_path}")
+    return {
+        "enclave": read_time_file(time_path), "total": timer.total, "stages": timer.as_dict(),
+        "phases": read_phase_times(time_path),
+    }
+
+
+def _run_short_read(scenario: Scenario, inputs: Dict, output_path: Path, log) -> Dict:
+    command = [
+        sys.executable, f"short{inputs['query']}.py", inputs["id_flag"], *map(str, inputs["ids"]),
+        "--LDBC_dir_path", inputs["LDBC_dir_path"], "--output_path", str(output_path),
+        "--threads", str(scenario.threads)
+    ]
+    env = {**os.environ, "OBLIVIATOR_RESULT_CACHE": "off", "OBLIVIATOR_DATA_LENGTH": str(scenario.data_length)}
+    time_path = output_path.with_suffix(".time")
+    # A .time file left by an earlier trial would hide a failed run.
+    time_path.unlink(missing_ok=True)
+    log.flush()
+    start = time.perf_counter()
+    subprocess.run(command, check=True, cwd=Path(__file__).resolve().parent.parent, env=env, stdout=log, stderr=subprocess.STDOUT)
+    total = time.perf_counter() - start
+    if not time_path.exists():
+        raise RuntimeError(f"short read {inputs['query']} did not write {time_path}")
+    # The batch's .time file holds the enclave time of the whole batch.
+    enclave = read_time_file(time_path) / len(inputs["ids"])
+    return {"enclave": enclave, "total": total / len(inputs["ids"]), "stages": {}, "phases": {}}
+
+
+def _run_kks_join(scenario: Scenario, inputs: Dict, output_path: Path, log) -> Dict:
+    global _kks_built
+    make_args, program = KKS_BUILDS[scenario.variant]
+    log.flush()
+    if _kks_built != scenario.variant:
+        subprocess.run(["make", "-B", *make_args], check=True, cwd=KKS_DIR, stdout=log, stderr=subprocess.STDOUT)
+        _kks_built = scenario.variant
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [program, str(Path(inputs["input_path"]).resolve()), str(output_path)],
+        check=True, cwd=KKS_DIR, capture_output=True, text=True
+    )
+    total = time.perf_counter() - start
+    log.write(completed.stdout)
+    output_path.unlink(missing_ok=True)
+    phases = {}
+    for line in completed.stdout.splitlines():
+        label, _, seconds = line.rpartition(":")
+        seconds = seconds.strip()
+        if label and seconds.endswith("s"):
+            try:
+                phases["_".join(label.lower().split())] = float(seconds[:-1])
+            except ValueError:
+                continue
+    if "total_runtime" not in phases:
+        raise RuntimeError(f"{program} did not report its total runtime")
+    enclave = phases.pop("total_runtime")
+    return {"enclave": enclave, "total": total, "stages": {}, "phases": phases}
+
+
+def run_trial(scenario: Scenario, inputs: Dict, work_dir: Path, log) -> Dict:
+    """Runs a scenario once. Returns {"enclave": s, "total": s, "stages": {stage: s}, "phases": {phase: s}}."""
+    output_path = (work_dir / f"{scenario.name}.csv").resolve()
+    if scenario.operator == "short_read":
+        return _run_short_read(scenario, inputs, output_path, log)
+    if scenario.operator == "kks_join":
+        return _run_kks_join(scenario, inputs, output_path.with_suffix(".txt"), log)
+    with redirect_stdout(log):
+        return _run_operator(scenario, inputs, work_dir, output_path)
+
+
+def run_scenario(
+    scenario: Scenario,
+    data_dir: Path,
+    work_dir: Path,
+    trials: int,
+    warmup: int
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    The recorded trials of one scenario, after `warmup` unrecorded runs, and the
+    error that stopped it (e.g. a payload that does not fit its DATA_LENGTH), if any.
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    log_path = work_dir / f"{scenario.name}.log"
+    results = []
+    with open(log_path, "a") as log:
+        try:
+            inputs = scenario_inputs(scenario, data_dir)
+            for run in range(warmup + trials):
+                trial = run_trial(scenario, inputs, work_dir, log)
+                if run >= warmup:
+                    results.append(trial)
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            print(f"  {scenario.name} failed: {e} (log: {log_path})")
+            return results, str(e)
+    return results, None
@@ -0,0 +1,187 @@
+# bench/scenarios.py
+
+import itertools
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+#######################
+# BENCHMARK SCENARIOS #
+#######################
+
+# A scenario is one configuration to time: an operator, the input it runs on
+# and the knobs that change its cost. Suites are written declaratively as a
+# list of specs (dicts, or a JSON file with the same shape), and any field of a
+# spec may be a list, which expands into one scenario per combination:
+#
+#   {"operator": "fk_join", "generator": "synthetic", "scale": [10000, 100000],
+#    "payload_size": 32, "payload_mode": ["map", "direct"], "threads": [1, 4]}
+#
+# is eight scenarios. Fields:
+#
+#   operator       filter, aggregate, fk_join, nfk_join, short_read or kks_join
+#   generator      synthetic (generated inputs, see generators.py) or ldbc
+#   scale          rows of the (largest) synthetic table
+#   payload_size   bytes of every synthetic payload
+#   skew           Zipf exponent of the synthetic foreign keys and group ids (0 = uniform)
+#   match_rate     share of the synthetic foreign keys that have a join partner
+#   dataset_dir    LDBC directory for the ldbc generator (default LDBC_SF1)
+#   payload_mode   map (relabeled payloads) or direct (--no_map)
+#   threads        enclave threads, or "auto"
+#   variant        default or opaque_shared_memory; for kks_join the join_kks
+#                  program: merge_join, prototype, sgx or sgx_l3
+#   data_length    DATA_LENGTH mode: "auto", "header" or bytes (default "auto")
+#   query          LDBC short read number (short_read only)
+#   batch_size     ids answered together by one short read (short_read only)
+#   seed           seed of the input generator and id sampling
+#   label          name in reports (default: built from the operator and its settings)
+
+OPERATORS = ("filter", "aggregate", "fk_join", "nfk_join", "short_read", "kks_join")
+KKS_VARIANTS = ("merge_join", "prototype", "sgx", "sgx_l3")
+GENERATORS = ("synthetic", "ldbc")
+DEFAULTS = {
+    "generator": "synthetic",
+    "scale": 10000,
+    "payload_size": 16,
+    "skew": 0.0,
+    "match_rate": 1.0,
+    "dataset_dir": "LDBC_SF1",
+    "payload_mode": "map",
+    "threads": "auto",
+    "variant": "default",
+    "data_length": "auto",
+    "query": None,
+    "batch_size": 1,
+    "seed": 1,
+    "label": None,
+}
+
+
+class Scenario:
+    """One benchmark configuration (see the field list above)."""
+
+    def __init__(self, operator: str, **fields):
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator '{operator}'. Valid are: {list(OPERATORS)}")
+        unknown = set(fields) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown scenario fields: {sorted(unknown)}")
+        self.operator = operator
+        self.fields = {**DEFAULTS, **fields}
+        if self.generator not in GENERATORS:
+            raise ValueError(f"Unknown generator '{self.generator}'. Valid are: {list(GENERATORS)}")
+        if operator == "short_read" and (self.generator != "ldbc" or self.query not in range(1, 8)):
+            raise ValueError("short_read scenarios need generator 'ldbc' and a query from 1 to 7")
+        if operator == "kks_join" and (self.generator != "synthetic" or self.variant not in KKS_VARIANTS):
+            raise ValueError(f"kks_join scenarios need generator 'synthetic' and a variant from {list(KKS_VARIANTS)}")
+
+    def __getattr__(self, name: str):
+        fields = self.__dict__.get("fields", {})
+        if name in fields:
+            return fields[name]
+        raise AttributeError(name)
+
+    @property
+    def name(self) -> str:
+        if self.label:
+            return self.label
+        parts = [self.operator]
+        if self.operator == "short_read":
+            parts.append(f"q{self.query}")
+        if self.generator == "synthetic":
+            parts.append(f"n{self.scale}")
+            if self.operator != "kks_join":
+                parts.append(f"p{self.payload_size}")
+            if self.skew:
+                parts.append(f"z{self.skew:g}")
+            if self.match_rate != 1:
+                parts.append(f"m{self.match_rate:g}")
+        if self.operator == "kks_join":
+            return "_".join(str(part) for part in parts + [self.variant])
+        parts += [self.payload_mode, f"t{self.threads}", f"dl{self.data_length}"]
+        if self.variant != "default":
+            parts.append(self.variant)
+        if self.batch_size != 1:
+            parts.append(f"b{self.batch_size}")
+        return "_".join(str(part) for part in parts)
+
+    def as_dict(self) -> Dict:
+        return {"name": self.name, "operator": self.operator, **self.fields}
+
+
+def expand(spec: Dict) -> List[Scenario]:
+    """Every scenario a spec describes: one per combination of its list-valued fields."""
+    keys = list(spec)
+    values = [value if isinstance(value, list) else [value] for value in spec.values()]
+    return [Scenario(**dict(zip(keys, combination))) for combination in itertools.product(*values)]
+
+
+# The sweeps the old ad-hoc scripts ran, plus a quick synthetic smoke suite.
+SUITES: Dict[str, List[Dict]] = {
+    "smoke": [
+        {"operator": ["filter", "aggregate", "fk_join"], "scale": 1000, "payload_size": 16},
+    ],
+    "synthetic": [
+        {"operator": ["filter", "aggregate", "fk_join", "nfk_join"], "scale": [10000, 100000],
+         "payload_size": [16, 64], "payload_mode": "map"},
+        {"operator": ["filter", "fk_join"], "scale": [10000, 100000], "payload_size": [16, 64],
+         "payload_mode": "direct"},
+    ],
+    # Hot keys: FK joins and aggregation as the Zipf skew of the keys grows.
+    "skew": [
+        {"operator": ["fk_join", "aggregate"], "scale": 100000, "payload_size": 16, "skew": [0.0, 0.5, 1.0, 1.5]},
+    ],
+    # test_payload_fkjoin.py: LDBC Person x Post, relabeled vs. direct payloads by DATA_LENGTH.
+    "payload_fkjoin": [
+        {"operator": "fk_join", "generator": "ldbc", "dataset_dir": "Big_LDBC", "payload_mode": "map",
+         "data_length": [32, 42, 46, 47, 48, 49, 50, 54, 64, 128, 256]},
+        {"operator": "fk_join", "generator": "ldbc", "dataset_dir": "Big_LDBC", "payload_mode": "direct",
+         "data_length": [128, 256, 512, 1024]},
+    ],
+    # test_payload_filter.py: the Short Read 4 filter over LDBC Post by DATA_LENGTH.
+    "payload_filter": [
+        {"operator": "filter", "generator": "ldbc", "dataset_dir": "Big_LDBC", "payload_mode": "direct",
+         "data_length": [32, 42, 46, 47, 48, 49, 50, 54, 64, 128, 256, 512, 1024]},
+    ],
+    # ldbc_test.py: every LDBC short read on sampled ids.
+    "ldbc_short_reads": [
+        {"operator": "short_read", "generator": "ldbc", "query": [1, 2, 3, 4, 5, 6, 7]},
+    ],
+    # join_kks/test_scripts/perf_test.py: the KKS merge join, prototype and SGX
+    # app (with and without L3) by input size. Variant comes first so each
+    # program is built once.
+    "kks_perf": [
+        {"operator": "kks_join", "variant": ["merge_join", "prototype", "sgx", "sgx_l3"],
+         "scale": [1000, 100000, 250000, 500000, 750000, 1000000]},
+    ],
+    # scripts/figure9.sh: NFK join thread scaling, on synthetic tables of 2^16
+    # to 2^24 rows instead of the artifact's pre-generated 1xn inputs.
+    "figure9": [
+        {"operator": "nfk_join", "scale": [2 ** 16, 2 ** 18, 2 ** 20, 2 ** 22, 2 ** 24],
+         "threads": [1, 2, 4, 8, 16, 32]},
+    ],
+    # scripts/figure11.sh: filter and aggregation on 1 and 32 threads, on
+    # synthetic tables instead of the Big Data Benchmark queries.
+    "figure11": [
+        {"operator": ["filter", "aggregate"], "scale": 1000000, "threads": [1, 32]},
+    ],
+}
+
+
+def load_suite(suite: Union[str, Path], overrides: Optional[Dict] = None) -> List[Scenario]:
+    """
+    The scenarios of a built-in suite (see SUITES) or of a JSON file holding a
+    list of specs. overrides (e.g. {"batch_size": 4}) replace fields in every spec.
+    """
+    if str(suite) in SUITES:
+        specs = SUITES[str(suite)]
+    else:
+        path = Path(suite)
+        if not path.exists():
+            raise ValueError(f"Unknown suite '{suite}': not one of {sorted(SUITES)} and no such file")
+        with open(path, "r") as f:
+            specs = json.load(f)
+    scenarios = []
+    for spec in specs:
+        scenarios += expand({**spec, **(overrides or {})})
+    return scenarios
@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import IO, List, Optional, Sequence, Tuple
+
+from content_store import ContentStore
+
+##########################
+# OBLIVIATOR BUILD CACHE #
+##########################
+
+# Building an operator (make clean && make, including enclave signing) often takes
+# longer than the query it serves. The build key is a hash over the operator's
+# sources: .c/.h/.edl/.conf/.mk files and Makefiles, including common/elem_t.h
+# (DATA_LENGTH) and third_party sources. The key also covers the make arguments
+# (e.g. L3=1), any extra key values, and the host CPU, because the Makefile
+# builds with -march=native.
+# The signed enclave and the host binary are stored under that key. On a hit
+# they are hard-linked (or copied) back into the operator directory instead of
+# rebuilding.
+# build_entry fills the cache without touching the operator directory at all:
+# a miss is built in a private overlay copy (sources hard-linked, everything
+# else copied), which is how the wrappers build by default (see workspace.py).
+#
+# Environment:
+#   OBLIVIATOR_BUILD_CACHE         store directory (default ~/.cache/obliviator/builds),
+#                                  or "off" to always rebuild
+#   OBLIVIATOR_BUILD_CACHE_MAX_MB  LRU size limit in MB (default 2048)
+
+ARTIFACTS = {
+    "parallel": Path("host/parallel"),
+    "parallel_enc.signed": Path("enclave/parallel_enc.signed"),
+}
+SOURCE_SUFFIXES = {".c", ".h", ".edl", ".conf", ".mk", ".S", ".s"}
+# Files oeedger8r generates from parallel.edl; they are rewritten on every build.
+GENERATED_PREFIXES = ("parallel_t.", "parallel_u.", "parallel_args.")
+STAMP_FILE = ".build_key"
+
+
+def _store_root() -> Optional[Path]:
+    root = os.environ.get("OBLIVIATOR_BUILD_CACHE", "~/.cache/obliviator/builds")
+    if root.lower() in ("off", "0", "none", ""):
+        return None
+    return Path(os.path.expanduser(root))
+
+
+def get_store() -> Optional[ContentStore]:
+    root = _store_root()
+    if root is None:
+        return None
+    max_mb = int(os.environ.get("OBLIVIATOR_BUILD_CACHE_MAX_MB", "2048"))
+    return ContentStore(root, max_mb * 1024 * 1024)
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def _is_source(path: Path) -> bool:
+    if path.name.startswith(GENERATED_PREFIXES):
+        return False
+    return path.suffix in SOURCE_SUFFIXES or path.name in ("Makefile", "makefile", "GNUmakefile")
+
+
+def _source_files(code_dir: Path) -> List[Path]:
+    files = []
+    for path in code_dir.rglob("*"):
+        if path.is_file() and _is_source(path):
+            files.append(path)
+    return sorted(files)
+
+
+def compute_build_key(code_dir: Path, make_args: Sequence[str] = (), extra_key: Sequence[str] = ()) -> str:
+    """Hashes everything that determines the built host binary and signed enclave."""
+    h = hashlib.sha256()
+    h.update(f"machine={platform.machine()}\ncpu={_cpu_model()}\n".encode())
+    h.update(("make_args=" + " ".join(make_args) + "\n").encode())
+    h.update(("extra=" + "\x1f".join(extra_key) + "\n").encode())
+    for path in _source_files(code_dir):
+        h.update(str(path.relative_to(code_dir)).encode() + b"\0")
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def _install(entry_dir: Path, code_dir: Path):
+    """Hard links (falling back to a copy) the cached artifacts into code_dir."""
+    for name, rel_path in ARTIFACTS.items():
+        target = code_dir / rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        try:
+            os.link(entry_dir / name, target)
+        except OSError:
+            shutil.copy2(entry_dir / name, target)
+
+
+def _read_stamp(code_dir: Path) -> Optional[str]:
+    try:
+        return (code_dir / STAMP_FILE).read_text().strip()
+    except OSError:
+        return None
+
+
+def _write_stamp(code_dir: Path, key: str):
+    (code_dir / STAMP_FILE).write_text(key + "\n")
+
+
+def _run_make(code_dir: Path, make_args: Sequence[str], make_jobs: Optional[int] = None, log: Optional[IO] = None):
+    subprocess.run(["make", "clean"], cwd=code_dir, check=True, capture_output=log is None, stdout=log, stderr=log)
+    jobs_arg = [f"-j{make_jobs}"] if make_jobs else []
+    subprocess.run(["make", *jobs_arg, *make_args], cwd=code_dir, check=True, stdout=log, stderr=log)
+
+
+def _overlay_file(source: str, target: str):
+    """Hard-links sources, which make only reads, and copies everything else, which make may rewrite."""
+    if _is_source(Path(source)):
+        try:
+            os.link(source, target)
+            return
+        except OSError:
+            pass
+    shutil.copy2(source, target)
+
+
+def overlay_tree(code_dir: Path, target: Path):
+    """
+    Creates a private copy of code_dir at target that a build can run in without
+    touching code_dir: sources are hard-linked, build outputs and anything else
+    are copied (make clean then unlinks the copies).
+    """
+    shutil.copytree(code_dir, target, symlinks=True, copy_function=_overlay_file, ignore=shutil.ignore_patterns(STAMP_FILE))
+
+
+def build_copy(
+    code_dir: Path,
+    build_dir: Path,
+    make_args: Sequence[str] = (),
+    make_jobs: Optional[int] = None,
+    log: Optional[IO] = None
+):
+    """Builds code_dir with make_args in a new overlay copy at build_dir."""
+    overlay_tree(code_dir, build_dir)
+    _run_make(build_dir, make_args, make_jobs, log)
+
+
+def build_entry(
+    code_dir: Path,
+    make_args: Sequence[str] = (),
+    extra_key: Sequence[str] = (),
+    make_jobs: Optional[int] = None,
+    log: Optional[IO] = None
+) -> Tuple[Optional[str], Optional[Path], bool]:
+    """
+    Makes sure the build cache holds binaries for code_dir's current sources and
+    make_args without writing to code_dir: a miss is built in a private overlay
+    copy (see overlay_tree). Concurrent callers that need the same build wait for
+    one of them to make it. Returns (key, entry directory, cache hit), or
+    (None, None, False) when the build cache is disabled.
+    """
+    store = get_store()
+    if store is None:
+        return None, None, False
+    code_dir = Path(code_dir)
+    key = compute_build_key(code_dir, make_args, extra_key)
+    entry_dir = store.get(key)
+    if entry_dir is not None:
+        return key, entry_dir, True
+
+    with store.key_lock(key):
+        entry_dir = store.get(key)
+        if entry_dir is not None:
+            return key, entry_dir, True
+        print(f"Build cache miss ({key[:12]}): building {code_dir} in a private copy...")
+        workspace = Path(tempfile.mkdtemp(prefix=f"obliviator_build_{key[:12]}_"))
+        try:
+            build_dir = workspace / code_dir.name
+            build_copy(code_dir, build_dir, make_args, make_jobs, log)
+            entry_dir = store.put(
+                key,
+                {name: build_dir / rel_path for name, rel_path in ARTIFACTS.items()},
+                meta={"code_dir": str(code_dir), "make_args": list(make_args)},
+            )
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+    return key, entry_dir, False
+
+
+def cached_build(code_dir: Path, make_args: Sequence[str] = (), extra_key: Sequence[str] = ()) -> bool:
+    """
+    Ensures code_dir holds binaries built from its current sources and make_args.
+    Returns True on a cache hit, False if make had to run.
+    """
+    store = get_store()
+    if store is None:
+        _run_make(code_dir, make_args)
+        return False
+
+    key = compute_build_key(code_dir, make_args, extra_key)
+    artifacts_present = all((code_dir / rel_path).exists() for rel_path in ARTIFACTS.values())
+
+    entry_dir = store.get(key)
+    if entry_dir is not None:
+        if _read_stamp(code_dir) == key and artifacts_present:
+            print(f"Build cache hit ({key[:12]}): binaries already installed.")
+        else:
+            _install(entry_dir, code_dir)
+            _write_stamp(code_dir, key)
+            print(f"Build cache hit ({key[:12]}): installed cached binaries into {code_dir}.")
+        return True
+
+    print(f"Build cache miss ({key[:12]}): building {code_dir}...")
+    (code_dir / STAMP_FILE).unlink(missing_ok=True)
+    _run_make(code_dir, make_args)
+    store.put(
+        key,
+        {name: code_dir / rel_path for name, rel_path in ARTIFACTS.items()},
+        meta={"code_dir": str(code_dir), "make_args": list(make_args)},
+    )
+    _write_stamp(code_dir, key)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the Obliviator build cache.")
+    parser.add_argument("--stats", action="store_true", help="Print hit/miss counters and store size.")
+    parser.add_argument("--clear", action="store_true", help="Remove every cached build.")
+    parser.add_argument("--key", help="Print the build key for an operator directory (e.g. ~/obliviator/fk_join).")
+    parser.add_argument("--make_args", nargs='*', default=[], help="Make arguments to include in --key.")
+    args = parser.parse_args()
+
+    store = get_store()
+    if store is None:
+        print("Build cache is disabled (OBLIVIATOR_BUILD_CACHE=off).")
+        return
+    if args.clear:
+        store.clear()
+        print(f"Cleared build cache at {store.root}.")
+    if args.key:
+        print(compute_build_key(Path(os.path.expanduser(args.key)), args.make_args))
+    if args.stats or not (args.clear or args.key):
+        for name, value in store.stats().items():
+            print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
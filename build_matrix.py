@@ -0,0 +1,142 @@
+import argparse
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from build_cache import build_entry, get_store
+from engine import DATA_LENGTH_BUCKETS, NFK_MAKE_ARGS, available_cpus, operator_code_dir, supports_sized_data_length
+
+###################################
+# PREBUILT OPERATOR BINARY MATRIX #
+###################################
+
+# A query that needs an operator build the build cache does not hold yet pays
+# for make (including enclave signing) on the query path. With per-job
+# DATA_LENGTH sizing (see engine.py) there is one build per DATA_LENGTH bucket,
+# so the first queries after a source change can rebuild several times.
+# build_matrix.py warms the build cache with every combination the wrappers
+# can ask for:
+#
+#   operator (operator_1, fk_join, join) x variant (default, opaque_shared_memory)
+#   x DATA_LENGTH (each bucket, plus the elem_t.h value) x L3 flag (join only)
+#
+# Each combination is built in its own overlay copy of the operator directory
+# (see build_cache.build_entry), so several builds of one operator run at once:
+# --jobs builds in a process pool, each running make -j<--make_jobs>. The
+# binaries go into the build cache under the same key the engine computes for
+# the operator directory, so at run time the wrappers run the matching build
+# from the cache (see workspace.py) instead of running make. Combinations
+# already in the cache are skipped. Directories whose elem_t.h fixes
+# DATA_LENGTH (e.g. the opaque_shared_memory variants) get their header build
+# only, and missing directories are skipped.
+
+OPERATORS = ("operator_1", "fk_join", "join")
+VARIANTS = ("default", "opaque_shared_memory")
+HEADER = "header"
+
+
+def matrix(
+    operators: Sequence[str],
+    variants: Sequence[str],
+    data_lengths: Sequence[str],
+    l3_values: Sequence[str]
+) -> List[Tuple[str, str, Path, List[str]]]:
+    """Every (operator, variant, code_dir, make_args) to build, in the make argument order the engine uses."""
+    combinations = []
+    for operator in operators:
+        for variant in variants:
+            try:
+                code_dir = operator_code_dir(operator, variant)
+            except FileNotFoundError as e:
+                print(f"Skipping {operator} ({variant}): {e}")
+                continue
+            sized = supports_sized_data_length(code_dir)
+            lengths = [length for length in data_lengths if sized or length == HEADER]
+            if operator == "join":
+                flag_sets = [NFK_MAKE_ARGS if value == "1" else [f"L3={value}"] for value in l3_values]
+            else:
+                flag_sets = [[]]
+            for flags in flag_sets:
+                for length in lengths:
+                    length_args = [] if length == HEADER else [f"DATA_LENGTH={length}"]
+                    combinations.append((operator, variant, code_dir, [*flags, *length_args]))
+    return combinations
+
+
+def build_combination(code_dir: str, make_args: List[str], make_jobs: int, log_dir: str) -> Tuple[str, str]:
+    """
+    Builds one combination in a private copy of code_dir and adds it to the
+    build cache (see build_cache.build_entry). Runs in a worker process.
+    Returns (status, detail).
+    """
+    code_dir = Path(code_dir)
+    log_path = Path(log_dir) / f"{code_dir.name}_{'_'.join(make_args) or 'header'}.log"
+    try:
+        with open(log_path, "w") as log:
+            key, _, hit = build_entry(code_dir, make_args, make_jobs=make_jobs, log=log)
+    except subprocess.CalledProcessError as e:
+        return "failed", f"{' '.join(e.cmd)} exited with {e.returncode}, see {log_path}"
+    except (OSError, RuntimeError) as e:
+        return "failed", str(e)
+    return ("cached" if hit else "built"), key[:12]
+
+
+def build_matrix(
+    operators: Sequence[str] = OPERATORS,
+    variants: Sequence[str] = VARIANTS,
+    data_lengths: Sequence[str] = (*map(str, DATA_LENGTH_BUCKETS), HEADER),
+    l3_values: Sequence[str] = ("1",),
+    jobs: Optional[int] = None,
+    make_jobs: int = 4,
+    dry_run: bool = False
+) -> bool:
+    """Builds every combination into the build cache. Returns True if none failed."""
+    if get_store() is None:
+        raise RuntimeError("The build cache is disabled (OBLIVIATOR_BUILD_CACHE=off); there is nowhere to put the builds.")
+    combinations = matrix(operators, variants, data_lengths, l3_values)
+    jobs = jobs or max(1, available_cpus() // make_jobs)
+    print(f"Build matrix: {len(combinations)} combinations, {jobs} parallel builds with make -j{make_jobs}.")
+    if dry_run:
+        for operator, variant, _, make_args in combinations:
+            print(f"  {operator:<11} {variant:<21} {' '.join(make_args) or '(header)'}")
+        return True
+
+    log_dir = Path(tempfile.mkdtemp(prefix="obliviator-build-logs-"))
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(build_combination, str(code_dir), make_args, make_jobs, str(log_dir)): (operator, variant, make_args)
+            for operator, variant, code_dir, make_args in combinations
+        }
+        for future in as_completed(futures):
+            operator, variant, make_args = futures[future]
+            status, detail = future.result()
+            failed += status == "failed"
+            print(f"  {status:<7} {operator:<11} {variant:<21} {' '.join(make_args) or '(header)':<28} {detail}")
+    print(f"Build matrix finished in {time.perf_counter() - start:.1f}s ({failed} failed). Logs: {log_dir}")
+    return failed == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prebuild every operator/variant/DATA_LENGTH/L3 combination into the build cache.")
+    parser.add_argument("--operators", nargs='+', choices=OPERATORS, default=list(OPERATORS))
+    parser.add_argument("--variants", nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--data_lengths", nargs='+', choices=[*map(str, DATA_LENGTH_BUCKETS), HEADER],
+                        default=[*map(str, DATA_LENGTH_BUCKETS), HEADER],
+                        help="DATA_LENGTH buckets to build; 'header' is the value in common/elem_t.h.")
+    parser.add_argument("--l3", nargs='+', choices=["0", "1"], default=["1"], help="L3 flag values for the NFK join (the wrappers use 1).")
+    parser.add_argument("--jobs", type=int, default=None, help="Builds to run at once (default: available CPUs / --make_jobs).")
+    parser.add_argument("--make_jobs", type=int, default=4, help="make -j value for each build.")
+    parser.add_argument("--dry_run", action="store_true", help="List the combinations without building.")
+    args = parser.parse_args()
+
+    ok = build_matrix(args.operators, args.variants, args.data_lengths, args.l3, args.jobs, args.make_jobs, args.dry_run)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
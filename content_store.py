@@ -0,0 +1,204 @@
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+#######################################
+# CONTENT-ADDRESSED STORE (LRU, DISK) #
+#######################################
+
+# A directory of entries keyed by a content hash. Every entry is a directory of
+# named files. index.json records each entry's size and last use together with
+# hit/miss/eviction counters. Whenever the total size goes over max_bytes,
+# entries are evicted least-recently-used first. All index updates are
+# serialised with an flock on <root>/.lock, so concurrent wrapper processes can
+# share one store.
+#
+# Paths outside the store can be tied to an entry with link(), e.g. the run
+# directories workspace.py fills with hard links into build entries. They are
+# created under the store lock, so an eviction cannot run halfway through, and
+# removed together with their entry. Jobs that use an entry hold use(key), a
+# shared flock on the entry's key lock; eviction skips entries that are in use.
+
+
+class ContentStore:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.entries_dir = self.root / "entries"
+        self.index_path = self.root / "index.json"
+        self.entries_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.root / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def key_lock(self, key: str):
+        """Serialises work on one key across threads and processes, e.g. two jobs building the same entry."""
+        locks_dir = self.root / "locks"
+        locks_dir.mkdir(parents=True, exist_ok=True)
+        with open(locks_dir / f"{key}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def use(self, key: str):
+        """Keeps key's entry (and its linked paths) from being evicted while the block runs."""
+        locks_dir = self.root / "locks"
+        locks_dir.mkdir(parents=True, exist_ok=True)
+        with open(locks_dir / f"{key}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"entries": {}, "hits": 0, "misses": 0, "evictions": 0}
+
+    def _save_index(self, index: Dict):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def entry_dir(self, key: str) -> Path:
+        return self.entries_dir / key
+
+    def get(self, key: str) -> Optional[Path]:
+        """Returns the entry directory for key (and marks it used), or None on a miss."""
+        with self._locked():
+            index = self._load_index()
+            entry = index["entries"].get(key)
+            entry_dir = self.entry_dir(key)
+            if entry is None or not entry_dir.is_dir():
+                index["entries"].pop(key, None)
+                index["misses"] += 1
+                self._save_index(index)
+                return None
+            entry["last_used"] = time.time()
+            index["hits"] += 1
+            self._save_index(index)
+            return entry_dir
+
+    def put(self, key: str, files: Dict[str, Path], meta: Optional[Dict] = None) -> Path:
+        """
+        Copies files ({name: source path}) into a new entry and evicts old entries
+        until the store fits in max_bytes. Entry files are made read-only so that a
+        hard link handed out by the store cannot be modified in place.
+        """
+        with self._locked():
+            index = self._load_index()
+            entry_dir = self.entry_dir(key)
+            staging_dir = self.entries_dir / f".{key}.{os.getpid()}"
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            staging_dir.mkdir(parents=True)
+            size = 0
+            for name, source in files.items():
+                target = staging_dir / name
+                shutil.copy2(source, target)
+                os.chmod(target, 0o555)
+                size += target.stat().st_size
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging_dir, entry_dir)
+
+            index["entries"][key] = {"size": size, "last_used": time.time(), **(meta or {})}
+            self._evict(index, keep=key)
+            self._save_index(index)
+            return entry_dir
+
+    def link(self, key: str, path: Path, create: Callable[[], None]) -> bool:
+        """
+        Ties path to key's entry: calls create() if path does not exist yet, and
+        removes path when the entry is evicted. Returns False, without creating
+        anything, if the entry is no longer in the store.
+        """
+        with self._locked():
+            index = self._load_index()
+            entry = index["entries"].get(key)
+            if entry is None or not self.entry_dir(key).is_dir():
+                return False
+            path = Path(path)
+            if not path.exists():
+                create()
+            links = entry.setdefault("links", [])
+            if str(path) not in links:
+                links.append(str(path))
+                self._save_index(index)
+            return True
+
+    def _remove_entry(self, key: str, entry: Dict):
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        for path in entry.get("links", []):
+            shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def _unused(self, key: str) -> Iterator[bool]:
+        """Yields whether no job holds use(key), keeping new ones out while the block runs."""
+        lock_path = self.root / "locks" / f"{key}.lock"
+        if not lock_path.exists():
+            yield True
+            return
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self, index: Dict, keep: Optional[str] = None):
+        entries = index["entries"]
+        total = sum(e["size"] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            with self._unused(key) as unused:
+                if not unused:
+                    continue
+                total -= entries[key]["size"]
+                self._remove_entry(key, entries[key])
+            del entries[key]
+            index["evictions"] += 1
+
+    def stats(self) -> Dict:
+        with self._locked():
+            index = self._load_index()
+        return {
+            "entries": len(index["entries"]),
+            "bytes": sum(e["size"] for e in index["entries"].values()),
+            "max_bytes": self.max_bytes,
+            "hits": index["hits"],
+            "misses": index["misses"],
+            "evictions": index["evictions"],
+        }
+
+    def clear(self):
+        with self._locked():
+            for key, entry in self._load_index()["entries"].items():
+                self._remove_entry(key, entry)
+            shutil.rmtree(self.entries_dir, ignore_errors=True)
+            self.entries_dir.mkdir(parents=True, exist_ok=True)
+            self._save_index({"entries": {}, "hits": 0, "misses": 0, "evictions": 0})
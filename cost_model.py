@@ -0,0 +1,409 @@
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import shutil
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from engine import (
+    StageTimer, data_length_mode, fitting_data_length, read_time_file, read_time_metadata, threads_arg
+)
+from obliviator_formatting.streaming_input import payload_width
+
+###########################
+# PAYLOAD MODE COST MODEL #
+###########################
+
+# fkjoin.py and operator1.py can relabel their payloads to integer ids (the
+# default) or pass them to the enclave directly (--no_map). Relabeling costs a
+# sort of the payload strings and a reverse lookup afterwards, but every elem_t
+# then only carries an id. Passing payloads directly skips both, but the
+# oblivious sorts move a DATA_LENGTH sized for the widest payload (see
+# engine.py). Which one is faster depends on the input, and
+# payload_evaluation_results.csv / test_payload_fkjoin.py show the crossover.
+#
+# With --payload_mode auto the wrappers estimate both costs before running and
+# pick the cheaper one. The estimate reads the first SAMPLE_ROWS rows of each
+# table. The row count is the file size divided by the sample's bytes per row,
+# and the widest payload, the mean width and the distinct payloads are taken
+# from the sample, with the distinct count scaled up when most sampled payloads
+# are unique. The cost of a run is one linear model over the features below,
+# shared by both modes: the relabeling features are zero for direct payloads,
+# and the sort traffic differs through DATA_LENGTH. Every run (in any mode)
+# appends its features and its actual pipeline time (all stages except build
+# and result cache lookups) to the history file. Once the history holds
+# MIN_HISTORY runs of an operator, with at least MIN_MODE_RUNS of each mode, the
+# coefficients are fitted to it by non-negative least squares. There are no
+# built-in coefficients: until the model is fitted, auto uses relabeled
+# payloads. `python cost_model.py --calibrate` fills the history by running
+# both modes on synthetic tables of a few sizes and payload widths.
+#
+# So that the mode auto does not pick keeps getting history, auto runs the
+# other mode instead with probability EXPLORE_RATE (OBLIVIATOR_COST_EXPLORE).
+# Direct payloads are never chosen when the widest payload does not fit a
+# DATA_LENGTH. The decision, both predictions and the actual time are printed
+# and added to the .time file.
+#
+# Environment:
+#   OBLIVIATOR_COST_HISTORY   history file (default ~/.cache/obliviator/cost_history.jsonl),
+#                             or "off" to neither record nor fit
+#   OBLIVIATOR_COST_EXPLORE   share of auto runs that run the other mode (default 0.1, 0 to never)
+
+PAYLOAD_MODES = ("auto", "map", "direct")
+SAMPLE_ROWS = 10000
+MIN_HISTORY = 12
+MIN_MODE_RUNS = 4
+MAX_HISTORY = 2000
+EXPLORE_RATE = 0.1
+ELEM_OVERHEAD = 16      # elem_t bytes besides the payload (key, flags)
+
+FEATURES = ("constant", "sort_bytes", "rows", "payload_bytes", "relabel", "dictionary_bytes")
+
+# Calibration inputs: rows of the fk table (the pk table has a tenth) or of the
+# filter table, and payload widths, each run in both modes.
+CALIBRATION_SCALES = (10000, 50000, 200000)
+CALIBRATION_PAYLOAD_SIZES = (8, 32, 96)
+
+
+class PayloadStats:
+    """Estimated size and payload widths of an operator's input tables."""
+
+    def __init__(self, rows: int, distinct: int, max_width: int, mean_width: float):
+        self.rows = rows
+        self.distinct = distinct
+        self.max_width = max_width
+        self.mean_width = mean_width
+
+    def as_dict(self) -> Dict:
+        return {"rows": self.rows, "distinct": self.distinct, "max_width": self.max_width, "mean_width": self.mean_width}
+
+
+class PayloadDecision:
+    """The payload mode chosen for one run, with the predicted time of each mode."""
+
+    def __init__(
+        self,
+        operator: str,
+        mode: str,
+        reason: str,
+        stats: PayloadStats,
+        features: Dict[str, List[float]],
+        predictions: Dict[str, Optional[float]]
+    ):
+        self.operator = operator
+        self.mode = mode
+        self.reason = reason
+        self.stats = stats
+        self.features = features
+        self.predictions = predictions
+
+    @property
+    def no_map(self) -> bool:
+        return self.mode == "direct"
+
+
+def history_path() -> Optional[Path]:
+    path = os.environ.get("OBLIVIATOR_COST_HISTORY", "~/.cache/obliviator/cost_history.jsonl")
+    if path.lower() in ("off", "0", "none", ""):
+        return None
+    return Path(os.path.expanduser(path))
+
+
+def sample_table(filepath: str, key: Optional[str], payload_cols: Sequence[str]) -> Tuple[int, List[str]]:
+    """
+    Reads the first SAMPLE_ROWS rows of a CSV table. Returns (estimated number
+    of rows with a key, sampled payload strings).
+    """
+    with open(filepath, "r", newline="", encoding="utf-8-sig") as f:
+        header_line = f.readline()
+        lines = list(islice(f, SAMPLE_ROWS))
+    header = next(csv.reader([header_line], delimiter="|"), [])
+    missing = [col for col in ([key] if key else []) + list(payload_cols) if col not in header]
+    if missing:
+        raise ValueError(f"Missing columns in {filepath}: {missing}")
+
+    payloads = []
+    for row in csv.DictReader(lines, fieldnames=header, delimiter="|"):
+        if key and not (row[key] or "").strip():
+            continue
+        payloads.append("|".join(row[col] or "" for col in payload_cols) or "_")
+    if len(lines) < SAMPLE_ROWS:
+        return len(payloads), payloads
+    sample_bytes = sum(len(line.encode("utf-8")) for line in lines)
+    table_bytes = os.path.getsize(filepath) - len(header_line.encode("utf-8"))
+    return int(table_bytes / sample_bytes * len(payloads)), payloads
+
+
+def estimate_stats(tables: Sequence[Tuple[str, Optional[str], Sequence[str]]]) -> PayloadStats:
+    """Estimates rows, distinct payloads and payload widths over (path, key, payload_cols) tables."""
+    rows, distinct, max_width, width_sum, sampled = 0, 0, 0, 0, 0
+    for filepath, key, payload_cols in tables:
+        table_rows, payloads = sample_table(filepath, key, payload_cols)
+        widths = [payload_width(payload) for payload in payloads]
+        unique = len(set(payloads))
+        # Mostly-unique columns grow with the table; the others have saturated.
+        if payloads and unique > len(payloads) // 2:
+            unique = int(unique * table_rows / len(payloads))
+        rows += table_rows
+        distinct += unique
+        max_width = max([max_width, *widths])
+        width_sum += sum(widths)
+        sampled += len(widths)
+    return PayloadStats(rows, distinct, max_width, width_sum / sampled if sampled else 0.0)
+
+
+def features(stats: PayloadStats, elem_length: int, mapped: bool) -> List[float]:
+    """The cost features of one run, in FEATURES order."""
+    n = max(stats.rows, 1)
+    log_n = max(1.0, math.log2(n))
+    return [
+        1.0,
+        n * log_n * log_n * (elem_length + ELEM_OVERHEAD),
+        float(n),
+        n * stats.mean_width,
+        n * log_n if mapped else 0.0,
+        stats.distinct * stats.mean_width if mapped else 0.0,
+    ]
+
+
+def _fit_nonnegative(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Least squares with every coefficient >= 0: refits without the most negative one until none is left."""
+    # The features span many orders of magnitude, so each column is scaled to at most 1 for the solve.
+    scale = np.abs(x).max(axis=0)
+    scale[scale == 0] = 1.0
+    x = x / scale
+    active = list(range(x.shape[1]))
+    coefficients = np.zeros(x.shape[1])
+    while active:
+        solution, *_ = np.linalg.lstsq(x[:, active], y, rcond=None)
+        if (solution >= 0).all():
+            coefficients[active] = solution
+            break
+        del active[int(np.argmin(solution))]
+    return coefficients / scale
+
+
+def load_history(operator: Optional[str] = None) -> List[Dict]:
+    """The last MAX_HISTORY recorded runs (of one operator, if given)."""
+    path = history_path()
+    if path is None or not path.exists():
+        return []
+    runs = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if operator is None or run.get("operator") == operator:
+                runs.append(run)
+    return runs[-MAX_HISTORY:]
+
+
+def coefficients(operator: str) -> Tuple[Optional[np.ndarray], str]:
+    """
+    The operator's coefficients fitted to its history of both modes, or None
+    while the history is too short. Returns (coefficients, source).
+    """
+    runs = [run for run in load_history(operator) if run.get("mode") in ("map", "direct")]
+    counts = {mode: sum(run["mode"] == mode for run in runs) for mode in ("map", "direct")}
+    if len(runs) < MIN_HISTORY or min(counts.values()) < MIN_MODE_RUNS:
+        return None, f"not fitted: {counts['map']} map and {counts['direct']} direct runs recorded"
+    x = np.array([run["features"] for run in runs], dtype=float)
+    y = np.array([run["actual"] for run in runs], dtype=float)
+    return _fit_nonnegative(x, y), f"fitted to {len(runs)} runs"
+
+
+def explore_rate() -> float:
+    if history_path() is None:
+        return 0.0
+    return float(os.environ.get("OBLIVIATOR_COST_EXPLORE", EXPLORE_RATE))
+
+
+def choose_payload_mode(
+    operator: str,
+    code_dir: Path,
+    tables: Sequence[Tuple[str, Optional[str], Sequence[str]]],
+    payload_mode: str = "auto",
+    data_length: Union[int, str, None] = None
+) -> PayloadDecision:
+    """
+    Predicts the pipeline time of relabeled ("map") and direct payloads for an
+    operator run over (path, key, payload_cols) tables, and returns the mode to
+    use: for "auto" the cheaper one (relabeled payloads until the model is
+    fitted, and now and then the other one), otherwise payload_mode itself.
+    """
+    if payload_mode not in PAYLOAD_MODES:
+        raise ValueError(f"Invalid payload mode '{payload_mode}'. Valid are: {list(PAYLOAD_MODES)}")
+    stats = estimate_stats(tables)
+    mode_dl = data_length_mode(data_length, code_dir)
+    id_width = len(str(max(stats.distinct, 1)))
+    lengths = {
+        "map": fitting_data_length(mode_dl, code_dir, id_width),
+        "direct": fitting_data_length(mode_dl, code_dir, stats.max_width),
+    }
+    model, source = coefficients(operator)
+    run_features, predictions = {}, {}
+    for mode, length in lengths.items():
+        predictions[mode] = None
+        if length is None:
+            continue
+        run_features[mode] = features(stats, length, mode == "map")
+        if model is not None:
+            predictions[mode] = float(np.dot(model, run_features[mode]))
+
+    if payload_mode != "auto":
+        mode, reason = payload_mode, "requested"
+    elif "direct" not in run_features:
+        mode, reason = "map", f"payloads of up to {stats.max_width} bytes do not fit a DATA_LENGTH"
+    elif "map" not in run_features:
+        mode, reason = "direct", "relabeled ids do not fit a DATA_LENGTH"
+    else:
+        if model is None:
+            mode, reason = "map", f"default ({source})"
+        else:
+            mode = "direct" if predictions["direct"] < predictions["map"] else "map"
+            reason = f"cheaper prediction ({source})"
+        if random.random() < explore_rate():
+            mode = "direct" if mode == "map" else "map"
+            reason = f"exploring the other mode ({source})"
+    decision = PayloadDecision(operator, mode, reason, stats, run_features, predictions)
+
+    predicted = ", ".join(
+        f"{name} {'n/a' if value is None else f'{value:.3f}s'}" for name, value in predictions.items()
+    )
+    print(f"Payload mode: {mode} ({reason}; predicted {predicted}; ~{stats.rows} rows, "
+          f"{stats.distinct} distinct payloads, widest {stats.max_width} bytes)")
+    return decision
+
+
+def actual_time(timer: StageTimer) -> float:
+    """A run's pipeline time without build and result cache stages, which the model does not predict."""
+    return sum(seconds for name, seconds in timer.as_dict().items() if name not in ("build", "result_cache"))
+
+
+def record_outcome(decision: PayloadDecision, timer: StageTimer, output_path: Path):
+    """Adds the decision to the run's .time file and appends the run to the history."""
+    time_file = Path(output_path).with_suffix(".time")
+    if not time_file.exists():
+        return
+    cache_hit = read_time_metadata(time_file).get("result_cache") == "hit"
+    actual = actual_time(timer)
+    predicted = decision.predictions.get(decision.mode)
+
+    lines = [f"payload_mode={decision.mode}"]
+    lines += [f"predicted_{mode}={value}" for mode, value in decision.predictions.items() if value is not None]
+    text = time_file.read_text().rstrip("\n")
+    time_file.write_text(text + "\n" + "\n".join(lines) + "\n")
+    if cache_hit:
+        return
+    predicted_text = "n/a" if predicted is None else f"{predicted:.3f}s"
+    print(f"Payload mode {decision.mode}: predicted {predicted_text}, actual {actual:.3f}s.")
+
+    path = history_path()
+    if path is None or decision.mode not in decision.features:
+        return
+    run = {
+        "operator": decision.operator,
+        "mode": decision.mode,
+        "features": decision.features[decision.mode],
+        "predicted": predicted,
+        "actual": actual,
+        "enclave": read_time_file(time_file),
+        "stats": decision.stats.as_dict(),
+        "timestamp": time.time(),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+def calibrate(operator: str, data_dir: Path, work_dir: Path, threads: Union[int, str] = "auto"):
+    """
+    Records runs of both payload modes on synthetic tables of every
+    CALIBRATION_SCALES x CALIBRATION_PAYLOAD_SIZES shape (generated into
+    data_dir and reused), so the model can be fitted before auto is used.
+    """
+    from bench.generators import synthetic_table
+    from engine import make_temp_dir, operator_code_dir, run_fk_join, run_operator1
+
+    for scale in CALIBRATION_SCALES:
+        for payload_size in CALIBRATION_PAYLOAD_SIZES:
+            if operator == "fk_join":
+                pk = str(synthetic_table(data_dir, "pk", scale, payload_size, 0))
+                fk = str(synthetic_table(data_dir, "fk", scale, payload_size, 0))
+                tables = [(pk, "id", ["payload"]), (fk, "ref", ["payload"])]
+            else:
+                table = str(synthetic_table(data_dir, "filter", scale, payload_size, 0))
+                tables = [(table, "id", ["payload"])]
+            code_dir = operator_code_dir("fk_join" if operator == "fk_join" else "operator_1", "default")
+            for mode in ("map", "direct"):
+                decision = choose_payload_mode(operator, code_dir, tables, mode)
+                if mode not in decision.features:
+                    continue
+                output_path = (Path(work_dir) / f"calibrate_{operator}_n{scale}_p{payload_size}_{mode}.csv").resolve()
+                temp_dir = make_temp_dir(str(Path(work_dir) / f"tmp_calibrate_{operator}"))
+                try:
+                    if operator == "fk_join":
+                        timer = run_fk_join(
+                            pk, "id", ["payload"], fk, "ref", ["payload"], temp_dir, output_path,
+                            no_map=decision.no_map, threads=threads, use_cache=False
+                        )
+                    else:
+                        timer = run_operator1(
+                            table, "id", ["payload"], temp_dir, output_path, no_map=decision.no_map,
+                            filter_threshold=scale // 2, threads=threads, use_cache=False
+                        )
+                finally:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                record_outcome(decision, timer, output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the payload mode cost model and how well it fits the recorded runs.")
+    parser.add_argument("--operator", choices=["fk_join", "operator1"], help="Only this operator (default: both).")
+    parser.add_argument("--clear", action="store_true", help="Delete the run history.")
+    parser.add_argument("--calibrate", action="store_true", help="Run both payload modes on synthetic tables of a few sizes and record them, then show the fit.")
+    parser.add_argument("--data_dir", default="bench_data", help="Where --calibrate generates its tables.")
+    parser.add_argument("--work_dir", default="bench_work/calibrate", help="Where --calibrate writes its outputs.")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads for --calibrate.")
+    args = parser.parse_args()
+
+    operators = [args.operator] if args.operator else ["fk_join", "operator1"]
+    path = history_path()
+    if path is None:
+        print("Cost history is disabled (OBLIVIATOR_COST_HISTORY=off); auto always relabels payloads.")
+        return
+    if args.clear:
+        if path.exists():
+            path.unlink()
+        print(f"Cleared cost history at {path}.")
+        return
+    if args.calibrate:
+        Path(args.work_dir).mkdir(parents=True, exist_ok=True)
+        for operator in operators:
+            calibrate(operator, Path(args.data_dir), Path(args.work_dir), args.threads)
+
+    for operator in operators:
+        model, source = coefficients(operator)
+        print(f"\n--- {operator} ({source}) ---")
+        if model is None:
+            continue
+        print("  " + ", ".join(f"{name}={value:.3g}" for name, value in zip(FEATURES, model)))
+        runs = load_history(operator)
+        for mode in ("map", "direct"):
+            mode_runs = [run for run in runs if run["mode"] == mode]
+            if mode_runs:
+                errors = [abs(float(np.dot(model, run["features"])) - run["actual"]) for run in mode_runs]
+                print(f"  {mode}: {len(mode_runs)} runs, mean absolute error {sum(errors) / len(errors):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
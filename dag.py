@@ -0,0 +1,190 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import tracing
+from engine import available_cpus, read_time_file
+
+######################
+# QUERY DAG EXECUTOR #
+######################
+
+# The LDBC short reads chain several wrapper calls, and some of those calls do
+# not depend on each other (short3.py's two NFK joins, and the filter that
+# follows each one). A QueryDAG holds the query's operators as tasks. Each task
+# lists the tasks it depends on, and those must be added before it, so the
+# graph can never contain a cycle. run() starts every task whose dependencies
+# have finished on a thread pool. Python stages share the GIL, but the enclave
+# runs in its own host process, so independent branches do overlap.
+#
+# Concurrency is capped twice. The pool has one thread per available core
+# (OBLIVIATOR_DAG_WORKERS overrides this). engine.run_obliviator additionally
+# lets at most OBLIVIATOR_ENCLAVE_SLOTS enclaves run at the same time.
+#
+# A task's time_file is the .time file its wrapper writes. The task counts as
+# failed if that file is missing afterwards, because the wrappers report errors
+# by printing them rather than raising. The file is deleted before the task
+# starts, so one left by an earlier run of the query cannot pass for a success. Tasks that depend on a failed task are
+# skipped. The enclave time read from each time file is used for two numbers:
+# the summed time, which the short reads have always reported, and the
+# critical path, i.e. the longest chain of dependent enclave times. The critical
+# path is what the query costs when independent branches run side by side.
+#
+# With tracing on (see tracing.py) every task is a span on the track of the
+# pool thread that ran it, around the spans of its operator's stages.
+
+
+def default_workers() -> int:
+    workers = os.environ.get("OBLIVIATOR_DAG_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    return available_cpus()
+
+
+class DAGTask:
+    def __init__(self, name: str, fn: Callable, args: tuple, kwargs: dict, deps: Sequence[str], time_file: Optional[Path]):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deps = list(deps)
+        self.time_file = Path(time_file) if time_file is not None else None
+        self.status = "pending"
+        self.seconds = 0.0
+        self.error: Optional[BaseException] = None
+
+
+class QueryDAG:
+    """A set of dependent operator calls, run concurrently where the dependencies allow."""
+
+    def __init__(self, label: str, max_workers: Optional[int] = None):
+        self.label = label
+        self.max_workers = max_workers or default_workers()
+        self.tasks: Dict[str, DAGTask] = {}
+        self.wall_time = 0.0
+        self.enclave_times: Dict[str, float] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable,
+        *args,
+        deps: Sequence[str] = (),
+        time_file: Optional[Path] = None,
+        **kwargs
+    ) -> str:
+        """Adds a task that calls fn(*args, **kwargs) once every task in deps has finished."""
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already part of {self.label}")
+        unknown = [dep for dep in deps if dep not in self.tasks]
+        if unknown:
+            raise ValueError(f"Task '{name}' depends on tasks that have not been added yet: {unknown}")
+        self.tasks[name] = DAGTask(name, fn, args, kwargs, deps, time_file)
+        return name
+
+    def _run_task(self, task: DAGTask):
+        print(f"[{self.label}] Starting {task.name}...")
+        if task.time_file is not None:
+            task.time_file.unlink(missing_ok=True)
+        start = time.perf_counter()
+        try:
+            with tracing.span(task.name, self.label) as span:
+                if task.deps:
+                    span.record(deps=", ".join(task.deps))
+                task.fn(*task.args, **task.kwargs)
+            if task.time_file is not None and not task.time_file.exists():
+                raise RuntimeError(f"{task.name} did not write {task.time_file}")
+        finally:
+            task.seconds = time.perf_counter() - start
+        print(f"[{self.label}] Finished {task.name} in {task.seconds:.4f}s.")
+
+    def _ready(self) -> List[DAGTask]:
+        """Returns the pending tasks that can start now, skipping those behind a failed task."""
+        changed = True
+        while changed:
+            changed = False
+            for task in self.tasks.values():
+                if task.status == "pending" and any(self.tasks[dep].status in ("failed", "skipped") for dep in task.deps):
+                    task.status = "skipped"
+                    changed = True
+        return [
+            task for task in self.tasks.values()
+            if task.status == "pending" and all(self.tasks[dep].status == "done" for dep in task.deps)
+        ]
+
+    def run(self):
+        """Runs every task. Raises RuntimeError if any task failed or was skipped."""
+        print(f"[{self.label}] Running {len(self.tasks)} tasks on up to {self.max_workers} threads.")
+        start = time.perf_counter()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                for task in self._ready():
+                    task.status = "running"
+                    running[pool.submit(self._run_task, task)] = task
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    task.error = future.exception()
+                    task.status = "done" if task.error is None else "failed"
+                    if task.error is not None:
+                        print(f"[{self.label}] {task.name} failed: {task.error}")
+        self.wall_time = time.perf_counter() - start
+
+        unfinished = [task.name for task in self.tasks.values() if task.status != "done"]
+        if unfinished:
+            raise RuntimeError(f"{self.label}: tasks did not complete: {unfinished}")
+        # Read now: the query's own .time file may replace a task's afterwards.
+        self.enclave_times = {
+            name: read_time_file(task.time_file)
+            for name, task in self.tasks.items() if task.time_file is not None
+        }
+
+    def critical_path(self) -> Tuple[float, List[str]]:
+        """Returns the longest chain of dependent enclave times (after run()) and the tasks on it."""
+        times = self.enclave_times
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        # Tasks are stored in the order they were added, which is a topological order.
+        for name, task in self.tasks.items():
+            before = max(task.deps, key=lambda dep: finish[dep], default=None)
+            previous[name] = before
+            finish[name] = times.get(name, 0.0) + (finish[before] if before is not None else 0.0)
+        if not finish:
+            return 0.0, []
+        name = max(finish, key=finish.get)
+        length = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return length, path[::-1]
+
+    def write_time_file(self, path: Path) -> Tuple[float, float]:
+        """
+        Writes the query's .time file: the summed enclave time on the first line
+        (as before), then critical_path, critical_path_tasks and wall metadata.
+        Returns (summed time, critical path time).
+        """
+        total_time = sum(self.enclave_times.values())
+        critical_time, critical_tasks = self.critical_path()
+        with open(path, "w") as tf:
+            tf.write(f"{total_time}\n")
+            tf.write(f"critical_path={critical_time}\n")
+            tf.write(f"critical_path_tasks={','.join(critical_tasks)}\n")
+            tf.write(f"wall={self.wall_time}\n")
+        return total_time, critical_time
+
+    def report(self):
+        """Prints the wall time of every task and the critical path."""
+        print(f"\n--- Task timings ({self.label}) ---")
+        for task in self.tasks.values():
+            deps = f" (after {', '.join(task.deps)})" if task.deps else ""
+            print(f"  {task.name:<18} {task.seconds:10.4f}s  {task.status}{deps}")
+        print(f"  {'wall':<18} {self.wall_time:10.4f}s")
+        critical_time, critical_tasks = self.critical_path()
+        print(f"  critical path: {' -> '.join(critical_tasks)} ({critical_time:.4f}s enclave time)")
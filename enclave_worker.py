@@ -0,0 +1,281 @@
+import argparse
+import atexit
+import hashlib
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+##################################
+# OBLIVIATOR WARM ENCLAVE WORKER #
+##################################
+
+# Every plain run of ./host/parallel creates the enclave, commits its EPC heap
+# (NumHeapPages in the enclave .conf), spawns the worker threads and then tears
+# all of that down again. When started with `--serve <socket>`, the host keeps
+# one enclave loaded and runs a job for every input path it receives on a Unix
+# socket. The enclave's stdout (the enclave time line) comes back over the same
+# connection, followed by "OBLIVIATOR_DONE <ret>".
+#
+# This module starts at most one worker per (operator directory, thread count)
+# for the lifetime of the Python process. It keeps a small pool of open
+# connections to each worker and stops every worker at exit. A worker is
+# restarted when its binaries change, e.g. when the build cache installs a
+# different build. Jobs to one worker run one at a time, in the order the
+# worker receives them.
+#
+# Each worker's stdin is a pipe that this process holds open. The host exits
+# when the pipe closes, so a worker never outlives the process that started
+# it, even when that process is killed or leaves through os._exit (as pool
+# children do) and the atexit shutdown never runs.
+#
+# Environment:
+#   OBLIVIATOR_WARM_WORKERS   "1" to route engine.run_obliviator through warm workers
+#   OBLIVIATOR_WORKER_DIR     directory for worker sockets and logs
+#                             (default <tmp>/obliviator-workers-<uid>)
+
+DONE_MARKER = "OBLIVIATOR_DONE "
+SERVE_FLAG = b"--serve"
+HOST_BINARY = Path("host/parallel")
+ENCLAVE_IMAGE = Path("enclave/parallel_enc.signed")
+START_TIMEOUT_SEC = 300.0
+MAX_IDLE_CONNECTIONS = 4
+
+
+class WorkerUnavailable(RuntimeError):
+    """The operator cannot be served by a warm worker; run the host directly."""
+
+
+def _worker_dir() -> Path:
+    default = Path(tempfile.gettempdir()) / f"obliviator-workers-{os.getuid()}"
+    worker_dir = Path(os.path.expanduser(os.environ.get("OBLIVIATOR_WORKER_DIR", str(default))))
+    worker_dir.mkdir(parents=True, exist_ok=True)
+    return worker_dir
+
+
+def _binary_identity(code_dir: Path) -> Tuple:
+    """Changes whenever the host binary or signed enclave in code_dir is replaced."""
+    identity = []
+    for rel_path in (HOST_BINARY, ENCLAVE_IMAGE):
+        st = (code_dir / rel_path).stat()
+        identity.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(identity)
+
+
+def supports_serve(code_dir: Path) -> bool:
+    """True if the host binary in code_dir was built with --serve support."""
+    try:
+        with open(code_dir / HOST_BINARY, "rb") as f:
+            return SERVE_FLAG in f.read()
+    except OSError:
+        return False
+
+
+class EnclaveWorker:
+    """A host process started with --serve, plus a pool of connections to it."""
+
+    def __init__(self, code_dir: Path, num_threads: int):
+        self.code_dir = Path(code_dir)
+        self.num_threads = num_threads
+        self.identity = _binary_identity(self.code_dir)
+        tag = hashlib.sha256(f"{self.code_dir}\0{num_threads}\0{os.getpid()}".encode()).hexdigest()[:16]
+        self.socket_path = _worker_dir() / f"{tag}.sock"
+        self.log_path = _worker_dir() / f"{tag}.log"
+        self.process: Optional[subprocess.Popen] = None
+        self.jobs_served = 0
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def start(self, timeout: float = START_TIMEOUT_SEC):
+        """Launches the worker and waits until its socket accepts connections."""
+        command = ["./host/parallel", "./enclave/parallel_enc.signed", str(self.num_threads), "--serve", str(self.socket_path)]
+        print(f"Starting warm enclave worker for {self.code_dir} ({self.num_threads} threads)...")
+        start = time.perf_counter()
+        with open(self.log_path, "w") as log_file:
+            self.process = subprocess.Popen(
+                command, cwd=self.code_dir, stdin=subprocess.PIPE, stdout=log_file, stderr=subprocess.STDOUT
+            )
+        while True:
+            if self.process.poll() is not None:
+                raise WorkerUnavailable(f"worker exited with status {self.process.returncode}; see {self.log_path}")
+            try:
+                self._idle.append(self._connect())
+                break
+            except OSError:
+                if time.perf_counter() - start > timeout:
+                    self.stop()
+                    raise WorkerUnavailable(f"worker did not start within {timeout:.0f}s; see {self.log_path}")
+                time.sleep(0.05)
+        print(f"Warm enclave worker ready in {time.perf_counter() - start:.3f}s (socket {self.socket_path}).")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _connect(self) -> socket.socket:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(str(self.socket_path))
+        except OSError:
+            conn.close()
+            raise
+        return conn
+
+    def _acquire(self) -> socket.socket:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn: socket.socket):
+        with self._lock:
+            if len(self._idle) < MAX_IDLE_CONNECTIONS:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def run(self, input_path: Path) -> subprocess.CompletedProcess:
+        """
+        Runs one job on input_path. The result looks like the CompletedProcess of a
+        plain host run: stdout starts with the enclave time, and returncode is the
+        value time_join returned.
+        """
+        command = ["--serve", str(self.socket_path), str(input_path)]
+        conn = self._acquire()
+        try:
+            conn.sendall(f"{input_path}\n".encode())
+            response = b""
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    raise ConnectionError(f"worker for {self.code_dir} closed the connection; see {self.log_path}")
+                response += chunk
+                marker = response.rfind(DONE_MARKER.encode())
+                if marker != -1 and response.endswith(b"\n"):
+                    break
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+        self.jobs_served += 1
+
+        stdout, _, status = response.decode(errors="replace").rpartition(DONE_MARKER)
+        return subprocess.CompletedProcess(command, int(status.strip()), stdout, "")
+
+    def stop(self):
+        """Asks the worker to quit, falling back to terminate/kill."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        if self.alive():
+            try:
+                conn = idle.pop() if idle else self._connect()
+                conn.sendall(b"QUIT\n")
+                conn.close()
+            except OSError:
+                pass
+        for conn in idle:
+            conn.close()
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+        if self.process is not None and self.process.stdin is not None:
+            self.process.stdin.close()
+        self.socket_path.unlink(missing_ok=True)
+
+
+_workers: Dict[Tuple[str, int], EnclaveWorker] = {}
+_unavailable: Dict[Tuple[str, int], Tuple] = {}
+_registry_lock = threading.Lock()
+_enabled = os.environ.get("OBLIVIATOR_WARM_WORKERS", "0").lower() in ("1", "on", "true", "yes")
+
+
+def enable(flag: bool = True):
+    """Turns routing of engine.run_obliviator through warm workers on or off."""
+    global _enabled
+    _enabled = flag
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def get_worker(code_dir: Path, num_threads: int = 1) -> EnclaveWorker:
+    """
+    Returns the running worker for (code_dir, num_threads), starting it if needed
+    and restarting it if the binaries in code_dir changed since it was launched.
+    Raises WorkerUnavailable if the host lacks --serve support or fails to start.
+    """
+    code_dir = Path(code_dir).resolve()
+    key = (str(code_dir), num_threads)
+    with _registry_lock:
+        identity = _binary_identity(code_dir)
+        if _unavailable.get(key) == identity:
+            raise WorkerUnavailable(f"worker for {code_dir} failed to start earlier")
+
+        worker = _workers.get(key)
+        if worker is not None and worker.alive() and worker.identity == identity:
+            return worker
+        if worker is not None:
+            print(f"Restarting warm enclave worker for {code_dir} (binaries changed or worker exited).")
+            worker.stop()
+            del _workers[key]
+
+        if not supports_serve(code_dir):
+            _unavailable[key] = identity
+            raise WorkerUnavailable(f"{code_dir / HOST_BINARY} was built without --serve support")
+        worker = EnclaveWorker(code_dir, num_threads)
+        try:
+            worker.start()
+        except WorkerUnavailable:
+            _unavailable[key] = identity
+            raise
+        _workers[key] = worker
+        return worker
+
+
+def run_job(code_dir: Path, input_path: Path, num_threads: int = 1) -> subprocess.CompletedProcess:
+    """Runs one operator job on a warm worker, starting the worker on first use."""
+    return get_worker(code_dir, num_threads).run(Path(input_path).resolve())
+
+
+def shutdown_all():
+    """Stops every worker started by this process."""
+    with _registry_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        print(f"Stopping warm enclave worker for {worker.code_dir} ({worker.jobs_served} jobs served).")
+        worker.stop()
+
+
+atexit.register(shutdown_all)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one or more prepared inputs through a single warm enclave worker.")
+    parser.add_argument("--code_dir", required=True, help="Built operator directory (e.g. ~/obliviator/operator_1).")
+    parser.add_argument("--num_threads", type=int, default=1, help="Enclave threads for the worker.")
+    parser.add_argument("inputs", nargs='+', help="Enclave input files (header line followed by rows).")
+    args = parser.parse_args()
+
+    code_dir = Path(os.path.expanduser(args.code_dir))
+    for input_path in args.inputs:
+        start = time.perf_counter()
+        completed = run_job(code_dir, Path(os.path.expanduser(input_path)), args.num_threads)
+        elapsed = time.perf_counter() - start
+        enclave_time = completed.stdout.strip().splitlines()[0] if completed.stdout.strip() else "?"
+        print(f"{input_path}: status {completed.returncode}, enclave time {enclave_time}s, round trip {elapsed:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
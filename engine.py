@@ -0,0 +1,1536 @@
+import argparse
+import heapq
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import partial
+from itertools import zip_longest
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import enclave_worker
+import partition
+import result_cache
+import tracing
+import workspace
+from build_cache import cached_build
+from obliviator_formatting import binary_records
+from obliviator_formatting.dictionary_store import DictionaryStore, open_dictionary
+from obliviator_formatting.format_fk_join import collect_fk_join_columns, read_join_table_columns, write_fk_join_input
+from obliviator_formatting.format_operator1 import collect_operator1_columns, collect_where_columns, write_operator1_input
+from obliviator_formatting.format_operator2 import collect_operator2_columns
+from obliviator_formatting.reconstruct_agg_csv import agg_csv_header, agg_csv_rows
+from obliviator_formatting.predicate import FILTER_EXPR, WherePredicate
+from obliviator_formatting.reconstruct_csv import filter_csv_rows, payload_csv_rows
+from obliviator_formatting.reconstruct_fk_join_csv import fk_join_csv_header, fk_join_csv_rows
+from obliviator_formatting.relabel import format_rows
+from obliviator_formatting.relabel_fk_join import relabel_fk_join_columns
+from obliviator_formatting.relabel_op1 import relabel_operator1_columns
+from obliviator_formatting.relabel_operator2 import relabel_operator2_columns
+from obliviator_formatting.reverse_relabel import CHUNK_ROWS, iter_output_columns, write_reversed_csv
+from obliviator_formatting.streaming_input import HEADER_WIDTH, max_payload_width, peak_rss_mib
+
+#########################################
+# OBLIVIATOR IN-PROCESS PIPELINE ENGINE #
+#########################################
+
+# The wrappers (fkjoin.py, join.py, operator1.py, operator2.py) are thin shims
+# over the run_* functions below. Formatting, relabeling, reverse relabeling and
+# CSV reconstruction all run in this process and hand their rows to each other
+# in memory; the only files written are the enclave input, the enclave output
+# (written by the C host) and the final CSV. With the dictionary store enabled
+# (obliviator_formatting/dictionary_store.py), the relabeled columns of an
+# unchanged input table are loaded from disk instead of being formatted and
+# relabeled again.
+
+# Filter operator codes understood by common/filter.h in the operator_1 and
+# operator_3/3_1 enclaves. The operator and threshold travel in the input header
+# ("N 0 <op> <threshold>") and the enclave keeps a row when `threshold <op> key`,
+# so changing the filter never requires editing or rebuilding the operator.
+FILTER_OPS = {'<': 0, '>': 1, '==': 2, '<=': 3, '>=': 4, '!=': 5}
+
+# IN-list filter ("N 0 7 <count> <value_1> ... <value_count>"): a row is kept when
+# its key equals any of the values. The enclave compares every row with every
+# value, so a batch of point queries (e.g. several person ids in one short read)
+# costs one oblivious pass instead of one per id. FILTER_IN_MAX_VALUES matches
+# FILTER_MAX_VALUES in common/filter.h.
+FILTER_IN = 7
+FILTER_IN_MAX_VALUES = 1024
+
+# Enclave thread count. The C operators split work (bitonic merges, aggregation
+# trees) between threads by repeated halving, so the count is always a power of
+# two. It can be no larger than NumTCS in the operator's enclave/parallel.conf,
+# because each host thread enters the enclave through its own TCS. "auto" also
+# caps the count at one thread per MIN_ROWS_PER_THREAD input rows, since on small
+# inputs the thread hand-off costs more than it saves.
+MIN_ROWS_PER_THREAD = 1 << 14
+ENCLAVE_CONF = Path("enclave/parallel.conf")
+
+# Enclave record format. "text" is the "<n1> <n2>" + "<key> <payload>" format every
+# operator reads. "binary" (obliviator_formatting/binary_records.py) writes
+# fixed-width int64 keys and payloads that the enclave copies straight into
+# elem_t, and reads the result back as a numpy array. Only operators whose
+# sources include common/record_format.h (fk_join and operator_1) understand it;
+# the others fall back to text.
+RECORD_FORMATS = ("text", "binary")
+RECORD_FORMAT_HEADER = Path("common/record_format.h")
+ELEM_HEADER = Path("common/elem_t.h")
+
+# Payload-sized DATA_LENGTH. Every oblivious sort copies and swaps the whole
+# elem_t, so an operator's running time grows with its payload buffer
+# (DATA_LENGTH in common/elem_t.h). It used to be set for every job by editing
+# the header (set_payload.py). Operators whose elem_t.h leaves DATA_LENGTH
+# overridable (operator_1, fk_join, join) are now built per job with
+# `make DATA_LENGTH=<bytes>`: the formatters report the widest payload they
+# wrote (a relabeled payload is just its id), and "auto" picks the smallest
+# bucket in DATA_LENGTH_BUCKETS that holds it and its NUL terminator. Each
+# bucket is its own build-cache entry. A payload that does not fit the largest
+# bucket, or an explicit --data_length, is refused instead of being truncated.
+# "header" keeps the elem_t.h value and truncates longer payloads as before.
+# Without --data_length, OBLIVIATOR_DATA_LENGTH sets the mode (default "auto").
+DATA_LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512, 1024)
+DATA_LENGTH_MODES = ("auto", "header")
+SIZED_DATA_LENGTH_GUARD = "#ifndef DATA_LENGTH"
+
+# Make arguments an operator is always built with, ahead of its DATA_LENGTH.
+NFK_MAKE_ARGS = ["L3=1"]
+
+# Host phase timings. The first line a host prints is still the enclave time
+# (the oblivious part of the run, which the .time file has always held). After
+# it, every wrapped host (operator_1, operator_2, fk_join, join, the three
+# operator_3 steps and their opaque_shared_memory variants) prints one
+# "phase <name> <seconds>" line per phase (see host/phases.h): the numbered
+# phases the enclave marks, named below in order (a "<variant>/<operator>"
+# entry overrides the default one, see operator_phases), and the host's
+# read_input, ecall (the whole enclave call) and write_output. The enclave phases add up to
+# the enclave time; parse_format, derived as ecall minus the enclave time, is
+# the enclave parsing its input rows, allocating and formatting its output.
+# Hosts that report sub-phases as "<label>: <seconds>s" (the KKS join
+# prototype) are parsed too, under the label in snake case. write_time_file
+# adds every phase to the .time file as phase_<name>=<seconds>.
+OPERATOR_PHASES = {
+    "operator_1": ("scan", "compact"),
+    "operator_2": ("sort", "aggregate", "compact"),
+    "fk_join": ("sort", "aggregate", "compact"),
+    "join": ("sort", "count", "compact", "expand", "distribute", "fill", "align_sort"),
+    "operator_3/3_1": ("scan", "compact"),
+    "operator_3/3_2": ("sort", "aggregate", "compact"),
+    "operator_3/3_3": ("sort", "aggregate", "final_sort"),
+    # The opaque_shared_memory enclaves compact by sorting the kept rows to the front.
+    "opaque_shared_memory/operator_1": ("scan", "compact_sort"),
+    "opaque_shared_memory/operator_2": ("sort", "aggregate", "compact_sort"),
+    "opaque_shared_memory/fk_join": ("sort", "aggregate", "compact"),
+    "opaque_shared_memory/operator_3/3_1": ("scan", "compact_sort"),
+    "opaque_shared_memory/operator_3/3_2": ("sort", "aggregate", "compact_sort"),
+    "opaque_shared_memory/operator_3/3_3": ("sort", "aggregate", "final_sort"),
+}
+
+# Concurrent pipelines. dag.py runs independent wrapper calls on threads of one
+# process, so each call gets its own temp directory (make_temp_dir), builds of
+# one operator directory are serialised, and at most OBLIVIATOR_ENCLAVE_SLOTS
+# enclaves (default: one per available core) run at the same time. Lower it
+# when concurrent enclaves would overcommit the EPC.
+_build_locks: Dict[str, threading.Lock] = {}
+_builds_in_use: Dict[str, "_BuildInUse"] = {}
+_registry_lock = threading.Lock()
+_enclave_slots: Optional[threading.BoundedSemaphore] = None
+
+
+class StageTimer:
+    """Records the wall time of each named pipeline stage."""
+
+    def __init__(self, label: str = "pipeline"):
+        self.label = label
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[tracing.Span]:
+        """Times the block; the span it yields takes the stage's rows and files (see tracing.py)."""
+        start = time.perf_counter()
+        try:
+            with tracing.span(name, self.label) as span:
+                yield span
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.stages)
+
+    def as_dict(self) -> Dict[str, float]:
+        timings: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            timings[name] = timings.get(name, 0.0) + seconds
+        return timings
+
+    def report(self):
+        """Prints a per-stage wall time table."""
+        print(f"\n--- Stage timings ({self.label}) ---")
+        for name, seconds in self.stages:
+            print(f"  {name:<18} {seconds:10.4f}s")
+        print(f"  {'total':<18} {self.total:10.4f}s")
+        print(f"  {'peak RSS':<18} {peak_rss_mib():10.1f} MiB")
+
+
+def operator_code_dir(operator: str, variant: str = "default", fallback: Optional[str] = None) -> Path:
+    """
+    Resolves the Obliviator source directory for an operator, e.g. ~/obliviator/fk_join
+    or ~/obliviator/opaque_shared_memory/fk_join.
+    """
+    if variant == "opaque_shared_memory":
+        code_dir = Path(os.path.expanduser(f"~/obliviator/{variant}/{operator}"))
+    else:
+        code_dir = Path(os.path.expanduser(f"~/obliviator/{operator}"))
+    if not code_dir.exists() and fallback is not None:
+        code_dir_fallback = Path(os.path.expanduser(f"~/obliviator/{fallback}"))
+        if code_dir_fallback.exists():
+            return code_dir_fallback
+        raise FileNotFoundError(f"Could not find operator code directory at {code_dir} or {code_dir_fallback}")
+    if not code_dir.exists():
+        raise FileNotFoundError(f"Could not find operator code directory: {code_dir}")
+    return code_dir
+
+
+def threads_arg(value: str) -> Union[int, str]:
+    """argparse type for --threads: a positive integer or "auto"."""
+    if value == "auto":
+        return value
+    try:
+        threads = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a positive integer or 'auto', got '{value}'")
+    if threads < 1:
+        raise argparse.ArgumentTypeError(f"thread count must be at least 1, got {threads}")
+    return threads
+
+
+def enclave_tcs_limit(code_dir: Path) -> int:
+    """Reads NumTCS from the operator's enclave config (1 if it is missing)."""
+    try:
+        with open(code_dir / ENCLAVE_CONF, "r") as conf:
+            for line in conf:
+                name, _, value = line.partition("=")
+                if name.strip() == "NumTCS":
+                    return max(1, int(value.strip()))
+    except (OSError, ValueError):
+        pass
+    return 1
+
+
+def _power_of_two_floor(n: int) -> int:
+    return 1 << (max(1, n).bit_length() - 1)
+
+
+def available_cpus() -> int:
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+
+def resolve_threads(threads: Union[int, str], code_dir: Path, num_rows: int, workers: int = 1) -> int:
+    """
+    Turns a --threads value into the count passed to host/parallel: a power of two
+    no larger than the enclave's NumTCS. "auto" additionally uses the CPUs this
+    process may run on, shared among `workers` enclaves running at once, and the
+    input size.
+    """
+    tcs_limit = enclave_tcs_limit(code_dir)
+    if threads == "auto":
+        cpus = max(1, available_cpus() // max(1, workers))
+        by_size = max(1, num_rows // MIN_ROWS_PER_THREAD)
+        chosen = _power_of_two_floor(min(cpus, tcs_limit, by_size))
+        print(f"Threads (auto): {chosen} (cpus={cpus}, NumTCS={tcs_limit}, rows={num_rows})")
+        return chosen
+
+    chosen = _power_of_two_floor(min(int(threads), tcs_limit))
+    if chosen != int(threads):
+        print(f"Warning: using {chosen} threads instead of {threads} "
+              f"(must be a power of two and at most NumTCS={tcs_limit} in {code_dir / ENCLAVE_CONF}).")
+    return chosen
+
+
+def header_row_count(input_path: Path) -> int:
+    """Number of rows announced by an enclave input header ("n1 n2 ...", "N 0 ..." or "N")."""
+    with open(input_path, "r") as f:
+        fields = f.readline().split()
+    return sum(int(field) for field in fields[:2])
+
+
+def resolve_record_format(record_format: str, code_dir: Path) -> str:
+    """Returns record_format, or "text" if the operator in code_dir cannot read binary records."""
+    if record_format not in RECORD_FORMATS:
+        raise ValueError(f"Invalid record format '{record_format}'. Valid are: {list(RECORD_FORMATS)}")
+    if record_format == "binary" and not (code_dir / RECORD_FORMAT_HEADER).exists():
+        print(f"Warning: {code_dir} has no {RECORD_FORMAT_HEADER}; using the text record format.")
+        return "text"
+    return record_format
+
+
+def elem_data_length(code_dir: Path) -> int:
+    """Reads DATA_LENGTH (the elem_t payload size) from the operator's common/elem_t.h."""
+    with open(code_dir / ELEM_HEADER, "r") as header:
+        for line in header:
+            fields = line.split()
+            if len(fields) >= 3 and fields[0] == "#define" and fields[1] == "DATA_LENGTH":
+                return int(fields[2])
+    raise ValueError(f"DATA_LENGTH not defined in {code_dir / ELEM_HEADER}")
+
+
+def data_length_arg(value: str) -> Union[int, str]:
+    """argparse type for --data_length: "auto", "header" or a DATA_LENGTH in bytes."""
+    if value in DATA_LENGTH_MODES:
+        return value
+    try:
+        length = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected one of {list(DATA_LENGTH_MODES)} or a byte count, got '{value}'")
+    if length < 2:
+        raise argparse.ArgumentTypeError(f"DATA_LENGTH must be at least 2 bytes, got {length}")
+    return length
+
+
+def supports_sized_data_length(code_dir: Path) -> bool:
+    """True if the operator's elem_t.h lets `make DATA_LENGTH=<bytes>` override its DATA_LENGTH."""
+    try:
+        with open(code_dir / ELEM_HEADER, "r") as header:
+            return SIZED_DATA_LENGTH_GUARD in header.read()
+    except FileNotFoundError:
+        return False
+
+
+def data_length_mode(data_length: Union[int, str, None], code_dir: Path) -> Union[int, str]:
+    """
+    The DATA_LENGTH mode of a job: data_length, else OBLIVIATOR_DATA_LENGTH, else
+    "auto". Operators whose elem_t.h fixes DATA_LENGTH always use "header".
+    """
+    if data_length is None:
+        data_length = data_length_arg(os.environ.get("OBLIVIATOR_DATA_LENGTH", "auto"))
+    if data_length != "header" and not supports_sized_data_length(code_dir):
+        print(f"Note: {code_dir / ELEM_HEADER} fixes DATA_LENGTH; using its value.")
+        return "header"
+    return data_length
+
+
+def truncation_length(mode: Union[int, str], code_dir: Path) -> Optional[int]:
+    """The DATA_LENGTH payloads are truncated to in this mode, or None if oversized payloads are refused."""
+    return elem_data_length(code_dir) if mode == "header" else None
+
+
+def mapped_payload_width(ids: np.ndarray, binary: bool) -> int:
+    """Payload width of relabeled ids: an int64 in binary records, the decimal id in text."""
+    if binary:
+        return binary_records.MAPPED_PAYLOAD_LEN
+    if len(ids) == 0:
+        return 1
+    return max(len(str(int(ids.max()))), len(str(int(ids.min()))))
+
+
+def fitting_data_length(mode: Union[int, str], code_dir: Path, payload_width: int) -> Optional[int]:
+    """
+    The DATA_LENGTH a mode gives payloads of up to payload_width bytes, or None
+    if they do not fit (or, in "header" mode, if the operator has no elem_t.h).
+    """
+    if mode == "header":
+        return elem_data_length(code_dir) if (code_dir / ELEM_HEADER).exists() else None
+    needed = payload_width + 1
+    if mode == "auto":
+        return next((bucket for bucket in DATA_LENGTH_BUCKETS if bucket >= needed), None)
+    return mode if needed <= mode else None
+
+
+def choose_data_length(mode: Union[int, str], code_dir: Path, payload_width: int) -> Tuple[Optional[int], List[str]]:
+    """
+    Picks the job's DATA_LENGTH for payloads of up to payload_width bytes.
+    Returns (DATA_LENGTH, make args that build it). Raises ValueError if a
+    payload does not fit and the mode does not allow truncation.
+    """
+    length = fitting_data_length(mode, code_dir, payload_width)
+    if mode == "header":
+        if length is not None and payload_width >= length:
+            print(f"Warning: payloads of up to {payload_width} bytes are truncated to "
+                  f"DATA_LENGTH - 1 = {length - 1} bytes.")
+        return length, []
+    if length is None and mode == "auto":
+        raise ValueError(
+            f"A payload of {payload_width} bytes does not fit the largest DATA_LENGTH "
+            f"({DATA_LENGTH_BUCKETS[-1]}); select fewer payload columns, drop --no_map, "
+            f"or pass --data_length header to truncate"
+        )
+    if length is None:
+        raise ValueError(f"A payload of {payload_width} bytes does not fit DATA_LENGTH {mode}")
+    print(f"DATA_LENGTH: {length} bytes (widest payload: {payload_width} bytes)")
+    return length, [f"DATA_LENGTH={length}"]
+
+
+def build_operator(code_dir: Path, make_args: Sequence[str] = (), extra_key: Sequence[str] = ()) -> bool:
+    """
+    Makes sure code_dir holds binaries built from its current sources, either by
+    installing them from the build cache or by running `make clean && make <make_args>`.
+    Returns True on a cache hit.
+    """
+    with _registry_lock:
+        lock = _build_locks.setdefault(str(Path(code_dir).resolve()), threading.Lock())
+    with lock:
+        return cached_build(code_dir, make_args, extra_key)
+
+
+class _BuildInUse:
+    """Which make args an operator directory is built with, and how many jobs are running that build."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.make_args: Optional[Tuple[str, ...]] = None
+        self.jobs = 0
+
+
+@contextmanager
+def operator_build(
+    code_dir: Path,
+    make_args: Sequence[str] = (),
+    timer: Optional[StageTimer] = None,
+    stage: str = "build"
+) -> Iterator[Path]:
+    """
+    Builds code_dir with make_args and yields the directory to run the operator
+    from. By default that is a job workspace (see workspace.py) that no other job
+    modifies, so jobs with any make args run side by side and code_dir itself is
+    never written to. With OBLIVIATOR_WORKSPACES=off, code_dir is built in place
+    (see build_operator) and that build is kept until the block exits; jobs that
+    need other make args (e.g. another DATA_LENGTH) wait until no job is using it.
+    """
+    if workspace.enabled():
+        with ExitStack() as stack:
+            with timer.stage(stage) if timer is not None else nullcontext():
+                run_dir = stack.enter_context(workspace.job_workspace(code_dir, make_args))
+            yield run_dir
+        return
+
+    with _registry_lock:
+        in_use = _builds_in_use.setdefault(str(Path(code_dir).resolve()), _BuildInUse())
+    make_args = tuple(make_args)
+    with (timer.stage(stage) if timer is not None else nullcontext()), in_use.condition:
+        while in_use.jobs and in_use.make_args != make_args:
+            in_use.condition.wait()
+        build_operator(code_dir, make_args)
+        in_use.make_args = make_args
+        in_use.jobs += 1
+    try:
+        yield code_dir
+    finally:
+        with in_use.condition:
+            in_use.jobs -= 1
+            in_use.condition.notify_all()
+
+
+def enclave_slots() -> threading.BoundedSemaphore:
+    """The semaphore that limits how many enclaves this process runs at once."""
+    global _enclave_slots
+    with _registry_lock:
+        if _enclave_slots is None:
+            slots = int(os.environ.get("OBLIVIATOR_ENCLAVE_SLOTS", "0")) or available_cpus()
+            _enclave_slots = threading.BoundedSemaphore(max(1, slots))
+    return _enclave_slots
+
+
+def make_temp_dir(prefix: str) -> Path:
+    """Creates a fresh temp directory in the working directory, e.g. tmp_fk_join_<pid>_<random>."""
+    return Path(tempfile.mkdtemp(prefix=f"{prefix}_{os.getpid()}_", dir="."))
+
+
+def run_obliviator(code_dir: Path, input_path: Path, num_threads: int = 1) -> Tuple[Path, subprocess.CompletedProcess]:
+    """
+    Executes the built operator on input_path and returns (raw_output_path, completed_process).
+    The host writes its result next to the input as <input stem>_output.txt. When warm
+    workers are enabled (see enclave_worker.py) the job goes to a long-lived host that
+    keeps the enclave loaded; otherwise, or if no worker can be started, the host runs
+    once for this input.
+    """
+    absolute_path_to_input = Path(input_path).resolve()
+    print(f"Executing with input: {absolute_path_to_input}")
+
+    completed_process = None
+    with enclave_slots():
+        if enclave_worker.enabled():
+            try:
+                completed_process = enclave_worker.run_job(code_dir, absolute_path_to_input, num_threads)
+                execution_command = completed_process.args
+            except enclave_worker.WorkerUnavailable as e:
+                print(f"Warm worker unavailable ({e}); running the host directly.")
+        if completed_process is None:
+            execution_command = ["./host/parallel", "./enclave/parallel_enc.signed", str(num_threads), str(absolute_path_to_input)]
+            completed_process = subprocess.run(execution_command, cwd=code_dir, capture_output=True, text=True)
+
+    if completed_process.returncode not in [0, 1]:
+        raise subprocess.CalledProcessError(completed_process.returncode, execution_command, completed_process.stdout, completed_process.stderr)
+
+    raw_output_path = absolute_path_to_input.with_name(absolute_path_to_input.stem + "_output.txt")
+    if not raw_output_path.exists():
+        raise FileNotFoundError(f"Obliviator output file not found: {raw_output_path}")
+    return raw_output_path, completed_process
+
+
+def run_obliviator_partitions(
+    code_dir: Path,
+    input_paths: Sequence[Path],
+    num_threads: int = 1,
+    workers: int = 1
+) -> Tuple[List[Path], List[subprocess.CompletedProcess]]:
+    """
+    Runs the built operator on each input (the chunks of a partitioned run, see
+    partition.py), one after another or on up to `workers` enclaves at once.
+    Returns the raw output paths and completed processes in input order.
+    """
+    if workers > 1 and len(input_paths) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda path: run_obliviator(code_dir, path, num_threads), input_paths))
+    else:
+        results = [run_obliviator(code_dir, path, num_threads) for path in input_paths]
+    return [output_path for output_path, _ in results], [process for _, process in results]
+
+
+def operator_phases(operator: str, variant: str = "default") -> Tuple[str, ...]:
+    """Names of the numbered enclave phases of an operator (e.g. "fk_join" or "operator_3/3_2") in a variant."""
+    return OPERATOR_PHASES.get(f"{variant}/{operator}", OPERATOR_PHASES.get(operator, ()))
+
+
+def parse_host_output(stdout: str, phase_names: Sequence[str] = ()) -> Tuple[float, Dict[str, float]]:
+    """
+    Returns (enclave time, {phase: seconds}) from a host's stdout (see
+    OPERATOR_PHASES). phase_names names the enclave's numbered phases in order;
+    a phase without a name is called phase<number>.
+    """
+    lines = stdout.strip().splitlines()
+    enclave_time = float(lines[0])
+    phases: Dict[str, float] = {}
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) == 3 and fields[0] == "phase":
+            name = fields[1]
+            if name.isdigit():
+                index = int(name) - 1
+                name = phase_names[index] if index < len(phase_names) else f"phase{name}"
+            seconds = fields[2]
+        else:
+            label, _, seconds = line.rpartition(":")
+            seconds = seconds.strip()
+            if not label or not seconds.endswith("s"):
+                continue
+            name, seconds = "_".join(label.lower().split()), seconds[:-1]
+        try:
+            phases[name] = phases.get(name, 0.0) + float(seconds)
+        except ValueError:
+            continue
+    if "ecall" in phases:
+        phases["parse_format"] = max(0.0, phases["ecall"] - enclave_time)
+    return enclave_time, phases
+
+
+def write_time_file(
+    completed_process: Union[subprocess.CompletedProcess, Sequence[subprocess.CompletedProcess]],
+    output_path: Path,
+    phase_names: Sequence[str] = (),
+    **metadata
+) -> Optional[float]:
+    """
+    Parses the enclave time (first line of host stdout) and writes it to <output_path>.time.
+    For the chunks of a partitioned run it writes the sum of their times.
+    The time stays on the first line; metadata (e.g. threads=4) follows as key=value lines,
+    then the host's phase times (see parse_host_output), also summed over the chunks.
+    """
+    if isinstance(completed_process, subprocess.CompletedProcess):
+        completed_process = [completed_process]
+    try:
+        time_value, phases = 0.0, {}
+        for process in completed_process:
+            process_time, process_phases = parse_host_output(process.stdout, phase_names)
+            time_value += process_time
+            for name, seconds in process_phases.items():
+                phases[name] = phases.get(name, 0.0) + seconds
+        time_file_path = Path(output_path).with_suffix('.time')
+        with open(time_file_path, 'w') as tf:
+            tf.write(str(time_value))
+            for key, value in metadata.items():
+                if value is not None:
+                    tf.write(f"\n{key}={value}")
+            for name, seconds in phases.items():
+                tf.write(f"\nphase_{name}={seconds:.6f}")
+        print(f"Captured execution time: {time_value}s. Saved to {time_file_path}")
+        if phases:
+            print("Host phases: " + ", ".join(f"{name} {seconds:.4f}s" for name, seconds in phases.items()))
+        return time_value
+    except (ValueError, IndexError) as e:
+        print(f"Warning: Could not parse execution time from C program output. Error: {e}")
+        return None
+
+
+def read_time_file(time_file_path: Path) -> float:
+    """Returns the enclave time from a .time file (its first line)."""
+    with open(time_file_path, 'r') as tf:
+        return float(tf.readline().strip())
+
+
+def read_time_metadata(time_file_path: Path) -> Dict[str, str]:
+    """Returns the key=value lines that follow the time in a .time file."""
+    with open(time_file_path, 'r') as tf:
+        lines = tf.read().splitlines()[1:]
+    return dict(line.split("=", 1) for line in lines if "=" in line)
+
+
+def read_phase_times(time_file_path: Path) -> Dict[str, float]:
+    """Returns the host phase times in a .time file ({} if the host reported none)."""
+    return {
+        key[len("phase_"):]: float(value)
+        for key, value in read_time_metadata(time_file_path).items() if key.startswith("phase_")
+    }
+
+
+def write_enclave_input(path: Path, header: str, rows: Iterable[str]):
+    """Writes the header line followed by the data rows for the C host."""
+    with open(path, "w", encoding='utf-8') as outfile:
+        outfile.write(f"{header}\n")
+        outfile.writelines(rows)
+
+
+def filter_header(
+    num_rows: int,
+    threshold: Optional[int],
+    condition: str = "<",
+    filter_in: Optional[Sequence[int]] = None
+) -> str:
+    """
+    Builds the "N 0 [<op> <threshold>]" header for the filter operators, or the
+    IN-list header when filter_in is given. Without either the enclave falls back
+    to its built-in default filter.
+    """
+    if filter_in is not None:
+        return f"{num_rows} 0 {FILTER_IN} {len(filter_in)} " + " ".join(str(value) for value in filter_in)
+    if threshold is None:
+        return f"{num_rows} 0"
+    if condition not in FILTER_OPS:
+        raise ValueError(f"Invalid filter operator '{condition}'. Valid are: {list(FILTER_OPS)}")
+    return f"{num_rows} 0 {FILTER_OPS[condition]} {threshold}"
+
+
+def normalize_filter_in(filter_in: Optional[Sequence[int]]) -> Optional[List[int]]:
+    """Sorts and deduplicates IN-list values, checking that the enclave can hold them."""
+    if filter_in is None:
+        return None
+    values = sorted(set(int(value) for value in filter_in))
+    if not values:
+        raise ValueError("The IN-list filter needs at least one value")
+    if len(values) > FILTER_IN_MAX_VALUES:
+        raise ValueError(f"The IN-list filter holds at most {FILTER_IN_MAX_VALUES} values, got {len(values)}")
+    return values
+
+
+@contextmanager
+def result_chunks(
+    raw_output_path: Path,
+    binary: bool,
+    num_fields: int,
+    separator: Optional[str] = None,
+    exact: bool = False
+) -> Iterator[Iterator[List[Sequence]]]:
+    """
+    Opens a raw enclave result and yields an iterator over its column chunks:
+    CHUNK_ROWS records of a binary result, or lines of a text result split into
+    num_fields columns (see reverse_relabel.iter_output_columns).
+    """
+    if binary:
+        header, records = binary_records.read_records(raw_output_path)
+        yield binary_records.iter_record_columns(header, records, CHUNK_ROWS)
+    else:
+        with open(raw_output_path, "r", encoding='utf-8') as infile:
+            yield iter_output_columns(infile, num_fields, separator, exact, str(raw_output_path))
+
+
+def merge_bucket_outputs(raw_output_paths: Sequence[Path], merged_path: Path) -> Path:
+    """
+    Merges the raw "k|p1|p2" results of a hash-bucketed FK join (see partition.py)
+    into one result ordered by key id, as a single enclave run returns it. Every
+    bucket result is already sorted by key id and no key is in two buckets.
+    """
+    files = [open(raw_output_path, "r", encoding='utf-8') for raw_output_path in raw_output_paths]
+    try:
+        lines = [(line for line in infile if line.strip()) for infile in files]
+        with open(merged_path, "w", encoding='utf-8') as outfile:
+            outfile.writelines(heapq.merge(*lines, key=lambda line: int(line.split("|", 1)[0])))
+    finally:
+        for infile in files:
+            infile.close()
+    return merged_path
+
+
+@contextmanager
+def partitioned_result_chunks(
+    raw_output_paths: Sequence[Path],
+    binary: bool,
+    num_fields: int,
+    exact: bool = False
+) -> Iterator[Iterator[List[Sequence]]]:
+    """result_chunks over the raw results of a partitioned run, read one after another in input order."""
+    def chunks():
+        for raw_output_path in raw_output_paths:
+            with result_chunks(raw_output_path, binary, num_fields, exact=exact) as path_chunks:
+                yield from path_chunks
+
+    yield chunks()
+
+
+def fetch_cached_result(
+    operator: str,
+    code_dir: Path,
+    input_paths: Sequence[str],
+    params: Dict,
+    output_path: Path,
+    timer: StageTimer,
+    make_args: Sequence[str] = (),
+    data_length: Union[int, str] = "header"
+) -> Tuple[Optional[str], bool]:
+    """
+    Looks the operator call up in the result cache (result_cache.py). Returns
+    (result key, hit); on a hit the cached CSV and .time file are already at
+    output_path. The key is None when the cache is disabled. data_length is the
+    job's DATA_LENGTH mode: payloads are only truncated in "header" mode, so
+    otherwise the result does not depend on the size that will be picked.
+    """
+    if not result_cache.enabled():
+        return None, False
+    if data_length == "header":
+        data_length = fitting_data_length("header", code_dir, 0)
+    with timer.stage("result_cache"):
+        key = result_cache.compute_result_key(operator, code_dir, data_length, input_paths, params, make_args)
+        hit = result_cache.fetch_result(key, output_path)
+    if hit:
+        print(f"Result cache hit ({key[:12]}): copied the cached result to {output_path}")
+        print(f"✅ Process complete. Final CSV output written to: {output_path}\n")
+        timer.report()
+    return key, hit
+
+
+def _print_process_error(e: subprocess.CalledProcessError):
+    print("\n--- FATAL ERROR: Build or Execution Failed ---")
+    print(f"Command '{e.cmd}' returned non-zero exit status {e.returncode}.")
+    if e.stdout: print("--- STDOUT ---\n" + e.stdout)
+    if e.stderr: print("--- STDERR ---\n" + e.stderr)
+
+
+def _dictionary_columns(
+    store: DictionaryStore,
+    timer: StageTimer,
+    tables: Sequence[Tuple[str, str, Callable[[], Sequence[List[str]]], Sequence[bool]]]
+) -> List[List[Sequence]]:
+    """
+    Returns the formatted columns of each (name, csv path, reader, mapped) table,
+    with the mapped columns as dictionary ids. Tables the store holds unchanged
+    are loaded from it; the others are read and relabeled into it.
+    """
+    results = []
+    for name, path, read_columns, mapped in tables:
+        with timer.stage("dictionary"):
+            columns = store.lookup(name, path)
+        if columns is not None:
+            print(f"Dictionary hit for {path}: reusing its relabeled columns.")
+        else:
+            print(f"Dictionary miss for {path}: formatting and relabeling it.")
+            with timer.stage("format") as span:
+                raw_columns = read_columns()
+                span.record(rows_out=len(raw_columns[0]), inputs=[path])
+            with timer.stage("relabel") as span:
+                columns = store.store(name, raw_columns, mapped)
+                span.record(rows_in=len(raw_columns[0]), rows_out=len(columns[0]))
+        results.append(columns)
+    return results
+
+
+def _relabel_join_input(
+    table1_path: str,
+    key1: str,
+    payload1_cols: List[str],
+    table2_path: str,
+    key2: str,
+    payload2_cols: List[str],
+    timer: StageTimer
+) -> Tuple[int, int, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Formats and relabels both join tables (shared by the FK and NFK joins).
+    Returns (n1, n2, key_ids, payload_ids, uniques table).
+    """
+    store = open_dictionary("join", [(table1_path, [key1, *payload1_cols]), (table2_path, [key2, *payload2_cols])])
+    if store is None:
+        print("\nStep 1: Formatting input files for Obliviator...")
+        with timer.stage("format") as span:
+            (keys1, payloads1), (keys2, payloads2) = collect_fk_join_columns(
+                table1_path, key1, payload1_cols, table2_path, key2, payload2_cols
+            )
+            span.record(rows_out=len(keys1) + len(keys2), inputs=[table1_path, table2_path])
+
+        print("\nStep 2: Relabeling data for C program...")
+        with timer.stage("relabel") as span:
+            key_ids, payload_ids, table = relabel_fk_join_columns(keys1 + keys2, payloads1 + payloads2)
+            span.record(rows_in=len(key_ids), rows_out=len(key_ids), uniques=len(table))
+        return len(keys1), len(keys2), key_ids, payload_ids, table
+
+    print(f"\nSteps 1-2: Formatting and relabeling input files (dictionary {store.root})...")
+    (key_ids1, payload_ids1), (key_ids2, payload_ids2) = _dictionary_columns(store, timer, [
+        ("table1", table1_path, partial(read_join_table_columns, table1_path, key1, payload1_cols), [True, True]),
+        ("table2", table2_path, partial(read_join_table_columns, table2_path, key2, payload2_cols), [True, True]),
+    ])
+    table = store.table()
+    store.close()
+    return (
+        len(key_ids1), len(key_ids2),
+        np.concatenate([key_ids1, key_ids2]), np.concatenate([payload_ids1, payload_ids2]), table
+    )
+
+
+def _write_fk_join_binary_input(
+    table1_path: str,
+    key1: str,
+    payload1_cols: List[str],
+    table2_path: str,
+    key2: str,
+    payload2_cols: List[str],
+    temp_dir: Path,
+    code_dir: Path,
+    no_map: bool,
+    data_length: Union[int, str],
+    timer: StageTimer
+) -> Tuple[Path, int, Optional[np.ndarray], int]:
+    """
+    Formats, relabels and writes the FK join input as binary records.
+    Returns (input_path, num_rows, uniques table or None with no_map, widest
+    payload in bytes).
+    """
+    table = None
+    if not no_map:
+        n1, n2, key_ids, payload_ids, table = _relabel_join_input(
+            table1_path, key1, payload1_cols, table2_path, key2, payload2_cols, timer
+        )
+        input_path = temp_dir / "fk_relabel_for_c.obr"
+        with timer.stage("write_input"):
+            binary_records.write_records(input_path, key_ids, payload_ids, n1, n2)
+        payload_width = mapped_payload_width(payload_ids, True)
+    else:
+        print("\nStep 1: Formatting input files for Obliviator (binary records)...")
+        with timer.stage("format"):
+            (keys1, payloads1), (keys2, payloads2) = collect_fk_join_columns(
+                table1_path, key1, payload1_cols, table2_path, key2, payload2_cols
+            )
+        n1, n2 = len(keys1), len(keys2)
+        input_path = temp_dir / "fk_format.obr"
+        with timer.stage("write_input"):
+            payloads = binary_records.encode_payloads(payloads1 + payloads2, truncation_length(data_length, code_dir))
+            binary_records.write_records(input_path, np.asarray(keys1 + keys2, dtype=np.int64), payloads, n1, n2)
+        payload_width = payloads.dtype.itemsize if len(payloads) else 0
+    return input_path, n1 + n2, table, payload_width
+
+
+def run_fk_join(
+    table1_path: str,
+    key1: str,
+    payload1_cols: List[str],
+    table2_path: str,
+    key2: str,
+    payload2_cols: List[str],
+    temp_dir: Path,
+    output_path: Path,
+    variant: str = "default",
+    no_map: bool = False,
+    threads: Union[int, str] = "auto",
+    record_format: str = "text",
+    use_cache: bool = True,
+    data_length: Union[int, str, None] = None,
+    buckets: int = 1,
+    launcher=None,
+    timer: Optional[StageTimer] = None
+) -> StageTimer:
+    """
+    Runs an oblivious foreign key join with every Python stage in-process.
+    With use_cache, a cached result for the same inputs is returned instead.
+    data_length ("auto", "header" or bytes) sets the operator's DATA_LENGTH.
+    buckets > 1 hash-partitions both tables into that many padded bucket pairs
+    (see partition.py) and joins each pair in its own enclave through launcher
+    (see launchers.py; by default all at once in this process), then merges
+    the bucket results by key.
+    """
+    timer = timer or StageTimer("fk_join")
+    print(f"Running oblivious FK Join (variant: {variant})")
+    temp_dir.mkdir(exist_ok=True)
+    code_dir = operator_code_dir("fk_join", variant)
+    binary = resolve_record_format(record_format, code_dir) == "binary"
+    data_length = data_length_mode(data_length, code_dir)
+    if buckets > 1 and (binary or no_map):
+        raise ValueError("--buckets needs relabeled payloads (no --no_map) and the text record format")
+
+    result_key = None
+    if use_cache:
+        params = {
+            "variant": variant, "key1": key1, "payload1_cols": payload1_cols, "key2": key2,
+            "payload2_cols": payload2_cols, "no_map": no_map, "binary": binary,
+        }
+        result_key, hit = fetch_cached_result(
+            "fk_join", code_dir, [table1_path, table2_path], params, output_path, timer, data_length=data_length
+        )
+        if hit:
+            return timer
+
+    table, bucket_rows = None, None
+    if binary:
+        input_path, num_rows, table, payload_width = _write_fk_join_binary_input(
+            table1_path, key1, payload1_cols, table2_path, key2, payload2_cols, temp_dir, code_dir, no_map,
+            data_length, timer
+        )
+    elif no_map:
+        # Nothing to relabel, so the rows are streamed straight to the input file.
+        print("\nStep 1: Formatting input files for Obliviator (streaming)...")
+        input_path = temp_dir / "fk_format.txt"
+        with timer.stage("format"):
+            print("--- Formatting CSVs for Join ---")
+            n1, n2, payload_width = write_fk_join_input(
+                table1_path, key1, payload1_cols, table2_path, key2, payload2_cols, str(input_path)
+            )
+        num_rows = n1 + n2
+    else:
+        n1, n2, key_ids, payload_ids, table = _relabel_join_input(
+            table1_path, key1, payload1_cols, table2_path, key2, payload2_cols, timer
+        )
+        num_rows = n1 + n2
+        input_path = temp_dir / "fk_relabel_for_c.txt"
+        input_paths = [input_path]
+        with timer.stage("write_input") as span:
+            if buckets > 1:
+                input_paths, capacity1, capacity2 = partition.write_bucket_inputs(
+                    input_path, n1, key_ids, payload_ids, buckets
+                )
+                bucket_rows = capacity1 + capacity2
+                print(f"Hash-partitioned {n1} + {n2} rows into {buckets} buckets of {capacity1} + {capacity2} rows.")
+            else:
+                write_enclave_input(input_path, f"{n1} {n2}", [format_rows([key_ids, payload_ids])])
+            span.record(rows_in=num_rows, rows_out=bucket_rows * buckets if buckets > 1 else num_rows, outputs=input_paths)
+        payload_width = mapped_payload_width(payload_ids, False)
+
+    print("\nStep 3: Running Obliviator FK Join C program...")
+    if buckets > 1:
+        num_threads = resolve_threads(threads, code_dir, bucket_rows, workers=getattr(launcher, "workers", buckets))
+    else:
+        num_threads = resolve_threads(threads, code_dir, num_rows)
+    elem_length, make_args = choose_data_length(data_length, code_dir, payload_width)
+    try:
+        print("Building Obliviator FK Join...")
+        with operator_build(code_dir, make_args, timer) as run_dir, timer.stage("enclave") as span:
+            if buckets <= 1:
+                raw_output_path, completed_process = run_obliviator(run_dir, input_path, num_threads)
+                span.record(rows_in=num_rows, inputs=[input_path], outputs=[raw_output_path], threads=num_threads)
+            else:
+                if launcher is not None:
+                    raw_output_paths, completed_process = launcher.run(run_dir, input_paths, num_threads)
+                else:
+                    raw_output_paths, completed_process = run_obliviator_partitions(
+                        run_dir, input_paths, num_threads, len(input_paths)
+                    )
+                span.record(
+                    rows_in=bucket_rows * buckets, inputs=input_paths, outputs=raw_output_paths,
+                    threads=num_threads, buckets=buckets
+                )
+        print("Exited Obliviator FK Join successfully.")
+    except subprocess.CalledProcessError as e:
+        _print_process_error(e)
+        raise
+    write_time_file(
+        completed_process, output_path, operator_phases("fk_join", variant), threads=num_threads, data_length=elem_length,
+        buckets=buckets if buckets > 1 else None, bucket_rows=bucket_rows
+    )
+    if buckets > 1:
+        with timer.stage("merge") as span:
+            raw_output_path = merge_bucket_outputs(raw_output_paths, temp_dir / "fk_merged_output.txt")
+            span.record(inputs=raw_output_paths, outputs=[raw_output_path])
+
+    print("\nStep 4: Reversing relabeling and reconstructing final CSV file...")
+    header = fk_join_csv_header(key1, payload1_cols, payload2_cols)
+    # Raw text rows are "k|p1|p2"; without mapping the payloads may hold further pipes.
+    with timer.stage("reconstruct") as span, result_chunks(raw_output_path, binary, 3, '|', exact=table is not None) as chunks:
+        write_reversed_csv(
+            chunks, str(output_path), header, partial(fk_join_csv_rows, num_columns=len(header)), table, [0, 1, 2]
+        )
+        span.record(inputs=[raw_output_path], outputs=[output_path])
+    if result_key is not None:
+        result_cache.store_result(result_key, output_path)
+    print(f"✅ Process complete. Final CSV output written to: {output_path}\n")
+    timer.report()
+    return timer
+
+
+def run_nfk_join(
+    table1_path: str,
+    key1: str,
+    payload1_cols: List[str],
+    table2_path: str,
+    key2: str,
+    payload2_cols: List[str],
+    temp_dir: Path,
+    output_path: Path,
+    variant: str = "default",
+    threads: Union[int, str] = "auto",
+    use_cache: bool = True,
+    data_length: Union[int, str, None] = None,
+    timer: Optional[StageTimer] = None
+) -> StageTimer:
+    """
+    Runs an oblivious non-foreign key join with every Python stage in-process.
+    With use_cache, a cached result for the same inputs is returned instead.
+    data_length ("auto", "header" or bytes) sets the operator's DATA_LENGTH.
+    """
+    timer = timer or StageTimer("nfk_join")
+    print(f"Running oblivious NFK Join (variant: {variant})")
+    temp_dir.mkdir(exist_ok=True)
+    code_dir = operator_code_dir("join", variant, fallback="join_kks")
+    data_length = data_length_mode(data_length, code_dir)
+
+    result_key = None
+    if use_cache:
+        params = {
+            "variant": variant, "key1": key1, "payload1_cols": payload1_cols,
+            "key2": key2, "payload2_cols": payload2_cols,
+        }
+        result_key, hit = fetch_cached_result(
+            "nfk_join", code_dir, [table1_path, table2_path], params, output_path, timer, NFK_MAKE_ARGS,
+            data_length=data_length
+        )
+        if hit:
+            return timer
+
+    n1, n2, key_ids, payload_ids, table = _relabel_join_input(
+        table1_path, key1, payload1_cols, table2_path, key2, payload2_cols, timer
+    )
+    num_rows = n1 + n2
+    input_path = temp_dir / "nfk_relabel_for_c.txt"
+    with timer.stage("write_input") as span:
+        write_enclave_input(input_path, f"{n1} {n2}", [format_rows([key_ids, payload_ids])])
+        span.record(rows_in=num_rows, rows_out=num_rows, outputs=[input_path])
+
+    print("\nStep 3: Running Obliviator NFK Join C program...")
+    num_threads = resolve_threads(threads, code_dir, num_rows)
+    elem_length, make_args = choose_data_length(data_length, code_dir, mapped_payload_width(payload_ids, False))
+    print(f"Using code directory: {code_dir}")
+    try:
+        print("Building Obliviator NFK Join...")
+        with operator_build(code_dir, [*NFK_MAKE_ARGS, *make_args], timer) as run_dir, timer.stage("enclave") as span:
+            raw_output_path, completed_process = run_obliviator(run_dir, input_path, num_threads)
+            span.record(rows_in=num_rows, inputs=[input_path], outputs=[raw_output_path], threads=num_threads)
+        print("Exited Obliviator NFK Join successfully.")
+    except subprocess.CalledProcessError as e:
+        _print_process_error(e)
+        raise
+    write_time_file(
+        completed_process, output_path, operator_phases("join", variant), threads=num_threads, data_length=elem_length
+    )
+
+    print("\nStep 4: Reversing relabeling and reconstructing final CSV file...")
+    header = fk_join_csv_header(key1, payload1_cols, payload2_cols)
+
+    def rows(keys, payloads_t1, _, payloads_t2):
+        # Raw rows are "k1 p1 k2 p2"; both keys hold the same id, so k2 is dropped.
+        return fk_join_csv_rows(keys, payloads_t1, payloads_t2, len(header))
+
+    with timer.stage("reconstruct") as span, result_chunks(raw_output_path, False, 4, exact=True) as chunks:
+        write_reversed_csv(chunks, str(output_path), header, rows, table, [0, 1, 3])
+        span.record(inputs=[raw_output_path], outputs=[output_path])
+    if result_key is not None:
+        result_cache.store_result(result_key, output_path)
+    print(f"✅ Process complete. Final CSV output written to: {output_path}\n")
+    timer.report()
+    return timer
+
+
+def _relabel_operator1_input(
+    filepath: str,
+    filter_col: str,
+    payload_cols: List[str],
+    timer: StageTimer
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Formats the Operator 1 input and relabels its payloads (the filter values
+    stay as they are). Returns (filter_values, value_ids, uniques table).
+    """
+    store = open_dictionary("operator1", [(filepath, [filter_col, *payload_cols])])
+    if store is None:
+        print("\nStep 1: Formatting input for Obliviator...")
+        with timer.stage("format") as span:
+            filter_values, payloads = collect_operator1_columns(filepath, filter_col, payload_cols)
+            span.record(rows_out=len(filter_values), inputs=[filepath])
+
+        print("\nStep 2: Relabeling data for Operator 1...")
+        with timer.stage("relabel") as span:
+            value_ids, table = relabel_operator1_columns(payloads)
+            span.record(rows_in=len(payloads), rows_out=len(value_ids), uniques=len(table))
+        return filter_values, value_ids, table
+
+    print(f"\nSteps 1-2: Formatting and relabeling input (dictionary {store.root})...")
+    [(filter_values, value_ids)] = _dictionary_columns(store, timer, [
+        ("table", filepath, partial(collect_operator1_columns, filepath, filter_col, payload_cols), [False, True]),
+    ])
+    table = store.table()
+    store.close()
+    return filter_values, value_ids, table
+
+
+def _write_operator1_binary_input(
+    filepath: str,
+    filter_col: str,
+    payload_cols: List[str],
+    temp_dir: Path,
+    code_dir: Path,
+    no_map: bool,
+    filter_threshold: Optional[int],
+    filter_condition: str,
+    filter_in: Optional[List[int]],
+    data_length: Union[int, str],
+    timer: StageTimer
+) -> Tuple[Path, int, Optional[np.ndarray], int]:
+    """
+    Formats, relabels and writes the Operator 1 input as binary records, with the
+    filter in the record header. Returns (input_path, num_rows, uniques table
+    or None with no_map, widest payload in bytes).
+    """
+    filter_op = binary_records.DEFAULT_FILTER_OP
+    if filter_in is not None:
+        filter_op = FILTER_IN
+    elif filter_threshold is not None:
+        filter_op = FILTER_OPS[filter_condition]
+    in_values = filter_in or ()
+
+    table = None
+    if not no_map:
+        filter_values, value_ids, table = _relabel_operator1_input(filepath, filter_col, payload_cols, timer)
+        input_path = temp_dir / "op1_relabel_for_c.obr"
+        with timer.stage("write_input"):
+            binary_records.write_records(
+                input_path, np.asarray(filter_values, dtype=np.int64), value_ids,
+                len(filter_values), filter_op=filter_op, filter_threshold=filter_threshold or 0,
+                filter_values=in_values
+            )
+        payload_width = mapped_payload_width(value_ids, True)
+    else:
+        print("\nStep 1: Formatting input for Obliviator (binary records)...")
+        with timer.stage("format"):
+            filter_values, payloads = collect_operator1_columns(filepath, filter_col, payload_cols)
+        input_path = temp_dir / "op1_format.obr"
+        with timer.stage("write_input"):
+            payloads = binary_records.encode_payloads(payloads, truncation_length(data_length, code_dir))
+            binary_records.write_records(
+                input_path, np.asarray(filter_values, dtype=np.int64), payloads,
+                len(filter_values), filter_op=filter_op, filter_threshold=filter_threshold or 0,
+                filter_values=in_values
+            )
+        payload_width = payloads.dtype.itemsize if len(payloads) else 0
+    return input_path, len(filter_values), table, payload_width
+
+
+def _write_operator1_where_input(
+    filepath: str,
+    predicate: WherePredicate,
+    payload_cols: List[str],
+    temp_dir: Path,
+    code_dir: Path,
+    no_map: bool,
+    binary: bool,
+    data_length: Union[int, str],
+    timer: StageTimer
+) -> Tuple[Path, int, Optional[np.ndarray], int]:
+    """
+    Writes the input of a compound (--where) filter: each row's number as its
+    key, one int64 value per predicate column and its payload (relabeled unless
+    no_map), with the compiled predicate in the header. Returns (input_path,
+    num_rows, uniques table or None with no_map, widest payload in bytes).
+    """
+    table = None
+    store = None if no_map else open_dictionary("operator1_where", [(filepath, [*predicate.columns, *payload_cols])])
+    if store is None:
+        print("\nStep 1: Formatting input for Obliviator...")
+        with timer.stage("format"):
+            where_values, payload_column = collect_where_columns(filepath, predicate.columns, payload_cols)
+        if not no_map:
+            print("\nStep 2: Relabeling data for Operator 1...")
+            with timer.stage("relabel"):
+                payload_column, table = relabel_operator1_columns(payload_column)
+    else:
+        def read_columns():
+            where_values, payloads = collect_where_columns(filepath, predicate.columns, payload_cols)
+            return [*where_values, payloads]
+
+        print(f"\nSteps 1-2: Formatting and relabeling input (dictionary {store.root})...")
+        mapped = [False] * len(predicate.columns) + [True]
+        [columns] = _dictionary_columns(store, timer, [("table", filepath, read_columns, mapped)])
+        where_values, payload_column = columns[:-1], columns[-1]
+        table = store.table()
+        store.close()
+
+    with timer.stage("predicate"):
+        words, encoded_columns = predicate.compile(where_values)
+    num_rows = len(payload_column)
+    row_numbers = np.arange(num_rows, dtype=np.int64)
+    if table is not None:
+        payload_width = mapped_payload_width(payload_column, binary)
+    else:
+        payload_width = max_payload_width(payload_column)
+    with timer.stage("write_input"):
+        if binary:
+            input_path = temp_dir / "op1_where.obr"
+            if table is None:
+                payload_column = binary_records.encode_payloads(payload_column, truncation_length(data_length, code_dir))
+            binary_records.write_records(
+                input_path, row_numbers, payload_column, num_rows,
+                filter_op=FILTER_EXPR, filter_values=words, filter_columns=encoded_columns
+            )
+        else:
+            # "<N> 0 8 <program words>", then "<row> <column values...> <payload>" rows
+            input_path = temp_dir / "op1_where.txt"
+            header = f"{num_rows} 0 {FILTER_EXPR} " + " ".join(str(word) for word in words)
+            write_enclave_input(input_path, header, [format_rows([row_numbers, *encoded_columns, payload_column])])
+    return input_path, num_rows, table, payload_width
+
+
+def run_operator1(
+    filepath: str,
+    filter_col: Optional[str],
+    payload_cols: List[str],
+    temp_dir: Path,
+    output_path: Path,
+    variant: str = "default",
+    no_map: bool = False,
+    filter_threshold: Optional[int] = None,
+    filter_condition: str = "<",
+    threads: Union[int, str] = "auto",
+    record_format: str = "text",
+    use_cache: bool = True,
+    filter_in: Optional[Sequence[int]] = None,
+    where: Optional[str] = None,
+    data_length: Union[int, str, None] = None,
+    partition_mode: Union[int, str] = "off",
+    partition_workers: int = 1,
+    timer: Optional[StageTimer] = None
+) -> StageTimer:
+    """
+    Runs the oblivious filter (Operator 1) with every Python stage in-process.
+    Rows are kept when `filter_threshold <filter_condition> key`, or, with
+    filter_in, when the key is one of the filter_in values; the predicate is
+    passed to the enclave in the input header. A where predicate (see
+    obliviator_formatting/predicate.py) replaces filter_col and the threshold:
+    it is evaluated over several columns in the same single pass, and the
+    output holds the payload columns only. With use_cache, a cached result
+    for the same input and filter is returned instead. data_length ("auto",
+    "header" or bytes) sets the operator's DATA_LENGTH. partition_mode ("auto"
+    or rows per chunk) runs the filter on fixed-size chunks of the input, on up
+    to partition_workers enclaves at once (see partition.py); "off" runs it once.
+    """
+    timer = timer or StageTimer("operator1")
+    print(f"Running oblivious Operator 1 (variant: {variant}) on {filepath}")
+    temp_dir.mkdir(exist_ok=True)
+    predicate = WherePredicate(where) if where is not None else None
+    filter_in = normalize_filter_in(filter_in)
+    if predicate is not None:
+        if variant != "default":
+            raise ValueError(f"--where is only supported by the default Operator 1 variant, not '{variant}'")
+        print(f"Filter: keep rows where {where} (columns: {', '.join(predicate.columns)})")
+    elif filter_in is not None:
+        print(f"Filter: keep rows whose key is one of {len(filter_in)} values")
+    elif filter_threshold is not None:
+        if filter_condition not in FILTER_OPS:
+            print(f"Error: Invalid filter operator '{filter_condition}'. Valid are: {list(FILTER_OPS)}")
+            raise ValueError(f"Invalid filter operator '{filter_condition}'")
+        print(f"Filter: keep rows where {filter_threshold} {filter_condition} key")
+    code_dir = operator_code_dir("operator_1", variant)
+    binary = resolve_record_format(record_format, code_dir) == "binary"
+    data_length = data_length_mode(data_length, code_dir)
+
+    result_key = None
+    if use_cache:
+        params = {
+            "variant": variant, "filter_col": filter_col, "payload_cols": payload_cols, "no_map": no_map,
+            "binary": binary, "filter_threshold": filter_threshold, "filter_condition": filter_condition,
+            "filter_in": filter_in, "where": where,
+        }
+        result_key, hit = fetch_cached_result(
+            "operator1", code_dir, [filepath], params, output_path, timer, data_length=data_length
+        )
+        if hit:
+            return timer
+
+    table = None
+    if predicate is not None:
+        input_path, num_rows, table, payload_width = _write_operator1_where_input(
+            filepath, predicate, payload_cols, temp_dir, code_dir, no_map, binary, data_length, timer
+        )
+    elif binary:
+        input_path, num_rows, table, payload_width = _write_operator1_binary_input(
+            filepath, filter_col, payload_cols, temp_dir, code_dir, no_map,
+            filter_threshold, filter_condition, filter_in, data_length, timer
+        )
+    elif no_map:
+        # Nothing to relabel, so the rows are streamed straight to the input file.
+        # The C program expects the row count and a second number (0 for this operator),
+        # optionally followed by the filter operator code and threshold.
+        print("\nStep 1: Formatting input for Obliviator (streaming)...")
+        input_path = temp_dir / "op1_format.txt"
+        with timer.stage("format") as span:
+            num_rows, payload_width = write_operator1_input(
+                filepath, str(input_path), filter_col, payload_cols,
+                lambda count: filter_header(count, filter_threshold, filter_condition, filter_in),
+                HEADER_WIDTH + len(filter_header(0, filter_threshold, filter_condition, filter_in))
+            )
+            span.record(rows_out=num_rows, inputs=[filepath], outputs=[input_path])
+    else:
+        filter_values, value_ids, table = _relabel_operator1_input(filepath, filter_col, payload_cols, timer)
+        num_rows = len(filter_values)
+        input_path = temp_dir / "op1_relabel_for_c.txt"
+        with timer.stage("write_input") as span:
+            header = filter_header(num_rows, filter_threshold, filter_condition, filter_in)
+            write_enclave_input(input_path, header, [format_rows([filter_values, value_ids])])
+            span.record(rows_in=num_rows, rows_out=num_rows, outputs=[input_path])
+        payload_width = mapped_payload_width(value_ids, False)
+
+    print(f"\nStep 3: Running Obliviator C program ({variant} variant)...")
+    elem_length, make_args = choose_data_length(data_length, code_dir, payload_width)
+    input_paths, chunk_rows = [input_path], None
+    if partition_mode != "off":
+        chunk_rows = partition_mode
+        if partition_mode == "auto":
+            num_columns = len(predicate.columns) if predicate is not None else 0
+            chunk_rows = partition.auto_partition_rows(
+                partition.enclave_heap_bytes(code_dir, ENCLAVE_CONF),
+                partition.operator1_footprint(elem_length or elem_data_length(code_dir), num_columns, binary),
+                partition.input_row_bytes(payload_width, num_columns, binary), partition_workers
+            )
+        if num_rows > chunk_rows:
+            print(f"Partitioning {num_rows} rows into chunks of {chunk_rows} rows, "
+                  f"{partition_workers} enclave(s) at a time.")
+            with timer.stage("partition"):
+                input_paths = partition.split_input(input_path, chunk_rows, binary)
+        else:
+            print(f"Partitioning: all {num_rows} rows fit one chunk of {chunk_rows} rows.")
+            chunk_rows = None
+    num_threads = resolve_threads(threads, code_dir, min(num_rows, chunk_rows or num_rows))
+    try:
+        print("\nBuilding Obliviator Operator 1...")
+        with operator_build(code_dir, make_args, timer) as run_dir, timer.stage("enclave") as span:
+            raw_output_paths, completed_processes = run_obliviator_partitions(
+                run_dir, input_paths, num_threads, partition_workers
+            )
+            span.record(
+                rows_in=num_rows, inputs=input_paths, outputs=raw_output_paths,
+                threads=num_threads, partitions=len(input_paths)
+            )
+        print("Exited Obliviator Operator 1 successfully.")
+    except subprocess.CalledProcessError as e:
+        _print_process_error(e)
+        raise
+    write_time_file(
+        completed_processes, output_path, operator_phases("operator_1", variant), threads=num_threads,
+        data_length=elem_length, partitions=len(input_paths) if chunk_rows is not None else None, partition_rows=chunk_rows
+    )
+
+    print("\nStep 4: Reversing relabeling and reconstructing final CSV file...")
+    header, rows = [filter_col] + payload_cols, filter_csv_rows
+    if predicate is not None:
+        header, rows = payload_cols, payload_csv_rows
+    with timer.stage("reconstruct") as span, \
+            partitioned_result_chunks(raw_output_paths, binary, 2, exact=table is not None) as chunks:
+        write_reversed_csv(chunks, str(output_path), header, rows, table, [1], unmapped_prefix="UNMAPPED_ID_")
+        span.record(inputs=raw_output_paths, outputs=[output_path])
+    if result_key is not None:
+        result_cache.store_result(result_key, output_path)
+    print(f"✅ Process complete. Final CSV output written to: {output_path}\n")
+    timer.report()
+    return timer
+
+
+def operator2_header(num_rows: int, payload_order: bool) -> str:
+    """
+    Builds the "N [1]" header for Operator 2. With the 1, the enclave sorts rows
+    of equal key and value by their payload bytes too, so a group's reported row
+    does not depend on the input order. Only partitioned runs need this: their
+    chunk results are merged, and a single pass skips the payload compare.
+    """
+    return f"{num_rows} 1" if payload_order else f"{num_rows}"
+
+
+def _merge_operator2_partials(
+    run_dir: Path,
+    partial_paths: Sequence[Path],
+    temp_dir: Path,
+    num_threads: int,
+    workers: int
+) -> Tuple[Path, List[subprocess.CompletedProcess]]:
+    """
+    The merge phase of a partitioned Operator 2 run. Each partial result holds one
+    "key value total payload" line per group of its chunk, where value and payload
+    are the group's smallest (value, payload) row. Two oblivious aggregations over
+    all partial lines, run side by side, give the final groups: one sums the partial
+    totals, the other takes the smallest partial (value, payload). Both come out
+    sorted by key, so their lines are zipped into one result in the single-pass
+    format. Returns its path and the two completed processes.
+    """
+    partials = []
+    for partial_path in partial_paths:
+        with open(partial_path, "r", encoding='utf-8') as infile:
+            partials.extend(line.split() for line in infile if line.strip())
+    totals_path = temp_dir / "op2_merge_totals.txt"
+    values_path = temp_dir / "op2_merge_values.txt"
+    write_enclave_input(
+        totals_path, operator2_header(len(partials), False),
+        (f"{key} {total} {payload}\n" for key, _, total, payload in partials)
+    )
+    write_enclave_input(
+        values_path, operator2_header(len(partials), True),
+        (f"{key} {value} {payload}\n" for key, value, _, payload in partials)
+    )
+    print(f"Merging {len(partials)} partial groups from {len(partial_paths)} chunks.")
+    (totals_output, values_output), processes = run_obliviator_partitions(
+        run_dir, [totals_path, values_path], num_threads, min(workers, 2)
+    )
+
+    merged_path = temp_dir / "op2_merged_output.txt"
+    with open(totals_output, "r", encoding='utf-8') as totals_file, \
+            open(values_output, "r", encoding='utf-8') as values_file, \
+            open(merged_path, "w", encoding='utf-8') as outfile:
+        for totals_line, values_line in zip_longest(totals_file, values_file, fillvalue=""):
+            if not totals_line.strip() and not values_line.strip():
+                continue
+            key, _, total, _ = totals_line.split()
+            values_key, value, _, payload = values_line.split()
+            if key != values_key:
+                raise RuntimeError(f"Operator 2 merge results are out of step: key {key} against {values_key}")
+            outfile.write(f"{key} {value} {total} {payload}\n")
+    return merged_path, processes
+
+
+def run_operator2(
+    filepath: str,
+    group_by_col: str,
+    agg_col: str,
+    payload_cols: List[str],
+    temp_dir: Path,
+    output_path: Path,
+    variant: str = "default",
+    threads: Union[int, str] = "auto",
+    use_cache: bool = True,
+    partition_mode: Union[int, str] = "off",
+    partition_workers: int = 1,
+    timer: Optional[StageTimer] = None
+) -> StageTimer:
+    """
+    Runs the oblivious aggregation (Operator 2) with every Python stage in-process.
+    With use_cache, a cached result for the same input is returned instead.
+    partition_mode ("auto" or rows per chunk) aggregates fixed-size chunks of the
+    input on up to partition_workers enclaves at once and then merges the partial
+    results obliviously (see _merge_operator2_partials); "off" runs it once.
+    """
+    timer = timer or StageTimer("operator2")
+    print(f"Running oblivious Aggregation (variant: {variant})")
+    if partition_mode != "off" and variant != "default":
+        raise ValueError(f"--partition is only supported by the default Operator 2 variant, not '{variant}'")
+    temp_dir.mkdir(exist_ok=True)
+    code_dir = operator_code_dir("operator_2", variant)
+
+    result_key = None
+    if use_cache:
+        params = {"variant": variant, "group_by_col": group_by_col, "agg_col": agg_col, "payload_cols": payload_cols}
+        if partition_mode != "off":
+            # Float sums of a partitioned run add up in another order than a single pass.
+            params["partition"] = partition_mode
+        result_key, hit = fetch_cached_result("operator2", code_dir, [filepath], params, output_path, timer)
+        if hit:
+            return timer
+
+    store = open_dictionary("operator2", [(filepath, [group_by_col, agg_col, *payload_cols])])
+    if store is None:
+        print("\nStep 1: Formatting input file...")
+        with timer.stage("format") as span:
+            group_keys, agg_values, payloads = collect_operator2_columns(filepath, group_by_col, agg_col, payload_cols)
+            span.record(rows_out=len(group_keys), inputs=[filepath])
+
+        print("\nStep 2: Relabeling data...")
+        with timer.stage("relabel") as span:
+            key_ids, payload_ids, table = relabel_operator2_columns(group_keys, payloads)
+            span.record(rows_in=len(group_keys), rows_out=len(key_ids), uniques=len(table))
+    else:
+        print(f"\nSteps 1-2: Formatting and relabeling input file (dictionary {store.root})...")
+        read_columns = partial(collect_operator2_columns, filepath, group_by_col, agg_col, payload_cols)
+        [(key_ids, agg_values, payload_ids)] = _dictionary_columns(
+            store, timer, [("table", filepath, read_columns, [True, False, True])]
+        )
+        table = store.table()
+        store.close()
+    num_rows = len(key_ids)
+    chunk_rows = None
+    if partition_mode != "off":
+        chunk_rows = partition_mode
+        if partition_mode == "auto":
+            value_width = max((len(str(value)) for value in agg_values), default=1)
+            chunk_rows = partition.auto_partition_rows(
+                partition.enclave_heap_bytes(code_dir, ENCLAVE_CONF), partition.operator2_footprint(),
+                partition.input_row_bytes(value_width, 1, False), partition_workers
+            )
+        if num_rows <= chunk_rows:
+            print(f"Partitioning: all {num_rows} rows fit one chunk of {chunk_rows} rows.")
+            chunk_rows = None
+    input_path = temp_dir / "op2_relabel_for_c.txt"
+    with timer.stage("write_input") as span:
+        # Chunks that are merged afterwards must pick their group rows by payload on value ties.
+        write_enclave_input(
+            input_path, operator2_header(num_rows, chunk_rows is not None),
+            [format_rows([key_ids, agg_values, payload_ids])]
+        )
+        span.record(rows_in=num_rows, rows_out=num_rows, outputs=[input_path])
+
+    print("\nStep 3: Running Obliviator Aggregation C program...")
+    input_paths = [input_path]
+    if chunk_rows is not None:
+        print(f"Partitioning {num_rows} rows into chunks of {chunk_rows} rows, "
+              f"{partition_workers} enclave(s) at a time.")
+        with timer.stage("partition"):
+            input_paths = partition.split_text_input(input_path, chunk_rows)
+    num_threads = resolve_threads(threads, code_dir, min(num_rows, chunk_rows or num_rows))
+    try:
+        print("Building Obliviator Aggregation operator...")
+        with operator_build(code_dir, timer=timer) as run_dir:
+            with timer.stage("enclave") as span:
+                raw_output_paths, completed_processes = run_obliviator_partitions(
+                    run_dir, input_paths, num_threads, partition_workers
+                )
+                span.record(
+                    rows_in=num_rows, inputs=input_paths, outputs=raw_output_paths,
+                    threads=num_threads, partitions=len(input_paths)
+                )
+            raw_output_path = raw_output_paths[0]
+            if chunk_rows is not None:
+                with timer.stage("merge"):
+                    raw_output_path, merge_processes = _merge_operator2_partials(
+                        run_dir, raw_output_paths, temp_dir, num_threads, partition_workers
+                    )
+                completed_processes += merge_processes
+        print("Exited Obliviator Aggregation successfully.")
+    except subprocess.CalledProcessError as e:
+        _print_process_error(e)
+        raise
+    write_time_file(
+        completed_processes, output_path, operator_phases("operator_2", variant), threads=num_threads,
+        partitions=len(input_paths) if chunk_rows is not None else None, partition_rows=chunk_rows
+    )
+
+    print("\nStep 4: Reversing relabeling and reconstructing final CSV file...")
+    with timer.stage("reconstruct") as span, result_chunks(raw_output_path, False, 4) as chunks:
+        write_reversed_csv(
+            chunks, str(output_path), agg_csv_header(group_by_col, payload_cols), agg_csv_rows, table, [0, 3]
+        )
+        span.record(inputs=[raw_output_path], outputs=[output_path])
+    if result_key is not None:
+        result_cache.store_result(result_key, output_path)
+    print(f"✅ Process complete. Final CSV output written to: {output_path}\n")
+    timer.report()
+    return timer
@@ -6,7 +6,11 @@
 #include <stdbool.h>
 #include <stdint.h>
 
+/* Default payload size; `make DATA_LENGTH=<bytes>` overrides it per build
+ * (engine.py sizes it to the widest payload of each job). */
+#ifndef DATA_LENGTH
 #define DATA_LENGTH 200
+#endif
 
 typedef long long ojoin_int_type;
 
@@ -0,0 +1,96 @@
+#ifndef DISTRIBUTED_SGX_COMMON_RECORD_FORMAT_H
+#define DISTRIBUTED_SGX_COMMON_RECORD_FORMAT_H
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+/* Binary record format for enclave inputs and outputs.
+ *
+ * Instead of the text format ("<n1> <n2>" header, then "<key> <payload>" lines),
+ * the Python wrappers can write a 48-byte header followed by n1 + n2
+ * fixed-width records:
+ *
+ *   int64 key | num_payloads * payload_len payload bytes
+ *
+ * A payload is either the raw row bytes, NUL-padded, or an int64 mapped id
+ * when OBR_FLAG_MAPPED_IDS is set. In both cases it is copied into
+ * elem_t.data as is. The enclave writes its result in the same format, with
+ * the result rows counted in n1. For an IN-list filter (FILTER_IN in
+ * common/filter.h), num_filter_values int64 values sit between the header and
+ * the first record. All integers are little-endian, as on every
+ * SGX host. The header is recognised by its magic, so text inputs keep
+ * working unchanged. */
+
+#define OBR_MAGIC "OBRB"
+#define OBR_VERSION 1
+
+#define OBR_FLAG_MAPPED_IDS 0x1 /* payloads are int64 ids from the relabeler */
+#define OBR_FLAG_TRUNCATED 0x2  /* output did not fit the buffer */
+
+struct obr_header {
+    char magic[4];
+    uint16_t version;
+    uint16_t flags;
+    uint32_t payload_len;
+    uint32_t num_payloads;
+    int64_t n1;
+    int64_t n2;
+    int32_t filter_op;          /* filter operators only; -1 for the default */
+    int32_t num_filter_values;  /* FILTER_IN values following the header */
+    int64_t filter_threshold;
+};
+
+_Static_assert(sizeof(struct obr_header) == 48, "Record header should be 48 bytes");
+
+static inline bool obr_is_binary(const char *buf, size_t len) {
+    return len >= sizeof(struct obr_header) && memcmp(buf, OBR_MAGIC, 4) == 0;
+}
+
+static inline size_t obr_record_size(const struct obr_header *header) {
+    return sizeof(int64_t) + (size_t) header->num_payloads * header->payload_len;
+}
+
+static inline size_t obr_records_offset(const struct obr_header *header) {
+    return sizeof(*header) + (size_t) header->num_filter_values * sizeof(int64_t);
+}
+
+static inline size_t obr_total_size(const struct obr_header *header) {
+    return obr_records_offset(header) + (size_t) (header->n1 + header->n2) * obr_record_size(header);
+}
+
+/* Copies the header out of buf (which need not be aligned) and checks that it
+ * describes a single-payload input of at most max_payload_len bytes per row
+ * that fits in len bytes. Returns 0 on success. */
+static inline int obr_read_input_header(const char *buf, size_t len, size_t max_payload_len,
+        struct obr_header *header) {
+    memcpy(header, buf, sizeof(*header));
+    if (header->version != OBR_VERSION || header->num_payloads != 1
+            || header->payload_len == 0 || header->payload_len > max_payload_len
+            || header->n1 < 0 || header->n2 < 0 || header->num_filter_values < 0) {
+        return -1;
+    }
+    if (obr_records_offset(header) > len) {
+        return -1;
+    }
+    if ((size_t) (header->n1 + header->n2) > (len - obr_records_offset(header)) / obr_record_size(header)) {
+        return -1;
+    }
+    return 0;
+}
+
+/* Starts an output header for result rows of num_payloads payloads, keeping
+ * the payload width and flags of the input. */
+static inline void obr_init_output_header(struct obr_header *header,
+        const struct obr_header *input, uint32_t num_payloads) {
+    memset(header, 0, sizeof(*header));
+    memcpy(header->magic, OBR_MAGIC, 4);
+    header->version = OBR_VERSION;
+    header->flags = input->flags & OBR_FLAG_MAPPED_IDS;
+    header->payload_len = input->payload_len;
+    header->num_payloads = num_payloads;
+    header->filter_op = -1;
+}
+
+#endif /* common/record_format.h */
@@ -106,10 +106,45 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
 */
 
 
+/* Binary input (common/record_format.h): the first n1 records are table 1 and
+ * the next n2 table 2. The result is written back as records. */
+static int scalable_oblivious_join_binary(char *buf, size_t len) {
+    struct obr_header header;
+    if (obr_read_input_header(buf, len, DATA_LENGTH, &header)) {
+        return -1;
+    }
+    long long length1 = header.n1;
+    long long length2 = header.n2;
+
+    arr = calloc((length1 + length2), sizeof(*arr));
+    if (arr == NULL) { return -1; /* Allocation failed */ }
+
+    size_t record_size = obr_record_size(&header);
+    const char *record = buf + obr_records_offset(&header);
+    for (long long i = 0; i < length1 + length2; i++) {
+        int64_t key;
+        memcpy(&key, record, sizeof(key));
+        arr[i].key = key;
+        memcpy(arr[i].data, record + sizeof(key), header.payload_len);
+        arr[i].table_0 = i < length1;
+        record += record_size;
+    }
+
+    scalable_oblivious_join_set_binary_output(&header, len);
+    scalable_oblivious_join(arr, length1, length2, buf);
+    scalable_oblivious_join_set_binary_output(NULL, 0);
+
+    free(arr);
+
+    return 0;
+}
+
 // In enclave/parallel_enc.c
 
 int ecall_scalable_oblivious_join(char *input_path, size_t len) {
-    (void)len;
+    if (obr_is_binary(input_path, len)) {
+        return scalable_oblivious_join_binary(input_path, len);
+    }
 
     char *line_iterator;
     char *token_iterator;
@@ -27,6 +27,12 @@ bool* control_bit;
 
 static long long number_threads;
 
+/* Set for binary inputs (common/record_format.h): each result row is written
+ * as a record holding the join key and both payloads instead of a text line. */
+static bool binary_output = false;
+static struct obr_header binary_input_header;
+static size_t binary_output_capacity;
+
 long long tree_node_idx_48[48] = {63, 64, 65, 66, 67, 68, 69, 70, 71, 72, 73, 74, 75, 76, 77, 78, 79, 80, 81, 82, 83, 84, 85, 86, 87, 88, 89, 90, 91, 92, 93, 94, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62};
 long long tree_node_idx_6[6] = {7, 8, 9, 10, 5, 6};
 
@@ -48,6 +54,37 @@ long long my_len(char *data) {
     return i;
 }
 
+void scalable_oblivious_join_set_binary_output(const struct obr_header *input, size_t capacity) {
+    binary_output = input != NULL;
+    if (input) {
+        binary_input_header = *input;
+        binary_output_capacity = capacity;
+    }
+}
+
+/* Payload order matches the text output: table 1 (arr_) before table 2 (arr). */
+static void write_binary_output(char *output, elem_t *arr, elem_t *arr_, long long result_length) {
+    struct obr_header header;
+    obr_init_output_header(&header, &binary_input_header, 2);
+    size_t record_size = obr_record_size(&header);
+    long long fits = (binary_output_capacity - sizeof(header)) / record_size;
+    header.n1 = result_length;
+    if (header.n1 > fits) {
+        header.n1 = fits;
+        header.flags |= OBR_FLAG_TRUNCATED;
+    }
+
+    char *cursor = output + sizeof(header);
+    for (long long i = 0; i < header.n1; i++) {
+        int64_t key = arr[i].key;
+        memcpy(cursor, &key, sizeof(key));
+        memcpy(cursor + sizeof(key), arr_[i].data, header.payload_len);
+        memcpy(cursor + sizeof(key) + header.payload_len, arr[i].data, header.payload_len);
+        cursor += record_size;
+    }
+    memcpy(output, &header, sizeof(header));
+}
+
 long long o_strcmp(char* str1, char* str2) {
     bool flag = false;
     long long result = 0;
@@ -220,10 +257,12 @@ void scalable_oblivious_join(elem_t *arr, long long length1, long long length2,
 
     
     init_time2();       // timer starts after allocation
+    init_time();        // phase clock (host/phases.h): sort, aggregate, compact
 
 
 
     bitonic_sort(arr, true, 0, length, number_threads, true);
+    get_time(true);
 
     if (number_threads == 1) {
         condition = arr[0].table_0;
@@ -262,9 +301,11 @@ void scalable_oblivious_join(elem_t *arr, long long length1, long long length2,
             thread_wait(&multi_thread_aggregation_tree_1[i]);
         }
     }
+    get_time(true);
 
     result_length = oblivious_compact_elem(arr, control_bit, length, 1, number_threads);
     oblivious_compact_elem(arr_, control_bit, length, 1, number_threads);
+    get_time(true);
     
     get_time2(true);
     
@@ -296,24 +337,28 @@ void scalable_oblivious_join(elem_t *arr, long long length1, long long length2,
     char_current[0] = '\0';
     */
 
-    char *char_current = output_path;
-    for (long long i = 0; i < result_length; i++) {
-        // Note: The join logic places the payload from table 1 into arr_
-        // and the payload from table 2 into arr. The keys are the same.
-        long long join_key = arr[i].key;
-        char* payload_t1 = arr_[i].data;
-        char* payload_t2 = arr[i].data;
-
-        // Use sprintf to write a clean, pipe-delimited line.
-        // This format matches what our Python reconstruction script expects.
-        int chars_written = sprintf(char_current, "%lld|%s|%s\n", 
-                                    join_key, payload_t1, payload_t2);
+    if (binary_output) {
+        write_binary_output(output_path, arr, arr_, result_length);
+    } else {
+        char *char_current = output_path;
+        for (long long i = 0; i < result_length; i++) {
+            // Note: The join logic places the payload from table 1 into arr_
+            // and the payload from table 2 into arr. The keys are the same.
+            long long join_key = arr[i].key;
+            char* payload_t1 = arr_[i].data;
+            char* payload_t2 = arr[i].data;
+
+            // Use sprintf to write a clean, pipe-delimited line.
+            // This format matches what our Python reconstruction script expects.
+            int chars_written = sprintf(char_current, "%lld|%s|%s\n", 
+                                        join_key, payload_t1, payload_t2);
         
-        if (chars_written > 0) {
-            char_current += chars_written;
+            if (chars_written > 0) {
+                char_current += chars_written;
+            }
         }
+        *char_current = '\0'; // Null-terminate the final string
     }
-    *char_current = '\0'; // Null-terminate the final string
 
 
     free(ag_tree);
@@ -4,6 +4,7 @@
 #include <stddef.h>
 #include "common/elem_t.h"
 #include "common/ocalls.h"
+#include "common/record_format.h"
 
 struct tree_node_op2 {
     volatile long long key_first;
@@ -27,6 +28,7 @@ struct args_op2 {
 int scalable_oblivious_join_init(int nthreads);
 long long o_strcmp(char* str1, char* str2);
 void scalable_oblivious_join_free();
+void scalable_oblivious_join_set_binary_output(const struct obr_header *input, size_t capacity);
 
 void scalable_oblivious_join(elem_t *arr, long long length1, long long length2, char* output_path);
 
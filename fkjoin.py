@@ -1,9 +1,14 @@
 import os
-import subprocess
 from pathlib import Path
 import argparse
 import shutil
-from typing import List
+from typing import List, Optional, Union
+
+import cost_model
+import launchers
+import tracing
+from cost_model import PAYLOAD_MODES
+from engine import RECORD_FORMATS, data_length_arg, make_temp_dir, operator_code_dir, run_fk_join, threads_arg
 
 #######################################
 # OBLIVIATOR FOREIGN KEY JOIN WRAPPER #
@@ -29,123 +34,44 @@ def obliviator_fk_join(
     temp_dir: Path,
     ultimate_final_output_path: Path,
     fk_join_variant: str,
-    no_map: bool
+    no_map: bool,
+    threads: Union[int, str] = "auto",
+    record_format: str = "text",
+    use_cache: bool = True,
+    data_length: Union[int, str, None] = None,
+    payload_mode: str = "map",
+    buckets: int = 1,
+    launcher: Optional[str] = None,
+    bucket_workers: Optional[int] = None
 ):
     """
-    Runs an oblivious foreign key join using Obliviator.
+    Runs an oblivious foreign key join using Obliviator. Unless no_map is set,
+    payload_mode chooses between relabeled and direct payloads (see cost_model.py).
+    buckets > 1 joins hash-partitioned bucket pairs in parallel enclaves started
+    by launcher (see launchers.py), bucket_workers at a time.
     """
-    print(f"Running oblivious FK Join (variant: {fk_join_variant})")
-    temp_dir.mkdir(exist_ok=True)
-
-    # --- Step 1: Format both CSVs into a single input file ---
-    print("\nStep 1: Formatting input files for Obliviator...")
-    format_path = temp_dir / "fk_format.txt"
-    format_cmd = [
-        "python", "obliviator_formatting/format_fk_join.py",
-        "--filepath1", table1_path, "--key1", key1, "--payload1_cols", *payload1_cols,
-        "--filepath2", table2_path, "--key2", key2, "--payload2_cols", *payload2_cols,
-        "--output_path", str(format_path)
-    ]
-    subprocess.run(format_cmd, check=True, cwd=Path(__file__).parent)
-    print("Initial formatting complete.")
-
-
-
-    # relabel if desired
-    relabel_path = temp_dir / "fk_relabel_for_c.txt"
-    mapping_path = temp_dir / "fk_value_map.txt"
-    if not no_map:
-        # --- Step 2: Relabel data using the specialized FK join script ---
-        print("\nStep 2: Relabeling data for C program...")
-        # --- FIX: Use the new, purpose-built relabeling script ---
-        subprocess.run([
-            "python", "obliviator_formatting/relabel_fk_join.py",
-            "--input_path", str(format_path),
-            "--output_path", str(relabel_path),
-            "--mapping_path", str(mapping_path)
-        ], check=True, cwd=Path(__file__).parent)
-        print("Relabeling complete.")
-    else:
-        relabel_path = format_path
-
-    # --- Step 3: Run the Obliviator C program ---
-    print(f"\nStep 3: Running Obliviator FK Join C program...")
-    code_dir = Path(os.path.expanduser(f"~/obliviator/{fk_join_variant}/fk_join")) if fk_join_variant == "opaque_shared_memory" else Path(os.path.expanduser("~/obliviator/fk_join"))
-    if not code_dir.exists():
-        raise FileNotFoundError(f"Could not find operator code directory: {code_dir}")
-
-    try:
-        print(f"Building Obliviator FK Join...")
-        subprocess.run(["make", "clean"], cwd=code_dir, check=True, capture_output=True)
-        subprocess.run(["make"], cwd=code_dir, check=True)
-
-        absolute_path_to_input = (Path(__file__).parent / relabel_path).resolve()
-        print(f"Build completed. Executing with input: {absolute_path_to_input}")
-
-        execution_command = ["./host/parallel", "./enclave/parallel_enc.signed", "1", str(absolute_path_to_input)]
-        completed_process = subprocess.run(execution_command, cwd=code_dir, capture_output=True, text=True)
-
-        if completed_process.returncode not in [0, 1]:
-            raise subprocess.CalledProcessError(completed_process.returncode, execution_command, completed_process.stdout, completed_process.stderr)
-
-        print("Exited Obliviator FK Join successfully.")
-
-        raw_output_path = temp_dir / (relabel_path.stem + "_output.txt")
-        intermediate_output_path = temp_dir / "fk_intermediate_output.txt"
-        # Check for obliviator output
-        if not raw_output_path.exists():
-            raise FileNotFoundError(f"Obliviator output file not found: {raw_output_path}")
-
-        try:
-            time_output = completed_process.stdout.strip().splitlines()[0]
-            time_value = float(time_output)
-            time_file_path = ultimate_final_output_path.with_suffix('.time')
-            with open(time_file_path, 'w') as tf:
-                tf.write(str(time_value))
-            print(f"Captured execution time: {time_value}s. Saved to {time_file_path}")
-        except (ValueError, IndexError) as e:
-            print(f"Warning: Could not parse execution time from C program output. Error: {e}")
-
-
-
-        # Reverse relabel if needed
-        if not no_map:
-            # --- Step 4: Reverse the relabeling ---
-            print("\nStep 4: Reversing relabeling for intermediate output...")
-            subprocess.run([
-                "python", "obliviator_formatting/reverse_relabel_ids.py",
-                "--input_path", str(raw_output_path),
-                "--output_path", str(intermediate_output_path),
-                "--mapping_path", str(mapping_path)
-            ], check=True, cwd=Path(__file__).parent)
-            print("Reverse relabeling complete.")
-        else:
-            # just take output as-is
-            intermediate_output_path = raw_output_path
-
-
-
-        # --- Step 5: Reconstruct final CSV ---
-        print("\nStep 5: Reconstructing final CSV file...")
-        reconstruct_cmd = [
-            "python", "obliviator_formatting/reconstruct_fk_join_csv.py",
-            "--intermediate_path", str(intermediate_output_path),
-            "--final_csv_path", str(ultimate_final_output_path),
-            "--key_header", key1,
-            "--payload1_headers", *payload1_cols,
-            "--payload2_headers", *payload2_cols
-        ]
-        subprocess.run(reconstruct_cmd, check=True, cwd=Path(__file__).parent)
-        print(f"✅ Process complete. Final CSV output written to: {ultimate_final_output_path}\n")
-
-    except subprocess.CalledProcessError as e:
-        print("\n--- FATAL ERROR: Build or Execution Failed ---")
-        print(f"Command '{e.cmd}' returned non-zero exit status {e.returncode}.")
-        if e.stdout: print("--- STDOUT ---\n" + e.stdout)
-        if e.stderr: print("--- STDERR ---\n" + e.stderr)
-        raise
-
-def main():
+    bucket_launcher = None
+    if buckets > 1:
+        if payload_mode == "auto" and not no_map:
+            print("Payload mode: map (hash-bucketed joins need relabeled payloads)")
+            payload_mode = "map"
+        bucket_launcher = launchers.get_launcher(launcher, bucket_workers or buckets)
+    decision = cost_model.choose_payload_mode(
+        "fk_join", operator_code_dir("fk_join", fk_join_variant),
+        [(table1_path, key1, payload1_cols), (table2_path, key2, payload2_cols)],
+        "direct" if no_map else payload_mode, data_length
+    )
+    timer = run_fk_join(
+        table1_path, key1, payload1_cols,
+        table2_path, key2, payload2_cols,
+        temp_dir, ultimate_final_output_path,
+        variant=fk_join_variant, no_map=decision.no_map, threads=threads,
+        record_format=record_format, use_cache=use_cache, data_length=data_length,
+        buckets=buckets, launcher=bucket_launcher
+    )
+    cost_model.record_outcome(decision, timer, ultimate_final_output_path)
+
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="Wrapper for Obliviator's Foreign Key (FK) Join.")
     parser.add_argument("--table1_path", required=True, help="Path to the primary table CSV.")
     parser.add_argument("--key1", required=True, help="Name of the join key column in table 1.")
@@ -157,9 +83,23 @@ def main():
     parser.add_argument("--fk_join_variant", choices=["default", "opaque_shared_memory"], default="default")
     parser.add_argument("--no_cleanup", action="store_true")
     parser.add_argument("--no_map", action="store_true", help="Pass payloads directly into obliviator without mapping to unique integer IDs.")
-    args = parser.parse_args()
-
-    temp_dir = Path(f"tmp_fk_join_{os.getpid()}")
+    parser.add_argument("--payload_mode", choices=PAYLOAD_MODES, default="map", help="Relabel payloads to ids ('map', the default), pass them directly ('direct', same as --no_map), or let the cost model pick the faster one ('auto', see cost_model.py).")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads: a power of two up to NumTCS, or 'auto' to choose from CPUs, NumTCS and input size.")
+    parser.add_argument("--record_format", choices=RECORD_FORMATS, default="text", help="Enclave input/output format: text lines, or fixed-width binary records (default operator only).")
+    parser.add_argument("--no_cache", action="store_true", help="Always run the operator instead of reusing a cached result for the same inputs.")
+    parser.add_argument("--data_length", type=data_length_arg, default=None, help="Payload buffer size (DATA_LENGTH): 'auto' to size it to the widest payload, 'header' for the value in common/elem_t.h, or a byte count. Default: OBLIVIATOR_DATA_LENGTH, else 'auto'.")
+    parser.add_argument("--buckets", type=int, default=1, help="Hash-partition both tables into this many padded bucket pairs and join each pair in its own enclave (1: one enclave for the whole join).")
+    parser.add_argument("--launcher", default=None, help="Where the bucket enclaves run: 'local' (worker processes on this host), 'ssh:<host>,<host>' or '<module>:<factory>'. Default: OBLIVIATOR_LAUNCHER, else 'local'.")
+    parser.add_argument("--bucket_workers", type=int, default=None, help="Bucket enclaves to run at once with the local launcher (default: --buckets).")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
+    args = parser.parse_args(argv)
+    tracing.enable(args.trace)
+    if args.buckets < 1:
+        parser.error("--buckets must be at least 1")
+    if args.bucket_workers is not None and args.bucket_workers < 1:
+        parser.error("--bucket_workers must be at least 1")
+
+    temp_dir = make_temp_dir("tmp_fk_join")
     
     output_path = Path(os.path.expanduser(args.output_path))
     output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -168,7 +108,9 @@ def main():
         obliviator_fk_join(
             os.path.expanduser(args.table1_path), args.key1, args.payload1_cols,
             os.path.expanduser(args.table2_path), args.key2, args.payload2_cols,
-            temp_dir, output_path, args.fk_join_variant, args.no_map
+            temp_dir, output_path, args.fk_join_variant, args.no_map, args.threads,
+            args.record_format, not args.no_cache, args.data_length, args.payload_mode,
+            args.buckets, args.launcher, args.bucket_workers
         )
     except Exception as e:
         print(f"\nExecution aborted due to an error: {e}")
@@ -207,8 +207,12 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         free(index_target2_);
     #endif
     init_time2();
+    /* Phase clock (host/phases.h): sort, count, compact, expand, distribute,
+     * fill, align_sort. */
+    init_time();
 
     bitonic_sort_(arr, true, 0, length, number_threads, false);
+    get_time(true);
 
     if (1 < number_threads) {
         aggregation_tree_m(arr, length, number_threads);
@@ -229,6 +233,7 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
             arr[i - 1].m1 = condition * arr[i].m1 + !condition * arr[i - 1].m1;
         }
     }
+    get_time(true);
 
     for (int i = 0; i < number_threads; i++) {
         index_start_thread[i + 1] = index_start_thread[i] + length_thread + (i < length_extra);
@@ -256,6 +261,7 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
 
     oblivious_compact_elem(arr, control_bit, length, 1, number_threads);
     oblivious_compact_elem(arr_, control_bit_, length, 1, number_threads);
+    get_time(true);
     
     aggregation_tree_i(index_target, index_target2, arr, arr_, length1, length2, number_threads);
 
@@ -305,8 +311,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
             thread_wait(soj_scan_2_ + i);
         };
     }
+    get_time(true);
     oblivious_distribute_elem(arr1, index_target_, length_result, number_threads);
     oblivious_distribute_elem(arr2, index_target2_, length_result, number_threads);
+    get_time(true);
 
     if (1 < number_threads) {
         aggregation_tree_dup(arr1, length_result, number_threads);
@@ -318,9 +326,11 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
             o_memcpy(arr2 + i, arr2 + i - 1, sizeof(*arr2), !arr2[i].has_value);
         }
     }
+    get_time(true);
 
     aggregation_tree_j_order(arr2, length_result, number_threads);
     bitonic_sort_(arr2, true, 0, length_result, number_threads, true);
+    get_time(true);
 
     get_time2(true);
     
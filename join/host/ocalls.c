@@ -10,10 +10,45 @@
 #include "common/error.h"
 #include "common/ocalls.h"
 #include "host/error.h"
+#include "host/phases.h"
 
 struct timespec last_time;
 struct timespec last_time2;
 
+#define MAX_PHASES 32
+
+static const char *phase_names[MAX_PHASES];
+static double phase_seconds[MAX_PHASES];
+static int num_phases;
+
+double phase_clock(void) {
+    struct timespec now;
+    if (!timespec_get(&now, TIME_UTC)) {
+        perror("phase timespec_get");
+    }
+    return (double) now.tv_sec + (double) now.tv_nsec / 1000000000;
+}
+
+void record_phase(const char *name, double seconds) {
+    if (num_phases < MAX_PHASES) {
+        phase_names[num_phases] = name;
+        phase_seconds[num_phases] = seconds;
+        num_phases++;
+    }
+}
+
+void print_phases(void) {
+    int enclave_phase = 0;
+    for (int i = 0; i < num_phases; i++) {
+        if (phase_names[i] != NULL) {
+            printf("phase %s %f\n", phase_names[i], phase_seconds[i]);
+        } else {
+            printf("phase %d %f\n", ++enclave_phase, phase_seconds[i]);
+        }
+    }
+    num_phases = 0;
+}
+
 enum ocall_mpi_request_type {
     OCALL_MPI_SEND,
     OCALL_MPI_RECV,
@@ -416,7 +451,7 @@ void get_time(bool if_print) {
                 - (last_time.tv_sec * 1000000000 + last_time.tv_nsec))
                 / 1000000000;
         if (if_print) {
-            printf("%f\n", seconds_taken);
+            record_phase(NULL, seconds_taken);
         }
 
     last_time.tv_sec = end.tv_sec;
@@ -0,0 +1,129 @@
+import importlib
+import os
+import queue
+import shlex
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import enclave_worker
+import engine
+
+############################
+# BUCKET ENCLAVE LAUNCHERS #
+############################
+
+# A hash-bucketed FK join (fkjoin.py --buckets, see partition.py) runs one
+# enclave per bucket. A launcher decides where those enclaves run. Every
+# launcher has the same method as engine.run_obliviator_partitions:
+#
+#   run(run_dir, input_paths, num_threads) -> (raw output paths, completed processes)
+#
+# returning the results in input order. Two launchers come with the wrappers:
+#
+#   local              a pool of worker processes on this host (the default),
+#                      each running engine.run_obliviator on one bucket at a time.
+#                      Warm enclave workers are turned off in the pool: a pool
+#                      child would start its own, and it exits through
+#                      os._exit without the atexit shutdown.
+#   ssh:<host>,<host>  one bucket at a time per host (list a host twice for two),
+#                      run over ssh. The run directory and the job's temp
+#                      directory must be at the same paths on every host, e.g.
+#                      on a shared filesystem, as the inputs and outputs are not copied.
+#
+# Any other value is read as <module>:<factory>. The factory is called with the
+# worker count and returns a launcher, so other schedulers plug in without
+# changes to the wrappers.
+#
+# Environment:
+#   OBLIVIATOR_LAUNCHER   launcher used when --launcher is not given (default "local")
+
+
+def _run_bucket(run_dir: str, input_path: str, num_threads: int) -> Tuple[Path, subprocess.CompletedProcess]:
+    return engine.run_obliviator(Path(run_dir), Path(input_path), num_threads)
+
+
+class LocalLauncher:
+    """Runs each bucket in one of `workers` local worker processes."""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+
+    def run(
+        self,
+        run_dir: Path,
+        input_paths: Sequence[Path],
+        num_threads: int
+    ) -> Tuple[List[Path], List[subprocess.CompletedProcess]]:
+        print(f"Launching {len(input_paths)} buckets on {min(self.workers, len(input_paths))} local worker processes.")
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(input_paths)), initializer=enclave_worker.enable, initargs=(False,)
+        ) as pool:
+            results = list(pool.map(
+                _run_bucket, [str(run_dir)] * len(input_paths), [str(path) for path in input_paths],
+                [num_threads] * len(input_paths)
+            ))
+        return [output_path for output_path, _ in results], [process for _, process in results]
+
+
+class SshLauncher:
+    """Runs each bucket on the next free host over ssh (shared filesystem required)."""
+
+    def __init__(self, hosts: Sequence[str]):
+        if not hosts:
+            raise ValueError("The ssh launcher needs at least one host, e.g. ssh:node1,node2")
+        self.hosts = list(hosts)
+
+    def _run_on_host(self, free_hosts: queue.Queue, run_dir: Path, input_path: Path, num_threads: int):
+        host = free_hosts.get()
+        try:
+            input_path = Path(input_path).resolve()
+            print(f"Executing with input: {input_path} (on {host})")
+            remote_command = (
+                f"cd {shlex.quote(str(Path(run_dir).resolve()))} && "
+                f"./{enclave_worker.HOST_BINARY} ./{enclave_worker.ENCLAVE_IMAGE} "
+                f"{num_threads} {shlex.quote(str(input_path))}"
+            )
+            execution_command = ["ssh", host, remote_command]
+            completed_process = subprocess.run(execution_command, capture_output=True, text=True)
+        finally:
+            free_hosts.put(host)
+
+        if completed_process.returncode not in [0, 1]:
+            raise subprocess.CalledProcessError(
+                completed_process.returncode, execution_command, completed_process.stdout, completed_process.stderr
+            )
+        raw_output_path = input_path.with_name(input_path.stem + "_output.txt")
+        if not raw_output_path.exists():
+            raise FileNotFoundError(f"Obliviator output file not found: {raw_output_path} (is it on a shared filesystem?)")
+        return raw_output_path, completed_process
+
+    def run(
+        self,
+        run_dir: Path,
+        input_paths: Sequence[Path],
+        num_threads: int
+    ) -> Tuple[List[Path], List[subprocess.CompletedProcess]]:
+        print(f"Launching {len(input_paths)} buckets on {len(self.hosts)} ssh slots ({', '.join(sorted(set(self.hosts)))}).")
+        free_hosts = queue.Queue()
+        for host in self.hosts:
+            free_hosts.put(host)
+        with ThreadPoolExecutor(max_workers=len(self.hosts)) as pool:
+            results = list(pool.map(
+                lambda path: self._run_on_host(free_hosts, run_dir, path, num_threads), input_paths
+            ))
+        return [output_path for output_path, _ in results], [process for _, process in results]
+
+
+def get_launcher(spec: Optional[str] = None, workers: int = 1):
+    """The launcher for a --launcher value (default: OBLIVIATOR_LAUNCHER, else "local")."""
+    spec = spec or os.environ.get("OBLIVIATOR_LAUNCHER", "local")
+    if spec == "local":
+        return LocalLauncher(workers)
+    if spec.startswith("ssh:"):
+        return SshLauncher([host for host in spec[len("ssh:"):].split(",") if host])
+    module_name, _, factory_name = spec.partition(":")
+    if not factory_name:
+        raise ValueError(f"Unknown launcher '{spec}'. Use 'local', 'ssh:<host>,<host>' or '<module>:<factory>'.")
+    return getattr(importlib.import_module(module_name), factory_name)(workers)
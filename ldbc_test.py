@@ -1,55 +1,35 @@
-
-import os
-import subprocess
-from pathlib import Path
-import pandas as pd
 import argparse
-import shutil
-import csv
+from pathlib import Path
+
+from bench.cli import main
 
 # Run all LDBC short read queries and capture execution times.
-# Randomly sample parameters directly from CSV database
+# Now a thin wrapper around the benchmark suite's ldbc_short_reads suite (see
+# bench/scenarios.py): parameters are sampled from the CSV database with a fixed
+# seed, and each query gets a warmup run and repeated trials. The median enclave
+# time of each query is written to ldbc_test_output.txt as before.
+# With --batch_size N, each query is run once on N sampled ids (one join and one
+# IN-list filter, see batch.py) and the reported time is the amortized time per id.
+# Other arguments go to python -m bench (e.g. --trials 3).
+
+parser = argparse.ArgumentParser(description="Runs every LDBC short read on randomly sampled parameters.")
+parser.add_argument("--batch_size", type=int, default=1, help="Number of ids answered together by each query.")
+args, bench_args = parser.parse_known_args()
 
-LDBC_DIR = Path("LDBC_SF1")
-PERSON_CSV = LDBC_DIR / "Person.csv"
-POST_CSV = LDBC_DIR / "Post.csv"
 OUTPUT_PATH = Path("ldbc_test_output.txt")
 
-output_times = [ LDBC_DIR / "sr_output" / f"sr{n}_output.time" for n in range(1,8) ]
-times = []
-
-for query in range(1,8):
-    print(f"\n\n\nRunning SR Query {query}...\n\n\n")
-    # Randomly sample parameter
-    param = 0
-    if query < 4:
-        # sample person id
-        df = pd.read_csv(str(PERSON_CSV), sep='|')
-        param = df['id'].sample(n=1).item()
-        param_str = "--person_id"
-    else:
-        # sample message id
-        df = pd.read_csv(str(POST_CSV), sep='|')
-        param = df['id'].sample(n=1).item()
-        param_str = "--message_id"
-
-    # Run query
-    query_cmd = [
-        "python", f"short{query}.py",
-        param_str, str(param)
-    ]
-    subprocess.run(query_cmd, check=True, cwd=Path(__file__).parent)
-
-    # Capture time
-    with open(str(output_times[query - 1]), 'r') as tf:
-        times.append(tf.read())
-
-
+results = main([
+    "--suite", "ldbc_short_reads", "--set", f"batch_size={args.batch_size}",
+    "--output", "ldbc_test_results.json", *bench_args
+])
 
 # Write times to output
 output_str = ""
-for n in range(1,8):
-    output_str += f"Query {n}: {times[n-1]}s\n"
+for result in results:
+    stats = result["summary"]["enclave"]
+    time = f"{stats['median']}s" if stats.get("n") else f"failed ({result['error']})"
+    output_str += f"Query {result['scenario']['query']}: {time}\n"
+if args.batch_size > 1:
+    output_str += f"(amortized per query over batches of {args.batch_size} ids)\n"
 with open(str(OUTPUT_PATH), 'w') as tf:
     tf.write(output_str)
-
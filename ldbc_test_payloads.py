@@ -7,6 +7,7 @@ import seaborn as sns
 
 # Import the function from your payload setting script
 from set_payload import set_payloads
+from engine import read_time_file
 
 # --- Configuration ---
 LDBC_DIR = Path("LDBC_SF1")
@@ -63,11 +64,11 @@ def run_all_queries():
             param_str = "--message_id"
 
         query_cmd = ["python", f"short{query_num}.py", param_str, str(param)]
-        subprocess.run(query_cmd, check=True, cwd=Path(__file__).parent)
+        # Measure the DATA_LENGTH set in the headers rather than a per-job size
+        env = {**os.environ, "OBLIVIATOR_DATA_LENGTH": "header"}
+        subprocess.run(query_cmd, check=True, cwd=Path(__file__).parent, env=env)
 
-        with open(str(output_time_files[query_num - 1]), 'r') as tf:
-            time_str = tf.read().strip()
-            query_times.append(float(time_str))
+        query_times.append(read_time_file(output_time_files[query_num - 1]))
             
     return query_times
 
@@ -0,0 +1,236 @@
+# obliviator_formatting/binary_records.py
+
+import argparse
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+################################
+# BINARY ENCLAVE RECORD FORMAT #
+################################
+
+# Binary alternative to the "<n1> <n2>" + "<key> <payload>\n" text inputs
+# (see common/record_format.h in fk_join and operator_1). A 48-byte
+# little-endian header is followed by n1 + n2 fixed-width records:
+#
+#   int64 key | num_payloads * payload_len payload bytes
+#
+# Each payload is either the row's payload string, NUL-padded (and truncated to
+# DATA_LENGTH - 1 bytes like the text parser does, unless the job's DATA_LENGTH
+# was sized to fit it), or an int64 id from the relabeler (FLAG_MAPPED_IDS).
+# The enclave copies it into elem_t.data unchanged and writes its result in
+# the same format. A filter result has one payload per record. An FK join
+# result has two: table 1's payload, then table 2's. An IN-list filter input
+# carries its num_filter_values int64 values between the header and the first
+# record. A compound (--where) filter puts its program words there instead,
+# and appends one block of n1 + n2 int64 values per predicate column after the
+# records.
+# Records are read and written as numpy structured arrays, so neither side
+# parses or prints text.
+
+MAGIC = b"OBRB"
+VERSION = 1
+FLAG_MAPPED_IDS = 0x1
+FLAG_TRUNCATED = 0x2
+DEFAULT_FILTER_OP = -1
+MAPPED_PAYLOAD_LEN = 8
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u2"),
+    ("flags", "<u2"),
+    ("payload_len", "<u4"),
+    ("num_payloads", "<u4"),
+    ("n1", "<i8"),
+    ("n2", "<i8"),
+    ("filter_op", "<i4"),
+    ("num_filter_values", "<i4"),
+    ("filter_threshold", "<i8"),
+])
+assert HEADER_DTYPE.itemsize == 48
+
+
+def payload_fields(num_payloads: int) -> List[str]:
+    """Record field names: "payload" for inputs and filter results, "payload_t1"/"payload_t2" for join results."""
+    if num_payloads == 1:
+        return ["payload"]
+    return [f"payload_t{i + 1}" for i in range(num_payloads)]
+
+
+def record_dtype(payload_len: int, num_payloads: int = 1, mapped_ids: bool = False) -> np.dtype:
+    """The packed record layout: int64 key followed by num_payloads payloads."""
+    payload_type = "<i8" if mapped_ids else f"S{payload_len}"
+    return np.dtype([("key", "<i8")] + [(name, payload_type) for name in payload_fields(num_payloads)])
+
+
+def encode_payloads(payloads: Sequence[str], data_length: Optional[int]) -> np.ndarray:
+    """
+    Encodes payload strings as a fixed-width bytes array, truncated to
+    data_length - 1 bytes (the enclave keeps a NUL terminator in elem_t.data),
+    or not at all when data_length is None. The width is the longest encoded
+    payload, so short payloads give small records.
+    """
+    limit = data_length - 1 if data_length is not None else None
+    encoded = [payload.encode("utf-8")[:limit] for payload in payloads]
+    width = max((len(value) for value in encoded), default=1) or 1
+    return np.array(encoded, dtype=f"S{width}")
+
+
+def decode_payloads(payloads: np.ndarray) -> List[str]:
+    """Decodes a fixed-width bytes array (trailing NULs are dropped by numpy)."""
+    return [value.decode("utf-8", errors="replace") for value in payloads.tolist()]
+
+
+def write_records(
+    path: Path,
+    keys: np.ndarray,
+    payloads: np.ndarray,
+    n1: int,
+    n2: int = 0,
+    filter_op: int = DEFAULT_FILTER_OP,
+    filter_threshold: int = 0,
+    filter_values: Sequence[int] = (),
+    filter_columns: Sequence[np.ndarray] = ()
+):
+    """
+    Writes one input file: n1 table-1 rows followed by n2 table-2 rows.
+    payloads is either an int64 array of mapped ids or a fixed-width bytes array
+    (see encode_payloads). filter_values are the values of an IN-list filter or
+    the program of a compound filter, whose columns are filter_columns.
+    """
+    mapped_ids = payloads.dtype.kind in "iu"
+    payload_len = MAPPED_PAYLOAD_LEN if mapped_ids else payloads.dtype.itemsize
+    if len(keys) != n1 + n2 or len(payloads) != n1 + n2:
+        raise ValueError(f"Expected {n1 + n2} keys and payloads, got {len(keys)} and {len(payloads)}")
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["flags"] = FLAG_MAPPED_IDS if mapped_ids else 0
+    header["payload_len"] = payload_len
+    header["num_payloads"] = 1
+    header["n1"] = n1
+    header["n2"] = n2
+    header["filter_op"] = filter_op
+    header["filter_threshold"] = filter_threshold
+    header["num_filter_values"] = len(filter_values)
+
+    records = np.empty(n1 + n2, dtype=record_dtype(payload_len, 1, mapped_ids))
+    records["key"] = keys
+    records["payload"] = payloads
+
+    with open(path, "wb") as outfile:
+        outfile.write(header.tobytes())
+        outfile.write(np.asarray(filter_values, dtype="<i8").tobytes())
+        outfile.write(records.tobytes())
+        for column in filter_columns:
+            outfile.write(np.asarray(column, dtype="<i8").tobytes())
+
+
+def is_binary_file(path: Path) -> bool:
+    with open(path, "rb") as infile:
+        return infile.read(len(MAGIC)) == MAGIC
+
+
+def read_records(path: Path) -> Tuple[np.void, np.ndarray]:
+    """
+    Reads an input or enclave result file and returns (header, records). The
+    records are a read-only view of the file's bytes, without per-row parsing.
+    """
+    data = memoryview(Path(path).read_bytes())
+    if len(data) < HEADER_DTYPE.itemsize:
+        raise ValueError(f"{path} is too short for a binary record header")
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a binary record file (magic {header['magic']!r})")
+    if header["version"] != VERSION:
+        raise ValueError(f"{path} has record format version {header['version']}, expected {VERSION}")
+    if header["flags"] & FLAG_TRUNCATED:
+        raise ValueError(f"{path} is truncated: the enclave result did not fit the host buffer")
+
+    dtype = record_dtype(
+        int(header["payload_len"]), int(header["num_payloads"]), bool(header["flags"] & FLAG_MAPPED_IDS)
+    )
+    count = int(header["n1"] + header["n2"])
+    offset = HEADER_DTYPE.itemsize + 8 * int(header["num_filter_values"])
+    records = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+    return header, records
+
+
+def split_input(path: Path, chunk_rows: int, path_fn: Callable[[int], Path]) -> List[Path]:
+    """
+    Splits a filter input (n2 == 0) into inputs of chunk_rows records each (the
+    last may be shorter), written to path_fn(index). Every chunk keeps the
+    header's filter and values, and its rows of any compound filter columns.
+    """
+    header, records = read_records(path)
+    if header["n2"] != 0:
+        raise ValueError(f"{path} has {header['n2']} table-2 rows; only filter inputs can be split")
+    data = memoryview(Path(path).read_bytes())
+    num_rows = len(records)
+    values_end = HEADER_DTYPE.itemsize + 8 * int(header["num_filter_values"])
+    columns_start = values_end + records.nbytes
+    num_columns = (len(data) - columns_start) // (8 * num_rows) if num_rows else 0
+    columns = np.frombuffer(data, dtype="<i8", count=num_columns * num_rows, offset=columns_start).reshape(num_columns, num_rows)
+
+    paths = []
+    for index, start in enumerate(range(0, num_rows, chunk_rows)):
+        end = min(start + chunk_rows, num_rows)
+        chunk_header = header.copy()
+        chunk_header["n1"] = end - start
+        chunk_path = Path(path_fn(index))
+        with open(chunk_path, "wb") as outfile:
+            outfile.write(chunk_header.tobytes())
+            outfile.write(data[HEADER_DTYPE.itemsize:values_end])
+            outfile.write(records[start:end].tobytes())
+            for column in columns:
+                outfile.write(column[start:end].tobytes())
+        paths.append(chunk_path)
+    return paths
+
+
+def iter_record_columns(header: np.void, records: np.ndarray, chunk_rows: int) -> Iterator[List[Sequence]]:
+    """
+    Yields [keys, payload columns...] for chunk_rows records at a time. Mapped
+    payload ids stay int64 arrays; payload strings are decoded.
+    """
+    fields = payload_fields(int(header["num_payloads"]))
+    mapped_ids = bool(header["flags"] & FLAG_MAPPED_IDS)
+    for start in range(0, len(records), chunk_rows):
+        chunk = records[start:start + chunk_rows]
+        payloads = [chunk[name] if mapped_ids else decode_payloads(chunk[name]) for name in fields]
+        yield [chunk["key"].tolist()] + payloads
+
+
+def records_to_lines(header: np.void, records: np.ndarray) -> List[str]:
+    """Renders records in the host's text output format ("k p" or "k|p1|p2")."""
+    fields = payload_fields(int(header["num_payloads"]))
+    mapped_ids = bool(header["flags"] & FLAG_MAPPED_IDS)
+    columns = [records[name].tolist() if mapped_ids else decode_payloads(records[name]) for name in fields]
+    separator = " " if len(fields) == 1 else "|"
+    return [
+        separator.join([str(key)] + [str(column[i]) for column in columns]) + "\n"
+        for i, key in enumerate(records["key"].tolist())
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a binary enclave input or result file as text.")
+    parser.add_argument("--input_path", required=True)
+    parser.add_argument("--output_path", help="Write the text here instead of stdout.")
+    args = parser.parse_args()
+
+    header, records = read_records(Path(args.input_path))
+    lines = records_to_lines(header, records)
+    if args.output_path:
+        with open(args.output_path, "w", encoding='utf-8') as outfile:
+            outfile.writelines(lines)
+    else:
+        print(f"n1={header['n1']} n2={header['n2']} payload_len={header['payload_len']} "
+              f"num_payloads={header['num_payloads']} flags={header['flags']}")
+        print("".join(lines), end="")
+
+
+if __name__ == "__main__":
+    main()
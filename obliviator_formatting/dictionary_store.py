@@ -0,0 +1,235 @@
+# obliviator_formatting/dictionary_store.py
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from obliviator_formatting.relabel import encode_columns
+
+###############################
+# PERSISTENT DICTIONARY STORE #
+###############################
+
+# The relabelers rebuild the string -> id mapping on every query, although the
+# LDBC tables behind the short reads (Person.csv, Post.csv, ...) do not change
+# between queries. A DictionaryStore keeps that mapping on disk, one store per
+# (operator, input tables, column set), under
+# <OBLIVIATOR_DICTIONARY_DIR>/<operator>-<hash>/:
+#
+#   dictionary.sqlite   id -> value table (ids dense from 0) and one row per
+#                       input table: its size, mtime, sha256 and the generation
+#                       of its encoded columns
+#   <table>.<gen>.<i>.npy  the table's formatted columns: int64 ids for the
+#                       relabeled columns, fixed-width strings for the columns
+#                       passed through unchanged (e.g. the filter values)
+#
+# A table is reused while its size and mtime are unchanged. If they changed, the
+# file is hashed, and only a different hash means it is read again. Re-reading
+# one table never renumbers the dictionary: values already in it keep their id,
+# new ones are appended with the next free ids, so the columns cached for the
+# other tables stay valid. A repeat query on unchanged tables therefore skips
+# both the CSV formatting and the relabel pass and memory-maps the id columns.
+# Writers take an SQLite write lock for the whole refresh, so concurrent wrapper
+# processes can share one store.
+#
+# Environment:
+#   OBLIVIATOR_DICTIONARY_DIR   store directory (default ~/.cache/obliviator/dictionaries),
+#                               or "off" to relabel from scratch on every query
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dictionary (id INTEGER PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL, generation INTEGER NOT NULL, num_columns INTEGER NOT NULL, num_rows INTEGER NOT NULL
+);
+"""
+HASH_BLOCK = 1 << 20
+
+
+def dictionary_root() -> Optional[Path]:
+    root = os.environ.get("OBLIVIATOR_DICTIONARY_DIR", "~/.cache/obliviator/dictionaries")
+    if root.lower() in ("off", "0", "none", ""):
+        return None
+    return Path(os.path.expanduser(root))
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def open_dictionary(operator: str, tables: Sequence[Tuple[str, Sequence[str]]]) -> Optional["DictionaryStore"]:
+    """
+    Opens (creating it if needed) the store for an operator over the given
+    (csv path, column names) tables, or returns None if the store is disabled.
+    """
+    root = dictionary_root()
+    if root is None:
+        return None
+    spec = {"operator": operator, "tables": [[os.path.realpath(path), list(columns)] for path, columns in tables]}
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+    return DictionaryStore(root / f"{operator}-{digest[:16]}", spec)
+
+
+class DictionaryStore:
+    """An append-only value <-> id dictionary plus the encoded columns of each input table."""
+
+    def __init__(self, root: Path, spec: Optional[Dict] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        spec_path = self.root / "spec.json"
+        if spec is not None and not spec_path.exists():
+            spec_path.write_text(json.dumps(spec, indent=2) + "\n")
+        self._conn = sqlite3.connect(self.root / "dictionary.sqlite", timeout=600, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._table = None
+        self._pending = {}
+
+    def close(self):
+        self._conn.close()
+
+    @contextmanager
+    def _write_lock(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def table(self) -> np.ndarray:
+        """The id -> value table as an object array (table[id] is the original value)."""
+        if self._table is None:
+            values = [value for (value,) in self._conn.execute("SELECT value FROM dictionary ORDER BY id")]
+            self._table = np.array(values, dtype=object) if values else np.empty(0, dtype=object)
+        return self._table
+
+    def _column_path(self, name: str, generation: int, index: int) -> Path:
+        return self.root / f"{name}.{generation}.{index}.npy"
+
+    def _load(self, name: str, generation: int, num_columns: int) -> Optional[List]:
+        columns = []
+        for i in range(num_columns):
+            try:
+                column = np.load(self._column_path(name, generation, i), mmap_mode='r')
+            except (OSError, ValueError):
+                return None
+            columns.append(column if column.dtype.kind == "i" else column.tolist())
+        return columns
+
+    def lookup(self, name: str, path: str) -> Optional[List]:
+        """
+        Returns the cached columns of table name (read from path) if the file is
+        unchanged, else None. On a miss, pass the freshly read columns to store().
+        """
+        stat = os.stat(path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, sha256, generation, num_columns FROM sources WHERE name = ?", (name,)
+        ).fetchone()
+        digest = None
+        if row is not None:
+            size, mtime_ns, sha256, generation, num_columns = row
+            if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                digest = file_sha256(path)
+                if digest == sha256:
+                    # Touched or copied, but the same contents.
+                    self._conn.execute(
+                        "UPDATE sources SET size = ?, mtime_ns = ? WHERE name = ?",
+                        (stat.st_size, stat.st_mtime_ns, name)
+                    )
+            if digest is None or digest == sha256:
+                columns = self._load(name, generation, num_columns)
+                if columns is not None:
+                    return columns
+        # Signature of the file as it was before the caller reads it.
+        self._pending[name] = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns, digest or file_sha256(path))
+        return None
+
+    def _encode(self, columns: Sequence[Sequence[str]]) -> List[np.ndarray]:
+        """Encodes columns against the dictionary, appending values it does not hold yet."""
+        local_ids, uniques = encode_columns(columns)
+        table = self.table()
+        ids = pd.Index(table).get_indexer(uniques) if len(table) else np.full(len(uniques), -1)
+        ids = ids.astype(np.int64, copy=False)
+        new = np.flatnonzero(ids < 0)
+        if len(new):
+            ids[new] = np.arange(len(table), len(table) + len(new))
+            new_values = uniques[new]
+            self._conn.executemany(
+                "INSERT INTO dictionary (id, value) VALUES (?, ?)", zip(ids[new].tolist(), new_values.tolist())
+            )
+            self._table = np.concatenate([table, new_values])
+        return [ids.take(column) for column in local_ids]
+
+    def store(self, name: str, columns: Sequence[Sequence[str]], mapped: Sequence[bool]) -> List:
+        """
+        Encodes the mapped columns of table name into dictionary ids, saves all
+        columns and returns them (ids as int64 arrays, the rest unchanged).
+        """
+        path, size, mtime_ns, digest = self._pending.pop(name)
+        with self._write_lock():
+            # Another process may have appended values since table() was loaded.
+            self._table = None
+            ids = iter(self._encode([column for column, is_mapped in zip(columns, mapped) if is_mapped]))
+            result = [next(ids) if is_mapped else column for column, is_mapped in zip(columns, mapped)]
+
+            row = self._conn.execute("SELECT generation FROM sources WHERE name = ?", (name,)).fetchone()
+            old_generation = row[0] if row is not None else None
+            generation = 0 if old_generation is None else old_generation + 1
+            for i, column in enumerate(result):
+                column = column if isinstance(column, np.ndarray) else np.array(column, dtype=str)
+                np.save(self._column_path(name, generation, i), column)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, path, size, mtime_ns, digest, generation, len(result), len(result[0]) if result else 0)
+            )
+        if old_generation is not None:
+            for i in range(len(result)):
+                self._column_path(name, old_generation, i).unlink(missing_ok=True)
+        return result
+
+    def stats(self) -> Dict:
+        values = self._conn.execute("SELECT COUNT(*) FROM dictionary").fetchone()[0]
+        sources = self._conn.execute("SELECT name, path, num_rows FROM sources ORDER BY name").fetchall()
+        size = sum(path.stat().st_size for path in self.root.iterdir() if path.is_file())
+        return {"values": values, "tables": {name: f"{path} ({rows} rows)" for name, path, rows in sources}, "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent relabeling dictionaries.")
+    parser.add_argument("--stats", action="store_true", help="Print the values and tables held by each dictionary.")
+    parser.add_argument("--clear", action="store_true", help="Remove every dictionary.")
+    args = parser.parse_args()
+
+    root = dictionary_root()
+    if root is None:
+        print("Dictionary store is disabled (OBLIVIATOR_DICTIONARY_DIR=off).")
+        return
+    if args.clear:
+        shutil.rmtree(root, ignore_errors=True)
+        print(f"Cleared dictionaries at {root}.")
+    if args.stats or not args.clear:
+        for store_dir in sorted(root.glob("*/dictionary.sqlite")):
+            store = DictionaryStore(store_dir.parent)
+            print(f"{store_dir.parent.name}:")
+            for name, value in store.stats().items():
+                print(f"  {name}: {value}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,116 +2,148 @@
 
 import argparse
 import csv
-from pathlib import Path
-from typing import List
+from typing import Iterator, List, Tuple
 
-def format_for_fk_join(
-    filepath1: str,
-    key1: str,
-    payload1_cols: List[str],
-    filepath2: str,
-    key2: str,
-    payload2_cols: List[str],
-    output_path: str
-):
+from obliviator_formatting.streaming_input import StreamingInputWriter, peak_rss_mib
+
+def iter_join_table(filepath: str, key: str, payload_cols: List[str]) -> Iterator[Tuple[str, str]]:
     """
-    Reads two CSV files and formats them for an Obliviator Join operator.
+    Streams one CSV table as (join_key, payload_string) pairs.
+    Rows with an empty join key are skipped.
     """
-    print("--- Formatting CSVs for Join ---")
-    table1_rows = []
-    table2_rows = []
-
-    # --- Process the first table ---
     try:
         # FIX: Use 'utf-8-sig' to automatically handle Byte Order Marks (BOM)
-        with open(filepath1, mode='r', newline='', encoding='utf-8-sig') as infile:
+        with open(filepath, mode='r', newline='', encoding='utf-8-sig') as infile:
             # LDBC is pipe-separated
             reader = csv.DictReader(infile, delimiter='|')
-            header1 = reader.fieldnames
-            if not header1:
-                raise ValueError(f"CSV file is empty or has no header: {filepath1}")
-            
-            required_cols1 = {key1, *payload1_cols}
+            header = reader.fieldnames
+            if not header:
+                raise ValueError(f"CSV file is empty or has no header: {filepath}")
+
+            required_cols = {key, *payload_cols}
             # FIX: Provide a much more detailed error message if columns are missing
-            if not required_cols1.issubset(header1):
-                missing = sorted(list(required_cols1 - set(header1)))
+            if not required_cols.issubset(header):
+                missing = sorted(list(required_cols - set(header)))
                 raise ValueError(
-                    f"Missing columns in {filepath1}.\n"
-                    f"  Required: {sorted(list(required_cols1))}\n"
-                    f"  Found:    {header1}\n"
+                    f"Missing columns in {filepath}.\n"
+                    f"  Required: {sorted(list(required_cols))}\n"
+                    f"  Found:    {header}\n"
                     f"  Missing:  {missing}"
                 )
-            
+
             for row in reader:
-                #print(f"Parsing row:\n{row}\n")
-                join_key = row[key1]
-                
+                join_key = row[key]
+
                 # Added functionality: skip rows where join key is empty
                 if not join_key.strip():
                     continue
 
-                #print(f"Found join key: {key1} = {row[key1]}")
-                payload_string = "|".join(row[col] for col in payload1_cols)
-                #for col in payload1_cols:
-                    #print(f"Found ${col} = {row[col]}")
-                #print(f"Payload string: \n{payload_string}\n")
+                payload_string = "|".join(row[col] for col in payload_cols)
 
                 # If payload string is empty, use placeholder to prevent malformed lines
                 if not payload_string.strip():
                     payload_string = "_"
 
-                table1_rows.append(f"{join_key} {payload_string}\n")
+                yield join_key, payload_string
     except FileNotFoundError:
-        raise FileNotFoundError(f"Input file not found: {filepath1}")
+        raise FileNotFoundError(f"Input file not found: {filepath}")
 
 
-    # --- Process the second table ---
-    try:
-        with open(filepath2, mode='r', newline='', encoding='utf-8-sig') as infile:
-            # Pipe-separated
-            reader = csv.DictReader(infile, delimiter='|')
-            header2 = reader.fieldnames
-            if not header2:
-                raise ValueError(f"CSV file is empty or has no header: {filepath2}")
+def read_join_table_columns(filepath: str, key: str, payload_cols: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Reads one CSV table and returns its (join_keys, payload_strings) columns.
+    Rows with an empty join key are skipped.
+    """
+    keys = []
+    payloads = []
+    for join_key, payload_string in iter_join_table(filepath, key, payload_cols):
+        keys.append(join_key)
+        payloads.append(payload_string)
+    return keys, payloads
 
-            required_cols2 = {key2, *payload2_cols}
-            if not required_cols2.issubset(header2):
-                missing = sorted(list(required_cols2 - set(header2)))
-                raise ValueError(
-                    f"Missing columns in {filepath2}.\n"
-                    f"  Required: {sorted(list(required_cols2))}\n"
-                    f"  Found:    {header2}\n"
-                    f"  Missing:  {missing}"
-                )
 
-            for row in reader:
-                join_key = row[key2]
+def read_join_table_rows(filepath: str, key: str, payload_cols: List[str]) -> List[str]:
+    """
+    Reads one CSV table and returns its rows as "<join_key> <payload_string>" lines.
+    Rows with an empty join key are skipped.
+    """
+    keys, payloads = read_join_table_columns(filepath, key, payload_cols)
+    return [f"{join_key} {payload_string}\n" for join_key, payload_string in zip(keys, payloads)]
 
-                # Added functionality: skip rows where join key is empty
-                if not join_key.strip():
-                    continue
 
-                if not join_key.strip():
-                    print(f"WARNING: Join key {key2} empty for row in {filepath2}")
+def collect_fk_join_rows(
+    filepath1: str,
+    key1: str,
+    payload1_cols: List[str],
+    filepath2: str,
+    key2: str,
+    payload2_cols: List[str]
+) -> Tuple[List[str], List[str]]:
+    """
+    Reads both join tables into memory, returning (table1_rows, table2_rows).
+    """
+    print("--- Formatting CSVs for Join ---")
+    table1_rows = read_join_table_rows(filepath1, key1, payload1_cols)
+    table2_rows = read_join_table_rows(filepath2, key2, payload2_cols)
+    return table1_rows, table2_rows
 
-                payload_string = "|".join(row[col] for col in payload2_cols)
 
-                # If payload string is empty, use placeholder to prevent malformed lines
-                if not payload_string.strip():
-                    payload_string = "_"
+def collect_fk_join_columns(
+    filepath1: str,
+    key1: str,
+    payload1_cols: List[str],
+    filepath2: str,
+    key2: str,
+    payload2_cols: List[str]
+) -> Tuple[Tuple[List[str], List[str]], Tuple[List[str], List[str]]]:
+    """
+    Reads both join tables into memory as columns, returning
+    ((table1_keys, table1_payloads), (table2_keys, table2_payloads)).
+    """
+    print("--- Formatting CSVs for Join ---")
+    table1 = read_join_table_columns(filepath1, key1, payload1_cols)
+    table2 = read_join_table_columns(filepath2, key2, payload2_cols)
+    return table1, table2
 
-                table2_rows.append(f"{join_key} {payload_string}\n")
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Input file not found: {filepath2}")
+
+def write_fk_join_input(
+    filepath1: str,
+    key1: str,
+    payload1_cols: List[str],
+    filepath2: str,
+    key2: str,
+    payload2_cols: List[str],
+    output_path: str
+) -> Tuple[int, int, int]:
+    """
+    Streams both tables into a "<n1> <n2>" enclave input file without holding
+    their rows in memory. Returns (n1, n2, widest payload in bytes).
+    """
+    with StreamingInputWriter(output_path) as writer:
+        for table, (filepath, key, payload_cols) in enumerate(
+            [(filepath1, key1, payload1_cols), (filepath2, key2, payload2_cols)]
+        ):
+            writer.write_records(table, iter_join_table(filepath, key, payload_cols))
+    return writer.counts[0], writer.counts[1], writer.payload_width
 
 
-    # --- Write the combined output file ---
-    with open(output_path, "w", encoding='utf-8') as outfile:
-        outfile.write(f"{len(table1_rows)} {len(table2_rows)}\n")
-        outfile.writelines(table1_rows)
-        outfile.writelines(table2_rows)
+def format_for_fk_join(
+    filepath1: str,
+    key1: str,
+    payload1_cols: List[str],
+    filepath2: str,
+    key2: str,
+    payload2_cols: List[str],
+    output_path: str
+):
+    """
+    Reads two CSV files and formats them for an Obliviator Join operator.
+    """
+    print("--- Formatting CSVs for Join ---")
+    n1, n2, _ = write_fk_join_input(filepath1, key1, payload1_cols, filepath2, key2, payload2_cols, output_path)
 
-    print(f"Formatting complete. {len(table1_rows) + len(table2_rows)} total rows written to {output_path}.")
+    print(f"Formatting complete. {n1 + n2} total rows written to {output_path}.")
+    print(f"Peak RSS: {peak_rss_mib():.1f} MiB")
 
 
 def main():
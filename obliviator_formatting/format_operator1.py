@@ -2,46 +2,34 @@
 
 import argparse
 import csv
-from pathlib import Path
-from typing import List
+from typing import Callable, Iterator, List, Tuple
 
-def format_for_operator1(
+from obliviator_formatting.streaming_input import HEADER_WIDTH, StreamingInputWriter, peak_rss_mib
+
+def iter_operator1_table(
     filepath: str,
-    output_path: str,
     filter_col: str,
     payload_cols: List[str]
-):
+) -> Iterator[Tuple[str, str]]:
     """
-    Reads a CSV file and formats it for Obliviator Operator 1.
-
-    - Extracts a single column to be used for filtering.
-    - Extracts one or more payload columns and joins them into a single,
-      comma-separated string. This becomes the 'value' for the operator.
-    - Writes the output in the format: filter_col_value payload_string
-
-    Args:
-        filepath (str): Path to the input CSV file.
-        output_path (str): Path for the formatted output file.
-        filter_col (str): The name of the column to use for filtering.
-        payload_cols (list[str]): A list of column names to be concatenated
-                                  into the payload.
+    Streams a CSV file as (filter_value, payload_string) pairs.
+    Rows without a filter value are skipped.
     """
     print("--- Formatting CSV for Operator 1 ---")
     print(f"Filter column: {filter_col}")
     print(f"Payload columns: {payload_cols}")
 
-    rows = []
     try:
         with open(filepath, mode='r', newline='', encoding='utf-8') as infile:
             # LDBC is pipe-separated
             reader = csv.DictReader(infile, delimiter='|')
-            
+
             # Verify that all specified columns exist in the CSV header
             header = reader.fieldnames
             print(header)
             if not header:
                 raise ValueError("CSV file is empty or has no header.")
-            
+
             required_cols = {filter_col, *payload_cols}
             missing_cols = required_cols - set(header)
             if missing_cols:
@@ -49,16 +37,16 @@ def format_for_operator1(
 
             for row in reader:
                 filter_value = row[filter_col]
-                
+
                 # Fix - skip rows that do now have a valid filter_col attribute
                 if not filter_value.strip():
                     continue
-                
+
                 # Create the pipe-separated payload string
                 payload_values = [row[col] for col in payload_cols]
                 payload_string = "|".join(payload_values)
-                
-                rows.append(f"{filter_value} {payload_string}\n")
+
+                yield filter_value, payload_string
 
     except FileNotFoundError:
         print(f"Error: Input file not found at {filepath}")
@@ -67,14 +55,118 @@ def format_for_operator1(
         print(f"An error occurred during CSV processing: {e}")
         raise
 
-    # Write the formatted output file
-    with open(output_path, "w") as outfile:
-        # The C program expects a header line with the number of data rows
-        # and a second number (which is 0 for this operator).
-        outfile.write(f"{len(rows)} 0\n")
-        outfile.writelines(rows)
 
-    print(f"Formatting complete. {len(rows)} rows written to {output_path}.")
+def collect_operator1_columns(
+    filepath: str,
+    filter_col: str,
+    payload_cols: List[str]
+) -> Tuple[List[str], List[str]]:
+    """
+    Reads a CSV file and returns its (filter_values, payload_strings) columns.
+    Rows without a filter value are skipped.
+    """
+    filter_values = []
+    payloads = []
+    for filter_value, payload_string in iter_operator1_table(filepath, filter_col, payload_cols):
+        filter_values.append(filter_value)
+        payloads.append(payload_string)
+    return filter_values, payloads
+
+
+def collect_where_columns(
+    filepath: str,
+    where_cols: List[str],
+    payload_cols: List[str]
+) -> Tuple[List[List[str]], List[str]]:
+    """
+    Reads a CSV file for a --where filter and returns ([one column per
+    where_col], payload_strings). Rows with an empty value in any where column
+    are skipped.
+    """
+    print("--- Formatting CSV for Operator 1 (--where) ---")
+    print(f"Predicate columns: {where_cols}")
+    print(f"Payload columns: {payload_cols}")
+
+    where_values: List[List[str]] = [[] for _ in where_cols]
+    payloads = []
+    with open(filepath, mode='r', newline='', encoding='utf-8') as infile:
+        reader = csv.DictReader(infile, delimiter='|')
+        header = reader.fieldnames
+        if not header:
+            raise ValueError("CSV file is empty or has no header.")
+        missing_cols = {*where_cols, *payload_cols} - set(header)
+        if missing_cols:
+            raise ValueError(f"Missing required columns in CSV file: {', '.join(missing_cols)}")
+
+        for row in reader:
+            values = [row[col] for col in where_cols]
+            if not all(value.strip() for value in values):
+                continue
+            for column, value in zip(where_values, values):
+                column.append(value)
+            payloads.append("|".join(row[col] for col in payload_cols))
+    return where_values, payloads
+
+
+def collect_operator1_rows(
+    filepath: str,
+    filter_col: str,
+    payload_cols: List[str]
+) -> List[str]:
+    """
+    Reads a CSV file and returns its rows as "filter_col_value payload_string" lines.
+    Rows without a filter value are skipped.
+    """
+    filter_values, payloads = collect_operator1_columns(filepath, filter_col, payload_cols)
+    return [f"{filter_value} {payload_string}\n" for filter_value, payload_string in zip(filter_values, payloads)]
+
+
+def write_operator1_input(
+    filepath: str,
+    output_path: str,
+    filter_col: str,
+    payload_cols: List[str],
+    header_fn: Callable[[int], str] = lambda num_rows: f"{num_rows} 0",
+    header_width: int = HEADER_WIDTH
+) -> Tuple[int, int]:
+    """
+    Streams the formatted rows into an enclave input file without holding them
+    in memory. header_fn builds the header line from the row count (by default
+    "<N> 0"), which must fit in header_width characters.
+    Returns (row count, widest payload in bytes).
+    """
+    with StreamingInputWriter(output_path, 1, lambda counts: header_fn(counts[0]), header_width) as writer:
+        writer.write_records(0, iter_operator1_table(filepath, filter_col, payload_cols))
+    return writer.total, writer.payload_width
+
+
+def format_for_operator1(
+    filepath: str,
+    output_path: str,
+    filter_col: str,
+    payload_cols: List[str]
+):
+    """
+    Reads a CSV file and formats it for Obliviator Operator 1.
+
+    - Extracts a single column to be used for filtering.
+    - Extracts one or more payload columns and joins them into a single,
+      comma-separated string. This becomes the 'value' for the operator.
+    - Writes the output in the format: filter_col_value payload_string
+
+    Args:
+        filepath (str): Path to the input CSV file.
+        output_path (str): Path for the formatted output file.
+        filter_col (str): The name of the column to use for filtering.
+        payload_cols (list[str]): A list of column names to be concatenated
+                                  into the payload.
+    """
+    # The C program expects a header line with the number of data rows
+    # and a second number (which is 0 for this operator).
+    num_rows, _ = write_operator1_input(filepath, output_path, filter_col, payload_cols)
+
+    print(f"Formatting complete. {num_rows} rows written to {output_path}.")
+    print(f"Peak RSS: {peak_rss_mib():.1f} MiB")
 
 
 def main():
@@ -2,31 +2,29 @@
 
 import argparse
 import csv
-from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
-def format_for_operator2(
+def collect_operator2_columns(
     filepath: str,
-    output_path: str,
     group_by_col: str,
     agg_col: str,
     payload_cols: List[str]
-):
+) -> Tuple[List[str], List[str], List[str]]:
     """
-    Reads a CSV and formats it for the Obliviator Aggregation operator.
-
-    The output format is: <group_key> <agg_value> <payload_string>
+    Reads a CSV and returns its (group_keys, agg_values, payload_strings) columns.
     """
     print("--- Formatting CSV for Aggregation (Operator 2) ---")
-    rows = []
-    
+    group_keys = []
+    agg_values = []
+    payloads = []
+
     with open(filepath, mode='r', newline='', encoding='utf-8-sig') as infile:
         # LDBC is pipe-separated
         reader = csv.DictReader(infile, delimiter='|')
         header = reader.fieldnames
         if not header:
             raise ValueError(f"CSV file is empty or has no header: {filepath}")
-        
+
         required_cols = {group_by_col, agg_col, *payload_cols}
         if not required_cols.issubset(header):
             missing = sorted(list(required_cols - set(header)))
@@ -36,8 +34,40 @@ def format_for_operator2(
             group_key = row[group_by_col]
             agg_value = row[agg_col]
             payload_string = ",".join(row[col] for col in payload_cols)
-            
-            rows.append(f"{group_key} {agg_value} {payload_string}\n")
+
+            group_keys.append(group_key)
+            agg_values.append(agg_value)
+            payloads.append(payload_string)
+
+    return group_keys, agg_values, payloads
+
+
+def collect_operator2_rows(
+    filepath: str,
+    group_by_col: str,
+    agg_col: str,
+    payload_cols: List[str]
+) -> List[str]:
+    """
+    Reads a CSV and returns its rows as "<group_key> <agg_value> <payload_string>" lines.
+    """
+    group_keys, agg_values, payloads = collect_operator2_columns(filepath, group_by_col, agg_col, payload_cols)
+    return [f"{group_key} {agg_value} {payload_string}\n" for group_key, agg_value, payload_string in zip(group_keys, agg_values, payloads)]
+
+
+def format_for_operator2(
+    filepath: str,
+    output_path: str,
+    group_by_col: str,
+    agg_col: str,
+    payload_cols: List[str]
+):
+    """
+    Reads a CSV and formats it for the Obliviator Aggregation operator.
+
+    The output format is: <group_key> <agg_value> <payload_string>
+    """
+    rows = collect_operator2_rows(filepath, group_by_col, agg_col, payload_cols)
 
     with open(output_path, "w", encoding='utf-8') as outfile:
         # Header for the C program is a single number: the row count
@@ -1,9 +1,10 @@
 # obliviator_formatting/format_operator3_1.py
 
 import argparse
+from typing import Optional
 import pandas as pd # Using pandas for easy CSV column selection
 
-def format_operator3_1(filepath: str, output_path: str, filter_key_col: str, id_col: str):
+def format_operator3_1(filepath: str, output_path: str, filter_key_col: str, id_col: str, filter_spec: Optional[str] = None):
     """
     Formats a generic CSV input file for Obliviator's 'operator_3/3_1' (Filter/Projection).
     It extracts values from a specified 'filter_key_col' and 'id_col' to form
@@ -14,6 +15,8 @@ def format_operator3_1(filepath: str, output_path: str, filter_key_col: str, id_
         output_path (str): Path to the output formatted file for relabeling.
         filter_key_col (str): The name of the column whose values will act as the filter key.
         id_col (str): The name of the column whose values will act as the ID for reconstruction.
+        filter_spec (str, optional): "<op code> <threshold>" appended to the header so the
+                                     enclave applies that filter instead of its default.
     """
     # Read the CSV file
     df = pd.read_csv(filepath)
@@ -34,6 +37,8 @@ def format_operator3_1(filepath: str, output_path: str, filter_key_col: str, id_
 
     # The header for relabel_ids format: num_rows for table1, 0 for table2
     header_output = f"{len(lines_to_process)} {0}"
+    if filter_spec:
+        header_output += f" {filter_spec}"
     
     with open(output_path, "w") as outfile:
         outfile.write("\n".join([header_output] + lines_to_process))
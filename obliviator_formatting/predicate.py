@@ -0,0 +1,263 @@
+# obliviator_formatting/predicate.py
+
+import argparse
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+############################
+# WHERE PREDICATE COMPILER #
+############################
+
+# operator1.py --where takes a predicate over several columns, e.g.
+#
+#   creationDate BETWEEN '2010-01-01' AND '2010-12-31' AND (language == 'en' OR length > 100)
+#
+# and the enclave evaluates all of it in one oblivious scan (common/predicate.h
+# in operator_1) instead of one filter run per condition. Supported are
+# comparisons (<, >, <=, >=, ==, =, !=, <>) of a column with a literal,
+# [NOT] BETWEEN, [NOT] IN (...), AND, OR, NOT and parentheses. Keywords are
+# case-insensitive. Literals are integers or quoted strings.
+#
+# The expression is compiled to a postfix program of int64 words (see
+# predicate.h). Every predicate column travels with each row as an int64 value.
+# A column whose values are all integers is passed as is. Any other column is
+# encoded by rank: its values and the literals compared with it are sorted as
+# strings and replaced by their position, which keeps <, >, BETWEEN, == and IN
+# exact for strings (ISO dates compare correctly). Comparing an integer column
+# with a string literal is an error. Rows with an empty value in any predicate
+# column are skipped, like rows without a filter value in the single-column
+# filter.
+
+FILTER_EXPR = 8
+MAX_COLUMNS = 15        # PRED_MAX_COLUMNS - 1 (column 0 is the row number)
+MAX_WORDS = 4096
+MAX_DEPTH = 64
+
+PRED_CMP, PRED_IN, PRED_AND, PRED_OR, PRED_NOT = range(5)
+
+# The enclave keeps a row when (threshold <op> value), so `column < literal`
+# becomes `literal > column`. Codes as in engine.FILTER_OPS / common/filter.h.
+FLIPPED_OPS = {'<': 1, '>': 0, '<=': 4, '>=': 3, '==': 2, '!=': 5}
+OP_ALIASES = {'=': '==', '<>': '!='}
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*'|"(?:[^"]|"")*")
+      | (?P<number>-?\d+)(?![\w.])
+      | (?P<op><=|>=|==|!=|<>|<|>|=)
+      | (?P<punct>[(),])
+      | (?P<name>[A-Za-z_][\w.]*)
+    )""", re.VERBOSE)
+KEYWORDS = {"AND", "OR", "NOT", "BETWEEN", "IN"}
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """Splits a predicate into (kind, value) tokens; kind is string, number, op, punct, keyword or name."""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"Unexpected character in predicate at position {pos}: {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace(value[0] * 2, value[0])
+        elif kind == "name" and value.upper() in KEYWORDS:
+            kind, value = "keyword", value.upper()
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser producing nested tuples: ("cmp", col, op, lit), ("in", col, lits), ("and"|"or", a, b), ("not", a)."""
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, kind: str, value: str = None) -> bool:
+        if self.pos >= len(self.tokens):
+            return False
+        token_kind, token_value = self.tokens[self.pos]
+        return token_kind == kind and (value is None or token_value == value)
+
+    def take(self, kind: str, value: str = None) -> str:
+        if not self.peek(kind, value):
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end of predicate"
+            raise ValueError(f"Expected {value or kind} in predicate, found {found!r}")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def parse(self):
+        tree = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.pos][1]!r} in predicate")
+        return tree
+
+    def parse_or(self):
+        tree = self.parse_and()
+        while self.peek("keyword", "OR"):
+            self.take("keyword")
+            tree = ("or", tree, self.parse_and())
+        return tree
+
+    def parse_and(self):
+        tree = self.parse_not()
+        while self.peek("keyword", "AND"):
+            self.take("keyword")
+            tree = ("and", tree, self.parse_not())
+        return tree
+
+    def parse_not(self):
+        if self.peek("keyword", "NOT"):
+            self.take("keyword")
+            return ("not", self.parse_not())
+        if self.peek("punct", "("):
+            self.take("punct")
+            tree = self.parse_or()
+            self.take("punct", ")")
+            return tree
+        return self.parse_condition()
+
+    def literal(self) -> str:
+        if self.peek("number"):
+            return self.take("number")
+        return self.take("string")
+
+    def parse_condition(self):
+        column = self.take("name")
+        negated = False
+        if self.peek("keyword", "NOT"):
+            self.take("keyword")
+            negated = True
+        if self.peek("keyword", "BETWEEN"):
+            self.take("keyword")
+            low = self.literal()
+            self.take("keyword", "AND")
+            high = self.literal()
+            tree = ("and", ("cmp", column, ">=", low), ("cmp", column, "<=", high))
+        elif self.peek("keyword", "IN"):
+            self.take("keyword")
+            self.take("punct", "(")
+            values = [self.literal()]
+            while self.peek("punct", ","):
+                self.take("punct")
+                values.append(self.literal())
+            self.take("punct", ")")
+            tree = ("in", column, values)
+        elif negated:
+            raise ValueError(f"Expected BETWEEN or IN after {column} NOT")
+        else:
+            op = self.take("op")
+            tree = ("cmp", column, OP_ALIASES.get(op, op), self.literal())
+        return ("not", tree) if negated else tree
+
+
+def encode_column(values: Sequence[str], literals: Sequence[str], name: str) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    Encodes a predicate column as int64 values: the integers themselves, or the
+    string rank of each value among the column's values and literals.
+    Returns (encoded column, literal -> encoded value).
+    """
+    try:
+        encoded = np.asarray(values, dtype=np.int64)
+    except (ValueError, OverflowError):
+        encoded = None
+    if encoded is not None:
+        literal_ids = {}
+        for literal in literals:
+            try:
+                literal_ids[literal] = int(literal)
+            except ValueError:
+                raise ValueError(f"Column {name} holds integers but is compared with {literal!r}") from None
+        return encoded, literal_ids
+
+    literal_array = np.asarray(list(literals), dtype=str)
+    uniques = np.unique(np.concatenate([np.asarray(values, dtype=str), literal_array]))
+    encoded = np.searchsorted(uniques, np.asarray(values, dtype=str)).astype(np.int64)
+    ranks = np.searchsorted(uniques, literal_array).tolist() if len(literal_array) else []
+    return encoded, dict(zip(literals, ranks))
+
+
+class WherePredicate:
+    """A parsed --where predicate; compile() turns it into enclave program words and encoded columns."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tree = _Parser(text).parse()
+        self.columns: List[str] = []
+        self._literals: Dict[str, List[str]] = {}
+        self._collect(self.tree)
+        if len(self.columns) > MAX_COLUMNS:
+            raise ValueError(f"A predicate can use at most {MAX_COLUMNS} columns, got {len(self.columns)}")
+
+    def _collect(self, node):
+        kind = node[0]
+        if kind in ("cmp", "in"):
+            column = node[1]
+            if column not in self._literals:
+                self.columns.append(column)
+                self._literals[column] = []
+            self._literals[column].extend([node[3]] if kind == "cmp" else node[2])
+        else:
+            for child in node[1:]:
+                self._collect(child)
+
+    def _emit(self, node, literal_ids: Dict[str, Dict[str, int]], words: List[int]) -> Tuple[int, int]:
+        """Appends node's instructions to words. Returns (instruction count, stack depth reached)."""
+        kind = node[0]
+        if kind == "cmp":
+            _, column, op, literal = node
+            words.extend([PRED_CMP, self.columns.index(column) + 1, FLIPPED_OPS[op], literal_ids[column][literal]])
+            return 1, 1
+        if kind == "in":
+            _, column, literals = node
+            values = sorted(set(literal_ids[column][literal] for literal in literals))
+            words.extend([PRED_IN, self.columns.index(column) + 1, len(values)] + values)
+            return 1, 1
+        if kind == "not":
+            count, depth = self._emit(node[1], literal_ids, words)
+            words.append(PRED_NOT)
+            return count + 1, depth
+        count_a, depth_a = self._emit(node[1], literal_ids, words)
+        count_b, depth_b = self._emit(node[2], literal_ids, words)
+        words.append(PRED_AND if kind == "and" else PRED_OR)
+        return count_a + count_b + 1, max(depth_a, depth_b + 1)
+
+    def compile(self, column_values: Sequence[Sequence[str]]) -> Tuple[List[int], List[np.ndarray]]:
+        """
+        Encodes the values of self.columns (in that order) and compiles the
+        predicate. Returns (program words, encoded columns).
+        """
+        encoded_columns = []
+        literal_ids = {}
+        for column, values in zip(self.columns, column_values):
+            encoded, literal_ids[column] = encode_column(values, self._literals[column], column)
+            encoded_columns.append(encoded)
+        body: List[int] = []
+        count, depth = self._emit(self.tree, literal_ids, body)
+        words = [len(self.columns) + 1, count] + body
+        if depth > MAX_DEPTH:
+            raise ValueError(f"The predicate nests too deeply ({depth} levels, at most {MAX_DEPTH})")
+        if len(words) > MAX_WORDS:
+            raise ValueError(f"The compiled predicate has {len(words)} words, at most {MAX_WORDS}")
+        return words, encoded_columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse a --where predicate and print its columns and parse tree.")
+    parser.add_argument("where", help="Predicate, e.g. \"creationDate BETWEEN 2010 AND 2012 AND language == 'en'\".")
+    args = parser.parse_args()
+
+    predicate = WherePredicate(args.where)
+    print(f"Columns: {predicate.columns}")
+    print(f"Tree: {predicate.tree}")
+
+
+if __name__ == "__main__":
+    main()
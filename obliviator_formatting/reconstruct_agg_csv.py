@@ -2,29 +2,43 @@
 
 import argparse
 import csv
-from typing import List
+from typing import Iterable, Iterator, List, Sequence
 
-def reconstruct_agg_csv(
-    intermediate_path: str,
+def agg_csv_header(group_by_header: str, payload_headers: List[str]) -> List[str]:
+    # --- FIX: Use more descriptive headers based on observed behavior ---
+    return [group_by_header, 'representative_value', 'global_aggregate'] + payload_headers
+
+
+def agg_csv_rows(
+    group_keys: Sequence[str],
+    agg_values1: Sequence[str],
+    agg_values2: Sequence[str],
+    payloads: Sequence[str]
+) -> Iterator[List[str]]:
+    """
+    Yields the CSV rows of an aggregation result given as columns
+    (see reverse_relabel.write_reversed_csv).
+    """
+    for group_key, agg_val1, agg_val2, payload_str in zip(group_keys, agg_values1, agg_values2, payloads):
+        yield [group_key, agg_val1, agg_val2] + payload_str.split(',')
+
+
+def write_agg_csv(
+    lines: Iterable[str],
     final_csv_path: str,
     group_by_header: str,
     payload_headers: List[str]
 ):
     """
-    Reconstructs a final CSV from the intermediate output of the Aggregation operator.
+    Writes `group_key|agg_val_1|agg_val_2|payload_str` lines as the final CSV.
     """
-    print("--- Reconstructing Final Aggregation CSV ---")
-    
-    # --- FIX: Use more descriptive headers based on observed behavior ---
-    final_header = [group_by_header, 'representative_value', 'global_aggregate'] + payload_headers
-    
-    with open(intermediate_path, 'r', encoding='utf-8') as infile, \
-         open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
-        
+    final_header = agg_csv_header(group_by_header, payload_headers)
+
+    with open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
         writer = csv.writer(outfile, delimiter='|')
         writer.writerow(final_header)
 
-        for line in infile:
+        for line in lines:
             # Intermediate format is: group_key|agg_val_1|agg_val_2|payload_str
             parts = line.strip().split('|')
             if len(parts) != 4:
@@ -32,9 +46,24 @@ def reconstruct_agg_csv(
 
             group_key, agg_val1, agg_val2, payload_str = parts
             payload_vals = payload_str.split(',')
-            
+
             writer.writerow([group_key, agg_val1, agg_val2] + payload_vals)
 
+
+def reconstruct_agg_csv(
+    intermediate_path: str,
+    final_csv_path: str,
+    group_by_header: str,
+    payload_headers: List[str]
+):
+    """
+    Reconstructs a final CSV from the intermediate output of the Aggregation operator.
+    """
+    print("--- Reconstructing Final Aggregation CSV ---")
+
+    with open(intermediate_path, 'r', encoding='utf-8') as infile:
+        write_agg_csv(infile, final_csv_path, group_by_header, payload_headers)
+
     print(f"CSV reconstruction complete. Final output at: {final_csv_path}")
 
 def main():
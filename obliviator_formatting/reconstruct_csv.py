@@ -2,8 +2,54 @@
 
 import argparse
 import csv
-from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Sequence
+
+def write_filter_csv(
+    lines: Iterable[str],
+    final_csv_path: str,
+    filter_col: str,
+    payload_cols: List[str]
+):
+    """
+    Writes "filter_value payload_string" lines as a pipe-delimited CSV
+    with the original headers.
+    """
+    # The header for the new CSV file will be the filter column plus the payload columns
+    final_header = [filter_col] + payload_cols
+
+    with open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile, delimiter='|')
+        writer.writerow(final_header) # Write the header row
+
+        for line in lines:
+            parts = line.strip().split(maxsplit=1)
+            if len(parts) != 2:
+                continue # Skip any malformed lines
+
+            filter_val, payload_str = parts
+            payload_vals = payload_str.split('|')
+
+            # Write the reconstructed row
+            writer.writerow([filter_val] + payload_vals)
+
+
+def filter_csv_rows(filter_values: Sequence, payloads: Sequence[str]) -> Iterator[List[str]]:
+    """
+    Yields the CSV rows of a filter result given as columns
+    (see reverse_relabel.write_reversed_csv).
+    """
+    for filter_val, payload_str in zip(filter_values, payloads):
+        yield [filter_val] + payload_str.split('|')
+
+
+def payload_csv_rows(row_numbers: Sequence, payloads: Sequence[str]) -> Iterator[List[str]]:
+    """
+    Yields the CSV rows of a --where filter result, whose keys are row numbers
+    and are therefore left out.
+    """
+    for payload_str in payloads:
+        yield payload_str.split('|')
+
 
 def reconstruct_csv(
     intermediate_path: str,
@@ -23,29 +69,10 @@ def reconstruct_csv(
         payload_cols (list[str]): The names of the original payload columns.
     """
     print("--- Reconstructing Final CSV ---")
-    
-    # The header for the new CSV file will be the filter column plus the payload columns
-    final_header = [filter_col] + payload_cols
-    
-    try:
-        with open(intermediate_path, 'r', encoding='utf-8') as infile, \
-             open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
-            
-            writer = csv.writer(outfile, delimiter='|')
-            writer.writerow(final_header) # Write the header row
-
-            for line in infile:
-                parts = line.strip().split(maxsplit=1)
-                if len(parts) != 2:
-                    continue # Skip any malformed lines
 
-                filter_val, payload_str = parts
-                payload_vals = payload_str.split('|')
-
-                # print(f"DEBUG: key='{filter_val}' payload='{payload_str}' split_vals={payload_vals}")
-                
-                # Write the reconstructed row
-                writer.writerow([filter_val] + payload_vals)
+    try:
+        with open(intermediate_path, 'r', encoding='utf-8') as infile:
+            write_filter_csv(infile, final_csv_path, filter_col, payload_cols)
 
     except FileNotFoundError:
         print(f"Error: Intermediate file not found at {intermediate_path}")
@@ -53,7 +80,7 @@ def reconstruct_csv(
     except Exception as e:
         print(f"An error occurred during CSV reconstruction: {e}")
         raise
-        
+
     print(f"CSV reconstruction complete. Final output at: {final_csv_path}")
 
 def main():
@@ -2,7 +2,7 @@
 
 import argparse
 import csv
-from typing import List
+from typing import Iterable, Iterator, List, Sequence
 
 
 '''
@@ -48,47 +48,88 @@ def reconstruct_fk_join_csv(
 
 
 # Updated function:
+def fk_join_csv_header(key_header: str, payload1_headers: List[str], payload2_headers: List[str]) -> List[str]:
+    """
+    The final header includes the key and all payload headers,
+    prefixed with the table each column came from.
+    """
+    return ["t1." + key_header] + [ "t1." + header for header in payload1_headers ] + [ "t2." + header for header in payload2_headers ]
 
-def reconstruct_fk_join_csv(
-    intermediate_path: str,
+
+def write_fk_join_csv(
+    lines: Iterable[str],
     final_csv_path: str,
     key_header: str,
     payload1_headers: List[str],
     payload2_headers: List[str]
 ):
     """
-    Reconstructs a final CSV from the C program's direct output.
-    This version assumes the C output is in the format:
+    Writes the final CSV from pipe-delimited join lines:
     key|payload1_field1|payload1_field2|payload2_field1|...
     """
-    print("--- Reconstructing Final FK Join CSV ---")
-    
-    # The final header includes the key and all payload headers
-    # Specify which table came frome
-    final_header = ["t1." + key_header] + [ "t1." + header for header in payload1_headers ] + [ "t2." + header for header in payload2_headers ]
-    
-    with open(intermediate_path, 'r', encoding='utf-8') as infile, \
-         open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
-        
+    final_header = fk_join_csv_header(key_header, payload1_headers, payload2_headers)
+
+    with open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
         writer = csv.writer(outfile, delimiter='|')
         writer.writerow(final_header)
-
-        for line in infile:
+        for line in lines:
             # The entire line from the C program is now pipe-delimited
             # skip null entries if carrying no payload
             parts = [entry for entry in line.strip().split('|') if entry != '_']
-            
+
             # The number of parts should match the number of columns
             if len(parts) != len(final_header):
                 print(f"Warning: Skipping malformed intermediate line: '{line.strip()}'")
                 continue
-            
+
             # The parts are already correctly separated, just write them
             writer.writerow(parts)
 
+
+def fk_join_csv_rows(
+    keys: Sequence,
+    payloads_t1: Sequence[str],
+    payloads_t2: Sequence[str],
+    num_columns: int
+) -> Iterator[List[str]]:
+    """
+    Yields the CSV rows of a join result given as columns
+    (see reverse_relabel.write_reversed_csv), without going through
+    pipe-delimited lines. Rows without num_columns fields are skipped.
+    """
+    for key, payload1, payload2 in zip(keys, payloads_t1, payloads_t2):
+        line = f"{key}|{payload1}|{payload2}"
+        parts = line.split('|')
+        if '_' in parts:
+            # skip null entries if carrying no payload
+            parts = [entry for entry in parts if entry != '_']
+        if len(parts) != num_columns:
+            print(f"Warning: Skipping malformed result row: '{line}'")
+            continue
+        yield parts
+
+
+def reconstruct_fk_join_csv(
+    intermediate_path: str,
+    final_csv_path: str,
+    key_header: str,
+    payload1_headers: List[str],
+    payload2_headers: List[str]
+):
+    """
+    Reconstructs a final CSV from the C program's direct output.
+    This version assumes the C output is in the format:
+    key|payload1_field1|payload1_field2|payload2_field1|...
+    """
+    print("--- Reconstructing Final FK Join CSV ---")
+
+    with open(intermediate_path, 'r', encoding='utf-8') as infile:
+        write_fk_join_csv(infile, final_csv_path, key_header, payload1_headers, payload2_headers)
     print(f"CSV reconstruction complete. Final output at: {final_csv_path}")
 
 
+
+
 '''
 def reconstruct_fk_join_csv(
     intermediate_path: str,
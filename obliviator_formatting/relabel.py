@@ -0,0 +1,172 @@
+# obliviator_formatting/relabel.py
+
+import argparse
+import gc
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+####################################
+# VECTORIZED DICTIONARY RELABELING #
+####################################
+
+# Shared implementation behind relabel_fk_join, relabel_op1, relabel_operator2,
+# relabel_nfk_join and relabel_ids. A formatted row is split into fields. The
+# fields being mapped are dictionary-encoded in one pandas.factorize call over
+# a shared id space. Ids are assigned in order of first appearance, reading the
+# mapped fields row by row, so they match what the per-line relabelers produced.
+# The uniques array is itself the id -> value table: uniques[i] is the value of
+# id i. The relabeled rows and the mapping file are each built as one string
+# and written with a single write.
+#
+# Splitting creates one small list per row. Those lists hold only strings, so
+# the cyclic garbage collector is paused while they are built; otherwise it
+# rescans the growing set of live lists again and again, and on
+# multi-million-row tables that costs more than the split itself.
+
+
+@contextmanager
+def _gc_paused():
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def split_fields(
+    lines: Iterable[str],
+    num_fields: int,
+    separator: Optional[str] = None,
+    source_name: str = "<memory>",
+    exact: bool = False
+) -> List[List[str]]:
+    """
+    Splits rows into num_fields columns (the last field keeps any remaining
+    separators). separator=None splits on whitespace like str.split(). Rows with
+    fewer fields are skipped with a warning. With exact=True every separator
+    splits, and rows with more fields are skipped as well.
+    """
+    maxsplit = -1 if exact else num_fields - 1
+    with _gc_paused():
+        parts = [line.strip().split(separator, maxsplit) for line in lines]
+
+        rows = [fields for fields in parts if len(fields) == num_fields]
+        if len(rows) != len(parts):
+            malformed = [fields for fields in parts if len(fields) != num_fields]
+            print(f"Warning: Skipping {len(malformed)} malformed line(s) in {source_name}, e.g. {malformed[0]!r}")
+        return [[fields[i] for fields in rows] for i in range(num_fields)]
+
+
+def encode_columns(columns: Sequence[Sequence[str]]) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Dictionary-encodes the columns into one shared id space. Returns the int64 id
+    array of each column and the uniques array (uniques[id] == original value).
+    """
+    num_columns = len(columns)
+    num_rows = len(columns[0]) if num_columns else 0
+    interleaved = np.empty(num_rows * num_columns, dtype=object)
+    for i, column in enumerate(columns):
+        interleaved[i::num_columns] = column
+    codes, uniques = pd.factorize(interleaved, sort=False)
+    codes = codes.astype(np.int64, copy=False)
+    return [codes[i::num_columns] for i in range(num_columns)], np.asarray(uniques, dtype=object)
+
+
+def format_rows(columns: Sequence[Sequence], separator: str = " ") -> str:
+    """Joins the columns (int64 id arrays or lists of strings) into "<f0><sep><f1>...\n" rows as one string."""
+    if not columns or len(columns[0]) == 0:
+        return ""
+    template = separator.join("%d" if isinstance(column, np.ndarray) else "%s" for column in columns)
+    lists = [column.tolist() if isinstance(column, np.ndarray) else column for column in columns]
+    return "\n".join(map(template.__mod__, zip(*lists))) + "\n"
+
+
+def format_mapping(uniques: np.ndarray, separator: str = "|") -> str:
+    """Renders the "<id><sep><value>" mapping file contents."""
+    if len(uniques) == 0:
+        return ""
+    return "\n".join(map(f"%d{separator}%s".__mod__, enumerate(uniques.tolist()))) + "\n"
+
+
+def relabel_rows(
+    lines: Iterable[str],
+    num_fields: int,
+    relabel_fields: Sequence[int],
+    map_fields: Optional[Sequence[int]] = None,
+    input_separator: Optional[str] = None,
+    output_fields: Optional[Sequence[int]] = None,
+    source_name: str = "<memory>"
+) -> Tuple[str, np.ndarray, int]:
+    """
+    Relabels formatted rows (without the header line).
+
+    map_fields are the fields that get ids, in the order ids are assigned within
+    a row (defaults to relabel_fields). relabel_fields are the fields replaced by
+    their ids in the output. Every other field is passed through unchanged.
+    output_fields selects the fields written, space-separated (default: all).
+    Returns (relabeled rows as one string, uniques, row count).
+    """
+    map_fields = list(relabel_fields if map_fields is None else map_fields)
+    columns = split_fields(lines, num_fields, input_separator, source_name)
+    ids, uniques = encode_columns([columns[field] for field in map_fields])
+    for field in relabel_fields:
+        columns[field] = ids[map_fields.index(field)]
+    if output_fields is not None:
+        columns = [columns[field] for field in output_fields]
+    return format_rows(columns), uniques, len(columns[0])
+
+
+def relabel_file(
+    input_path: str,
+    output_path: str,
+    mapping_path: str,
+    num_fields: int,
+    relabel_fields: Sequence[int],
+    map_fields: Optional[Sequence[int]] = None,
+    input_separator: Optional[str] = None,
+    output_fields: Optional[Sequence[int]] = None,
+    mapping_separator: str = "|"
+) -> np.ndarray:
+    """
+    Relabels a formatted enclave input file (header line preserved) and writes
+    the mapping file. Returns the uniques array.
+    """
+    with open(input_path, "r", encoding='utf-8') as infile:
+        header = infile.readline()
+        text, uniques, _ = relabel_rows(
+            infile, num_fields, relabel_fields, map_fields, input_separator, output_fields, input_path
+        )
+
+    with open(output_path, "w", encoding='utf-8') as outfile:
+        outfile.write(header + text)
+    with open(mapping_path, "w", encoding='utf-8') as map_file:
+        map_file.write(format_mapping(uniques, mapping_separator))
+    return uniques
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dictionary-encode fields of a formatted Obliviator input file.")
+    parser.add_argument("--input_path", required=True)
+    parser.add_argument("--output_path", required=True)
+    parser.add_argument("--mapping_path", required=True)
+    parser.add_argument("--num_fields", type=int, default=2, help="Fields per row (the last one keeps embedded separators).")
+    parser.add_argument("--relabel_fields", type=int, nargs='+', default=[0, 1], help="Fields replaced by their ids.")
+    parser.add_argument("--map_fields", type=int, nargs='*', help="Fields given ids, in assignment order (default: --relabel_fields).")
+    parser.add_argument("--input_separator", help="Field separator (default: whitespace).")
+    parser.add_argument("--output_fields", type=int, nargs='*', help="Fields written to the output (default: all).")
+    parser.add_argument("--mapping_separator", default="|")
+    args = parser.parse_args()
+    uniques = relabel_file(
+        args.input_path, args.output_path, args.mapping_path, args.num_fields,
+        args.relabel_fields, args.map_fields, args.input_separator, args.output_fields, args.mapping_separator
+    )
+    print(f"Relabeling complete: {len(uniques)} distinct values.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,23 @@
 # obliviator_formatting/relabel_fk_join.py
 
 import argparse
-from pathlib import Path
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from obliviator_formatting.relabel import encode_columns, relabel_file
+
+
+def relabel_fk_join_columns(keys: Sequence[str], payloads: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Relabels the key and payload columns of both tables (table 1 rows first).
+    Keys and payloads share one id space, assigned in order of first
+    appearance. Returns int64 (key_ids, payload_ids) arrays and the uniques
+    array (uniques[id] is the original value).
+    """
+    (key_ids, payload_ids), uniques = encode_columns([keys, payloads])
+    return key_ids, payload_ids, uniques
+
 
 def relabel_for_fk_join(input_path: str, output_path: str, mapping_path: str):
     """
@@ -11,52 +27,8 @@ def relabel_for_fk_join(input_path: str, output_path: str, mapping_path: str):
     - Writes a new file where keys/payloads are replaced by integer IDs.
     - Writes a robust, pipe-delimited mapping file.
     """
-    value_map = {}
-    next_mapped_id = 0
-
-    def get_or_assign_id(original_value: str) -> int:
-        nonlocal next_mapped_id
-        if original_value not in value_map:
-            value_map[original_value] = next_mapped_id
-            next_mapped_id += 1
-        return value_map[original_value]
-
     print(f"--- Running FK Join Relabeling ---")
-    
-    lines_to_write = []
-    header = ""
-    with open(input_path, "r", encoding='utf-8') as infile:
-        header = infile.readline() # Read and preserve the header
-        
-        for line in infile:
-            parts = line.strip().split(maxsplit=1)
-            if len(parts) != 2:
-                # Print the raw line and its representation to see hidden characters
-                print(f"--- MALFORMED LINE DETECTED in {input_path} ---")
-                print(f"Raw line: {line}")
-                print(f"Representation: {repr(line)}")
-                print(f"-------------------------------------------------")
-                continue
-            
-            original_key, original_payload = parts
-            
-            mapped_key_id = get_or_assign_id(original_key)
-            mapped_payload_id = get_or_assign_id(original_payload)
-            
-            lines_to_write.append(f"{mapped_key_id} {mapped_payload_id}\n")
-
-    # Write the relabeled output file for the C program
-    with open(output_path, 'w', encoding='utf-8') as outfile:
-        if header:
-            outfile.write(header)
-        outfile.writelines(lines_to_write)
-
-    # --- FIX: Write the mapping file using a pipe delimiter ---
-    # This ensures that complex payloads with spaces are handled correctly.
-    with open(mapping_path, "w", encoding='utf-8') as map_file:
-        for original_val, mapped_id in value_map.items():
-            map_file.write(f"{mapped_id}|{original_val}\n")
-    
+    relabel_file(input_path, output_path, mapping_path, 2, relabel_fields=[0, 1])
     print("FK Join relabeling complete.")
 
 
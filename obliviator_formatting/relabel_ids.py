@@ -2,15 +2,7 @@
 
 import argparse
 
-id_map = {}
-next_id = 0
-
-def get_or_assign_id(original_id_str):
-    global next_id
-    if original_id_str not in id_map:
-        id_map[original_id_str] = next_id
-        next_id += 1
-    return str(id_map[original_id_str]) # Ensure string output
+from obliviator_formatting.relabel import relabel_file
 
 
 def relabel_ids ( input_path , output_path , mapping_path, key_index_to_relabel: int = 0 ):
@@ -24,45 +16,19 @@ def relabel_ids ( input_path , output_path , mapping_path, key_index_to_relabel:
                                     If -1, no columns are relabeled to new integers,
                                     but all unique IDs encountered in column 0 and 1 are still mapped.
     """
-    global id_map, next_id
-    id_map = {} # Reset map for each run
-    next_id = 0 # Reset counter for each run
-
-    with open(input_path, "r") as infile, open(output_path, "w") as outfile:
-        # Write the header line unmodified
-        header = infile.readline()
-        outfile.write(header)
-        
-        for line_num, line in enumerate(infile):
-            parts = line.strip().split(maxsplit=1) # Split only on the first space (assuming ID VALUE format)
-
-            if len(parts) == 2:
-                original_key_str, original_value_str = parts
-                output_parts = [original_key_str, original_value_str] # Default to no change for values
-
-                # CRITICAL FIX: Ensure *both* parts are added to the mapping, even if only one is relabeled to an int.
-                # This makes the map comprehensive.
-                get_or_assign_id(original_key_str) # Add key to map
-                get_or_assign_id(original_value_str) # Add value to map
+    if key_index_to_relabel in (0, 1):
+        relabel_fields = [key_index_to_relabel]
+    else:
+        if key_index_to_relabel != -1:
+            print(f"Warning: relabel_ids: key_index_to_relabel {key_index_to_relabel} not supported for 2-column input. No relabeling performed.")
+        relabel_fields = []
 
-                # Relabel the specified key if index is valid
-                if key_index_to_relabel == 0:
-                    output_parts[0] = get_or_assign_id(original_key_str) # Relabel key
-                elif key_index_to_relabel == 1: # If relabeling the second part (value)
-                    output_parts[1] = get_or_assign_id(original_value_str) # Relabel value
-                elif key_index_to_relabel != -1:
-                    print(f"Warning: relabel_ids: key_index_to_relabel {key_index_to_relabel} not supported for 2-column input. No relabeling performed for this line.")
-
-                outfile.write(f"{output_parts[0]} {output_parts[1]}\n")
-            else:
-                # For non-2-column inputs (like headers or malformed lines), just write as-is
-                outfile.write(line)
-                print(f"Warning: relabel_ids encountered unexpected line format (not 2 columns): {line.strip()}")
-
-    # Write mapping file: mapped_id original_id
-    with open(mapping_path, "w") as f:
-        for original, mapped in id_map.items():
-            f.write(f"{mapped} {original}\n")
+    # Both columns are always added to the mapping, even if only one (or neither)
+    # is relabeled, so the map stays comprehensive.
+    relabel_file(
+        input_path, output_path, mapping_path, 2,
+        relabel_fields=relabel_fields, map_fields=[0, 1], mapping_separator=" "
+    )
 
 
 def main():
@@ -78,4 +44,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -2,6 +2,22 @@
 
 import argparse
 from pathlib import Path
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from obliviator_formatting.relabel import encode_columns, relabel_file
+
+
+def relabel_operator1_columns(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Relabels the value column only; the IDs stay as they are for numeric
+    filtering. Each distinct value gets a sequential id. Returns the value_ids
+    array and the uniques array.
+    """
+    (value_ids,), uniques = encode_columns([values])
+    return value_ids, uniques
+
 
 def relabel_for_operator1(input_path: str, output_path: str, mapping_path: str):
     """
@@ -16,49 +32,16 @@ def relabel_for_operator1(input_path: str, output_path: str, mapping_path: str):
         output_path (str): Path for the relabeled file to be fed into the C program.
         mapping_path (str): Path to write the value mapping to (mapped_id -> original_value).
     """
-    value_map = {}
-    next_mapped_id = 0
-
     print(f"--- Running Operator 1 Relabeling ---")
     print(f"Input: {input_path}")
     print(f"Output: {output_path}")
     print(f"Mapping: {mapping_path}")
 
-    with open(input_path, "r") as infile, open(output_path, "w") as outfile:
-        # The first line of the formatted file is the header (e.g., "10 0")
-        # which contains the count of lines. We pass it through.
-        header = infile.readline()
-        if header:
-            outfile.write(header)
-        else:
-            print("Warning: Input file for relabeling is empty.")
-            return
-
-        for line in infile:
-            parts = line.strip().split(maxsplit=1)
-            if len(parts) != 2:
-                print(f"Warning: Skipping malformed line in {input_path}: {line.strip()}")
-                continue
-
-            original_id, original_value = parts
-
-            # Get or create a new integer ID for the string value
-            if original_value not in value_map:
-                value_map[original_value] = next_mapped_id
-                next_mapped_id += 1
-            
-            mapped_value_id = value_map[original_value]
-
-            # Write the output with the ORIGINAL ID and the NEW MAPPED VALUE ID
-            outfile.write(f"{original_id} {mapped_value_id}\n")
+    if Path(input_path).stat().st_size == 0:
+        print("Warning: Input file for relabeling is empty.")
+        return
+    relabel_file(input_path, output_path, mapping_path, 2, relabel_fields=[1])
 
-    # Write the mapping file: mapped_id original_value
-    # This will be used to restore the original string after the C program runs.
-    with open(mapping_path, "w") as map_file:
-        # We need to invert the map for writing
-        for original_val, mapped_id in value_map.items():
-            map_file.write(f"{mapped_id}|{original_val}\n")
-    
     print("Operator 1 relabeling complete.")
 
 
@@ -0,0 +1,186 @@
+# obliviator_formatting/reverse_relabel.py
+
+import argparse
+import csv
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from obliviator_formatting.relabel import format_rows, split_fields
+
+########################################
+# VECTORIZED REVERSE RELABELING TO CSV #
+########################################
+
+# Shared implementation behind reverse_relabel_ids, reverse_relabel_op1,
+# reverse_relabel_operator2 and reverse_relabel_nfk_join, and behind the last
+# stage of every engine.py pipeline. The relabelers assign dense ids 0..n-1, so
+# the reverse map is an object array indexed by id: the uniques array from
+# relabel.py, or a mapping file read back with read_mapping_table. Nothing is
+# looked up in a str -> str dict.
+#
+# The C output is read CHUNK_ROWS lines at a time. Each chunk is split into
+# columns, its id columns are parsed to int64 in one call, and the originals
+# are fetched with a single take. The rebuilt rows go straight to csv.writer,
+# so reverse relabeling and CSV reconstruction are one pass over the output.
+# Memory stays bounded by the chunk size, not the result size. Ids that are
+# not in the table come back as "<unmapped_prefix><id>", as they always have.
+
+CHUNK_ROWS = 1 << 16
+
+
+def read_mapping_table(mapping_path: str, separator: Optional[str] = "|") -> np.ndarray:
+    """
+    Loads an "<id><sep><value>" mapping file into an object array indexed by id.
+    Ids missing from the file are left as None. separator=None splits on whitespace.
+    """
+    try:
+        with open(mapping_path, "r", encoding='utf-8') as map_file:
+            ids, values = split_fields(map_file, 2, separator, mapping_path)
+    except FileNotFoundError:
+        print(f"Error: Mapping file not found at {mapping_path}")
+        raise
+
+    ids = np.array(ids, dtype=np.int64)
+    table = np.full(int(ids.max()) + 1 if len(ids) else 0, None, dtype=object)
+    table[ids] = values
+    return table
+
+
+def _parse_id(value) -> int:
+    try:
+        mapped_id = int(value)
+    except ValueError:
+        return -1
+    return mapped_id if 0 <= mapped_id < 2**63 else -1
+
+
+def parse_ids(column: Sequence) -> np.ndarray:
+    """Parses an id column to int64. Entries that are not valid ids become -1."""
+    if isinstance(column, np.ndarray):
+        return column.astype(np.int64, copy=False)
+    try:
+        return np.array(column, dtype=np.int64)
+    except (ValueError, OverflowError):
+        return np.array([_parse_id(value) for value in column], dtype=np.int64)
+
+
+def reverse_column(column: Sequence, table: np.ndarray, unmapped_prefix: str = "UNMAPPED_") -> List[str]:
+    """
+    Returns the original values of a column of mapped ids (strings or an int64
+    array), where table[id] is the original value.
+    """
+    ids = parse_ids(column)
+    valid = (ids >= 0) & (ids < len(table))
+    if len(table):
+        originals = table.take(np.where(valid, ids, 0))
+        valid &= np.not_equal(originals, None)
+    else:
+        originals = np.full(len(ids), None, dtype=object)
+
+    values = originals.tolist()
+    for i in np.flatnonzero(~valid).tolist():
+        values[i] = f"{unmapped_prefix}{column[i]}"
+    return values
+
+
+def iter_output_columns(
+    lines: Iterable[str],
+    num_fields: int,
+    separator: Optional[str] = None,
+    exact: bool = False,
+    source_name: str = "<memory>",
+    chunk_rows: int = CHUNK_ROWS
+) -> Iterator[List[List[str]]]:
+    """Yields C output lines as chunks of num_fields columns (see relabel.split_fields)."""
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_rows))
+        if not chunk:
+            return
+        yield split_fields(chunk, num_fields, separator, source_name, exact)
+
+
+def reverse_columns(
+    chunks: Iterable[List[Sequence]],
+    table: Optional[np.ndarray],
+    mapped_fields: Sequence[int],
+    unmapped_prefix: str = "UNMAPPED_"
+) -> Iterator[List[Sequence]]:
+    """Replaces the mapped_fields of every column chunk by their original values (no-op when table is None)."""
+    for columns in chunks:
+        if table is not None:
+            for field in mapped_fields:
+                columns[field] = reverse_column(columns[field], table, unmapped_prefix)
+        yield columns
+
+
+def write_reversed_csv(
+    chunks: Iterable[List[Sequence]],
+    final_csv_path: str,
+    header: List[str],
+    row_builder: Callable[..., Iterable[List[str]]],
+    table: Optional[np.ndarray] = None,
+    mapped_fields: Sequence[int] = (),
+    unmapped_prefix: str = "UNMAPPED_"
+):
+    """
+    Reverse relabels each column chunk and streams row_builder(*columns) into a
+    pipe-delimited CSV with the given header.
+    """
+    with open(final_csv_path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile, delimiter='|')
+        writer.writerow(header)
+        for columns in reverse_columns(chunks, table, mapped_fields, unmapped_prefix):
+            writer.writerows(row_builder(*columns))
+
+
+def reverse_relabel_file(
+    input_path: str,
+    output_path: str,
+    table: np.ndarray,
+    num_fields: int,
+    mapped_fields: Sequence[int],
+    input_separator: Optional[str] = None,
+    output_separator: str = " ",
+    output_fields: Optional[Sequence[int]] = None,
+    exact: bool = False,
+    unmapped_prefix: str = "UNMAPPED_"
+):
+    """
+    Writes a reverse-relabeled copy of a raw C output file, chunk by chunk.
+    output_fields selects the fields written (default: all).
+    """
+    with open(input_path, "r", encoding='utf-8') as infile, open(output_path, "w", encoding='utf-8') as outfile:
+        chunks = iter_output_columns(infile, num_fields, input_separator, exact, input_path)
+        for columns in reverse_columns(chunks, table, mapped_fields, unmapped_prefix):
+            if output_fields is not None:
+                columns = [columns[field] for field in output_fields]
+            outfile.write(format_rows(columns, output_separator))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reverse relabel fields of a raw Obliviator output file.")
+    parser.add_argument("--input_path", required=True)
+    parser.add_argument("--output_path", required=True)
+    parser.add_argument("--mapping_path", required=True)
+    parser.add_argument("--num_fields", type=int, default=2, help="Fields per line (the last one keeps embedded separators).")
+    parser.add_argument("--mapped_fields", type=int, nargs='+', default=[0, 1], help="Fields holding mapped ids.")
+    parser.add_argument("--input_separator", help="Field separator of the C output (default: whitespace).")
+    parser.add_argument("--output_separator", default=" ")
+    parser.add_argument("--output_fields", type=int, nargs='*', help="Fields written to the output (default: all).")
+    parser.add_argument("--mapping_separator", default="|", help="Use ' ' for whitespace-separated mapping files.")
+    parser.add_argument("--exact", action="store_true", help="Skip lines that do not have exactly --num_fields fields.")
+    args = parser.parse_args()
+
+    table = read_mapping_table(args.mapping_path, None if args.mapping_separator == " " else args.mapping_separator)
+    reverse_relabel_file(
+        args.input_path, args.output_path, table, args.num_fields, args.mapped_fields,
+        args.input_separator, args.output_separator, args.output_fields, args.exact
+    )
+    print("Reverse relabeling complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,53 +2,26 @@
 
 import argparse
 
+from obliviator_formatting.reverse_relabel import read_mapping_table, reverse_relabel_file
+
+
 def reverse_relabel_ids(input_path, output_path, mapping_path):
     """
     Reverse-relabels IDs in the input file based on a mapping.
     This version is now smarter about delimiters and handles the specific
-    output formats for each operator.
+    output formats for each operator: a JOIN result is pipe-delimited
+    ("k|p1|p2"), a FILTER result is space-delimited ("k p"). One C output
+    holds a single kind of result, so the first line decides the format.
     """
-    reverse_map = {}
-    try:
-        # The mapping file is pipe-delimited for robustness.
-        with open(mapping_path, "r", encoding='utf-8') as f:
-            for line in f:
-                parts = line.strip().split('|', 1)
-                if len(parts) == 2:
-                    mapped, original = parts
-                    reverse_map[mapped] = original
-    except FileNotFoundError:
-        print(f"Error: Mapping file not found at {mapping_path}")
-        raise
+    table = read_mapping_table(mapping_path)
 
-    with open(input_path, "r", encoding='utf-8') as infile, open(output_path, "w") as outfile:
-        for line in infile:
-            # --- FIX: Check for pipe delimiter to identify join output ---
-            if '|' in line:
-                # This is a JOIN result, which is pipe-delimited.
-                parts = line.strip().split('|')
-                if len(parts) == 3:
-                    key_id, p1_id, p2_id = parts
-                    
-                    original_key = reverse_map.get(key_id, f"UNMAPPED_{key_id}")
-                    original_p1 = reverse_map.get(p1_id, f"UNMAPPED_{p1_id}")
-                    original_p2 = reverse_map.get(p2_id, f"UNMAPPED_{p2_id}")
-                    
-                    # Write the intermediate file in the format reconstruct_fk_join_csv.py expects
-                    outfile.write(f"{original_key}|{original_p1}|{original_p2}\n")
-                else:
-                    print(f"Warning: Skipping malformed join line in raw C output: '{line.strip()}'")
+    with open(input_path, "r", encoding='utf-8') as infile:
+        first_line = infile.readline()
 
-            else:
-                # This is a FILTER result, which is space-delimited.
-                parts = line.strip().split()
-                if len(parts) == 2:
-                    key_id, p_id = parts
-                    original_key = reverse_map.get(key_id, f"UNMAPPED_{key_id}")
-                    original_p = reverse_map.get(p_id, f"UNMAPPED_{p_id}")
-                    outfile.write(f"{original_key} {original_p}\n")
-                else:
-                    print(f"Warning: Skipping malformed filter line in raw C output: '{line.strip()}'")
+    if '|' in first_line:
+        reverse_relabel_file(input_path, output_path, table, 3, [0, 1, 2], '|', '|', exact=True)
+    else:
+        reverse_relabel_file(input_path, output_path, table, 2, [0, 1], exact=True)
 
 
 def main():
@@ -1,7 +1,9 @@
 # obliviator_formatting/reverse_relabel_op1.py
 
 import argparse
-from pathlib import Path
+
+from obliviator_formatting.reverse_relabel import read_mapping_table, reverse_relabel_file
+
 
 def reverse_relabel_for_operator1(input_path: str, output_path: str, mapping_path: str):
     """
@@ -16,32 +18,14 @@ def reverse_relabel_for_operator1(input_path: str, output_path: str, mapping_pat
         output_path (str): Path for the final, human-readable output file.
         mapping_path (str): Path to the value mapping file.
     """
-    reverse_map = {}
     print(f"--- Running Operator 1 Reverse Relabeling ---")
     print(f"Input: {input_path}")
     print(f"Output: {output_path}")
     print(f"Mapping: {mapping_path}")
 
-    with open(mapping_path, "r") as map_file:
-        for line in map_file:
-            parts = line.strip().split('|',maxsplit=1)
-            if len(parts) == 2:
-                mapped_id, original_value = parts
-                reverse_map[mapped_id] = original_value
-
-    with open(input_path, "r") as infile, open(output_path, "w") as outfile:
-        for line in infile:
-            parts = line.strip().split()
-            if len(parts) != 2:
-                print(f"Warning: Skipping malformed line in C output: {line.strip()}")
-                continue
-            
-            original_id, mapped_value_id = parts
-
-            # Look up the original string value, defaulting to a placeholder if not found
-            original_value = reverse_map.get(mapped_value_id, f"UNMAPPED_ID_{mapped_value_id}")
-
-            outfile.write(f"{original_id} {original_value}\n")
+    table = read_mapping_table(mapping_path)
+    # Only the value is mapped; unknown ids default to a placeholder
+    reverse_relabel_file(input_path, output_path, table, 2, [1], exact=True, unmapped_prefix="UNMAPPED_ID_")
 
     print("Operator 1 reverse relabeling complete.")
 
@@ -2,6 +2,9 @@
 
 import argparse
 
+from obliviator_formatting.reverse_relabel import read_mapping_table, reverse_relabel_file
+
+
 def reverse_relabel_for_operator2(input_path: str, output_path: str, mapping_path: str):
     """
     Reverse-relabels IDs from the Aggregation (Operator 2) C program's output.
@@ -12,28 +15,9 @@ def reverse_relabel_for_operator2(input_path: str, output_path: str, mapping_pat
     It writes an intermediate file in the format:
     `<original_key>|<agg_val_1>|<agg_val_2>|<original_payload>`
     """
-    reverse_map = {}
-    with open(mapping_path, "r", encoding='utf-8') as f:
-        for line in f:
-            parts = line.strip().split(maxsplit=1)
-            if len(parts) == 2:
-                mapped, original = parts
-                reverse_map[mapped] = original
-    
-    with open(input_path, "r", encoding='utf-8') as infile, open(output_path, "w", encoding='utf-8') as outfile:
-        for line in infile:
-            parts = line.strip().split(maxsplit=3)
-            
-            if len(parts) == 4:
-                key_id, agg1, agg2, payload_id = parts
-                
-                original_key = reverse_map.get(key_id, f"UNMAPPED_{key_id}")
-                original_payload = reverse_map.get(payload_id, f"UNMAPPED_{payload_id}")
-                
-                # Write the intermediate file using a pipe delimiter
-                outfile.write(f"{original_key}|{agg1}|{agg2}|{original_payload}\n")
-            else:
-                print(f"Warning: Skipping malformed line in raw aggregation output: '{line.strip()}'")
+    # The Operator 2 mapping file is space-delimited
+    table = read_mapping_table(mapping_path, separator=None)
+    reverse_relabel_file(input_path, output_path, table, 4, [0, 3], output_separator='|')
 
 
 def main():
@@ -0,0 +1,108 @@
+# obliviator_formatting/streaming_input.py
+
+import resource
+import sys
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple
+
+#####################################
+# STREAMING ENCLAVE INPUT FORMATTER #
+#####################################
+
+# The C operators read their row counts from the first line of the input
+# ("<n1> <n2>", or "<N> 0 [<op> <threshold>]" for the filter). That is why the
+# formatters used to keep every row in memory until both tables had been read.
+# StreamingInputWriter instead reserves a blank header line of HEADER_WIDTH
+# characters, streams the rows straight to disk and then seeks back to write
+# the counts into the reserved space. The counts are padded with trailing
+# spaces. The enclaves parse them with atoi/atoll/strtoll, and
+# engine.header_row_count uses str.split, so the padding is ignored.
+# Memory use no longer depends on the table size. Headers that carry more than
+# the counts (an IN-list filter's values) reserve a wider line.
+#
+# Rows written as (key, payload) pairs also record the widest payload in UTF-8
+# bytes, which the engine uses to size the operator's DATA_LENGTH for the job.
+
+HEADER_WIDTH = 64
+
+
+def peak_rss_mib() -> float:
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def payload_width(payload: str) -> int:
+    """Length of a payload in bytes as written to the enclave input (UTF-8)."""
+    return len(payload) if payload.isascii() else len(payload.encode("utf-8"))
+
+
+def max_payload_width(payloads: Sequence[str]) -> int:
+    """The widest payload in bytes, or 0 without payloads."""
+    return max((payload_width(payload) for payload in payloads), default=0)
+
+
+def two_table_header(counts: List[int]) -> str:
+    return " ".join(str(count) for count in counts)
+
+
+class StreamingInputWriter:
+    """
+    Writes an enclave input file whose header (built by header_fn from the
+    per-table row counts) is only known once every row has been written.
+    Use as a context manager; the header is filled in on a clean exit.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_tables: int = 2,
+        header_fn: Callable[[List[int]], str] = two_table_header,
+        header_width: int = HEADER_WIDTH
+    ):
+        self.path = path
+        self.counts = [0] * num_tables
+        self.header_fn = header_fn
+        self.header_width = header_width
+        self.payload_width = 0
+        self._file = None
+
+    def __enter__(self) -> "StreamingInputWriter":
+        self._file = open(self.path, "w", encoding='utf-8')
+        self._file.write(" " * self.header_width + "\n")
+        return self
+
+    def _counted(self, table: int, rows: Iterable[str]) -> Iterator[str]:
+        for row in rows:
+            self.counts[table] += 1
+            yield row
+
+    def write_rows(self, table: int, rows: Iterable[str]):
+        """Streams rows ("...\\n" lines) of one table. Tables must be written in order."""
+        self._file.writelines(self._counted(table, rows))
+
+    def _measured(self, records: Iterable[Tuple[str, str]]) -> Iterator[str]:
+        width = self.payload_width
+        for key, payload in records:
+            width = max(width, payload_width(payload))
+            yield f"{key} {payload}\n"
+        self.payload_width = width
+
+    def write_records(self, table: int, records: Iterable[Tuple[str, str]]):
+        """Streams (key, payload) rows as "<key> <payload>" lines, recording the widest payload."""
+        self.write_rows(table, self._measured(records))
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                header = self.header_fn(self.counts)
+                if len(header) > self.header_width:
+                    raise ValueError(f"Header '{header}' does not fit the reserved {self.header_width} characters")
+                self._file.seek(0)
+                self._file.write(header.ljust(self.header_width))
+        finally:
+            self._file.close()
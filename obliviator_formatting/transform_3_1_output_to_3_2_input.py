@@ -1,8 +1,29 @@
 # obliviator_formatting/transform_3_1_output_to_3_2_input.py (Generic Two-Table Join Input)
 
 import argparse
+from typing import Iterable, Iterator, List
+
 import pandas as pd
 
+from obliviator_formatting.streaming_input import StreamingInputWriter, peak_rss_mib
+
+READ_CHUNK_ROWS = 1 << 16
+
+
+def _csv_columns(filepath: str) -> List[str]:
+    return list(pd.read_csv(filepath, nrows=0).columns)
+
+
+def _key_value_lines(chunks: Iterable[pd.DataFrame], key_col: str, value_cols: List[str]) -> Iterator[str]:
+    """Yields "<key> <value1>,<value2>,..." lines for every row of the chunks."""
+    for chunk in chunks:
+        # str() of each value, as before: missing values become "nan"
+        keys = list(map(str, chunk[key_col].tolist()))
+        values = [list(map(str, chunk[col].tolist())) for col in value_cols]
+        for key, *value_parts in zip(keys, *values):
+            yield f"{key} {','.join(value_parts)}\n"
+
+
 def transform_3_1_output_to_3_2_input(
     original_csv_filepath: str,
     step1_filtered_ids_filepath: str,
@@ -20,6 +41,9 @@ def transform_3_1_output_to_3_2_input(
 
     Table 1 data is derived from original_csv_filepath, filtered by step1_filtered_ids_filepath.
     Table 2 data is derived from second_table_filepath.
+
+    Both CSVs are read READ_CHUNK_ROWS rows at a time and written straight to
+    output_path, so memory does not grow with the table sizes.
     """
     # --- Prepare Table 1 Data (from original_csv_filepath filtered by Step 1 output) ---
     print("Preparing Table 1 data for Operator 3, Step 2...")
@@ -33,56 +57,36 @@ def transform_3_1_output_to_3_2_input(
     if not filtered_ids:
         print("Warning: Step 3_1 filter yielded no results. Table 1 for Step 3_2 will be empty.")
 
-    df_original = pd.read_csv(original_csv_filepath)
-
     all_req_cols_table1 = [id_col_in_original_csv, join_key_col_3_2_A] + [c.strip() for c in join_key_col_3_2_B_and_values.split(',')]
-    missing_cols_table1 = [col for col in all_req_cols_table1 if col not in df_original.columns]
+    missing_cols_table1 = [col for col in all_req_cols_table1 if col not in _csv_columns(original_csv_filepath)]
     if missing_cols_table1:
         raise ValueError(f"Missing required columns in original CSV for Table 1 (Step 3_2 transformation): {', '.join(missing_cols_table1)}")
 
-    df_filtered_table1 = df_original[df_original[id_col_in_original_csv].astype(str).isin(filtered_ids)].copy()
-
-    lines_table1 = []
     cols_for_table1_value = [col.strip() for col in join_key_col_3_2_B_and_values.split(',')]
 
-    for index, row in df_filtered_table1.iterrows():
-        # Key for Table 1 will be join_key_col_3_2_A
-        key_value_table1 = str(row[join_key_col_3_2_A])
-        
-        # Value for Table 1 will be concatenation of other specified columns
-        value_parts_table1 = [str(row[col]) for col in cols_for_table1_value]
-        value_str_table1 = ','.join(value_parts_table1)
-        lines_table1.append(f"{key_value_table1} {value_str_table1}")
-
     # --- Prepare Table 2 Data (from second_table_filepath) ---
-    print(f"Preparing Table 2 data from {second_table_filepath} for Operator 3, Step 2...")
-    df_second_table = pd.read_csv(second_table_filepath)
-
     all_req_cols_table2 = [second_table_key_col] + [c.strip() for c in second_table_other_cols.split(',')]
-    missing_cols_table2 = [col for col in all_req_cols_table2 if col not in df_second_table.columns]
+    missing_cols_table2 = [col for col in all_req_cols_table2 if col not in _csv_columns(second_table_filepath)]
     if missing_cols_table2:
         raise ValueError(f"Missing required columns in second table CSV for Table 2 (Step 3_2 transformation): {', '.join(missing_cols_table2)}")
 
-    lines_table2 = []
     cols_for_table2_value = [col.strip() for col in second_table_other_cols.split(',')]
 
-    for index, row in df_second_table.iterrows():
-        # Key for Table 2 will be second_table_key_col
-        key_value_table2 = str(row[second_table_key_col])
-        
-        # Value for Table 2 will be concatenation of other specified columns
-        value_parts_table2 = [str(row[col]) for col in cols_for_table2_value]
-        value_str_table2 = ','.join(value_parts_table2)
-        lines_table2.append(f"{key_value_table2} {value_str_table2}")
-    
-    # --- Concatenate and Write to Output ---
-    header_output = f"{len(lines_table1)} {len(lines_table2)}"
-    
-    all_lines = [header_output] + lines_table1 + lines_table2
+    # --- Stream both tables to the output; the header is filled in at the end ---
+    with StreamingInputWriter(output_path) as writer:
+        # Key for Table 1 will be join_key_col_3_2_A, value the concatenation of the other columns
+        chunks = (
+            chunk[chunk[id_col_in_original_csv].astype(str).isin(filtered_ids)]
+            for chunk in pd.read_csv(original_csv_filepath, chunksize=READ_CHUNK_ROWS)
+        )
+        writer.write_rows(0, _key_value_lines(chunks, join_key_col_3_2_A, cols_for_table1_value))
+
+        print(f"Preparing Table 2 data from {second_table_filepath} for Operator 3, Step 2...")
+        chunks = pd.read_csv(second_table_filepath, chunksize=READ_CHUNK_ROWS)
+        writer.write_rows(1, _key_value_lines(chunks, second_table_key_col, cols_for_table2_value))
 
-    with open(output_path, "w") as outfile:
-        outfile.write("\n".join(all_lines))
     print(f"Transformed and concatenated two-table input for Operator 3, Step 2 written to {output_path}.")
+    print(f"Peak RSS: {peak_rss_mib():.1f} MiB")
 
 
 def main():
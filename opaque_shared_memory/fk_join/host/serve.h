@@ -0,0 +1,185 @@
+#ifndef OBLIVIATOR_HOST_SERVE_H
+#define OBLIVIATOR_HOST_SERVE_H
+
+/* Warm worker mode: `parallel <enclave> <threads> --serve <socket_path>` keeps
+ * the enclave and its worker threads alive and runs one job per request line
+ * received on a Unix socket. A request is an absolute input path; while the
+ * job runs, stdout (including the enclave time) goes to the requesting
+ * connection, which then receives "OBLIVIATOR_DONE <ret>". Connections stay
+ * open across jobs so clients can pool them. "QUIT" stops the worker.
+ *
+ * The worker is tied to its owner through stdin: when stdin is a pipe,
+ * enclave_worker.py holds its write end open, and the worker exits as soon as
+ * the pipe closes, however the owner went away (exit, crash, SIGKILL or a
+ * pool child leaving through os._exit). Workers started with another stdin
+ * run until they get "QUIT".
+ *
+ * Every host/parallel.c includes this header once and passes serve() the
+ * function that runs one job on an input path. */
+
+#include <errno.h>
+#include <poll.h>
+#include <signal.h>
+#include <stdio.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/un.h>
+#include "common/error.h"
+
+#define SERVE_MAX_CLIENTS 64
+#define SERVE_LINE_MAX 4096
+#define SERVE_DONE_MARKER "OBLIVIATOR_DONE"
+
+/* Runs one job on input_path, printing to stdout, and returns its status. */
+typedef int (*serve_job_fn)(void *arg, const char *input_path);
+
+static int serve_listen(const char *socket_path) {
+    struct sockaddr_un addr;
+    int fd;
+
+    if (strlen(socket_path) >= sizeof(addr.sun_path)) {
+        handle_error_string("Socket path too long: %s", socket_path);
+        return -1;
+    }
+
+    fd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (fd < 0) {
+        perror("socket");
+        return -1;
+    }
+    memset(&addr, 0, sizeof(addr));
+    addr.sun_family = AF_UNIX;
+    strcpy(addr.sun_path, socket_path);
+    unlink(socket_path);
+    if (bind(fd, (struct sockaddr *) &addr, sizeof(addr))) {
+        perror("bind");
+        close(fd);
+        return -1;
+    }
+    if (listen(fd, SERVE_MAX_CLIENTS)) {
+        perror("listen");
+        close(fd);
+        return -1;
+    }
+    return fd;
+}
+
+/* Reads one newline-terminated request. Returns 1 on success, 0 on EOF and -1
+ * on error or an over-long line. */
+static int serve_read_line(int fd, char *line, size_t size) {
+    size_t len = 0;
+    while (len + 1 < size) {
+        ssize_t n = read(fd, line + len, 1);
+        if (n <= 0) {
+            return n == 0 && len == 0 ? 0 : -1;
+        }
+        if (line[len] == '\n') {
+            line[len] = '\0';
+            return 1;
+        }
+        len++;
+    }
+    return -1;
+}
+
+/* True once the owner's end of the stdin pipe is closed. Anything the owner
+ * writes is discarded. */
+static int serve_owner_gone(int fd) {
+    char discard[256];
+    ssize_t n = read(fd, discard, sizeof(discard));
+    return n == 0 || (n < 0 && errno != EINTR && errno != EAGAIN);
+}
+
+static void serve_job(int conn, const char *input_path, serve_job_fn run_job, void *arg) {
+    int ret;
+    int saved_stdout;
+
+    fflush(stdout);
+    saved_stdout = dup(STDOUT_FILENO);
+    dup2(conn, STDOUT_FILENO);
+    ret = run_job(arg, input_path);
+    fflush(stdout);
+    dup2(saved_stdout, STDOUT_FILENO);
+    close(saved_stdout);
+
+    dprintf(conn, SERVE_DONE_MARKER " %d\n", ret);
+}
+
+static int serve(const char *socket_path, serve_job_fn run_job, void *arg) {
+    /* fds[0] is the listening socket, fds[1] stdin, the rest are clients. */
+    struct pollfd fds[SERVE_MAX_CLIENTS + 2];
+    nfds_t num_fds = 2;
+    char line[SERVE_LINE_MAX];
+    struct stat stdin_stat;
+    int running = 1;
+
+    int listen_fd = serve_listen(socket_path);
+    if (listen_fd < 0) {
+        return -1;
+    }
+    /* A client that disconnects mid-job must not kill the worker. */
+    signal(SIGPIPE, SIG_IGN);
+
+    fds[0].fd = listen_fd;
+    fds[0].events = POLLIN;
+    /* A negative fd is skipped by poll(). */
+    fds[1].fd = fstat(STDIN_FILENO, &stdin_stat) == 0 && S_ISFIFO(stdin_stat.st_mode) ? STDIN_FILENO : -1;
+    fds[1].events = POLLIN;
+    printf("Serving jobs on %s\n", socket_path);
+    fflush(stdout);
+
+    while (running) {
+        if (poll(fds, num_fds, -1) < 0) {
+            if (errno == EINTR) {
+                continue;
+            }
+            perror("poll");
+            break;
+        }
+
+        if (fds[1].revents && serve_owner_gone(fds[1].fd)) {
+            printf("Owner closed stdin, stopping\n");
+            fflush(stdout);
+            break;
+        }
+
+        /* Walk clients backwards so a closed one can be replaced by the last. */
+        for (nfds_t i = num_fds - 1; i >= 2 && running; i--) {
+            if (!fds[i].revents) {
+                continue;
+            }
+            if (serve_read_line(fds[i].fd, line, sizeof(line)) <= 0) {
+                close(fds[i].fd);
+                fds[i] = fds[--num_fds];
+                continue;
+            }
+            if (strcmp(line, "QUIT") == 0) {
+                running = 0;
+                break;
+            }
+            serve_job(fds[i].fd, line, run_job, arg);
+        }
+
+        if (running && (fds[0].revents & POLLIN)) {
+            int conn = accept(listen_fd, NULL, NULL);
+            if (conn >= 0 && num_fds < SERVE_MAX_CLIENTS + 2) {
+                fds[num_fds].fd = conn;
+                fds[num_fds].events = POLLIN;
+                num_fds++;
+            } else if (conn >= 0) {
+                close(conn);
+            }
+        }
+    }
+
+    for (nfds_t i = 2; i < num_fds; i++) {
+        close(fds[i].fd);
+    }
+    close(listen_fd);
+    unlink(socket_path);
+    return 0;
+}
+
+#endif /* host/serve.h */
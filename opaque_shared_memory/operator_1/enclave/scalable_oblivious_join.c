@@ -26,6 +26,8 @@
 
 static int number_threads;
 //static bool *control_bit;
+// Default predicate when the input header carries no filter: (88 < true_key).
+static struct filter_params filter = { FILTER_LT, 88 };
 int res_thread[100];
 
 #define MAX_DUMMY_ORDER 2147480000
@@ -82,6 +84,10 @@ void scalable_oblivious_join_free() {
     return;
 }
 
+void scalable_oblivious_join_set_filter(struct filter_params params) {
+    filter = params;
+}
+
 
 struct soj_scan_1_args {
     int idx_st;
@@ -101,8 +107,9 @@ void soj_scan_1(void *voidargs) {
 
     for (int i = index_start; i < index_end; i++) {
         //cb1[i] = (88 < arr1[i].key);
-        arr1[i].key = (88 < arr1[i].true_key) * i + (arr1[i].true_key <= 88) * MAX_DUMMY_ORDER;
-        res_thread[thread_order] += (88 < arr1[i].true_key);
+        bool keep = filter_keep(&filter, arr1[i].true_key);
+        arr1[i].key = keep * i + (!keep) * MAX_DUMMY_ORDER;
+        res_thread[thread_order] += keep;
     }
 
     return;
@@ -120,11 +127,13 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     index_start_thread[0] = 0;
     struct thread_work soj_scan_1_[number_threads - 1];
     init_time2();
+    init_time();        // phase clock (host/phases.h): scan, compact_sort
 
     if (number_threads == 1) {
         for (int i = 0; i < length1; i++) {
-            arr[i].key = 1 - (88 < arr[i].true_key);
-            length_result += (88 < arr[i].true_key);
+            bool keep = filter_keep(&filter, arr[i].true_key);
+            arr[i].key = 1 - keep;
+            length_result += keep;
         }
     } else {
         for (int i = 0; i < number_threads; i++) {
@@ -153,8 +162,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     bitonic_sort(arr, true, 0, length1, number_threads);
 
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
@@ -3,12 +3,16 @@
 #include <stddef.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <time.h>
+#include <unistd.h>
 #include <mpi.h>
 #include "common/error.h"
 #include "common/ocalls.h"
 #include "common/algorithm_type.h"
 #include "host/error.h"
+#include "host/phases.h"
+#include "host/serve.h"
 
 #ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
 #include <openenclave/host.h>
@@ -88,9 +92,12 @@ int time_join(enum algorithm_type algorithm_type) {
         goto exit_free_arr;
     }
 
+double phase_start = phase_clock();
 char *buf = (char *)malloc(MAX_BUF_SIZE);
 ret = fread(buf, 1, MAX_BUF_SIZE, input_file);
 fclose(input_file);
+record_phase("read_input", phase_clock() - phase_start);
+phase_start = phase_clock();
 
 
 #ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
@@ -103,13 +110,16 @@ fclose(input_file);
 #else /* DISTRIBUTED_SGX_SORT_HOSTONLY */
             ret = ecall_scalable_oblivious_join(buf, MAX_BUF_SIZE);
 #endif /* DISTRIBUTED_SGX_SORT_HOSTONLY */
+    record_phase("ecall", phase_clock() - phase_start);
     if (ret) {
         handle_error_string("Enclave exited with return code %d", ret);
         goto exit_free_arr;
     }
 
+    phase_start = phase_clock();
     fwrite(buf, 1, strlen(buf), output_file);
     fclose(output_file);
+    record_phase("write_output", phase_clock() - phase_start);
     free(buf);
     // MPI_Barrier(MPI_COMM_WORLD);
 
@@ -129,10 +139,51 @@ exit_free_arr:
 #else
     ecall_ojoin_free_arr();
 #endif
+    print_phases();
 
     return ret;
 }
 
+/* Builds "<input path without .txt>_output.txt", the file the wrappers read. */
+static char *output_path_for(const char *input_path) {
+    size_t len = strlen(input_path);
+    char *output_file_path = calloc(len + 8, sizeof(*output_file_path));
+    if (!output_file_path) {
+        return NULL;
+    }
+    memcpy(output_file_path, input_path, len - 4);
+    strcpy(output_file_path + len - 4, "_output.txt");
+    return output_file_path;
+}
+
+/* Runs one --serve job (see host/serve.h) on input_path. */
+static int run_serve_job(void *arg, const char *input_path) {
+    char *output_file_path;
+
+    if (strlen(input_path) < 5) {
+        printf("Invalid INPUT FILE\n");
+        return -1;
+    }
+    input_file = fopen(input_path, "rb");
+    if (!input_file) {
+        printf("Invalid INPUT FILE\n");
+        return -1;
+    }
+    output_file_path = output_path_for(input_path);
+    output_file = output_file_path ? fopen(output_file_path, "w") : NULL;
+    free(output_file_path);
+    if (!output_file) {
+        fclose(input_file);
+        printf("Invalid OUTPUT FILE\n");
+        return -1;
+    }
+#ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
+    return time_join(arg);
+#else
+    return time_join(*(enum algorithm_type *) arg);
+#endif
+}
+
 int main(int argc, char **argv) {
     int ret = -1;
 
@@ -141,6 +192,7 @@ int main(int argc, char **argv) {
 #ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
     if (argc < 4) {
         printf("usage: %s enclave_image num_threads input_file_path\n", argv[0]);
+        printf("       %s enclave_image num_threads --serve socket_path\n", argv[0]);
 #else /* DISTRIBUTED_SGX_SORT_HOSTONLY */
     if (argc < 3) {
         printf("usage: %s num_threads input_file_path\n", argv[0]);
@@ -227,35 +279,28 @@ int main(int argc, char **argv) {
         }
     }
 
-    for (int i = 3; i < argc; i++) {
-        input_file = fopen(argv[i], "rb");
-        char *output_file_path = calloc(strlen(argv[i]) + 8, sizeof(*output_file_path));
-        for (size_t u = 0; u < strlen(argv[i]) - 4; u++) {
-            output_file_path[u] = argv[i][u];
-        }
-        output_file_path[strlen(argv[i]) - 4] = '_';
-        output_file_path[strlen(argv[i]) - 3] = 'o';
-        output_file_path[strlen(argv[i]) - 2] = 'u';
-        output_file_path[strlen(argv[i]) - 1] = 't';
-        output_file_path[strlen(argv[i])] = 'p';
-        output_file_path[strlen(argv[i]) + 1] = 'u';
-        output_file_path[strlen(argv[i]) + 2] = 't';
-        output_file_path[strlen(argv[i]) + 3] = '.';
-        output_file_path[strlen(argv[i]) + 4] = 't';
-        output_file_path[strlen(argv[i]) + 5] = 'x';
-        output_file_path[strlen(argv[i]) + 6] = 't';
-        output_file_path[strlen(argv[i]) + 7] = '\0';
-        output_file = fopen(output_file_path, "w");
-        if (!output_file) {
-            printf("Invalid OUTPUT FILE\n");
-            return 0;
-        }
+    if (argc >= 5 && strcmp(argv[3], "--serve") == 0) {
 #ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
-        ret = time_join(enclave);
+        ret = serve(argv[4], run_serve_job, enclave);
 #else
-        ret = time_join(algorithm_type);
+        ret = serve(argv[4], run_serve_job, &algorithm_type);
+#endif
+    } else {
+        for (int i = 3; i < argc; i++) {
+            input_file = fopen(argv[i], "rb");
+            char *output_file_path = output_path_for(argv[i]);
+            output_file = fopen(output_file_path, "w");
+            if (!output_file) {
+                printf("Invalid OUTPUT FILE\n");
+                return 0;
+            }
+#ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
+            ret = time_join(enclave);
+#else
+            ret = time_join(algorithm_type);
 #endif
 
+        }
     }
 
 #ifndef DISTRIBUTED_SGX_SORT_HOSTONLY
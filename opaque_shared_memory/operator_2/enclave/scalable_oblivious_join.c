@@ -151,8 +151,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     struct thread_work multi_thread_aggregation_tree_1[number_threads - 1];
     struct thread_work multi_thread_aggregation_tree_2[number_threads - 1];
     init_time2();
+    init_time();        // phase clock (host/phases.h): sort, aggregate, compact_sort
 
     bitonic_sort_(arr, true, 0, length, number_threads, false);
+    get_time(true);
 
     if (number_threads == 1) {
         sum[0] = arr[0].sum;
@@ -205,8 +207,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     bitonic_sort_(arr, false, 0, length, number_threads, true);
 
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
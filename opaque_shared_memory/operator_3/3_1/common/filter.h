@@ -0,0 +1,68 @@
+#ifndef DISTRIBUTED_SGX_COMMON_FILTER_H
+#define DISTRIBUTED_SGX_COMMON_FILTER_H
+
+#include <stdbool.h>
+#include <stdlib.h>
+
+/* Runtime filter predicate: a row is kept when (threshold <op> key).
+ *
+ * The operator and threshold are query parameters passed in the input header
+ * ("<length1> <length2> <op> <threshold>"), so the enclave no longer has to be
+ * rebuilt per query. They are public, so switching on op does not depend on any
+ * secret data; every row is evaluated with the same comparison. */
+
+enum filter_op {
+    FILTER_LT = 0,   /* threshold <  key */
+    FILTER_GT = 1,   /* threshold >  key */
+    FILTER_EQ = 2,   /* threshold == key */
+    FILTER_LE = 3,   /* threshold <= key */
+    FILTER_GE = 4,   /* threshold >= key */
+    FILTER_NE = 5,   /* threshold != key */
+    FILTER_NONE = 6, /* keep every row */
+};
+
+struct filter_params {
+    int op;
+    long long threshold;
+};
+
+static inline bool filter_keep(const struct filter_params *filter, long long key) {
+    switch (filter->op) {
+        case FILTER_LT: return filter->threshold < key;
+        case FILTER_GT: return filter->threshold > key;
+        case FILTER_EQ: return filter->threshold == key;
+        case FILTER_LE: return filter->threshold <= key;
+        case FILTER_GE: return filter->threshold >= key;
+        case FILTER_NE: return filter->threshold != key;
+        default: return true;
+    }
+}
+
+/* Parses the optional "<op> <threshold>" tokens following the num_counts row
+ * counts of a header line. Leaves *filter unchanged (the operator's default)
+ * when the header carries no filter or an unknown operator. */
+static inline void filter_parse_header(const char *header, int num_counts,
+        struct filter_params *filter) {
+    char *cursor = (char *) header;
+    char *end;
+    for (int i = 0; i < num_counts; i++) {
+        strtoll(cursor, &end, 10);
+        if (end == cursor) {
+            return;
+        }
+        cursor = end;
+    }
+    long long op = strtoll(cursor, &end, 10);
+    if (end == cursor || op < FILTER_LT || op > FILTER_NONE) {
+        return;
+    }
+    cursor = end;
+    long long threshold = strtoll(cursor, &end, 10);
+    if (end == cursor && op != FILTER_NONE) {
+        return;
+    }
+    filter->op = (int) op;
+    filter->threshold = threshold;
+}
+
+#endif /* common/filter.h */
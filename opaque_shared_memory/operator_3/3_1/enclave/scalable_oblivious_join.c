@@ -26,6 +26,8 @@
 
 static int number_threads;
 static bool *control_bit;
+// Default predicate when the input header carries no filter: (19800101 <= key).
+static struct filter_params filter = { FILTER_LE, 19800101 };
 int res_length[100];
 
 void reverse(char *s) {
@@ -76,6 +78,10 @@ int scalable_oblivious_join_init(int nthreads) {
 
 }
 
+void scalable_oblivious_join_set_filter(struct filter_params params) {
+    filter = params;
+}
+
 struct args_op2 {
     int index_thread_start;
     int index_thread_end;
@@ -91,8 +97,9 @@ void aggregation_tree_op2(void *voidargs) {
     elem_t* arr = args->arr;
 
     for (int i = index_thread_start; i < index_thread_end; i++) {
-        res_length[thread_order] += (19800101 <= arr[i].key);
-        arr[i].key = (19800101 <= arr[i].key);
+        bool keep = filter_keep(&filter, arr[i].key);
+        res_length[thread_order] += keep;
+        arr[i].key = keep;
     }
 
     return;
@@ -110,11 +117,13 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     idx_start_thread[0] = 0;
     struct thread_work multi_thread_aggregation_tree_1[number_threads - 1];
     init_time2();
+    init_time();        // phase clock (host/phases.h): scan, compact_sort
 
     if (number_threads == 1) {
         for (int i = 0; i < length1; i++) {
-            result_length += (19800101 <= arr[i].key);
-            arr[i].key = (1 - (19800101 <= arr[i].key));
+            bool keep = filter_keep(&filter, arr[i].key);
+            result_length += keep;
+            arr[i].key = (1 - keep);
         }
     } else {
         for (int i = 0; i < number_threads; i++) {
@@ -139,8 +148,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     bitonic_sort(arr, true, 0, length1, 1, false);
 
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
@@ -4,11 +4,14 @@
 #include <stddef.h>
 #include "common/elem_t.h"
 #include "common/ocalls.h"
+#include "common/filter.h"
 
 int scalable_oblivious_join_init(int nthreads);
 
 void scalable_oblivious_join_free();
 
+void scalable_oblivious_join_set_filter(struct filter_params params);
+
 void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output_path);
 
 #endif /* distributed-sgx-sort/enclave/ojoin.h */
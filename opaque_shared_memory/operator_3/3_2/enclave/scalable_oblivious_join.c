@@ -217,8 +217,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     //for (int i = 0; i < num_threads; i++) ready[i] = false;
     for (int i = 0; i < number_threads; i++) res_thread[i] = 0;
     init_time2();
+    init_time();        // phase clock (host/phases.h): sort, aggregate, compact_sort
 
     bitonic_sort(arr, true, 0, length, number_threads, false);
+    get_time(true);
 
     if (number_threads == 1) {
         condition = arr[0].table_0;
@@ -273,9 +275,11 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     bitonic_sort(arr, true, 0, length, number_threads, true);
     bitonic_sort(arr_, true, 0, length, number_threads, true);
     
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
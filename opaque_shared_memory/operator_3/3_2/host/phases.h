@@ -0,0 +1,15 @@
+#ifndef OBLIVIATOR_HOST_PHASES_H
+#define OBLIVIATOR_HOST_PHASES_H
+
+/* Phase timings of one run (implemented in host/ocalls.c). Inside the
+ * enclave, init_time() starts the phase clock and every get_time(true) ends a
+ * numbered phase. The host adds named phases of its own with record_phase().
+ * print_phases() prints them all after the run as "phase <number or name>
+ * <seconds>" lines and clears them, so the enclave time printed by get_time2()
+ * stays the first line of stdout. */
+
+double phase_clock(void);
+void record_phase(const char *name, double seconds);
+void print_phases(void);
+
+#endif /* host/phases.h */
@@ -212,8 +212,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     struct thread_work multi_thread_aggregation_tree_1[number_threads - 1];
     struct thread_work multi_thread_aggregation_tree_2[number_threads - 1];
     init_time2();
+    init_time();        // phase clock (host/phases.h): sort, aggregate, final_sort
 
     bitonic_sort(arr, true, 0, length, number_threads, false);
+    get_time(true);
 
     if (number_threads == 1) {
         arr[0].avg_pagerank = arr[0].pagerank;
@@ -281,8 +283,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     bitonic_sort(arr, true, 0, length, number_threads, true);
 
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
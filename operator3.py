@@ -1,61 +1,30 @@
 # operator3.py (Final Output to Script Directory, Temp Cleanup)
 
 import os
-import subprocess
 from pathlib import Path
 import argparse
-import time
-import re
-from typing import Optional # Import Optional for Python < 3.10 type hints
+from typing import Dict, Optional, Tuple, Union # Import Optional for Python < 3.10 type hints
 import shutil # Import shutil for directory removal
 
+import tracing
+from engine import (
+    FILTER_OPS, StageTimer, header_row_count, operator_build, operator_phases, parse_host_output, resolve_threads,
+    run_obliviator, threads_arg
+)
+from obliviator_formatting.format_operator3_1 import format_operator3_1
+from obliviator_formatting.relabel_ids import relabel_ids
+from obliviator_formatting.reverse_relabel_ids import reverse_relabel_ids
+from obliviator_formatting.transform_3_1_output_to_3_2_input import transform_3_1_output_to_3_2_input
+from obliviator_formatting.transform_3_2_output_to_3_3_input import transform_3_2_output_to_3_3_input
+
 ###########################
 # OBLIVIATOR OPERATOR 3 WRAPPER #
 ###########################
 
-# Path to the source file containing the hardcoded filter, relative to the step's code_dir
-SCALABLE_OBLIVIOUS_JOIN_C_PATH_REL_TO_CODE_DIR = Path("enclave/scalable_oblivious_join.c")
-# The string literal placeholder that MUST exist in the C code (manual setup required)
-FILTER_PLACEHOLDER_STRING = "FILTER_PLACEHOLDER_VALUE"
-# Regex to find the placeholder and capture the parts around it
-FILTER_PATTERN_REGEX = r"(control_bit\[i\] = \()(\s*)(" + re.escape(FILTER_PLACEHOLDER_STRING) + r")(\s*)( <= arr\[i\]\.key\);)"
-
-
-def _replace_filter_value_in_source(code_dir: Path, target_value: str):
-    """
-    Modifies the scalable_oblivious_join.c file to replace FILTER_PLACEHOLDER_VALUE
-    with the given target_value (which can be a number or the placeholder string itself).
-    """
-    source_file_abs_path = code_dir / SCALABLE_OBLIVIOUS_JOIN_C_PATH_REL_TO_CODE_DIR
-    
-    if not source_file_abs_path.exists():
-        raise FileNotFoundError(f"Source file not found: {source_file_abs_path}. Cannot set filter.")
-
-    print(f"Modifying filter value in {source_file_abs_path} to '{target_value}'...")
-    
-    original_content = ""
-    with open(source_file_abs_path, 'r') as f:
-        original_content = f.read()
-
-    # Perform the replacement using the regex pattern
-    new_content = re.sub(FILTER_PATTERN_REGEX, r"\g<1>\g<2>" + target_value + r"\g<4>\g<5>", original_content)
-    
-    if original_content == new_content:
-        # This means the pattern (including the placeholder) was not found or already replaced
-        if FILTER_PLACEHOLDER_STRING not in original_content:
-            print(f"Warning: Placeholder '{FILTER_PLACEHOLDER_STRING}' not found *anywhere* in {source_file_abs_path}. "
-                  "Please ensure manual setup of the placeholder in the C file is correct.")
-        else:
-            print(f"Warning: Regex pattern '{FILTER_PATTERN_REGEX}' did not match or value was already set. "
-                  f"Placeholder '{FILTER_PLACEHOLDER_STRING}' exists in file, but not in the expected context. Content unchanged.")
-        
-    with open(source_file_abs_path, 'w') as f:
-        f.write(new_content)
-    
-    # Force write buffers to disk immediately
-    os.fsync(f.fileno())
-    
-    print("Source file modification complete (and synced to disk).")
+# The 3_1 enclave keeps a row when `threshold <= key` (FILTER_LE in common/filter.h).
+# A threshold given on the command line is passed in the input header; without one
+# the enclave uses its built-in default (19800101).
+FILTER_CONDITION_3_1 = "<="
 
 
 def _run_obliviator_step(
@@ -67,12 +36,16 @@ def _run_obliviator_step(
     operator_variant: str,
     filter_key_col: str = "",
     id_col: str = "",
-    filter_threshold_3_1: Optional[int] = None
-) -> Path:
+    filter_threshold_3_1: Optional[int] = None,
+    threads: Union[int, str] = "auto",
+    timer: Optional[StageTimer] = None
+) -> Tuple[Path, Optional[float], int, Dict[str, float]]:
     """
     Helper function to run a single obliviator operator step for Operator 3.
     This function now handles the formatting/relabeling internally based on the step.
+    Returns (raw output path, enclave time, thread count used, host phase times).
     """
+    timer = timer or StageTimer(f"operator3 {step_name}")
     step_subdir = Path(step_name)
 
     code_dir = obliviator_base_dir / step_subdir
@@ -87,15 +60,12 @@ def _run_obliviator_step(
         # For step 3_1, we format the original raw input CSV
         print(f"Formatting initial CSV for Operator 3, Step {step_name}...")
         format_path = temp_dir / f"op3_{step_name}_format.txt"
-        formatter_script_path = Path(__file__).parent / "obliviator_formatting" / "format_operator3_1.py"
-        formatter_cmd = [
-            "python", str(formatter_script_path),
-            "--filepath", str(raw_input_filepath), # Original raw input for 3_1
-            "--output_path", str(format_path),
-            "--filter_key_col", filter_key_col,
-            "--id_col", id_col
-        ]
-        subprocess.run(formatter_cmd, check=True, cwd=Path(__file__).parent)
+        with timer.stage(f"{step_name}_format"):
+            filter_spec = None
+            if filter_threshold_3_1 is not None:
+                filter_spec = f"{FILTER_OPS[FILTER_CONDITION_3_1]} {filter_threshold_3_1}"
+                print(f"Filter: keep rows where {filter_threshold_3_1} {FILTER_CONDITION_3_1} key")
+            format_operator3_1(str(raw_input_filepath), str(format_path), filter_key_col, id_col, filter_spec)
         print(f"Formatted input written to {format_path}.")
 
         # Then relabel the formatted input
@@ -103,14 +73,9 @@ def _run_obliviator_step(
         relabel_path = temp_dir / f"op3_{step_name}_relabel.txt"
         # Mapping path for step 3_1
         mapping_path_3_1 = temp_dir / f"op3_3_1_map.txt"
-        relabel_cmd = [
-            "python", "obliviator_formatting/relabel_ids.py",
-            "--input_path", str(format_path),
-            "--output_path", str(relabel_path),
-            "--mapping_path", str(mapping_path_3_1),
-            "--key_index_to_relabel", "-1" # Do not relabel the filter key
-        ]
-        subprocess.run(relabel_cmd, check=True, cwd=Path(__file__).parent)
+        with timer.stage(f"{step_name}_relabel"):
+            # Do not relabel the filter key
+            relabel_ids(str(format_path), str(relabel_path), str(mapping_path_3_1), key_index_to_relabel=-1)
         print(f"Relabeled input written to {relabel_path}, relabel map written to {mapping_path_3_1}.")
         actual_input_to_obliviator_binary = relabel_path.resolve()
     
@@ -122,14 +87,9 @@ def _run_obliviator_step(
         relabel_path = temp_dir / f"op3_{step_name}_relabel.txt"
         # Mapping path for step 3_2 or 3_3
         current_mapping_path = temp_dir / f"op3_{step_name}_map.txt" # Define it here
-        relabel_cmd = [
-            "python", "obliviator_formatting/relabel_ids.py",
-            "--input_path", str(transformed_input_filepath), # Input is already transformed/formatted
-            "--output_path", str(relabel_path),
-            "--mapping_path", str(current_mapping_path), # Use current step's map path
-            "--key_index_to_relabel", "0" # Assume first column is key and needs relabeling.
-        ]
-        subprocess.run(relabel_cmd, check=True, cwd=Path(__file__).parent)
+        with timer.stage(f"{step_name}_relabel"):
+            # Input is already transformed/formatted; assume first column is key and needs relabeling.
+            relabel_ids(str(transformed_input_filepath), str(relabel_path), str(current_mapping_path), key_index_to_relabel=0)
         print(f"Relabeled input written to {relabel_path}, relabel map written to {current_mapping_path}.")
         actual_input_to_obliviator_binary = relabel_path.resolve()
     
@@ -137,29 +97,24 @@ def _run_obliviator_step(
         raise ValueError(f"Unsupported step_name: {step_name}")
 
 
-    # --- Apply filter modification if it's step 3_1 and a threshold is provided ---
-    filter_modified_in_source = False
-    if step_name == "3_1" and filter_threshold_3_1 is not None:
-        try:
-            _replace_filter_value_in_source(code_dir, str(filter_threshold_3_1))
-            filter_modified_in_source = True
-        except Exception as e:
-            print(f"ERROR: Failed to modify filter source code: {e}. Proceeding without modification.")
-            
     try:
-        # 3. Run Obliviator binary - Build ALWAYS after potential source modification
+        # 3. Run Obliviator binary
         print(f"Building Obliviator Operator 3, Step {step_name} ({operator_variant})...")
-        subprocess.run(["make", "clean"], cwd=code_dir, check=True)
-        subprocess.run(["make"], cwd=code_dir, check=True)
-
-        print(f"Build completed. Executing Operator 3, Step {step_name} with input: {actual_input_to_obliviator_binary} (absolute path)")
-        print(f"obliviator executable will run from CWD: {code_dir}")
-
-        subprocess.run(
-            ["./host/parallel", "./enclave/parallel_enc.signed", "1", str(actual_input_to_obliviator_binary)],
-            cwd=code_dir
-        )
+        with operator_build(code_dir, timer=timer, stage=f"{step_name}_build") as run_dir:
+            num_threads = resolve_threads(threads, code_dir, header_row_count(actual_input_to_obliviator_binary))
+            print(f"Build completed. Executing Operator 3, Step {step_name} with input: {actual_input_to_obliviator_binary} (absolute path)")
+            print(f"obliviator executable will run from CWD: {run_dir} with {num_threads} thread(s)")
+
+            with timer.stage(f"{step_name}_enclave"):
+                _, completed_process = run_obliviator(run_dir, actual_input_to_obliviator_binary, num_threads)
+        print(completed_process.stdout, end="")
         print(f"Exited Obliviator Operator 3, Step {step_name} successfully.")
+        try:
+            enclave_time, phases = parse_host_output(
+                completed_process.stdout, operator_phases(f"operator_3/{step_name}", operator_variant)
+            )
+        except (ValueError, IndexError):
+            enclave_time, phases = None, {}
 
         # Find and Copy Obliviator's Raw Output
         obliviator_raw_output_filename = Path(actual_input_to_obliviator_binary).stem + "_output.txt"
@@ -172,15 +127,11 @@ def _run_obliviator_step(
             print(f"DEBUG: Contents of {temp_dir}: {[item.name for item in temp_dir.iterdir()]}")
             raise FileNotFoundError(f"Obliviator output file not found: {obliviator_raw_output_path_absolute}")
 
-        return obliviator_raw_output_path_absolute
+        return obliviator_raw_output_path_absolute, enclave_time, num_threads, phases
 
     except Exception as e:
         print(f"Error during Obliviator Step {step_name} execution or output retrieval: {e}")
         raise
-    finally:
-        # --- Revert filter modification after execution ---
-        if filter_modified_in_source:
-            _replace_filter_value_in_source(code_dir, FILTER_PLACEHOLDER_STRING)
 
 
 def _cleanup_temp_dir(temp_dir_path: Path):
@@ -216,7 +167,8 @@ def obliviator_operator3_pipeline (
     col3_from_step2_output_3_3: str = "", # Maps to <col3_value> in obliviator_3_3 input
     
     operator3_variant: str = "default",
-    no_cleanup: bool = False # New argument to skip cleanup
+    no_cleanup: bool = False, # New argument to skip cleanup
+    threads: Union[int, str] = "auto"
 ):
     """
     Runs the full Obliviator "Operator 3" pipeline (Filter -> Join -> Aggregate)
@@ -229,6 +181,8 @@ def obliviator_operator3_pipeline (
     ultimate_final_output_path = Path(os.getcwd()) / final_output_file_name # Output to current working directory
     # OR: Path(__file__).parent / final_output_file_name if you always want it next to the script
 
+    timer = StageTimer("operator3 pipeline")
+
     # Create temporary directory for intermediate files
     temp_dir = Path("tmp_operator3_pipeline")
     temp_dir.mkdir(exist_ok=True)
@@ -247,7 +201,7 @@ def obliviator_operator3_pipeline (
 
         # --- Step 3_1: Filter/Projection ---
         print("\n--- Initiating Operator 3: Step 3_1 (Filter/Projection) ---")
-        step1_output_path = _run_obliviator_step(
+        step1_output_path, step_time_3_1, threads_3_1, phases_3_1 = _run_obliviator_step(
             step_name="3_1",
             raw_input_filepath=Path(initial_filepath).resolve(), # Original CSV here
             transformed_input_filepath=None, # Not used for step 3_1 here
@@ -256,7 +210,9 @@ def obliviator_operator3_pipeline (
             operator_variant=operator3_variant,
             filter_key_col=filter_key_col_3_1,
             id_col=id_col_3_1,
-            filter_threshold_3_1=filter_threshold_3_1
+            filter_threshold_3_1=filter_threshold_3_1,
+            threads=threads,
+            timer=timer
         )
         print(f"Step 3_1 completed. Raw output: {step1_output_path}")
         
@@ -266,44 +222,46 @@ def obliviator_operator3_pipeline (
         
         second_table_source_path_abs = Path(second_table_filepath_3_2).resolve()
 
-        subprocess.run([
-            "python", str(Path(__file__).parent / "obliviator_formatting/transform_3_1_output_to_3_2_input.py"),
-            "--original_csv_filepath", str(Path(initial_filepath).resolve()), # Table 1 source
-            "--step1_filtered_ids_filepath", str(step1_output_path),
-            "--output_path", str(step_3_2_input_transformed_path),
-            "--id_col_in_original_csv", id_col_3_1, # Use correct ID col for step 3_1 in transform
-            "--join_key_col_3_2_A", join_key_col_3_2_A,
-            "--join_key_col_3_2_B_and_values", join_key_col_3_2_B_and_values,
-            "--second_table_filepath", str(second_table_source_path_abs), # Pass custom second table
-            "--second_table_key_col", second_table_key_col_3_2,
-            "--second_table_other_cols", second_table_other_cols_3_2
-        ], check=True, cwd=Path(__file__).parent)
+        with timer.stage("transform_3_1_to_3_2"):
+            transform_3_1_output_to_3_2_input(
+                str(Path(initial_filepath).resolve()), # Table 1 source
+                str(step1_output_path),
+                str(step_3_2_input_transformed_path),
+                id_col_3_1, # Use correct ID col for step 3_1 in transform
+                join_key_col_3_2_A,
+                join_key_col_3_2_B_and_values,
+                str(second_table_source_path_abs), # Pass custom second table
+                second_table_key_col_3_2,
+                second_table_other_cols_3_2
+            )
         print(f"Transformed input for Step 3_2 written to: {step_3_2_input_transformed_path}")
 
 
         # --- Step 3_2: Join ---
         print("\n--- Initiating Operator 3: Step 3_2 (Join) ---")
-        step2_output_path = _run_obliviator_step(
+        step2_output_path, step_time_3_2, threads_3_2, phases_3_2 = _run_obliviator_step(
             step_name="3_2",
             raw_input_filepath=None, # Not used for step 3_2
             transformed_input_filepath=step_3_2_input_transformed_path, # Transformed input here
             obliviator_base_dir=obliviator_base_dir_path,
             temp_dir=temp_dir,
-            operator_variant=operator3_variant
+            operator_variant=operator3_variant,
+            threads=threads,
+            timer=timer
         )
         print(f"Step 3_2 completed. Raw output: {step2_output_path}")
 
         # --- Transformation 3_2_output -> 3_3_input ---
         print("\n--- Transforming Step 3_2 Output to Step 3_3 Input ---")
         step_3_3_input_transformed_path = temp_dir / "op3_3_3_input_transformed.txt"
-        subprocess.run([
-            "python", str(Path(__file__).parent / "obliviator_formatting/transform_3_2_output_to_3_3_input.py"),
-            "--step2_raw_output_filepath", str(step2_output_path),
-            "--output_path", str(step_3_3_input_transformed_path),
-            "--col1_from_step2_output", col1_from_step2_output_3_3,
-            "--col2_from_step2_output", col2_from_step2_output_3_3,
-            "--col3_from_step2_output", col3_from_step2_output_3_3
-        ], check=True, cwd=Path(__file__).parent)
+        with timer.stage("transform_3_2_to_3_3"):
+            transform_3_2_output_to_3_3_input(
+                str(step2_output_path),
+                str(step_3_3_input_transformed_path),
+                col1_from_step2_output_3_3,
+                col2_from_step2_output_3_3,
+                col3_from_step2_output_3_3
+            )
         print(f"Transformed input for Step 3_3 written to: {step_3_3_input_transformed_path}")
 
 
@@ -311,36 +269,37 @@ def obliviator_operator3_pipeline (
         mapping_path_3_3_for_revert = temp_dir / f"op3_3_3_map.txt" 
 
         print("\n--- Initiating Operator 3: Step 3_3 (Aggregate) ---")
-        step3_raw_output_path = _run_obliviator_step( # Renamed output variable for clarity
+        step3_raw_output_path, step_time_3_3, threads_3_3, phases_3_3 = _run_obliviator_step( # Renamed output variable for clarity
             step_name="3_3",
             raw_input_filepath=None,
             transformed_input_filepath=step_3_3_input_transformed_path,
             obliviator_base_dir=obliviator_base_dir_path,
             temp_dir=temp_dir,
-            operator_variant=operator3_variant
+            operator_variant=operator3_variant,
+            threads=threads,
+            timer=timer
         )
         print(f"Step 3_3 completed. Raw output: {step3_raw_output_path}")
 
         # --- Final Output Reverse Relabeling ---
         print("\n--- Reverting IDs in Final Aggregation Output ---")
         
-        reverse_relabel_process = subprocess.run(
-            ["python", "obliviator_formatting/reverse_relabel_ids.py",
-             "--input_path", str(step3_raw_output_path),
-             "--output_path", str(ultimate_final_output_path), # Direct output to final file outside temp_dir
-             "--mapping_path", str(mapping_path_3_3_for_revert),
-             "--key_index_to_relabel", "0"
-            ], 
-            check=True, 
-            cwd=Path(__file__).parent,
-            capture_output=True,
-            text=True
-        )
-        print(f"Reverse Relabeling stdout:\n{reverse_relabel_process.stdout}")
-        if reverse_relabel_process.stderr:
-            print(f"Reverse Relabeling stderr:\n{reverse_relabel_process.stderr}")
+        with timer.stage("reverse_relabel"):
+            # Direct output to final file outside temp_dir
+            reverse_relabel_ids(str(step3_raw_output_path), str(ultimate_final_output_path), str(mapping_path_3_3_for_revert))
+
+        # Record the combined enclave time of the three steps, then the threads and host phase times of each step.
+        step_times = [step_time_3_1, step_time_3_2, step_time_3_3]
+        if all(t is not None for t in step_times):
+            with open(ultimate_final_output_path.with_suffix('.time'), 'w') as tf:
+                tf.write(str(sum(step_times)))
+                tf.write(f"\nthreads_3_1={threads_3_1}\nthreads_3_2={threads_3_2}\nthreads_3_3={threads_3_3}")
+                for step_name, phases in (("3_1", phases_3_1), ("3_2", phases_3_2), ("3_3", phases_3_3)):
+                    for name, seconds in phases.items():
+                        tf.write(f"\nphase_{step_name}_{name}={seconds:.6f}")
 
         print(f"\n✅ Obliviator Operator 3 Pipeline completed. Final output written to: {ultimate_final_output_path}\n\n")
+        timer.report()
 
     except Exception as e:
         print(f"\nFATAL ERROR during pipeline execution: {e}")
@@ -389,7 +348,11 @@ def main():
                         help="Specify the Operator 3 variant.")
     parser.add_argument("--no_cleanup", action="store_true",
                         help="Do not clean up temporary directories after execution. Useful for debugging.")
+    parser.add_argument("--threads", type=threads_arg, default="auto",
+                        help="Enclave threads for every step: a power of two up to NumTCS, or 'auto' to choose per step from CPUs, NumTCS and input size.")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
     args = parser.parse_args()
+    tracing.enable(args.trace)
 
     # Expand user paths for input files
     args.initial_filepath = os.path.expanduser(args.initial_filepath)
@@ -409,7 +372,8 @@ def main():
         args.col2_from_step2_output_3_3,
         args.col3_from_step2_output_3_3,
         args.operator3_variant,
-        args.no_cleanup
+        args.no_cleanup,
+        args.threads
     )
 
 
@@ -8,7 +8,11 @@
 
 #define ELEM_SIZE 128
 #define ELEM_STRUCT_SIZE 19
+/* Default payload size; `make DATA_LENGTH=<bytes>` overrides it per build
+ * (engine.py sizes it to the widest payload of each job). */
+#ifndef DATA_LENGTH
 #define DATA_LENGTH 200          // MODIFIED: Default is 4
+#endif
 
 typedef int ojoin_int_type;
 
@@ -0,0 +1,185 @@
+#ifndef DISTRIBUTED_SGX_COMMON_PREDICATE_H
+#define DISTRIBUTED_SGX_COMMON_PREDICATE_H
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdlib.h>
+#include "common/filter.h"
+
+/* Compound filter predicate over several columns, evaluated in one scan.
+ *
+ * The Python wrapper (predicate.py) compiles a --where expression into a
+ * postfix program of int64 words:
+ *
+ *   <num_columns> <num_instructions> <instruction> ...
+ *
+ *   PRED_CMP  <column> <op> <threshold>          threshold <op> column (filter.h ops)
+ *   PRED_IN   <column> <count> <value> ...        column is one of the values
+ *   PRED_AND, PRED_OR, PRED_NOT                   combine the results on the stack
+ *
+ * Column 0 is the row's key. Columns 1 .. num_columns - 1 are int64 values
+ * that travel with each row: between the key and the payload in the text
+ * format, or as column blocks after the records in the binary format.
+ *
+ * The program is a query parameter and therefore public. Every row runs every
+ * instruction, comparisons are not short-circuited and IN lists are scanned to
+ * the end, so the work per row does not depend on the row's values. */
+
+#define FILTER_EXPR 8
+
+#define PRED_MAX_COLUMNS 16
+#define PRED_MAX_WORDS 4096
+#define PRED_MAX_DEPTH 64
+
+enum predicate_opcode {
+    PRED_CMP = 0,
+    PRED_IN = 1,
+    PRED_AND = 2,
+    PRED_OR = 3,
+    PRED_NOT = 4,
+};
+
+struct predicate {
+    int num_columns;
+    int num_words;
+    long long words[PRED_MAX_WORDS];
+    /* num_columns - 1 column-major arrays of num_rows values */
+    const long long *columns;
+    long long num_rows;
+};
+
+/* Validates the program in words[0 .. num_words). Returns 0 when every
+ * instruction is well formed and the program leaves exactly one result. */
+static inline int predicate_check(struct predicate *pred) {
+    const long long *words = pred->words;
+    int n = pred->num_words;
+    if (n < 2 || words[0] < 1 || words[0] > PRED_MAX_COLUMNS) {
+        return -1;
+    }
+    pred->num_columns = (int) words[0];
+    long long num_instructions = words[1];
+    int pos = 2;
+    int depth = 0;
+    for (long long i = 0; i < num_instructions; i++) {
+        if (pos >= n) {
+            return -1;
+        }
+        switch (words[pos]) {
+            case PRED_CMP:
+                if (pos + 4 > n || words[pos + 1] < 0 || words[pos + 1] >= pred->num_columns
+                        || words[pos + 2] < FILTER_LT || words[pos + 2] > FILTER_NE) {
+                    return -1;
+                }
+                pos += 4;
+                depth++;
+                break;
+            case PRED_IN:
+                if (pos + 3 > n || words[pos + 1] < 0 || words[pos + 1] >= pred->num_columns
+                        || words[pos + 2] < 0 || words[pos + 2] > n - pos - 3) {
+                    return -1;
+                }
+                pos += 3 + (int) words[pos + 2];
+                depth++;
+                break;
+            case PRED_AND:
+            case PRED_OR:
+                if (depth < 2) {
+                    return -1;
+                }
+                pos++;
+                depth--;
+                break;
+            case PRED_NOT:
+                if (depth < 1) {
+                    return -1;
+                }
+                pos++;
+                break;
+            default:
+                return -1;
+        }
+        if (depth > PRED_MAX_DEPTH) {
+            return -1;
+        }
+    }
+    return pos == n && depth == 1 ? 0 : -1;
+}
+
+/* Parses "<op> <words...>" after the num_counts row counts of a text header.
+ * Returns 0 if the header carries a valid FILTER_EXPR program. */
+static inline int predicate_parse_header(const char *header, int num_counts, struct predicate *pred) {
+    char *cursor = (char *) header;
+    char *end;
+    for (int i = 0; i < num_counts + 1; i++) {
+        long long value = strtoll(cursor, &end, 10);
+        if (end == cursor || (i == num_counts && value != FILTER_EXPR)) {
+            return -1;
+        }
+        cursor = end;
+    }
+    pred->num_words = 0;
+    while (pred->num_words < PRED_MAX_WORDS) {
+        long long word = strtoll(cursor, &end, 10);
+        if (end == cursor) {
+            break;
+        }
+        pred->words[pred->num_words++] = word;
+        cursor = end;
+    }
+    return predicate_check(pred);
+}
+
+static inline void predicate_attach(struct predicate *pred, const long long *columns, long long num_rows) {
+    pred->columns = columns;
+    pred->num_rows = num_rows;
+}
+
+static inline long long predicate_column(const struct predicate *pred, long long column,
+        long long key, long long row) {
+    return column == 0 ? key : pred->columns[(column - 1) * pred->num_rows + row];
+}
+
+static inline bool predicate_eval(const struct predicate *pred, long long key, long long row) {
+    const long long *words = pred->words;
+    bool stack[PRED_MAX_DEPTH + 1];
+    int depth = 0;
+    int pos = 2;
+    for (long long i = 0; i < words[1]; i++) {
+        switch (words[pos]) {
+            case PRED_CMP: {
+                long long value = predicate_column(pred, words[pos + 1], key, row);
+                stack[depth++] = filter_compare((int) words[pos + 2], words[pos + 3], value);
+                pos += 4;
+                break;
+            }
+            case PRED_IN: {
+                long long value = predicate_column(pred, words[pos + 1], key, row);
+                long long count = words[pos + 2];
+                bool keep = false;
+                for (long long j = 0; j < count; j++) {
+                    keep |= words[pos + 3 + j] == value;
+                }
+                stack[depth++] = keep;
+                pos += 3 + count;
+                break;
+            }
+            case PRED_AND:
+                depth--;
+                stack[depth - 1] = stack[depth - 1] & stack[depth];
+                pos++;
+                break;
+            case PRED_OR:
+                depth--;
+                stack[depth - 1] = stack[depth - 1] | stack[depth];
+                pos++;
+                break;
+            default: /* PRED_NOT */
+                stack[depth - 1] = !stack[depth - 1];
+                pos++;
+                break;
+        }
+    }
+    return stack[0];
+}
+
+#endif /* common/predicate.h */
@@ -163,8 +163,86 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
 */
 
 // FINAL FIX: modified to have separate input and output buffers
+/* Binary input (common/record_format.h): the rows are copied straight out of
+ * the fixed-width records, and the result is written back as records. */
+static int scalable_oblivious_join_binary(char *buf, size_t len) {
+    struct obr_header header;
+    if (obr_read_input_header(buf, len, DATA_LENGTH, &header)) {
+        return -1;
+    }
+    int length1 = header.n1 + header.n2;
+
+    struct filter_params filter = { FILTER_NONE, 0 };
+    if (header.filter_op == FILTER_IN) {
+        if (header.num_filter_values > FILTER_MAX_VALUES) {
+            return -1;
+        }
+        filter.op = FILTER_IN;
+        filter.num_values = header.num_filter_values;
+        memcpy(filter.values, buf + sizeof(header), (size_t) filter.num_values * sizeof(int64_t));
+    } else if (header.filter_op >= FILTER_LT && header.filter_op <= FILTER_NONE) {
+        filter.op = header.filter_op;
+        filter.threshold = header.filter_threshold;
+    }
+    scalable_oblivious_join_set_filter(filter);
+
+    /* Compound predicate: the program words follow the header, and the values
+     * of predicate columns 1 .. num_columns - 1 follow the records as one
+     * block of length1 int64 values per column. */
+    static struct predicate predicate;
+    long long *columns = NULL;
+    if (header.filter_op == FILTER_EXPR) {
+        if (header.num_filter_values > PRED_MAX_WORDS) {
+            return -1;
+        }
+        predicate.num_words = header.num_filter_values;
+        memcpy(predicate.words, buf + sizeof(header), (size_t) predicate.num_words * sizeof(int64_t));
+        if (predicate_check(&predicate)) {
+            return -1;
+        }
+        size_t column_bytes = (size_t) (predicate.num_columns - 1) * length1 * sizeof(int64_t);
+        if (obr_total_size(&header) + column_bytes > len) {
+            return -1;
+        }
+        columns = malloc(column_bytes + 1);
+        if (columns == NULL) {
+            return -1;
+        }
+        memcpy(columns, buf + obr_total_size(&header), column_bytes);
+        predicate_attach(&predicate, columns, length1);
+        scalable_oblivious_join_set_predicate(&predicate);
+    }
+
+    arr = calloc(length1, sizeof(*arr));
+    if (arr == NULL) {
+        free(columns);
+        return -1;
+    }
+    size_t record_size = obr_record_size(&header);
+    const char *record = buf + obr_records_offset(&header);
+    for (int i = 0; i < length1; i++) {
+        int64_t key;
+        memcpy(&key, record, sizeof(key));
+        arr[i].key = key;
+        memcpy(arr[i].data, record + sizeof(key), header.payload_len);
+        record += record_size;
+    }
+
+    scalable_oblivious_join_set_binary_output(&header, len);
+    scalable_oblivious_join(arr, length1, 0, buf);
+    scalable_oblivious_join_set_binary_output(NULL, 0);
+    scalable_oblivious_join_set_predicate(NULL);
+
+    free(arr);
+    free(columns);
+
+    return 0;
+}
+
 int ecall_scalable_oblivious_join(char *input_path, size_t len) {
-    (void)len;
+    if (obr_is_binary(input_path, len)) {
+        return scalable_oblivious_join_binary(input_path, len);
+    }
 
     // --- Parsing Logic (this part is correct and stays the same) ---
     char *line_iterator;
@@ -172,12 +250,41 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
     line = strtok_r(input_path, "\n", &line_iterator);
     int length1 = atoi(line);
     int length2 = 0;
+
+    // Optional runtime filter after the row counts: "<length1> 0 <op> <threshold>",
+    // or "<length1> 0 7 <count> <values...>" for an IN list.
+    // Without it every row is kept.
+    struct filter_params filter = { FILTER_NONE, 0 };
+    filter_parse_header(line, 2, &filter);
+    scalable_oblivious_join_set_filter(filter);
+
+    // Compound predicate ("<length1> 0 8 <program words>", common/predicate.h):
+    // each row carries the values of predicate columns 1 .. num_columns - 1
+    // between its key and its payload.
+    static struct predicate predicate;
+    long long *columns = NULL;
+    bool has_predicate = predicate_parse_header(line, 2, &predicate) == 0;
+    if (has_predicate) {
+        columns = calloc((size_t) (predicate.num_columns - 1) * length1 + 1, sizeof(*columns));
+        if (columns == NULL) {
+            return -1;
+        }
+        predicate_attach(&predicate, columns, length1);
+        scalable_oblivious_join_set_predicate(&predicate);
+    }
+
     arr = calloc((length1 + length2), sizeof(*arr));
     for (int i = 0; i < length1; i++) {
         line = strtok_r(NULL, "\n", &line_iterator);
         if (line == NULL) { break; }
         char *token_iterator;
         char *key_str = strtok_r(line, " ", &token_iterator);
+        if (has_predicate) {
+            for (int c = 1; c < predicate.num_columns; c++) {
+                char *column_str = strtok_r(NULL, " ", &token_iterator);
+                columns[(size_t) (c - 1) * length1 + i] = column_str ? atoll(column_str) : 0;
+            }
+        }
         char *val_str = strtok_r(NULL, "\n", &token_iterator);
         if (key_str) { arr[i].key = atoll(key_str); }
         //if (val_str) { strncpy(arr[i].data, val_str, DATA_LENGTH); }
@@ -194,6 +301,8 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
     char *output_buffer = (char *)malloc(len);
     if (output_buffer == NULL) {
         free(arr);
+        free(columns);
+        scalable_oblivious_join_set_predicate(NULL);
         return -1; // Indicate memory allocation error
     }
     output_buffer[0] = '\0'; // Start with an empty string
@@ -201,6 +310,7 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
     // --- Processing Step ---
     // Call the function, but pass the NEW buffer as the output destination.
     scalable_oblivious_join(arr, length1, length2, output_buffer);
+    scalable_oblivious_join_set_predicate(NULL);
     
     // --- Finalization ---
     // Copy the results from our clean output buffer back to the original buffer
@@ -213,6 +323,7 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
     // Clean up all allocated memory
     free(output_buffer);
     free(arr);
+    free(columns);
 
     return 0;
 }
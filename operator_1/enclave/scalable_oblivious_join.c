@@ -26,6 +26,15 @@
 
 static int number_threads;
 static bool *control_bit;
+static struct filter_params filter = { FILTER_NONE, 0 };
+/* Set for a compound --where filter; replaces filter when not NULL. */
+static const struct predicate *predicate = NULL;
+
+/* Set for binary inputs (common/record_format.h): the result is written as
+ * records of the same payload width instead of text lines. */
+static bool binary_output = false;
+static struct obr_header binary_input_header;
+static size_t binary_output_capacity;
 
 void reverse(char *s) {
     int i, j;
@@ -79,6 +88,50 @@ void scalable_oblivious_join_free() {
     return;
 }
 
+void scalable_oblivious_join_set_filter(struct filter_params params) {
+    filter = params;
+}
+
+void scalable_oblivious_join_set_predicate(const struct predicate *pred) {
+    predicate = pred;
+}
+
+static inline bool keep_row(const elem_t *elem, long long row) {
+    if (predicate) {
+        return predicate_eval(predicate, elem->key, row);
+    }
+    return filter_keep(&filter, elem->key);
+}
+
+void scalable_oblivious_join_set_binary_output(const struct obr_header *input, size_t capacity) {
+    binary_output = input != NULL;
+    if (input) {
+        binary_input_header = *input;
+        binary_output_capacity = capacity;
+    }
+}
+
+static void write_binary_output(char *output, elem_t *arr, int length_result) {
+    struct obr_header header;
+    obr_init_output_header(&header, &binary_input_header, 1);
+    size_t record_size = obr_record_size(&header);
+    long long fits = (binary_output_capacity - sizeof(header)) / record_size;
+    header.n1 = length_result;
+    if (header.n1 > fits) {
+        header.n1 = fits;
+        header.flags |= OBR_FLAG_TRUNCATED;
+    }
+
+    char *cursor = output + sizeof(header);
+    for (long long i = 0; i < header.n1; i++) {
+        int64_t key = arr[i].key;
+        memcpy(cursor, &key, sizeof(key));
+        memcpy(cursor + sizeof(key), arr[i].data, header.payload_len);
+        cursor += record_size;
+    }
+    memcpy(output, &header, sizeof(header));
+}
+
 
 struct soj_scan_1_args {
     int idx_st;
@@ -96,7 +149,7 @@ void soj_scan_1(void *voidargs) {
     elem_t *arr1 = args->arr1;
 
     for (int i = index_start; i < index_end; i++) {
-        cb1[i] = (/*MT_FILTER_START*/FILTER_PLACEHOLDER_VALUE_OP1_MT/*MT_FILTER_END*/ /*MT_COND_START*/FILTER_PLACEHOLDER_COND_OP1_MT/*MT_COND_END*/ arr1[i].key);
+        cb1[i] = keep_row(&arr1[i], i);
     }
 
     return;
@@ -120,11 +173,12 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
 
 
     init_time2();       // timer starts after allocation
+    init_time();        // phase clock (host/phases.h): scan, compact
 
 
     if (number_threads == 1) {
         for (int i = 0; i < length1; i++) {
-            control_bit[i] = (/*ST_FILTER_START*/FILTER_PLACEHOLDER_VALUE_OP1_ST/*ST_FILTER_END*/ /*ST_COND_START*/FILTER_PLACEHOLDER_COND_OP1_ST/*ST_COND_END*/ arr[i].key);
+            control_bit[i] = keep_row(&arr[i], i);
         }  
     }
     else {
@@ -150,13 +204,20 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
             };
         }
     };
+    get_time(true);
 
     length_result = oblivious_compact_elem(arr, control_bit, length1, 1, number_threads);
+    get_time(true);
 
     get_time2(true);
 
     // This block modified to accomodate 64-bit keys
 
+    if (binary_output) {
+        write_binary_output(output_path, arr, length_result);
+        return;
+    }
+
     char *char_current = output_path;
     for (int i = 0; i < length_result; i++) {
         // Use sprintf to handle the 64-bit key and formatting safely.
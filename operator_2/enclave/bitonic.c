@@ -23,8 +23,33 @@ inline int prev_pow_two(int x) {
     return y >>= 1;
 }
 
+static bool payload_order;
+
+void bitonic_set_payload_order(bool enabled) {
+    payload_order = enabled;
+}
+
+/* Orders by key, then value, so a group's first row (the one the aggregation
+ * reports) holds its smallest value. With payload_order, rows of equal key and
+ * value are also ordered by their payload bytes, so that row does not depend on
+ * the input order either; partitioned runs need this to merge their chunks.
+ * payload_order is public, and when it is set all DATA_LENGTH bytes are read. */
+static bool elem_less(const elem_t *a, const elem_t *b) {
+    bool key_equal = (a->key == b->key);
+    bool less = (a->key < b->key) | (key_equal & (a->sum < b->sum));
+    if (payload_order) {
+        int data_order = 0;
+        for (int k = 0; k < DATA_LENGTH; k++) {
+            int diff = (unsigned char) a->data[k] - (unsigned char) b->data[k];
+            data_order += (data_order == 0) * diff;
+        }
+        less |= key_equal & (a->sum == b->sum) & (data_order < 0);
+    }
+    return less;
+}
+
 void bitonic_compare(bool ascend, int i, int j) {
-    bool condition = ((arr[i].key < arr[j].key) != ascend);
+    bool condition = (elem_less(arr + i, arr + j) != ascend);
     o_memswap(arr+i, arr+j, sizeof(*arr),condition);
 }
 
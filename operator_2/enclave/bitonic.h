@@ -28,5 +28,6 @@ struct bitonic_merge_args_2 {
 };
 
 void bitonic_sort(elem_t *arr_, bool ascend , int lo, int hi, int num_threads);
+void bitonic_set_payload_order(bool enabled);
 
 #endif /* distributed-sgx-sort/enclave/bitonic.h */
\ No newline at end of file
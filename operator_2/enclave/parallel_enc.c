@@ -79,6 +79,9 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
     char *length;
     length = strtok(input_path, "\n");
     int length1 = atoi(length);
+    /* "N 1": order equal (key, value) rows by payload (partitioned runs only). */
+    char *flags = strchr(length, ' ');
+    bitonic_set_payload_order(flags != NULL && atoi(flags + 1) == 1);
     int length2 = 0;
     arr = calloc((length1 + length2), sizeof(*arr));
     
@@ -215,8 +215,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     ag_tree[0].sum_suffix = 0;
     ag_tree[0].complete2 = true;
     init_time2();
+    init_time();        // phase clock (host/phases.h): sort, aggregate, compact
 
     bitonic_sort(arr, true, 0, length, number_threads);
+    get_time(true);
 
     if (number_threads == 1) {
         sum[0] = arr[0].sum;
@@ -258,8 +260,19 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
             thread_wait(&multi_thread_aggregation_tree_1[i]);
         }
     }
-
+    get_time(true);
+
+    /* sum[i] is the total of row i's group. Carry it in a copy of arr that is
+     * compacted with the same control bits, so each output row prints its own
+     * group's total rather than the total at its pre-compaction position. */
+    elem_t* totals = calloc(length, sizeof(*totals));
+    for (int i = 0; i < length; i++) {
+        totals[i] = arr[i];
+        totals[i].sum = sum[i];
+    }
+    oblivious_compact_elem(totals, cb, length, 1, number_threads, buff);
     length_result = oblivious_compact_elem(arr, cb, length, 1, number_threads, buff);
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
@@ -273,12 +286,12 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
 
         char sum1[20];
         int sum1_len;
-        sprintf(sum1, "%g", arr[i].sum);
+        sprintf(sum1, "%.9g", arr[i].sum);
         sum1_len = my_len(sum1);
 
         char sum2[20];
         int sum2_len;
-        sprintf(sum2, "%.2f", sum[i]);
+        sprintf(sum2, "%.9g", totals[i].sum);
         sum2_len = my_len(sum2);
 
         strncpy(char_current, string_key1, str1_len);
@@ -293,6 +306,7 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     char_current[0] = '\0';
 
     free(sum);
+    free(totals);
     free(ag_tree);
     free(cb);
     free(buff);
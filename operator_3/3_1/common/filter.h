@@ -0,0 +1,109 @@
+#ifndef DISTRIBUTED_SGX_COMMON_FILTER_H
+#define DISTRIBUTED_SGX_COMMON_FILTER_H
+
+#include <stdbool.h>
+#include <stdlib.h>
+
+/* Runtime filter predicate: a row is kept when (threshold <op> key).
+ *
+ * The operator and threshold are query parameters passed in the input header
+ * ("<length1> <length2> <op> <threshold>"), so the enclave no longer has to be
+ * rebuilt per query. They are public, so switching on op does not depend on any
+ * secret data; every row is evaluated with the same comparison.
+ *
+ * FILTER_IN answers a batch of point queries in one pass: a row is kept when
+ * its key equals any of num_values values ("<length1> <length2> 7 <count>
+ * <value_1> ... <value_count>"). Every row is compared with every value and
+ * the matches are OR-ed together, so the work per row is the same whether the
+ * key matches the first value, the last one or none. */
+
+#define FILTER_MAX_VALUES 1024
+
+enum filter_op {
+    FILTER_LT = 0,   /* threshold <  key */
+    FILTER_GT = 1,   /* threshold >  key */
+    FILTER_EQ = 2,   /* threshold == key */
+    FILTER_LE = 3,   /* threshold <= key */
+    FILTER_GE = 4,   /* threshold >= key */
+    FILTER_NE = 5,   /* threshold != key */
+    FILTER_NONE = 6, /* keep every row */
+    FILTER_IN = 7,   /* key is one of values[0 .. num_values) */
+};
+
+struct filter_params {
+    int op;
+    long long threshold;
+    int num_values;
+    long long values[FILTER_MAX_VALUES];
+};
+
+static inline bool filter_in(const struct filter_params *filter, long long key) {
+    bool keep = false;
+    for (int i = 0; i < filter->num_values; i++) {
+        keep |= filter->values[i] == key;
+    }
+    return keep;
+}
+
+/* (threshold <op> key) for the comparison operators; true for any other op. */
+static inline bool filter_compare(int op, long long threshold, long long key) {
+    switch (op) {
+        case FILTER_LT: return threshold < key;
+        case FILTER_GT: return threshold > key;
+        case FILTER_EQ: return threshold == key;
+        case FILTER_LE: return threshold <= key;
+        case FILTER_GE: return threshold >= key;
+        case FILTER_NE: return threshold != key;
+        default: return true;
+    }
+}
+
+static inline bool filter_keep(const struct filter_params *filter, long long key) {
+    if (filter->op == FILTER_IN) {
+        return filter_in(filter, key);
+    }
+    return filter_compare(filter->op, filter->threshold, key);
+}
+
+/* Parses the optional "<op> <threshold>" tokens following the num_counts row
+ * counts of a header line (for FILTER_IN, the threshold is the value count and
+ * the values follow it). Leaves *filter unchanged (the operator's default)
+ * when the header carries no filter, an unknown operator or a malformed list. */
+static inline void filter_parse_header(const char *header, int num_counts,
+        struct filter_params *filter) {
+    char *cursor = (char *) header;
+    char *end;
+    for (int i = 0; i < num_counts; i++) {
+        strtoll(cursor, &end, 10);
+        if (end == cursor) {
+            return;
+        }
+        cursor = end;
+    }
+    long long op = strtoll(cursor, &end, 10);
+    if (end == cursor || op < FILTER_LT || op > FILTER_IN) {
+        return;
+    }
+    cursor = end;
+    long long threshold = strtoll(cursor, &end, 10);
+    if (end == cursor && op != FILTER_NONE) {
+        return;
+    }
+    if (op == FILTER_IN) {
+        if (threshold < 0 || threshold > FILTER_MAX_VALUES) {
+            return;
+        }
+        for (int i = 0; i < threshold; i++) {
+            cursor = end;
+            filter->values[i] = strtoll(cursor, &end, 10);
+            if (end == cursor) {
+                return;
+            }
+        }
+        filter->num_values = (int) threshold;
+    }
+    filter->op = (int) op;
+    filter->threshold = threshold;
+}
+
+#endif /* common/filter.h */
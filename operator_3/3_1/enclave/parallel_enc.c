@@ -79,6 +79,12 @@ int ecall_scalable_oblivious_join(char *input_path, size_t len) {
     length = strtok(input_path, "\n");
     int length1 = atoi(length);
     int length2 = 0;
+
+    // Optional runtime filter after the row counts: "<length1> 0 <op> <threshold>".
+    struct filter_params filter = { FILTER_LE, 19800101 };
+    filter_parse_header(length, 2, &filter);
+    scalable_oblivious_join_set_filter(filter);
+
     arr = calloc((length1 + length2), sizeof(*arr));
     for (int i = 0; i < length1; i++) {
         arr[i].key = atoi(strtok(NULL, " "));
@@ -26,6 +26,8 @@
 
 static int number_threads;
 static bool *control_bit;
+// Default predicate when the input header carries no filter: (19800101 <= key).
+static struct filter_params filter = { FILTER_LE, 19800101 };
 
 void reverse(char *s) {
     int i, j;
@@ -78,6 +80,10 @@ int scalable_oblivious_join_init(int nthreads) {
 
 }
 
+void scalable_oblivious_join_set_filter(struct filter_params params) {
+    filter = params;
+}
+
 struct args_op {
     int index_thread_start;
     int index_thread_end;
@@ -91,7 +97,7 @@ void aggregation_tree_op(void *voidargs) {
     elem_t* arr = args->arr;
 
     for (int i = index_thread_start; i < index_thread_end; i++) {
-        control_bit[i] = (19800101 <= arr[i].key);
+        control_bit[i] = filter_keep(&filter, arr[i].key);
     }
 
     return;
@@ -108,10 +114,11 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     idx_start_thread[0] = 0;
     struct thread_work multi_thread_aggregation_tree_1[number_threads - 1];
     init_time2();
+    init_time();        // phase clock (host/phases.h): scan, compact
 
     if (number_threads == 1) {
         for (int i = 0; i < length1; i++) {
-            control_bit[i] = (19800101 <= arr[i].key);
+            control_bit[i] = filter_keep(&filter, arr[i].key);
         }
     } else {
         for (int i = 0; i < number_threads; i++) {
@@ -133,8 +140,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     result_length = oblivious_compact_elem(arr, control_bit, length1, 1, number_threads);
 
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
@@ -239,8 +239,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     //int my_count = 0;
     int length_result;
     init_time2();
+    init_time();        // phase clock (host/phases.h): sort, aggregate, compact
 
     bitonic_sort(arr, true, 0, length, number_threads);
+    get_time(true);
 
     /*
     for (int i = 0 ; i < length; i++) {
@@ -285,9 +287,11 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
     
+    get_time(true);
     length_result = oblivious_compact_elem(arr, control_bit, length, 1, number_threads);
     oblivious_compact_elem(arr_, control_bit, length, 1, number_threads);
     
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
@@ -293,8 +293,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
     ag_tree[0].sum_suffix3 = 0;
     ag_tree[0].complete2 = true;
     init_time2();
+    init_time();        // phase clock (host/phases.h): sort, aggregate, final_sort
 
     bitonic_sort(arr, true, 0, length, number_threads, false);
+    get_time(true);
 
     if (number_threads == 1) {
         arr[0].avg_pagerank = arr[0].pagerank;
@@ -345,8 +347,10 @@ void scalable_oblivious_join(elem_t *arr, int length1, int length2, char* output
         }
     }
 
+    get_time(true);
     bitonic_sort(arr, true, 0, length, number_threads, true);
 
+    get_time(true);
     get_time2(true);
 
     char *char_current = output_path;
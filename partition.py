@@ -0,0 +1,245 @@
+import argparse
+import os
+from itertools import islice
+from math import isqrt
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from obliviator_formatting import binary_records
+from obliviator_formatting.relabel import format_rows
+
+##################################
+# PARTITIONED OPERATOR EXECUTION #
+##################################
+
+# Operators 1 and 2 load their whole input into one enclave run. Once that no
+# longer fits the usable EPC, SGX pages enclave memory and the oblivious
+# operator slows down many times over. With --partition the formatted input is
+# split into chunks of a fixed number of rows, and one enclave runs per chunk,
+# one after another or --partition_workers at a time:
+#
+# - Operator 1 keeps or drops each row on its own, and its compaction keeps the
+#   kept rows in input order, so the chunk results are read back in order and
+#   the output is the same as a single-shot run.
+# - Operator 2 aggregates each chunk (partial aggregation) and then merges the
+#   partial results obliviously; see engine.run_operator2.
+#
+# The chunk size is computed, never data-dependent: every chunk but the last
+# holds exactly partition_rows rows, and partition_rows depends only on the
+# enclave config, the operator's memory layout, the widest row and the worker
+# count. A chunk's memory is what the enclave allocates for one run:
+#
+#   fixed:   the host's input buffer, copied into the enclave (1 GiB, MAX_BUF_SIZE
+#            in host/parallel.c), plus for Operator 1 text output a second one
+#   per row: Operator 1: elem_t (DATA_LENGTH + has_value, padded, + int64 key),
+#            a control bit, a compaction prefix count and one int64 per
+#            predicate column. Operator 2: elem_t (32 bytes), the running sum,
+#            control bit and prefix count, and the compacted copy of the totals
+#
+# partition_rows is the largest power of two whose chunk fits the enclave heap
+# (NumHeapPages in enclave/parallel.conf, capped by OBLIVIATOR_EPC_MB when the
+# machine's usable EPC is smaller) split across the workers, and whose input
+# fits the host buffer. --partition <rows> sets it directly. The enclave still
+# writes one result per chunk, so a partitioned run reveals how many rows each
+# chunk kept (Operator 1) or how many groups it held (Operator 2), where a
+# single-shot run reveals only the total.
+
+PAGE_SIZE = 4096
+HOST_BUFFER_BYTES = 1 << 30
+CONTROL_BIT_BYTES = 1
+PREFIX_COUNT_BYTES = 4
+OPERATOR2_ELEM_BYTES = 32   # static_assert in operator_2/common/elem_t.h
+TEXT_FIELD_BYTES = 21       # a signed int64 in decimal plus its separator
+HEADER_RESERVE = 64 * 1024  # header line or binary header, filter values and program words
+
+
+def partition_arg(value: str) -> Union[int, str]:
+    """argparse type for --partition: "off", "auto" or rows per chunk."""
+    if value in ("off", "auto"):
+        return value
+    try:
+        rows = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected 'off', 'auto' or a row count, got '{value}'")
+    if rows < 1:
+        raise argparse.ArgumentTypeError(f"rows per partition must be at least 1, got {rows}")
+    return rows
+
+
+def enclave_heap_bytes(code_dir: Path, conf_path: Path) -> int:
+    """The enclave heap (NumHeapPages) from the operator's config, capped by OBLIVIATOR_EPC_MB if set."""
+    heap_bytes = None
+    with open(code_dir / conf_path, "r") as conf:
+        for line in conf:
+            name, _, value = line.partition("=")
+            if name.strip() == "NumHeapPages":
+                heap_bytes = int(value.strip()) * PAGE_SIZE
+    if heap_bytes is None:
+        raise ValueError(f"NumHeapPages is not set in {code_dir / conf_path}")
+    epc_mb = os.environ.get("OBLIVIATOR_EPC_MB")
+    if epc_mb:
+        heap_bytes = min(heap_bytes, int(epc_mb) * 1024 * 1024)
+    return heap_bytes
+
+
+def elem_bytes(data_length: int) -> int:
+    """sizeof(elem_t) in operator_1: char data[DATA_LENGTH], bool has_value, long long key."""
+    return (data_length + 1 + 7) // 8 * 8 + 8
+
+
+def operator1_footprint(data_length: int, num_columns: int, binary: bool) -> Tuple[int, int]:
+    """(fixed bytes, bytes per row) an Operator 1 run allocates in the enclave."""
+    fixed = HOST_BUFFER_BYTES * (1 if binary else 2)
+    per_row = elem_bytes(data_length) + CONTROL_BIT_BYTES + PREFIX_COUNT_BYTES + 8 * num_columns
+    return fixed, per_row
+
+
+def operator2_footprint() -> Tuple[int, int]:
+    """(fixed bytes, bytes per row) an Operator 2 run allocates in the enclave."""
+    per_row = 2 * OPERATOR2_ELEM_BYTES + 4 + CONTROL_BIT_BYTES + PREFIX_COUNT_BYTES
+    return HOST_BUFFER_BYTES, per_row
+
+
+def input_row_bytes(payload_width: int, num_columns: int, binary: bool) -> int:
+    """The most bytes one row can take in the enclave input (key, int64 columns, payload)."""
+    if binary:
+        return 8 * (1 + num_columns) + payload_width
+    return TEXT_FIELD_BYTES * (1 + num_columns) + payload_width + 1
+
+
+def _power_of_two_floor(n: int) -> int:
+    return 1 << (n.bit_length() - 1)
+
+
+def auto_partition_rows(
+    heap_bytes: int,
+    footprint: Tuple[int, int],
+    row_bytes: int,
+    workers: int = 1
+) -> int:
+    """
+    Rows per chunk for --partition auto: the largest power of two whose enclave
+    memory (footprint, see operator1_footprint) fits heap_bytes / workers and
+    whose input (row_bytes per row) fits the host buffer.
+    """
+    fixed, per_row = footprint
+    budget = heap_bytes // max(1, workers) - fixed
+    if budget < per_row:
+        raise ValueError(
+            f"An enclave heap of {heap_bytes // 2**20} MiB split across {workers} worker(s) cannot hold "
+            f"the {fixed // 2**20} MiB of host buffers; use fewer --partition_workers or a larger NumHeapPages."
+        )
+    by_memory = budget // per_row
+    by_buffer = (HOST_BUFFER_BYTES - HEADER_RESERVE) // row_bytes
+    return _power_of_two_floor(min(by_memory, by_buffer))
+
+
+def part_path(input_path: Path, index: int) -> Path:
+    return input_path.with_name(f"{input_path.stem}_part{index}{input_path.suffix}")
+
+
+def split_text_input(input_path: Path, chunk_rows: int) -> List[Path]:
+    """
+    Splits a text input ("N ..." then N rows) into inputs of chunk_rows rows
+    (the last may be shorter) with the rest of the header unchanged.
+    """
+    paths = []
+    with open(input_path, "r", encoding='utf-8') as infile:
+        header = infile.readline().split()
+        num_rows = int(header[0])
+        for index, start in enumerate(range(0, num_rows, chunk_rows)):
+            count = min(chunk_rows, num_rows - start)
+            path = part_path(input_path, index)
+            with open(path, "w", encoding='utf-8') as outfile:
+                outfile.write(" ".join([str(count), *header[1:]]) + "\n")
+                outfile.writelines(islice(infile, count))
+            paths.append(path)
+    return paths
+
+
+def split_input(input_path: Path, chunk_rows: int, binary: bool) -> List[Path]:
+    """Splits an enclave input into chunks of chunk_rows rows. Returns the chunk paths in input order."""
+    if binary:
+        return binary_records.split_input(input_path, chunk_rows, lambda index: part_path(input_path, index))
+    return split_text_input(input_path, chunk_rows)
+
+
+
+################################
+# HASH-BUCKETED FK JOIN INPUTS #
+################################
+
+# fkjoin.py --buckets P splits one FK join into P smaller ones. Every relabeled
+# key id is hashed to a bucket (Fibonacci hashing, so equal keys always meet in
+# the same bucket and no bucket pair needs another's rows), and each bucket
+# pair runs as its own fk_join enclave. A bucket's row count would reveal how
+# the keys hash, so every bucket is padded to the same public size per table:
+#
+#   capacity = ceil(n / P) + 4 * sqrt(ceil(n / P)) + 1
+#
+# which a uniform hash exceeds with negligible probability. Table 1 is padded
+# with key -1 and table 2 with key -2. Relabeled ids are never negative and the
+# two dummy keys differ, so padding rows never join and the enclave compacts
+# them away. A table whose keys are skewed (one foreign key held by many table
+# 2 rows) can still overflow a bucket; the capacity is then doubled until every
+# bucket fits, which reveals the heaviest bucket's size up to a factor of two.
+# Each enclave returns its joined rows sorted by key id, so the bucket results
+# are merged by key id into the order a single enclave produces (see
+# engine.merge_bucket_outputs).
+
+BUCKET_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+DUMMY_KEYS = (-1, -2)  # padding keys of table 1 and table 2
+
+
+def hash_buckets(key_ids: np.ndarray, buckets: int) -> np.ndarray:
+    """The bucket of every key id."""
+    hashed = np.asarray(key_ids).astype(np.uint64) * np.uint64(BUCKET_HASH_MULTIPLIER)
+    return ((hashed >> np.uint64(32)) % np.uint64(buckets)).astype(np.int64)
+
+
+def bucket_capacity(num_rows: int, buckets: int, max_load: int) -> int:
+    """Rows every bucket of a table is padded to (see the comment above)."""
+    expected = -(-num_rows // buckets)
+    capacity = expected + 4 * isqrt(expected) + 1
+    while capacity < max_load:
+        capacity *= 2
+    return capacity
+
+
+def write_bucket_inputs(
+    input_path: Path,
+    n1: int,
+    key_ids: np.ndarray,
+    payload_ids: np.ndarray,
+    buckets: int
+) -> Tuple[List[Path], int, int]:
+    """
+    Writes one padded "<capacity1> <capacity2>" FK join input per bucket from the
+    relabeled rows of both tables (table 1 first). Returns the bucket input paths
+    and the two capacities.
+    """
+    bucket_of = hash_buckets(key_ids, buckets)
+    tables = []
+    for rows, dummy_key in ((slice(0, n1), DUMMY_KEYS[0]), (slice(n1, None), DUMMY_KEYS[1])):
+        loads = np.bincount(bucket_of[rows], minlength=buckets)
+        capacity = bucket_capacity(len(bucket_of[rows]), buckets, int(loads.max(initial=0)))
+        order = np.argsort(bucket_of[rows], kind="stable")
+        starts = np.concatenate([[0], np.cumsum(loads)])
+        tables.append((key_ids[rows][order], payload_ids[rows][order], starts, capacity, dummy_key))
+
+    paths = []
+    for bucket in range(buckets):
+        path = part_path(input_path, bucket)
+        with open(path, "w", encoding='utf-8') as outfile:
+            outfile.write(f"{tables[0][3]} {tables[1][3]}\n")
+            for keys, payloads, starts, capacity, dummy_key in tables:
+                start, end = starts[bucket], starts[bucket + 1]
+                padding = capacity - (end - start)
+                outfile.write(format_rows([
+                    np.concatenate([keys[start:end], np.full(padding, dummy_key, dtype=np.int64)]),
+                    np.concatenate([payloads[start:end], np.zeros(padding, dtype=np.int64)]),
+                ]))
+        paths.append(path)
+    return paths, tables[0][3], tables[1][3]
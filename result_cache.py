@@ -0,0 +1,185 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+from build_cache import compute_build_key
+from content_store import ContentStore
+from obliviator_formatting.dictionary_store import file_sha256
+
+#########################
+# OPERATOR RESULT CACHE #
+#########################
+
+# Several LDBC short reads run the same oblivious operator on the same inputs
+# (e.g. Person.csv joined with Post.csv on the same payload columns), and each
+# call recomputed it. The result key is a hash over the operator, its variant,
+# the contents of every input file, all query parameters (columns, filter
+# threshold and condition, record format, ...), the operator's DATA_LENGTH (or
+# its sizing mode, see engine.py) and its build key (see build_cache.py). The
+# final CSV and its .time file are kept under that key in an LRU
+# content-addressed store. On a hit both are copied to the requested output
+# path and the operator does not run. Since no enclave ran, the .time file of a
+# hit reports 0 as its time, so the DAG and short read totals only count work
+# that was done. The time of the run that produced the result follows as
+# cached_time=<t>, then result_cache=hit and the original metadata. The
+# original phase times are left out.
+#
+# Input digests are kept in a small index next to the store, digests.json,
+# keyed by the file's real path and checked against its size and mtime_ns. A
+# file is only hashed again when one of those changes, so a hit on a multi-GB
+# table costs a stat rather than a full read. The index holds the
+# MAX_DIGESTS most recently used files and is replaced atomically; two
+# processes updating it at once can lose an entry, which only costs a rehash.
+#
+# Environment:
+#   OBLIVIATOR_RESULT_CACHE         store directory (default ~/.cache/obliviator/results),
+#                                   or "off" to always run the operator
+#   OBLIVIATOR_RESULT_CACHE_MAX_MB  LRU size limit in MB (default 1024)
+
+RESULT_FILE = "result.csv"
+TIME_FILE = "result.time"
+
+DIGEST_INDEX = "digests.json"
+MAX_DIGESTS = 1000
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def _store_root() -> Optional[Path]:
+    root = os.environ.get("OBLIVIATOR_RESULT_CACHE", "~/.cache/obliviator/results")
+    if root.lower() in ("off", "0", "none", ""):
+        return None
+    return Path(os.path.expanduser(root))
+
+
+def enabled() -> bool:
+    return _store_root() is not None
+
+
+def get_store() -> Optional[ContentStore]:
+    root = _store_root()
+    if root is None:
+        return None
+    max_mb = int(os.environ.get("OBLIVIATOR_RESULT_CACHE_MAX_MB", "1024"))
+    return ContentStore(root, max_mb * 1024 * 1024)
+
+
+def _load_digest_index(index_path: Path) -> Dict[str, Dict]:
+    try:
+        with open(index_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_digest_index(index_path: Path, index: Dict[str, Dict]):
+    if len(index) > MAX_DIGESTS:
+        newest = sorted(index, key=lambda path: index[path]["used"])[-MAX_DIGESTS:]
+        index = {path: index[path] for path in newest}
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
+
+def input_digest(path: str) -> str:
+    """sha256 of an input file, reused while its (path, size, mtime_ns) is unchanged."""
+    stat = os.stat(path)
+    real_path = os.path.realpath(path)
+    memo_key = (real_path, stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+    if digest is not None:
+        return digest
+
+    root = _store_root()
+    index_path = root / DIGEST_INDEX if root is not None else None
+    index = _load_digest_index(index_path) if index_path is not None else {}
+    entry = index.get(real_path)
+    if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        digest = entry["sha256"]
+    else:
+        digest = file_sha256(path)
+    if index_path is not None:
+        index[real_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest, "used": time.time()}
+        _save_digest_index(index_path, index)
+    with _digests_lock:
+        _digests[memo_key] = digest
+    return digest
+
+
+def compute_result_key(
+    operator: str,
+    code_dir: Path,
+    data_length: Union[int, str],
+    input_paths: Sequence[str],
+    params: Dict,
+    make_args: Sequence[str] = ()
+) -> str:
+    """Hashes everything that determines an operator's final CSV."""
+    key = {
+        "operator": operator,
+        "build": compute_build_key(code_dir, make_args),
+        "data_length": data_length,
+        "inputs": [input_digest(path) for path in input_paths],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def fetch_result(key: str, output_path: Path) -> bool:
+    """Copies a cached result to output_path (and its .time file). Returns False on a miss."""
+    store = get_store()
+    entry_dir = store.get(key) if store is not None else None
+    if entry_dir is None:
+        return False
+    output_path = Path(output_path)
+    shutil.copyfile(entry_dir / RESULT_FILE, output_path)
+    cached_time, *metadata = (entry_dir / TIME_FILE).read_text().splitlines()
+    lines = ["0.0", f"cached_time={cached_time}", "result_cache=hit"]
+    lines += [line for line in metadata if line and not line.startswith("phase_")]
+    output_path.with_suffix(".time").write_text("\n".join(lines) + "\n")
+    return True
+
+
+def store_result(key: str, output_path: Path):
+    """Adds a finished operator's final CSV and .time file to the cache."""
+    store = get_store()
+    if store is None:
+        return
+    output_path = Path(output_path)
+    store.put(
+        key,
+        {RESULT_FILE: output_path, TIME_FILE: output_path.with_suffix(".time")},
+        meta={"output_path": str(output_path)},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the Obliviator result cache.")
+    parser.add_argument("--stats", action="store_true", help="Print hit/miss counters and store size.")
+    parser.add_argument("--clear", action="store_true", help="Remove every cached result.")
+    args = parser.parse_args()
+
+    store = get_store()
+    if store is None:
+        print("Result cache is disabled (OBLIVIATOR_RESULT_CACHE=off).")
+        return
+    if args.clear:
+        store.clear()
+        print(f"Cleared result cache at {store.root}.")
+    if args.stats or not args.clear:
+        for name, value in store.stats().items():
+            print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
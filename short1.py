@@ -1,10 +1,17 @@
 
 import os
-import subprocess
 from pathlib import Path
 import argparse
+from typing import List, Union
 import shutil
-import csv
+
+import batch
+import fkjoin
+import operator1
+import enclave_worker
+import tracing
+from dag import QueryDAG
+from engine import threads_arg
 
 
 def _cleanup_temp_dir(temp_dir_path: Path):
@@ -26,72 +33,63 @@ def _cleanup_temp_dir(temp_dir_path: Path):
 #   Filter to specified personId
 
 def shortread1 (
-    person_id: int,
+    person_ids: List[int],
     LDBC_dir_path: str,
     output_path: str,
-    no_cleanup: bool
+    no_cleanup: bool,
+    threads: Union[int, str] = "auto"
 ):
-    print(f"--- Running LDBC Short Read 1 for Person ID {person_id} ---")
+    print(f"--- Running LDBC Short Read 1 for Person ID(s) {', '.join(str(id_) for id_ in person_ids)} ---")
     # create temp directory for the query
     temp_dir = Path(f"tmp_ldbc_sr1_{os.getpid()}")
     temp_dir.mkdir(exist_ok=True)
     print(f"Created temporary directory: {temp_dir}")
 
     try:
+        dag = QueryDAG("short read 1")
 
         # --- Step 1: Join Person.csv with Place.csv on LocationCityId
 
         # Since FK join, join representative place table with primary key person table
-        print("Step 1: Joining Person.csv with Place.csv on LocationCitId")
         person_path = LDBC_dir_path + "/Person.csv"
         place_path = LDBC_dir_path + "/Place.csv"
         join_output_path = temp_dir / "sr1part1.csv"
         join_cmd = [
-            "python", "fkjoin.py",
             "--table1_path", str(place_path),
             "--key1", "id",
             "--payload1_cols", "name",
             "--table2_path", str(person_path),      # key table
             "--key2", "LocationCityId",
             "--payload2_cols", "id", "firstName", "lastName", "birthday", "locationIP", "browserUsed", "gender", "creationDate",
-            "--output_path", str(join_output_path)
+            "--output_path", str(join_output_path),
+            "--threads", str(threads)
         ]
-        subprocess.run(join_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator join exited successfully.")
+        dag.add("join", fkjoin.main, join_cmd, time_file=join_output_path.with_suffix(".time"))
 
         # Output will now have more specific headers, can specify t2.id to filter on person id.
 
         # --- Step 2: Filter this joined output for the desired person
 
-        print(f"Step 2: Filtering result of join for person with ID {person_id}.")
         filter_cmd = [
-            "python", "operator1.py",
             "--filepath", str(join_output_path),
             "--output_path", output_path,
             "--filter_col", "t2.id",
             "--payload_cols", "t2.firstName", "t2.lastName", "t2.birthday", "t2.locationIP", "t2.browserUsed", "t2.gender", "t2.creationDate", "t1.name",
-            "--filter_threshold_op1", str(person_id),
-            "--filter_condition_op1", "==",
+            *batch.filter_args(person_ids),
+            "--threads", str(threads)
         ]
-        subprocess.run(filter_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator filter exited succesfully.")
+        dag.add("filter", operator1.main, filter_cmd, deps=["join"], time_file=Path(output_path).with_suffix(".time"))
+        dag.run()
         print(f"Output of short read 1 written to {output_path}")
 
         # That's it for this one!
 
         # Finally, calculate composite time of all obliviator operations
-        total_time = 0.0
-        join_time_file = str(join_output_path.with_suffix(".time"))
-        with open(join_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        output_path_obj = Path(output_path)
-        filter_time_file = str(output_path_obj.with_suffix(".time"))
-        with open(filter_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        # write this compiled time to the <output_path>.time file
-        print(f"\n\nTotal time to execute Query 1: {total_time}\n\n")
-        with open(filter_time_file, 'w') as tf:
-            tf.write(str(total_time))
+        total_time, critical_time = dag.write_time_file(Path(output_path).with_suffix(".time"))
+        dag.report()
+        print(f"\n\nTotal time to execute Query 1: {total_time} (critical path: {critical_time})\n\n")
+        if len(person_ids) > 1:
+            batch.split_batch_output(output_path, "t2.id", person_ids, total_time, critical_time)
 
     
     except Exception as e:
@@ -107,18 +105,30 @@ def shortread1 (
 
 def main():
     parser = argparse.ArgumentParser(description="Runs LDBC Interactive Short Read 1.")
-    parser.add_argument("--person_id", type=int, required=True, help="The ID of the person to look up.")
+    parser.add_argument("--person_id", type=int, nargs='+', required=True, help="The ID of the person to look up. Several IDs are answered together in one batch.")
     parser.add_argument("--LDBC_dir_path", default="LDBC_SF1", help="Path to LDBC database.")
     parser.add_argument("--output_path", default="LDBC_SF1/sr_output/sr1_output.csv", help="Path for the final output CSV file.")
     parser.add_argument("--no_cleanup", action="store_true", help="Do not clean up temporary directories.")
+    parser.add_argument("--warm_workers", action="store_true", help="Keep one enclave loaded per operator and reuse it across the query's steps.")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads for every operator in the query: a power of two up to NumTCS, or 'auto'.")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
     args = parser.parse_args()
-
-    shortread1(
-        args.person_id,
-        args.LDBC_dir_path,
-        args.output_path,
-        args.no_cleanup
-    )
+    tracing.enable(args.trace)
+
+    if args.warm_workers:
+        enclave_worker.enable()
+
+    # Repeated ids are answered once, so the batch size counts distinct ids.
+    person_ids = list(dict.fromkeys(args.person_id))
+
+    with tracing.span("short read 1", "query"):
+        shortread1(
+            person_ids,
+            args.LDBC_dir_path,
+            args.output_path,
+            args.no_cleanup,
+            args.threads
+        )
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,19 @@
 
 import os
-import subprocess
 from pathlib import Path
 import argparse
+from typing import List, Union
 import shutil
 import csv
 
+import batch
+import join
+import operator1
+import enclave_worker
+import tracing
+from dag import QueryDAG
+from engine import threads_arg
+
 
 def _cleanup_temp_dir(temp_dir_path: Path):
     """Removes the specified temporary directory and its contents."""
@@ -63,39 +71,39 @@ def combine_csvs(file1_path, file2_path, output_path):
 #   Filter for desired $personId
 
 def shortread3 (
-    person_id: int,
+    person_ids: List[int],
     LDBC_dir_path: str,
     output_path: str,
-    no_cleanup: bool
+    no_cleanup: bool,
+    threads: Union[int, str] = "auto"
 ):
-    print(f"--- Running LDBC Short Read 3 for Person ID {person_id} ---")
+    print(f"--- Running LDBC Short Read 3 for Person ID(s) {', '.join(str(id_) for id_ in person_ids)} ---")
     # create temp directory for the query
     temp_dir = Path(f"tmp_ldbc_sr3_{os.getpid()}")
     temp_dir.mkdir(exist_ok=True)
     print(f"Created temporary directory: {temp_dir}")
 
     try:
+        dag = QueryDAG("short read 3")
 
         # --- Step 1: NFK join of Person.csv with Person_knows_Person.csv on Person2Id
         #       find all friends of all people
-        print("Step 1: Joining Person_knows_Person.csv with Person.csv on Person2Id")
         person_path = LDBC_dir_path + "/Person.csv"
         edge_path = LDBC_dir_path + "/Person_knows_Person.csv"
         join1_output_path = temp_dir / "sr3join1.csv"
         join1_cmd = [
-            "python", "join.py",
             "--table1_path", edge_path,
             "--key1", "Person2Id",
             "--payload1_cols", "Person1Id", "creationDate",
             "--table2_path", person_path,
             "--key2", "id",
             "--payload2_cols", "firstName", "lastName",
-            "--output_path", str(join1_output_path)
+            "--output_path", str(join1_output_path),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             join1_cmd.append("--no_cleanup")
-        subprocess.run(join1_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator join 1 exited successfully.")
+        dag.add("join1", join.main, join1_cmd, time_file=join1_output_path.with_suffix(".time"))
 
         
         # Address asymmetry of edge table
@@ -103,22 +111,20 @@ def shortread3 (
         #       find all friends of all people, reversing direction of edges
         #       friendship table is not symmetric, so must perform 2 joins to get all friends.
         #       We will then filter the join outputs separately and combine the results
-        print("Step 2: Joining Person_knows_Person.csv with Person.csv on Person1Id")
         join2_output_path = temp_dir / "sr3join2.csv"
         join2_cmd = [
-            "python", "join.py",
             "--table1_path", edge_path,
             "--key1", "Person1Id",
             "--payload1_cols", "Person2Id", "creationDate",
             "--table2_path", person_path,
             "--key2", "id",
             "--payload2_cols", "firstName", "lastName",
-            "--output_path", str(join2_output_path)
+            "--output_path", str(join2_output_path),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             join2_cmd.append("--no_cleanup")
-        subprocess.run(join2_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator join 2 exited successfully.")
+        dag.add("join2", join.main, join2_cmd, time_file=join2_output_path.with_suffix(".time"))
 
 
 
@@ -128,71 +134,69 @@ def shortread3 (
 
         # --- Step 3: Filter joint output 1 on t1.Person1Id to get details of
         #       friends of specified person
-        print(f"Step 3: Filtering result of first join on $Person1Id = {person_id}")
 
-        print(f"First filtering on Person1Id = {person_id}...")
         filter1_output_path = temp_dir / "sr3filter1.csv"
         filter1_cmd = [
-            "python", "operator1.py",
             "--filepath", str(join1_output_path),
             "--output_path", str(filter1_output_path),
             "--filter_col", "t1.Person1Id",
             "--payload_cols", "t1.Person2Id", "t1.creationDate", "t2.firstName", "t2.lastName",
-            "--filter_threshold_op1", str(person_id),
-            "--filter_condition_op1", "=="
+            *batch.filter_args(person_ids),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             filter1_cmd.append("--no_cleanup")
-        subprocess.run(filter1_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator filter 1 exited successfully.")
+        dag.add("filter1", operator1.main, filter1_cmd, deps=["join1"], time_file=filter1_output_path.with_suffix(".time"))
 
 
         # At this point columns in join2_output are
         # t1.Person1Id|t1.Person2Id|t1.creationDate|t2.firstName|t2.lastName
         # filter this file on t1.Person2Id to find friends of people (in reverse direction)
-        print(f"Step 4: Filtering result of second join on $Person2Id = {person_id}")
 
-        print(f"First filtering on Person2Id = {person_id}...")
         filter2_output_path = temp_dir / "sr3filter2.csv"
         filter2_cmd = [
-            "python", "operator1.py",
             "--filepath", str(join2_output_path),
             "--output_path", str(filter2_output_path),
             "--filter_col", "t1.Person2Id",
             "--payload_cols", "t1.Person1Id", "t1.creationDate", "t2.firstName", "t2.lastName",
-            "--filter_threshold_op1", str(person_id),
-            "--filter_condition_op1", "=="
+            *batch.filter_args(person_ids),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             filter2_cmd.append("--no_cleanup")
-        subprocess.run(filter2_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator filter 2 exited successfully.")
+        dag.add("filter2", operator1.main, filter2_cmd, deps=["join2"], time_file=filter2_output_path.with_suffix(".time"))
 
 
 
         # combine the two filtered CSVs to obtain the final output
-        combine_csvs ( str(filter1_output_path), str(filter2_output_path), output_path )
+        dag.add(
+            "combine", combine_csvs, str(filter1_output_path), str(filter2_output_path), output_path,
+            deps=["filter1", "filter2"]
+        )
+        dag.run()
 
         print(f"Output of short read 3 written to {output_path}.")
 
         # Finally, calculate composite time of all obliviator operations
-        total_time = 0.0
-        join1_time_file = str(join1_output_path.with_suffix(".time"))
-        with open(join1_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        join2_time_file = str(join2_output_path.with_suffix(".time"))
-        with open(join2_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        filter1_time_file = str(filter1_output_path.with_suffix(".time"))
-        with open(filter1_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        filter2_time_file = str(filter2_output_path.with_suffix(".time"))
-        with open(filter2_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        # write this compiled time to the <output_path>.time file
-        print(f"\n\nTotal time to execute Query 3: {total_time}\n\n")
-        with open(Path(output_path).with_suffix('.time'), 'w') as tf:
-            tf.write(str(total_time))
+        total_time, critical_time = dag.write_time_file(Path(output_path).with_suffix(".time"))
+        dag.report()
+        print(f"\n\nTotal time to execute Query 3: {total_time} (critical path: {critical_time})\n\n")
+        if len(person_ids) > 1:
+            # Each filter kept the rows of every person in the batch, so split both
+            # directions by person and combine the two halves of each person.
+            friends1 = batch.split_csv_by_key(
+                filter1_output_path, "t1.Person1Id", person_ids, lambda id_: temp_dir / f"sr3filter1_{id_}.csv"
+            )
+            friends2 = batch.split_csv_by_key(
+                filter2_output_path, "t1.Person2Id", person_ids, lambda id_: temp_dir / f"sr3filter2_{id_}.csv"
+            )
+            paths = {}
+            for id_ in friends1:
+                paths[id_] = batch.batch_output_path(output_path, id_)
+                combine_csvs(friends1[id_], friends2[id_], paths[id_])
+            batch.write_batch_time_files(paths, total_time, critical_time)
+            print(f"Per-person outputs of the batch of {len(paths)} written next to {output_path} "
+                  f"({total_time / len(paths)}s amortized enclave time per query).")
 
     
     except Exception as e:
@@ -208,18 +212,30 @@ def shortread3 (
 
 def main():
     parser = argparse.ArgumentParser(description="Runs LDBC Interactive Short Read 3.")
-    parser.add_argument("--person_id", type=int, required=True, help="The ID of the person to look up.")
+    parser.add_argument("--person_id", type=int, nargs='+', required=True, help="The ID of the person to look up. Several IDs are answered together in one batch.")
     parser.add_argument("--LDBC_dir_path", default="LDBC_SF1", help="Path to LDBC database.")
     parser.add_argument("--output_path", default="LDBC_SF1/sr_output/sr3_output.csv", help="Path for the final output CSV file.")
     parser.add_argument("--no_cleanup", action="store_true", help="Do not clean up temporary directories.")
+    parser.add_argument("--warm_workers", action="store_true", help="Keep one enclave loaded per operator and reuse it across the query's steps.")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads for every operator in the query: a power of two up to NumTCS, or 'auto'.")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
     args = parser.parse_args()
-
-    shortread3(
-        args.person_id,
-        args.LDBC_dir_path,
-        args.output_path,
-        args.no_cleanup
-    )
+    tracing.enable(args.trace)
+
+    if args.warm_workers:
+        enclave_worker.enable()
+
+    # Repeated ids are answered once, so the batch size counts distinct ids.
+    person_ids = list(dict.fromkeys(args.person_id))
+
+    with tracing.span("short read 3", "query"):
+        shortread3(
+            person_ids,
+            args.LDBC_dir_path,
+            args.output_path,
+            args.no_cleanup,
+            args.threads
+        )
 
 if __name__ == "__main__":
     main()
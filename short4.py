@@ -1,10 +1,15 @@
 
 import os
-import subprocess
 from pathlib import Path
 import argparse
+from typing import List, Union
 import shutil
-import csv
+
+import batch
+import operator1
+import enclave_worker
+import tracing
+from engine import read_time_file, threads_arg
 
 
 def _cleanup_temp_dir(temp_dir_path: Path):
@@ -26,12 +31,13 @@ def _cleanup_temp_dir(temp_dir_path: Path):
 #   payload columns in the obliviator filter call.
 
 def shortread4 (
-    message_id: int,
+    message_ids: List[int],
     LDBC_dir_path: str,
     output_path: str,
-    no_cleanup: bool
+    no_cleanup: bool,
+    threads: Union[int, str] = "auto"
 ):
-    print(f"--- Running LDBC Short Read 4 for Message ID {message_id} ---")
+    print(f"--- Running LDBC Short Read 4 for Message ID(s) {', '.join(str(id_) for id_ in message_ids)} ---")
     # create temp directory
     temp_dir = Path(f"tmp_ldbc_sr1_{os.getpid()}")
     temp_dir.mkdir(exist_ok=True)
@@ -50,29 +56,31 @@ def shortread4 (
         print("Step 2: Filtering combined Message.csv")
         message_path = LDBC_dir_path + "/Post.csv"  # temporary
         filter_cmd = [
-            "python", "operator1.py",
             "--filepath", str(message_path),
             "--output_path", output_path,
             "--filter_col", "id",
             "--payload_cols", "content", "creationDate",
-            "--filter_threshold_op1", str(message_id),
-            "--filter_condition_op1", "==",
-            "--operator1_variant", "default"
+            *batch.filter_args(message_ids),
+            "--operator1_variant", "default",
+            "--threads", str(threads)
         ]
         if no_cleanup:
             filter_cmd.append("--no_cleanup")
 
-        # Run obliviator operator
+        # Run obliviator operator. The wrapper prints errors instead of raising, so
+        # a stale .time file from an earlier run must not be mistaken for this one.
+        Path(output_path).with_suffix(".time").unlink(missing_ok=True)
         print("Running obliviator filter with passed arguments...")
-        subprocess.run(filter_cmd, check=True, cwd=Path(__file__).parent)
+        operator1.main(filter_cmd)
         print("Obliviator filter exited successfully.")
 
         # That's it for this one!
         # Finally, calculate composite time of all obliviator operations
         total_time = 0.0
-        with open(Path(output_path).with_suffix(".time"), 'r') as tf:
-            total_time += float(tf.read().strip())
+        total_time += read_time_file(Path(output_path).with_suffix(".time"))
         print(f"\n\nTotal time to execute Query 4: {total_time}\n\n")
+        if len(message_ids) > 1:
+            batch.split_batch_output(output_path, "id", message_ids, total_time, total_time)
 
     
     except Exception as e:
@@ -88,18 +96,30 @@ def shortread4 (
 
 def main():
     parser = argparse.ArgumentParser(description="Runs LDBC Interactive Short Read 1.")
-    parser.add_argument("--message_id", type=int, required=True, help="The ID of the Post or Comment to look up.")
+    parser.add_argument("--message_id", type=int, nargs='+', required=True, help="The ID of the Post or Comment to look up. Several IDs are answered together in one batch.")
     parser.add_argument("--LDBC_dir_path", default="LDBC_SF1", help="Path to LDBC database.")
     parser.add_argument("--output_path", default="LDBC_SF1/sr_output/sr4_output.csv", help="Path for the final output CSV file.")
     parser.add_argument("--no_cleanup", action="store_true", help="Do not clean up temporary directories.")
+    parser.add_argument("--warm_workers", action="store_true", help="Keep one enclave loaded per operator and reuse it across the query's steps.")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads for every operator in the query: a power of two up to NumTCS, or 'auto'.")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
     args = parser.parse_args()
-
-    shortread4(
-        args.message_id,
-        args.LDBC_dir_path,
-        args.output_path,
-        args.no_cleanup
-    )
+    tracing.enable(args.trace)
+
+    if args.warm_workers:
+        enclave_worker.enable()
+
+    # Repeated ids are answered once, so the batch size counts distinct ids.
+    message_ids = list(dict.fromkeys(args.message_id))
+
+    with tracing.span("short read 4", "query"):
+        shortread4(
+            message_ids,
+            args.LDBC_dir_path,
+            args.output_path,
+            args.no_cleanup,
+            args.threads
+        )
 
 if __name__ == "__main__":
     main()
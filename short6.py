@@ -1,10 +1,17 @@
 
 import os
-import subprocess
 from pathlib import Path
 import argparse
+from typing import List, Union
 import shutil
-import csv
+
+import batch
+import fkjoin
+import operator1
+import enclave_worker
+import tracing
+from dag import QueryDAG
+from engine import threads_arg
 
 
 def _cleanup_temp_dir(temp_dir_path: Path):
@@ -40,42 +47,42 @@ def _cleanup_temp_dir(temp_dir_path: Path):
 #           Filter for requested message
 #
 def shortread6 (
-    message_id: int,
+    message_ids: List[int],
     LDBC_dir_path: str,
     output_path: str,
-    no_cleanup: bool
+    no_cleanup: bool,
+    threads: Union[int, str] = "auto"
 ):
-    print(f"--- Running LDBC Short Read 6 for Message ID {message_id} ---")
+    print(f"--- Running LDBC Short Read 6 for Message ID(s) {', '.join(str(id_) for id_ in message_ids)} ---")
     # create temp directory for the query
     temp_dir = Path(f"tmp_ldbc_sr6_{os.getpid()}")
     temp_dir.mkdir(exist_ok=True)
     print(f"Created temporary directory: {temp_dir}")
 
     try:
+        dag = QueryDAG("short read 6")
 
         # FOR NOW RESTRICT TO POSTS.
         # Comments can be replies of comments, creating large chain of hops.
         # Stick to posts, and do the 2 joins.
 
         # --- Step 1: FK join of Forum.csv with Post.csv to get details of container forum
-        print("Step 1: Joining Post.csv with Comment.csv on ParentPostId")
         post_path = LDBC_dir_path + "/Post.csv"
         forum_path = LDBC_dir_path + "/Forum.csv"
         join_output_path = temp_dir / "sr6part1.csv"
         join_cmd = [
-            "python", "fkjoin.py",
             "--table1_path", forum_path,
             "--key1", "id",
             "--payload1_cols", "title", "ModeratorPersonId",
             "--table2_path", post_path,
             "--key2", "ContainerForumId",
             "--payload2_cols", "id",
-            "--output_path", str(join_output_path)
+            "--output_path", str(join_output_path),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             join_cmd.append("--no_cleanup")
-        subprocess.run(join_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator join exited successfully.")
+        dag.add("join1", fkjoin.main, join_cmd, time_file=join_output_path.with_suffix(".time"))
 
 
         # At this point structure of table is
@@ -84,23 +91,21 @@ def shortread6 (
         
 
         # --- Step 2: Join result with Person.csv on ModeratorPersonId to get details of moderator
-        print("Step 2: Joining Person.csv with resulting table on ModeratorPersonId")
         person_path = LDBC_dir_path + "/Person.csv"
         join2_output_path = temp_dir / "sr6part2.csv"
         join2_cmd = [
-            "python", "fkjoin.py",
             "--table1_path", person_path,
             "--key1", "id",
             "--payload1_cols", "firstName", "lastName",
-            "--table2_path", join_output_path,
+            "--table2_path", str(join_output_path),
             "--key2", "t1.ModeratorPersonId",
             "--payload2_cols", "t1.id", "t1.title", "t2.id",
-            "--output_path", str(join2_output_path)
+            "--output_path", str(join2_output_path),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             join2_cmd.append("--no_cleanup")
-        subprocess.run(join2_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator join exited successfully.")
+        dag.add("join2", fkjoin.main, join2_cmd, deps=["join1"], time_file=join2_output_path.with_suffix(".time"))
 
 
         # At this point structure of table is
@@ -109,39 +114,27 @@ def shortread6 (
 
 
         # --- Step 3: Filter for selected Post
-        print("Step 3: Filtering for requested post...")
         filter_cmd = [
-            "python", "operator1.py",
             "--filepath", str(join2_output_path),
             "--output_path", output_path,
             "--filter_col", "t2.t2.id",
             "--payload_cols", "t2.t1.id", "t2.t1.title", "t1.id", "t1.firstName", "t1.lastName",
-            "--filter_threshold_op1", str(message_id),
-            "--filter_condition_op1", "=="
+            *batch.filter_args(message_ids),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             filter_cmd.append("--no_cleanup")
-        subprocess.run(filter_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator filter exited successfully.")
+        dag.add("filter", operator1.main, filter_cmd, deps=["join2"], time_file=Path(output_path).with_suffix(".time"))
+        dag.run()
         print(f"Output of short read 6 written to {output_path}.")
 
 
         # Finally, calculate composite time of all obliviator operations
-        total_time = 0.0
-        join_time_file = str(join_output_path.with_suffix(".time"))
-        with open(join_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        join2_time_file = str(join2_output_path.with_suffix(".time"))
-        with open(join2_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        output_path_obj = Path(output_path)
-        filter_time_file = str(output_path_obj.with_suffix(".time"))
-        with open(filter_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        # write this compiled time to the <output_path>.time file
-        print(f"\n\nTotal time to execute Query 6: {total_time}\n\n")
-        with open(filter_time_file, 'w') as tf:
-            tf.write(str(total_time))
+        total_time, critical_time = dag.write_time_file(Path(output_path).with_suffix(".time"))
+        dag.report()
+        print(f"\n\nTotal time to execute Query 6: {total_time} (critical path: {critical_time})\n\n")
+        if len(message_ids) > 1:
+            batch.split_batch_output(output_path, "t2.t2.id", message_ids, total_time, critical_time)
 
 
 
@@ -161,18 +154,30 @@ def shortread6 (
 
 def main():
     parser = argparse.ArgumentParser(description="Runs LDBC Interactive Short Read 6.")
-    parser.add_argument("--message_id", type=int, required=True, help="The ID of the message to look up.")
+    parser.add_argument("--message_id", type=int, nargs='+', required=True, help="The ID of the message to look up. Several IDs are answered together in one batch.")
     parser.add_argument("--LDBC_dir_path", default="LDBC_SF1", help="Path to LDBC database.")
     parser.add_argument("--output_path", default="LDBC_SF1/sr_output/sr6_output.csv", help="Path for the final output CSV file.")
     parser.add_argument("--no_cleanup", action="store_true", help="Do not clean up temporary directories.")
+    parser.add_argument("--warm_workers", action="store_true", help="Keep one enclave loaded per operator and reuse it across the query's steps.")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads for every operator in the query: a power of two up to NumTCS, or 'auto'.")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
     args = parser.parse_args()
-
-    shortread6(
-        args.message_id,
-        args.LDBC_dir_path,
-        args.output_path,
-        args.no_cleanup
-    )
+    tracing.enable(args.trace)
+
+    if args.warm_workers:
+        enclave_worker.enable()
+
+    # Repeated ids are answered once, so the batch size counts distinct ids.
+    message_ids = list(dict.fromkeys(args.message_id))
+
+    with tracing.span("short read 6", "query"):
+        shortread6(
+            message_ids,
+            args.LDBC_dir_path,
+            args.output_path,
+            args.no_cleanup,
+            args.threads
+        )
 
 if __name__ == "__main__":
     main()
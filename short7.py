@@ -1,10 +1,17 @@
 
 import os
-import subprocess
 from pathlib import Path
 import argparse
+from typing import List, Union
 import shutil
-import csv
+
+import batch
+import fkjoin
+import operator1
+import enclave_worker
+import tracing
+from dag import QueryDAG
+from engine import threads_arg
 
 
 def _cleanup_temp_dir(temp_dir_path: Path):
@@ -32,38 +39,38 @@ def _cleanup_temp_dir(temp_dir_path: Path):
 #       Filter on ParentPostId to only get one-hop comments replying to specified post
 #       Construct knows column
 def shortread7 (
-    message_id: int,
+    message_ids: List[int],
     LDBC_dir_path: str,
     output_path: str,
-    no_cleanup: bool
+    no_cleanup: bool,
+    threads: Union[int, str] = "auto"
 ):
-    print(f"--- Running LDBC Short Read 7 for Message ID {message_id} ---")
+    print(f"--- Running LDBC Short Read 7 for Message ID(s) {', '.join(str(id_) for id_ in message_ids)} ---")
     # create temp directory for the query
     temp_dir = Path(f"tmp_ldbc_sr7_{os.getpid()}")
     temp_dir.mkdir(exist_ok=True)
     print(f"Created temporary directory: {temp_dir}")
 
     try:
+        dag = QueryDAG("short read 7")
 
         # --- Step 1: FK join of Person.csv with Comment.csv on CreatorPersonId ---
-        print("Step 1: Joining Person.csv with Comment.csv on CreatorPersonId")
         join_output_path = temp_dir / "sr7join.csv"
         comment_path = LDBC_dir_path + "/Comment.csv"
         person_path = LDBC_dir_path + "/Person.csv"
         join_cmd = [
-            "python", "fkjoin.py",
             "--table1_path", person_path,
             "--key1", "id",
             "--payload1_cols", "firstName", "lastName",
             "--table2_path", comment_path,
             "--key2", "CreatorPersonId",
             "--payload2_cols", "id", "content", "creationDate", "ParentPostId",
-            "--output_path", str(join_output_path)
+            "--output_path", str(join_output_path),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             join_cmd.append("--no_cleanup")
-        subprocess.run(join_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator join exited successfully.")
+        dag.add("join", fkjoin.main, join_cmd, time_file=join_output_path.with_suffix(".time"))
 
         # At this point columns are
         # t1.id     t1.firstName    t1.lastName     t2.id       t2.content      t2.creationDate     t2.ParentPostId
@@ -72,20 +79,17 @@ def shortread7 (
         # --- Step 2: Filter on t2.ParentPostId to only get comments that are one-hop
         #       replies to specified post ---
         #           Fix: can filter on a column that has missing row elements - these rows are just ignored
-        print(f"Step 2: Filtering result of join on $ParentPostId = {message_id}")
         filter_cmd = [
-            "python", "operator1.py",
             "--filepath", str(join_output_path),
             "--output_path", output_path,
             "--filter_col", "t2.ParentPostId",
             "--payload_cols", "t2.id", "t2.content", "t2.creationDate", "t1.id", "t1.firstName", "t1.lastName",
-            "--filter_threshold_op1", str(message_id),
-            "--filter_condition_op1", "=="
+            *batch.filter_args(message_ids),
+            "--threads", str(threads)
         ]
         if no_cleanup:
             filter_cmd.append("--no_cleanup")
-        subprocess.run(filter_cmd, check=True, cwd=Path(__file__).parent)
-        print("Obliviator filter exited successfully.")
+        dag.add("filter", operator1.main, filter_cmd, deps=["join"], time_file=Path(output_path).with_suffix(".time"))
 
 
         # To-do: Construct knows column using edge file - how to do this obliviously?
@@ -93,22 +97,16 @@ def shortread7 (
 
 
 
+        dag.run()
         print(f"Output of short read 6 written to {output_path}.")
 
         # Finally, calculate composite time of all obliviator operations
 
-        total_time = 0.0
-        join_time_file = str(join_output_path.with_suffix(".time"))
-        with open(join_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        output_path_obj = Path(output_path)
-        filter_time_file = str(output_path_obj.with_suffix(".time"))
-        with open(filter_time_file, 'r') as tf:
-            total_time += float(tf.read().strip())
-        # write this compiled time to the <output_path>.time file
-        print(f"\n\nTotal time to execute Query 7: {total_time}\n\n")
-        with open(filter_time_file, 'w') as tf:
-            tf.write(str(total_time))
+        total_time, critical_time = dag.write_time_file(Path(output_path).with_suffix(".time"))
+        dag.report()
+        print(f"\n\nTotal time to execute Query 7: {total_time} (critical path: {critical_time})\n\n")
+        if len(message_ids) > 1:
+            batch.split_batch_output(output_path, "t2.ParentPostId", message_ids, total_time, critical_time)
 
 
 
@@ -127,18 +125,30 @@ def shortread7 (
 
 def main():
     parser = argparse.ArgumentParser(description="Runs LDBC Interactive Short Read 7.")
-    parser.add_argument("--message_id", type=int, required=True, help="The ID of the message to look up.")
+    parser.add_argument("--message_id", type=int, nargs='+', required=True, help="The ID of the message to look up. Several IDs are answered together in one batch.")
     parser.add_argument("--LDBC_dir_path", default="LDBC_SF1", help="Path to LDBC database.")
     parser.add_argument("--output_path", default="LDBC_SF1/sr_output/sr7_output.csv", help="Path for the final output CSV file.")
     parser.add_argument("--no_cleanup", action="store_true", help="Do not clean up temporary directories.")
+    parser.add_argument("--warm_workers", action="store_true", help="Keep one enclave loaded per operator and reuse it across the query's steps.")
+    parser.add_argument("--threads", type=threads_arg, default="auto", help="Enclave threads for every operator in the query: a power of two up to NumTCS, or 'auto'.")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (JSON) of every pipeline stage to this path; see tracing.py.")
     args = parser.parse_args()
-
-    shortread7(
-        args.message_id,
-        args.LDBC_dir_path,
-        args.output_path,
-        args.no_cleanup
-    )
+    tracing.enable(args.trace)
+
+    if args.warm_workers:
+        enclave_worker.enable()
+
+    # Repeated ids are answered once, so the batch size counts distinct ids.
+    message_ids = list(dict.fromkeys(args.message_id))
+
+    with tracing.span("short read 7", "query"):
+        shortread7(
+            message_ids,
+            args.LDBC_dir_path,
+            args.output_path,
+            args.no_cleanup,
+            args.threads
+        )
 
 if __name__ == "__main__":
     main()
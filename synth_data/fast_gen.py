@@ -0,0 +1,224 @@
+# synth_data/fast_gen.py
+
+import argparse
+import time
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from obliviator_formatting import binary_records
+
+#############################
+# VECTORIZED SYNTHETIC DATA #
+#############################
+
+# synth_data_gen.py builds every row with Faker in a Python loop, which takes
+# minutes for a million rows and always draws uniform foreign keys. This
+# generator draws whole columns with numpy and writes them in chunks of
+# CHUNK_ROWS rows, so tens of millions of rows take about a minute, and the key
+# distribution is a parameter:
+#
+#   skew          Zipf exponent of the foreign keys. A reference picks the key
+#                 of rank k (1 = hottest) with probability proportional to
+#                 1 / k^skew over a bounded key space; 0 is uniform. Ranks are
+#                 assigned to the keys by a seeded permutation, so the hot keys
+#                 are spread over the id range rather than being the smallest ids.
+#   match_rate    share of the foreign keys that reference an existing key; the
+#                 rest point past the largest key and find no join partner
+#   payload_width characters of every generated string payload
+#   seed          the same seed and sizes always give byte-identical files;
+#                 each chunk draws from its own generator seeded with (seed,
+#                 table, chunk), so the output does not depend on memory
+#
+# Output formats (--format):
+#
+#   csv         users.csv (user_id|name|email|signup_date) and transactions.csv
+#               (transaction_id|user_id|amount|transaction_date), the schema of
+#               synth_data_gen.py, for the wrappers (fkjoin.py on user_id)
+#   obliviator  the FK join enclave input: "<n1> <n2>", then "<key> <payload>"
+#               rows, users (primary keys) first and transactions second
+#   binary      the same rows as binary enclave records
+#               (obliviator_formatting/binary_records.py)
+#   kks         join_kks gen_example.py inputs: "<n1> <n2>", a blank line, the
+#               sorted table 1 rows, a blank line, the sorted table 2 rows, where
+#               both tables hold repeated keys (table 1 is drawn with the same
+#               skew over the users) and every payload is its key, as in
+#               gen_example.py
+
+OUTPUT_FORMATS = ("csv", "obliviator", "binary", "kks")
+CHUNK_ROWS = 1 << 20
+LETTERS = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+FIRST_DATE = np.datetime64("2020-01-01T00:00:00", "s")
+DATE_SPAN_SECONDS = 5 * 365 * 24 * 3600
+USERS, TRANSACTIONS, PERMUTATION = 0, 1, 2
+
+
+class ZipfKeys:
+    """Draws references to keys with a bounded Zipf distribution over their seeded ranks."""
+
+    def __init__(self, keys: np.ndarray, skew: float, match_rate: float, seed: int):
+        if skew < 0:
+            raise ValueError(f"skew must be at least 0, got {skew}")
+        if not 0 <= match_rate <= 1:
+            raise ValueError(f"match_rate must be between 0 and 1, got {match_rate}")
+        self.ranked_keys = np.random.default_rng([seed, PERMUTATION]).permutation(keys)
+        self.skew = skew
+        self.match_rate = match_rate
+        self.missing_base = int(keys.max()) + 1 if len(keys) else 0
+        self.cdf = None
+        if skew > 0:
+            self.cdf = np.cumsum(np.arange(1, len(keys) + 1, dtype=np.float64) ** -skew)
+            self.cdf /= self.cdf[-1]
+
+    def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        num_keys = len(self.ranked_keys)
+        if self.cdf is None:
+            ranks = rng.integers(0, num_keys, size)
+        else:
+            ranks = np.minimum(np.searchsorted(self.cdf, rng.random(size), side="right"), num_keys - 1)
+        refs = self.ranked_keys[ranks]
+        missing = rng.random(size) >= self.match_rate
+        refs[missing] = self.missing_base + rng.integers(0, max(1, num_keys), int(missing.sum()))
+        return refs
+
+
+def random_strings(rng: np.random.Generator, size: int, width: int) -> np.ndarray:
+    """size random lowercase strings of width characters, as a fixed-width bytes array."""
+    codes = LETTERS[rng.integers(0, len(LETTERS), (size, max(1, width)), dtype=np.uint8)]
+    return codes.view(f"S{max(1, width)}").ravel()
+
+
+def random_dates(rng: np.random.Generator, size: int) -> np.ndarray:
+    """size ISO timestamps in the five years from FIRST_DATE."""
+    return np.datetime_as_string(FIRST_DATE + rng.integers(0, DATE_SPAN_SECONDS, size))
+
+
+def chunks(num_rows: int, seed: int, table: int) -> Iterator[Tuple[np.random.Generator, int, int]]:
+    """(generator, first row, row count) for every chunk of a table."""
+    for index, start in enumerate(range(0, num_rows, CHUNK_ROWS)):
+        yield np.random.default_rng([seed, table, index]), start, min(CHUNK_ROWS, num_rows - start)
+
+
+def write_rows(outfile, template: str, *columns):
+    """Writes one line per row of the columns (numpy arrays), formatted with template."""
+    lists = [column.astype(str).tolist() if column.dtype.kind == "S" else column.tolist() for column in columns]
+    if lists and lists[0]:
+        outfile.write("\n".join(map(template.__mod__, zip(*lists))) + "\n")
+
+
+def write_users_csv(path: Path, num_users: int, payload_width: int, seed: int):
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write("user_id|name|email|signup_date\n")
+        for rng, start, count in chunks(num_users, seed, USERS):
+            names = random_strings(rng, count, payload_width)
+            emails = np.char.add(names, b"@example.com")
+            ids = np.arange(start + 1, start + count + 1)
+            write_rows(outfile, "%d|%s|%s|%s", ids, names, emails, random_dates(rng, count))
+
+
+def write_transactions_csv(path: Path, num_transactions: int, users: ZipfKeys, seed: int):
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write("transaction_id|user_id|amount|transaction_date\n")
+        for rng, start, count in chunks(num_transactions, seed, TRANSACTIONS):
+            ids = np.arange(start + 1, start + count + 1)
+            amounts = rng.uniform(5.0, 1000.0, count)
+            write_rows(outfile, "txn_%07d|%d|%.2f|%s", ids, users.draw(rng, count), amounts, random_dates(rng, count))
+
+
+def write_obliviator_input(path: Path, num_users: int, num_transactions: int, users: ZipfKeys, payload_width: int, seed: int):
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write(f"{num_users} {num_transactions}\n")
+        for rng, start, count in chunks(num_users, seed, USERS):
+            write_rows(outfile, "%d %s", np.arange(start + 1, start + count + 1), random_strings(rng, count, payload_width))
+        for rng, start, count in chunks(num_transactions, seed, TRANSACTIONS):
+            write_rows(outfile, "%d %s", users.draw(rng, count), random_strings(rng, count, payload_width))
+
+
+def write_binary_input(path: Path, num_users: int, num_transactions: int, users: ZipfKeys, payload_width: int, seed: int):
+    keys = np.empty(num_users + num_transactions, dtype=np.int64)
+    payloads = np.empty(num_users + num_transactions, dtype=f"S{max(1, payload_width)}")
+    keys[:num_users] = np.arange(1, num_users + 1)
+    for rng, start, count in chunks(num_users, seed, USERS):
+        payloads[start:start + count] = random_strings(rng, count, payload_width)
+    for rng, start, count in chunks(num_transactions, seed, TRANSACTIONS):
+        offset = num_users + start
+        keys[offset:offset + count] = users.draw(rng, count)
+        payloads[offset:offset + count] = random_strings(rng, count, payload_width)
+    binary_records.write_records(path, keys, payloads, num_users, num_transactions)
+
+
+def write_kks_input(path: Path, num_users: int, num_transactions: int, users: ZipfKeys, seed: int):
+    # Table 1 repeats the users' keys with the same skew; only table 2 has non-matching keys.
+    table1 = ZipfKeys(users.ranked_keys, users.skew, 1.0, seed)
+    keys1 = np.sort(np.concatenate([table1.draw(rng, count) for rng, _, count in chunks(num_users, seed, USERS)]))
+    keys2 = np.sort(np.concatenate([users.draw(rng, count) for rng, _, count in chunks(num_transactions, seed, TRANSACTIONS)]))
+    with open(path, "w", encoding="utf-8") as outfile:
+        outfile.write(f"{len(keys1)} {len(keys2)}\n\n")
+        for start in range(0, len(keys1), CHUNK_ROWS):
+            write_rows(outfile, "%d %d", keys1[start:start + CHUNK_ROWS], keys1[start:start + CHUNK_ROWS])
+        outfile.write("\n")
+        for start in range(0, len(keys2), CHUNK_ROWS):
+            write_rows(outfile, "%d %d", keys2[start:start + CHUNK_ROWS], keys2[start:start + CHUNK_ROWS])
+
+
+def generate(
+    output_dir: Path,
+    num_users: int,
+    num_transactions: int,
+    skew: float = 0.0,
+    match_rate: float = 1.0,
+    payload_width: int = 16,
+    seed: int = 1,
+    output_format: str = "csv"
+):
+    """Writes the users and transactions in output_format to output_dir (see the comment above)."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format '{output_format}'. Valid are: {list(OUTPUT_FORMATS)}")
+    if num_users < 1 or num_transactions < 0:
+        raise ValueError("Need at least one user and no negative transaction count")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    users = ZipfKeys(np.arange(1, num_users + 1), skew, match_rate, seed)
+    start = time.perf_counter()
+    if output_format == "csv":
+        write_users_csv(output_dir / "users.csv", num_users, payload_width, seed)
+        write_transactions_csv(output_dir / "transactions.csv", num_transactions, users, seed)
+        written = ["users.csv", "transactions.csv"]
+    elif output_format == "obliviator":
+        write_obliviator_input(output_dir / "fk_join_input.txt", num_users, num_transactions, users, payload_width, seed)
+        written = ["fk_join_input.txt"]
+    elif output_format == "binary":
+        write_binary_input(output_dir / "fk_join_input.obr", num_users, num_transactions, users, payload_width, seed)
+        written = ["fk_join_input.obr"]
+    else:
+        write_kks_input(output_dir / "kks_input.txt", num_users, num_transactions, users, seed)
+        written = ["kks_input.txt"]
+    seconds = time.perf_counter() - start
+    rate = (num_users + num_transactions) / seconds * 60 if seconds else float("inf")
+    print(f"Wrote {num_users + num_transactions} rows in {seconds:.2f}s ({rate / 1e6:.1f}M rows/min): "
+          f"{', '.join(str(output_dir / name) for name in written)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates skewed synthetic users and transactions with numpy.")
+    parser.add_argument("--num_users", type=int, default=1_000_000, help="Rows of the users (primary key) table.")
+    parser.add_argument("--num_transactions", type=int, default=1_000_000, help="Rows of the transactions (foreign key) table.")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of the transactions' user ids (0 = uniform).")
+    parser.add_argument("--match_rate", type=float, default=1.0, help="Share of transactions whose user id exists.")
+    parser.add_argument("--payload_width", type=int, default=16, help="Characters of every generated string payload.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed; the same seed and sizes give identical files.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="Output format (see synth_data/fast_gen.py).")
+    parser.add_argument("--output_dir", default="synth_data/output", help="Directory for the generated files.")
+    args = parser.parse_args()
+    try:
+        generate(
+            Path(args.output_dir), args.num_users, args.num_transactions, args.skew, args.match_rate,
+            args.payload_width, args.seed, args.format
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from batch import batch_output_path, filter_args, split_batch_output, split_csv_by_key
+
+
+def test_filter_args():
+    assert filter_args([7]) == ["--filter_threshold_op1", "7", "--filter_condition_op1", "=="]
+    assert filter_args([7, 9, 11]) == ["--filter_in_op1", "7", "9", "11"]
+
+
+def test_batch_output_path():
+    assert str(batch_output_path("out/short1.csv", 42)) == "out/short1_42.csv"
+
+
+def test_split_csv_by_key(tmp_path):
+    csv_path = tmp_path / "batch.csv"
+    csv_path.write_text("id|name\n1|a\n2|b\n1|c\n5|unrequested\n")
+    paths = split_csv_by_key(csv_path, "id", [1, 2, 3], lambda id_: tmp_path / f"{id_}.csv")
+
+    assert sorted(paths) == [1, 2, 3]
+    assert paths[1].read_text().splitlines() == ["id|name", "1|a", "1|c"]
+    assert paths[2].read_text().splitlines() == ["id|name", "2|b"]
+    # Ids without matches still get a header-only file.
+    assert paths[3].read_text().splitlines() == ["id|name"]
+    assert not (tmp_path / "5.csv").exists()
+
+
+def test_split_batch_output_amortizes_time(tmp_path):
+    output_path = tmp_path / "short.csv"
+    output_path.write_text("personId|x\n1|a\n2|b\n")
+    paths = split_batch_output(str(output_path), "personId", [1, 2], 4.0, 2.0)
+
+    assert paths == {1: tmp_path / "short_1.csv", 2: tmp_path / "short_2.csv"}
+    for path in paths.values():
+        lines = path.with_suffix(".time").read_text().splitlines()
+        assert lines == ["2.0", "batch_size=2", "batch_time=4.0", "critical_path=1.0"]
+
+
+def test_split_csv_by_key_skips_unmapped_keys(tmp_path, capsys):
+    csv_path = tmp_path / "batch.csv"
+    csv_path.write_text("id|name\n1|a\nUNMAPPED_9|b\n1|c\n")
+    paths = split_csv_by_key(csv_path, "id", [1], lambda id_: tmp_path / f"{id_}.csv")
+    assert paths[1].read_text().splitlines() == ["id|name", "1|a", "1|c"]
+    assert "Skipping 1 row(s)" in capsys.readouterr().out
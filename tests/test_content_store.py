@@ -0,0 +1,91 @@
+import itertools
+
+import pytest
+
+import content_store
+from content_store import ContentStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A strictly increasing clock so that last_used orders entries deterministically.
+    ticks = itertools.count(1)
+    monkeypatch.setattr(content_store.time, "time", lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def source(tmp_path):
+    """A 10-byte file to store."""
+    path = tmp_path / "source.bin"
+    path.write_bytes(b"0123456789")
+    return path
+
+
+def test_get_and_put(tmp_path, source, clock):
+    store = ContentStore(tmp_path / "store", max_bytes=100)
+    assert store.get("a") is None
+    entry_dir = store.put("a", {"data": source}, meta={"kind": "test"})
+    assert (entry_dir / "data").read_bytes() == b"0123456789"
+    assert store.get("a") == entry_dir
+    assert store.stats() == {
+        "entries": 1, "bytes": 10, "max_bytes": 100, "hits": 1, "misses": 1, "evictions": 0
+    }
+
+
+def test_evicts_least_recently_used(tmp_path, source, clock):
+    store = ContentStore(tmp_path / "store", max_bytes=25)
+    store.put("a", {"data": source})
+    store.put("b", {"data": source})
+    store.get("a")  # b is now the least recently used entry
+    store.put("c", {"data": source})
+
+    assert store.get("b") is None
+    assert not store.entry_dir("b").exists()
+    assert store.get("a") is not None
+    assert store.get("c") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_new_entry_is_kept_even_when_too_large(tmp_path, source, clock):
+    store = ContentStore(tmp_path / "store", max_bytes=5)
+    store.put("a", {"data": source})
+    store.put("b", {"data": source})
+    assert store.get("a") is None
+    assert store.get("b") is not None
+
+
+def test_entries_in_use_are_not_evicted(tmp_path, source, clock):
+    store = ContentStore(tmp_path / "store", max_bytes=25)
+    store.put("a", {"data": source})
+    store.put("b", {"data": source})
+    with store.use("a"):
+        store.put("c", {"data": source})
+    assert store.get("a") is not None
+    assert store.get("b") is None
+
+
+def test_links_are_removed_with_their_entry(tmp_path, source, clock):
+    store = ContentStore(tmp_path / "store", max_bytes=15)
+    run_dir = tmp_path / "run"
+    assert not store.link("a", run_dir, run_dir.mkdir)
+
+    store.put("a", {"data": source})
+    assert store.link("a", run_dir, run_dir.mkdir)
+    assert run_dir.is_dir()
+    # An existing path is recorded again without calling create().
+    assert store.link("a", run_dir, lambda: pytest.fail("create() called for an existing path"))
+
+    store.put("b", {"data": source})
+    assert store.get("a") is None
+    assert not run_dir.exists()
+
+
+def test_clear(tmp_path, source, clock):
+    store = ContentStore(tmp_path / "store", max_bytes=100)
+    run_dir = tmp_path / "run"
+    store.put("a", {"data": source})
+    store.link("a", run_dir, run_dir.mkdir)
+    store.clear()
+    assert store.stats()["entries"] == 0
+    assert not run_dir.exists()
+    assert store.get("a") is None
@@ -0,0 +1,77 @@
+import pytest
+
+from dag import QueryDAG
+
+
+def write_time(path, seconds):
+    path.write_text(f"{seconds}\n")
+
+
+def test_add_rejects_duplicates_and_unknown_dependencies():
+    dag = QueryDAG("test")
+    dag.add("a", lambda: None)
+    with pytest.raises(ValueError, match="already part of"):
+        dag.add("a", lambda: None)
+    # Dependencies must be added first, which also rules out cycles.
+    with pytest.raises(ValueError, match="not been added yet"):
+        dag.add("b", lambda: None, deps=["c"])
+    with pytest.raises(ValueError, match="not been added yet"):
+        dag.add("self", lambda: None, deps=["self"])
+
+
+def test_run_and_critical_path(tmp_path):
+    # a (1s) -> c (4s); b (3s) -> c; a -> d (1s). Longest chain: b -> c.
+    dag = QueryDAG("test", max_workers=2)
+    times = {"a": 1.0, "b": 3.0, "c": 4.0, "d": 1.0}
+    order = []
+
+    def task(name):
+        order.append(name)
+        write_time(tmp_path / f"{name}.time", times[name])
+
+    dag.add("a", task, "a", time_file=tmp_path / "a.time")
+    dag.add("b", task, "b", time_file=tmp_path / "b.time")
+    dag.add("c", task, "c", deps=["a", "b"], time_file=tmp_path / "c.time")
+    dag.add("d", task, "d", deps=["a"], time_file=tmp_path / "d.time")
+    dag.run()
+
+    assert order.index("c") > max(order.index("a"), order.index("b"))
+    assert order.index("d") > order.index("a")
+    assert dag.critical_path() == (7.0, ["b", "c"])
+    total, critical = dag.write_time_file(tmp_path / "query.time")
+    assert (total, critical) == (9.0, 7.0)
+    lines = (tmp_path / "query.time").read_text().splitlines()
+    assert lines[:3] == ["9.0", "critical_path=7.0", "critical_path_tasks=b,c"]
+
+
+def test_critical_path_of_an_empty_dag():
+    assert QueryDAG("test").critical_path() == (0.0, [])
+
+
+def test_failed_task_skips_its_dependents(tmp_path):
+    dag = QueryDAG("test", max_workers=1)
+    ran = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    dag.add("a", fail)
+    dag.add("b", ran.append, "b", deps=["a"])
+    dag.add("c", ran.append, "c")
+    with pytest.raises(RuntimeError, match="did not complete"):
+        dag.run()
+    assert ran == ["c"]
+    assert dag.tasks["a"].status == "failed"
+    assert dag.tasks["b"].status == "skipped"
+
+
+def test_stale_time_file_does_not_count_as_success(tmp_path):
+    # The wrappers print errors instead of raising; a .time file from an earlier run must not hide that.
+    time_file = tmp_path / "filter.time"
+    write_time(time_file, 5.0)
+    dag = QueryDAG("test")
+    dag.add("filter", lambda: None, time_file=time_file)
+    with pytest.raises(RuntimeError, match="did not complete"):
+        dag.run()
+    assert dag.tasks["filter"].status == "failed"
+    assert not time_file.exists()
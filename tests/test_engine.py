@@ -0,0 +1,32 @@
+from engine import merge_bucket_outputs, operator_phases, parse_host_output
+
+
+def test_merge_bucket_outputs_orders_by_key_id(tmp_path):
+    # Each bucket result is sorted by key id and the buckets share no key.
+    buckets = {
+        "bucket_0.txt": "0|a|x\n3|d|x\n3|d|y\n10|k|z\n",
+        "bucket_1.txt": "1|b|x\n\n2|c|y\n",
+        "bucket_2.txt": "",
+    }
+    paths = []
+    for name, text in buckets.items():
+        paths.append(tmp_path / name)
+        paths[-1].write_text(text)
+
+    merged = merge_bucket_outputs(paths, tmp_path / "merged.txt")
+    assert merged == tmp_path / "merged.txt"
+    assert merged.read_text().splitlines() == ["0|a|x", "1|b|x", "2|c|y", "3|d|x", "3|d|y", "10|k|z"]
+
+
+def test_parse_host_output_names_phases_per_variant():
+    stdout = "1.5\nphase 1 0.5\nphase 2 0.25\nphase 3 0.75\nphase read_input 0.1\nphase ecall 2.0\n"
+    enclave_time, phases = parse_host_output(stdout, operator_phases("operator_3/3_3"))
+    assert enclave_time == 1.5
+    assert phases == {
+        "sort": 0.5, "aggregate": 0.25, "final_sort": 0.75, "read_input": 0.1, "ecall": 2.0, "parse_format": 0.5
+    }
+    _, phases = parse_host_output(stdout, operator_phases("operator_2", "opaque_shared_memory"))
+    assert list(phases)[:3] == ["sort", "aggregate", "compact_sort"]
+    # Variants without their own entry use the default names.
+    assert operator_phases("join", "opaque_shared_memory") == operator_phases("join")
+    assert operator_phases("unknown") == ()
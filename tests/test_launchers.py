@@ -0,0 +1,33 @@
+import subprocess
+
+import pytest
+
+import engine
+import enclave_worker
+from launchers import LocalLauncher, SshLauncher, get_launcher
+
+
+def fake_run_obliviator(run_dir, input_path, num_threads):
+    # Reports whether warm workers were on in the pool child that ran the bucket.
+    stdout = f"{enclave_worker.enabled()} {num_threads}"
+    return input_path.with_name(input_path.stem + "_output.txt"), subprocess.CompletedProcess([], 0, stdout, "")
+
+
+def test_local_launcher_keeps_input_order_and_disables_warm_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "run_obliviator", fake_run_obliviator)
+    monkeypatch.setattr(enclave_worker, "_enabled", True)
+    input_paths = [tmp_path / f"bucket_{i}.txt" for i in range(5)]
+
+    output_paths, processes = LocalLauncher(workers=2).run(tmp_path, input_paths, 4)
+    assert output_paths == [tmp_path / f"bucket_{i}_output.txt" for i in range(5)]
+    assert [process.stdout for process in processes] == ["False 4"] * 5
+    assert enclave_worker.enabled()
+
+
+def test_get_launcher():
+    assert isinstance(get_launcher("local", 3), LocalLauncher)
+    assert get_launcher("ssh:a,b,a").hosts == ["a", "b", "a"]
+    with pytest.raises(ValueError):
+        SshLauncher([])
+    with pytest.raises(ValueError, match="Unknown launcher"):
+        get_launcher("nonsense")
@@ -0,0 +1,95 @@
+import argparse
+
+import numpy as np
+import pytest
+
+import partition
+from partition import (
+    DUMMY_KEYS, auto_partition_rows, bucket_capacity, hash_buckets, partition_arg, split_text_input,
+    write_bucket_inputs
+)
+
+
+def test_partition_arg():
+    assert partition_arg("off") == "off"
+    assert partition_arg("auto") == "auto"
+    assert partition_arg("128") == 128
+    for value in ("0", "-3", "many"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            partition_arg(value)
+
+
+def test_auto_partition_rows_is_a_power_of_two_within_budget():
+    footprint = (100, 10)
+    rows = auto_partition_rows(100 + 10 * 1000, footprint, row_bytes=8)
+    assert rows == 512
+    assert auto_partition_rows(100 + 10 * 1000, footprint, row_bytes=8, workers=2) == 256
+
+
+def test_auto_partition_rows_bounded_by_host_buffer(monkeypatch):
+    monkeypatch.setattr(partition, "HOST_BUFFER_BYTES", 1000 + partition.HEADER_RESERVE)
+    assert auto_partition_rows(10 ** 9, (0, 1), row_bytes=10) == 64
+
+
+def test_auto_partition_rows_rejects_a_heap_smaller_than_the_buffers():
+    with pytest.raises(ValueError, match="cannot hold"):
+        auto_partition_rows(1000, (1000, 10), row_bytes=8)
+
+
+def test_split_text_input_keeps_the_rest_of_the_header(tmp_path):
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("5 0 2 7\n" + "".join(f"{i} payload{i}\n" for i in range(5)))
+    paths = split_text_input(input_path, 2)
+    assert [path.name for path in paths] == ["input_part0.txt", "input_part1.txt", "input_part2.txt"]
+    assert paths[0].read_text() == "2 0 2 7\n0 payload0\n1 payload1\n"
+    assert paths[1].read_text() == "2 0 2 7\n2 payload2\n3 payload3\n"
+    assert paths[2].read_text() == "1 0 2 7\n4 payload4\n"
+
+
+def test_split_text_input_single_chunk(tmp_path):
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("2\n1 a\n2 b\n")
+    [path] = split_text_input(input_path, 10)
+    assert path.read_text() == input_path.read_text()
+
+
+def test_hash_buckets_is_deterministic_and_in_range():
+    keys = np.arange(10000)
+    buckets = hash_buckets(keys, 7)
+    assert buckets.min() >= 0 and buckets.max() < 7
+    np.testing.assert_array_equal(buckets, hash_buckets(keys.copy(), 7))
+    # Fibonacci hashing spreads consecutive ids evenly.
+    loads = np.bincount(buckets, minlength=7)
+    assert loads.min() > 0.9 * len(keys) / 7
+
+
+def test_bucket_capacity():
+    # ceil(100 / 4) = 25; 25 + 4 * 5 + 1
+    assert bucket_capacity(100, 4, max_load=30) == 46
+    # Doubled until the heaviest bucket fits.
+    assert bucket_capacity(100, 4, max_load=100) == 184
+    assert bucket_capacity(0, 4, max_load=0) == 1
+
+
+def test_write_bucket_inputs_pads_every_bucket(tmp_path):
+    key_ids = np.array([0, 1, 2, 3, 0, 0, 1, 3, 3, 3], dtype=np.int64)
+    payload_ids = np.arange(10, dtype=np.int64)
+    paths, capacity1, capacity2 = write_bucket_inputs(tmp_path / "fk.txt", 4, key_ids, payload_ids, 2)
+    assert len(paths) == 2
+    bucket_of = hash_buckets(key_ids, 2)
+    seen = []
+    for bucket, path in enumerate(paths):
+        lines = path.read_text().splitlines()
+        assert lines[0] == f"{capacity1} {capacity2}"
+        rows = [tuple(map(int, line.split())) for line in lines[1:]]
+        assert len(rows) == capacity1 + capacity2
+        table1, table2 = rows[:capacity1], rows[capacity1:]
+        for rows_of_table, dummy_key, table_slice in ((table1, DUMMY_KEYS[0], slice(0, 4)),
+                                                       (table2, DUMMY_KEYS[1], slice(4, None))):
+            real = [row for row in rows_of_table if row[0] != dummy_key]
+            expected = [(int(k), int(p)) for k, p, b in zip(key_ids[table_slice], payload_ids[table_slice],
+                                                              bucket_of[table_slice]) if b == bucket]
+            assert real == expected
+            assert all(row == (dummy_key, 0) for row in rows_of_table[len(real):])
+            seen += real
+    assert sorted(seen) == sorted(zip(key_ids.tolist(), payload_ids.tolist()))
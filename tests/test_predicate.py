@@ -0,0 +1,126 @@
+import operator
+
+import pytest
+
+from engine import FILTER_OPS
+from obliviator_formatting.predicate import (
+    FLIPPED_OPS, PRED_AND, PRED_CMP, PRED_IN, PRED_NOT, WherePredicate, tokenize
+)
+
+# The enclave keeps a row when (threshold <op> value), see common/filter.h.
+ENCLAVE_OPS = {
+    FILTER_OPS['<']: operator.lt, FILTER_OPS['>']: operator.gt, FILTER_OPS['==']: operator.eq,
+    FILTER_OPS['<=']: operator.le, FILTER_OPS['>=']: operator.ge, FILTER_OPS['!=']: operator.ne,
+}
+
+
+def run_program(words, row):
+    """Evaluates compiled predicate words on one row of encoded column values, like common/predicate.h."""
+    count, pos, stack = words[1], 2, []
+    for _ in range(count):
+        instruction = words[pos]
+        if instruction == PRED_CMP:
+            column, op, threshold = words[pos + 1:pos + 4]
+            stack.append(ENCLAVE_OPS[op](threshold, row[column - 1]))
+            pos += 4
+        elif instruction == PRED_IN:
+            column, num_values = words[pos + 1:pos + 3]
+            stack.append(row[column - 1] in words[pos + 3:pos + 3 + num_values])
+            pos += 3 + num_values
+        elif instruction == PRED_NOT:
+            stack.append(not stack.pop())
+            pos += 1
+        else:
+            b, a = stack.pop(), stack.pop()
+            stack.append((a and b) if instruction == PRED_AND else (a or b))
+            pos += 1
+    assert pos == len(words) and len(stack) == 1
+    return stack[0]
+
+
+def kept_rows(where, columns):
+    predicate = WherePredicate(where)
+    words, encoded = predicate.compile([columns[name] for name in predicate.columns])
+    return [i for i, row in enumerate(zip(*encoded)) if run_program(words, row)]
+
+
+def test_tokenize_keywords_strings_and_operators():
+    assert tokenize("a <= 5 and b <> 'it''s' OR NOT c IN (1, -2)") == [
+        ("name", "a"), ("op", "<="), ("number", "5"), ("keyword", "AND"), ("name", "b"), ("op", "<>"),
+        ("string", "it's"), ("keyword", "OR"), ("keyword", "NOT"), ("name", "c"), ("keyword", "IN"),
+        ("punct", "("), ("number", "1"), ("punct", ","), ("number", "-2"), ("punct", ")"),
+    ]
+
+
+def test_tokenize_rejects_unknown_characters():
+    with pytest.raises(ValueError, match="Unexpected character"):
+        tokenize("a == 1 ; drop")
+
+
+def test_parse_precedence_and_between():
+    predicate = WherePredicate("x BETWEEN 1 AND 3 OR NOT y = 2 AND z != 4")
+    assert predicate.columns == ["x", "y", "z"]
+    assert predicate.tree == (
+        "or",
+        ("and", ("cmp", "x", ">=", "1"), ("cmp", "x", "<=", "3")),
+        ("and", ("not", ("cmp", "y", "==", "2")), ("cmp", "z", "!=", "4")),
+    )
+
+
+def test_parse_not_in_and_parentheses():
+    predicate = WherePredicate("(a < 1 OR a > 5) AND b NOT IN ('x', 'y')")
+    assert predicate.tree == (
+        "and",
+        ("or", ("cmp", "a", "<", "1"), ("cmp", "a", ">", "5")),
+        ("not", ("in", "b", ["x", "y"])),
+    )
+
+
+@pytest.mark.parametrize("where", ["a ==", "a == 1 AND", "(a == 1", "a NOT == 1", "a == 1 b"])
+def test_parse_errors(where):
+    with pytest.raises(ValueError):
+        WherePredicate(where)
+
+
+def test_flipped_ops_match_the_enclave_comparison():
+    # column <op> literal must hold exactly when literal <flipped op> column does.
+    python_ops = {'<': operator.lt, '>': operator.gt, '<=': operator.le, '>=': operator.ge,
+                  '==': operator.eq, '!=': operator.ne}
+    for op, code in FLIPPED_OPS.items():
+        for column in range(-2, 3):
+            assert ENCLAVE_OPS[code](0, column) == python_ops[op](column, 0), op
+
+
+@pytest.mark.parametrize("op", ["<", ">", "<=", ">=", "==", "=", "!=", "<>"])
+def test_integer_comparisons(op):
+    values = ["1", "2", "3", "4", "5"]
+    python_op = {'<': operator.lt, '>': operator.gt, '<=': operator.le, '>=': operator.ge, '==': operator.eq,
+                 '=': operator.eq, '!=': operator.ne, '<>': operator.ne}[op]
+    expected = [i for i, value in enumerate(values) if python_op(int(value), 3)]
+    assert kept_rows(f"n {op} 3", {"n": values}) == expected
+
+
+def test_string_columns_compare_by_rank():
+    dates = ["2009-12-31", "2010-01-01", "2010-06-15", "2010-12-31", "2011-01-01"]
+    langs = ["en", "de", "en", "fr", "en"]
+    columns = {"d": dates, "lang": langs}
+    assert kept_rows("d BETWEEN '2010-01-01' AND '2010-12-31'", columns) == [1, 2, 3]
+    assert kept_rows("d > '2010-03-01' AND lang == 'en'", columns) == [2, 4]
+    # A literal that is not in the column still ranks between its neighbours.
+    assert kept_rows("d < '2010-03-01' OR lang IN ('fr', 'es')", columns) == [0, 1, 3]
+    assert kept_rows("NOT lang IN ('en')", columns) == [1, 3]
+
+
+def test_compile_header_and_in_values():
+    predicate = WherePredicate("a IN (3, 1, 3) AND b == 2")
+    words, encoded = predicate.compile([["1", "2", "3"], ["2", "2", "5"]])
+    assert words[:2] == [3, 3]    # columns + 1 (column 0 is the row number), instructions
+    assert words[2:7] == [PRED_IN, 1, 2, 1, 3]
+    assert words[7:] == [PRED_CMP, 2, FLIPPED_OPS['=='], 2, PRED_AND]
+    assert [list(column) for column in encoded] == [[1, 2, 3], [2, 2, 5]]
+
+
+def test_integer_column_with_string_literal_is_an_error():
+    predicate = WherePredicate("a == 'x'")
+    with pytest.raises(ValueError, match="holds integers"):
+        predicate.compile([["1", "2"]])
@@ -0,0 +1,48 @@
+import numpy as np
+
+from obliviator_formatting.relabel import relabel_file, relabel_rows
+from obliviator_formatting.reverse_relabel import (
+    read_mapping_table, reverse_column, reverse_relabel_file
+)
+
+
+def test_ids_follow_first_appearance():
+    text, uniques, num_rows = relabel_rows(["b a\n", "a c\n", "c b\n"], 2, [0, 1])
+    assert text == "0 1\n1 2\n2 0\n"
+    assert uniques.tolist() == ["b", "a", "c"]
+    assert num_rows == 3
+
+
+def test_relabel_rows_passes_through_unmapped_fields():
+    # fk_join style: the key gets an id, the payload (with spaces) is kept.
+    text, uniques, _ = relabel_rows(["42 hello world\n", "7 x\n", "42 y\n"], 2, [0])
+    assert text == "0 hello world\n1 x\n0 y\n"
+    assert uniques.tolist() == ["42", "7"]
+
+
+def test_round_trip(tmp_path):
+    input_path = tmp_path / "input.txt"
+    relabeled_path = tmp_path / "relabeled.txt"
+    mapping_path = tmp_path / "mapping.txt"
+    restored_path = tmp_path / "restored.txt"
+    rows = ["alice bob\n", "bob 1000000000000\n", "carol alice\n", "dave dave\n"]
+    input_path.write_text("4 0\n" + "".join(rows))
+
+    uniques = relabel_file(str(input_path), str(relabeled_path), str(mapping_path), 2, [0, 1])
+    relabeled = relabeled_path.read_text().splitlines()
+    assert relabeled[0] == "4 0"
+    assert all(field.isdigit() for line in relabeled[1:] for field in line.split())
+
+    table = read_mapping_table(str(mapping_path))
+    assert table.tolist() == uniques.tolist()
+    # The C operators write their results without the header line.
+    raw_output = tmp_path / "raw_output.txt"
+    raw_output.write_text("\n".join(relabeled[1:]) + "\n")
+    reverse_relabel_file(str(raw_output), str(restored_path), table, 2, [0, 1])
+    assert restored_path.read_text() == "".join(rows)
+
+
+def test_reverse_column_marks_unmapped_ids():
+    table = np.array(["a", None, "c"], dtype=object)
+    assert reverse_column(["0", "2", "1", "3", "x"], table) == ["a", "c", "UNMAPPED_1", "UNMAPPED_3", "UNMAPPED_x"]
+    assert reverse_column(np.array([2, 0], dtype=np.int64), table) == ["c", "a"]
@@ -0,0 +1,44 @@
+import pytest
+
+import result_cache
+from engine import read_time_file, read_time_metadata
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("OBLIVIATOR_RESULT_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(result_cache, "_digests", {})
+    return tmp_path / "cache"
+
+
+def test_hit_reports_no_enclave_time(tmp_path, cache_dir):
+    output_path = tmp_path / "first.csv"
+    output_path.write_text("a|b\n1|2\n")
+    output_path.with_suffix(".time").write_text("2.5\nthreads=4\nphase_ecall=2.4")
+    result_cache.store_result("key", output_path)
+
+    hit_path = tmp_path / "second.csv"
+    assert not result_cache.fetch_result("other", hit_path)
+    assert result_cache.fetch_result("key", hit_path)
+    assert hit_path.read_text() == "a|b\n1|2\n"
+    assert read_time_file(hit_path.with_suffix(".time")) == 0.0
+    assert read_time_metadata(hit_path.with_suffix(".time")) == {
+        "cached_time": "2.5", "result_cache": "hit", "threads": "4"
+    }
+
+
+def test_input_digest_follows_file_contents(tmp_path, cache_dir):
+    path = tmp_path / "input.csv"
+    path.write_text("one")
+    first = result_cache.input_digest(str(path))
+    assert result_cache.input_digest(str(path)) == first
+    assert str(path.resolve()) in result_cache._load_digest_index(cache_dir / result_cache.DIGEST_INDEX)
+
+    path.write_text("other contents")
+    assert result_cache.input_digest(str(path)) != first
+
+
+def test_disabled(monkeypatch, tmp_path):
+    monkeypatch.setenv("OBLIVIATOR_RESULT_CACHE", "off")
+    assert not result_cache.enabled()
+    assert not result_cache.fetch_result("key", tmp_path / "out.csv")
@@ -0,0 +1,43 @@
+import pytest
+
+from engine import header_row_count
+from obliviator_formatting.streaming_input import HEADER_WIDTH, StreamingInputWriter, max_payload_width
+
+
+def test_header_is_patched_in_after_the_rows(tmp_path):
+    path = tmp_path / "input.txt"
+    with StreamingInputWriter(str(path)) as writer:
+        writer.write_records(0, [("1", "a"), ("2", "héllo")])
+        writer.write_rows(1, ["1 x\n", "1 y\n", "2 z\n"])
+    assert writer.counts == [2, 3]
+    assert writer.total == 5
+    assert writer.payload_width == len("héllo".encode("utf-8"))
+
+    lines = path.read_text(encoding="utf-8").split("\n")
+    assert len(lines[0]) == HEADER_WIDTH
+    assert lines[0].rstrip() == "2 3"
+    assert lines[1:] == ["1 a", "2 héllo", "1 x", "1 y", "2 z", ""]
+    # The padding is ignored by the engine's header parsing.
+    assert header_row_count(path) == 5
+
+
+def test_header_row_count_formats(tmp_path):
+    path = tmp_path / "input.txt"
+    for header, expected in [("7", 7), ("3 4", 7), ("7 0 > 100", 7)]:
+        path.write_text(header + "\n")
+        assert header_row_count(path) == expected
+
+
+def test_header_overflow_raises(tmp_path):
+    path = tmp_path / "input.txt"
+    with pytest.raises(ValueError, match="does not fit the reserved 8 characters"):
+        with StreamingInputWriter(str(path), num_tables=1, header_fn=lambda counts: f"{counts[0]} 0 in 1 2 3 4",
+                                  header_width=8) as writer:
+            writer.write_rows(0, ["1 a\n"])
+    # The file is closed even though the header could not be written.
+    assert writer._file.closed
+
+
+def test_max_payload_width():
+    assert max_payload_width([]) == 0
+    assert max_payload_width(["ab", "é", "abc"]) == 3
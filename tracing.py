@@ -0,0 +1,175 @@
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+from obliviator_formatting.streaming_input import peak_rss_mib
+
+##########################
+# PIPELINE STAGE TRACING #
+##########################
+
+# The .time file only holds the enclave time the host prints, so the Python
+# stages around it (format, relabel, build, reverse relabeling, reconstruct)
+# and the way a short read's operators overlap were invisible. With tracing on,
+# every engine.StageTimer stage and every dag.py task is recorded as a span:
+# its name, the operator it belongs to, its start and duration, and the rows
+# and bytes it read and wrote where the stage knows them. Each span also holds
+# the peak RSS of this process and of its child processes (the enclave hosts)
+# at the end of the stage. ru_maxrss is a high-water mark, so a jump between
+# two spans shows which stage raised the peak.
+#
+# All spans of a process go to one trace, so a short read that runs its
+# operators in-process produces a single trace covering the whole query. The
+# trace is written when the process exits, as Chrome trace JSON (complete "X"
+# events, one track per thread) that chrome://tracing and ui.perfetto.dev open.
+#
+# Enable it with --trace <path> on the wrappers and short reads, or with:
+#   OBLIVIATOR_TRACE  trace file path (default "off", no tracing)
+
+
+def _bytes(paths: Sequence[Union[str, Path]]) -> int:
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def _child_peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Span:
+    """One traced stage. The stage's code fills in what it read and wrote through record()."""
+
+    def __init__(self, name: str, category: str):
+        self.name = name
+        self.category = category
+        self.args: Dict[str, Union[int, float, str]] = {}
+        self.inputs: List[Union[str, Path]] = []
+        self.outputs: List[Union[str, Path]] = []
+
+    def record(
+        self,
+        rows_in: Optional[int] = None,
+        rows_out: Optional[int] = None,
+        inputs: Sequence[Union[str, Path]] = (),
+        outputs: Sequence[Union[str, Path]] = (),
+        **args
+    ):
+        """
+        Adds row counts, other arguments and the files the stage read (inputs) and
+        wrote (outputs). File sizes are taken when the span ends, as bytes_in and bytes_out.
+        """
+        if rows_in is not None:
+            self.args["rows_in"] = int(rows_in)
+        if rows_out is not None:
+            self.args["rows_out"] = int(rows_out)
+        self.inputs.extend(inputs)
+        self.outputs.extend(outputs)
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects the spans of this process and writes them as a Chrome trace."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.origin = time.perf_counter()
+        self.events: List[Dict] = []
+        self.threads: Dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self.lock:
+            if ident not in self.threads:
+                self.threads[ident] = len(self.threads)
+                self.events.append({
+                    "name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": self.threads[ident],
+                    "args": {"name": threading.current_thread().name},
+                })
+            return self.threads[ident]
+
+    @contextmanager
+    def span(self, name: str, category: str) -> Iterator[Span]:
+        span = Span(name, category)
+        tid = self._tid()
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            end = time.perf_counter()
+            args = dict(span.args)
+            if span.inputs:
+                args["bytes_in"] = _bytes(span.inputs)
+            if span.outputs:
+                args["bytes_out"] = _bytes(span.outputs)
+            args["peak_rss_mib"] = round(peak_rss_mib(), 1)
+            args["child_peak_rss_mib"] = round(_child_peak_rss_mib(), 1)
+            event = {
+                "name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": tid,
+                "ts": round((start - self.origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1), "args": args,
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def write(self):
+        with self.lock:
+            events = list(self.events)
+        document = {
+            "traceEvents": [
+                {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": " ".join(sys.argv)}},
+                *events,
+            ],
+            "displayTimeUnit": "ms",
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(document, f)
+        tmp_path.replace(self.path)
+        print(f"Trace with {sum(event['ph'] == 'X' for event in events)} spans written to {self.path}")
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def enable(path: Optional[Union[str, Path]] = None) -> Optional[Tracer]:
+    """
+    Starts tracing to path (or OBLIVIATOR_TRACE) and writes the trace when the
+    process exits. A tracer that is already running is kept, so the wrappers a
+    short read calls add their spans to the query's trace.
+    """
+    global _tracer
+    path = path or os.environ.get("OBLIVIATOR_TRACE", "off")
+    with _tracer_lock:
+        if _tracer is None and str(path).lower() not in ("off", "0", "none", ""):
+            _tracer = Tracer(Path(path))
+            atexit.register(_tracer.write)
+    return _tracer
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def span(name: str, category: str = "pipeline") -> Iterator[Span]:
+    """Traces the block as a span when tracing is on; otherwise yields a span that is not recorded."""
+    if _tracer is None:
+        yield Span(name, category)
+        return
+    with _tracer.span(name, category) as traced:
+        yield traced
@@ -0,0 +1,136 @@
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+from build_cache import ARTIFACTS, build_copy, build_entry, get_store
+
+###############################
+# ISOLATED PER-JOB WORKSPACES #
+###############################
+
+# The wrappers used to build each operator in the shared ~/obliviator/<op> tree
+# (make clean && make) and run the host from there. Two queries on one host
+# could then rebuild each other's binaries halfway through a run, e.g. with
+# another DATA_LENGTH. Now no job writes to the operator tree:
+#
+# - Builds happen in a private overlay copy of the tree (build_cache.overlay_tree:
+#   sources hard-linked, everything else copied) and go into the build cache.
+# - Each build key gets one shared run directory, <root>/<key>, holding the
+#   host binary and signed enclave as hard links into the cache entry. It is
+#   created atomically and never changed, so any number of jobs can run from it,
+#   and warm enclave workers (keyed by directory) stay valid. The run directory
+#   is linked to its cache entry (see content_store.py): it is created under the
+#   store's lock and removed when the entry is evicted, and jobs keep the entry
+#   from being evicted while they run from it.
+# - Inputs and outputs already live in each job's own temp directory.
+#
+# With the build cache disabled, every job builds and runs in its own overlay
+# copy under <root>, removed when the job ends.
+#
+# Environment:
+#   OBLIVIATOR_WORKSPACES   root directory (default ~/.cache/obliviator/workspaces),
+#                           or "off" to build and run in the operator tree as before
+
+
+# Times a job builds (or looks up) its build before giving up when the entry is
+# evicted again each time before the job can link its run directory.
+LINK_ATTEMPTS = 3
+
+
+def workspace_root() -> Optional[Path]:
+    root = os.environ.get("OBLIVIATOR_WORKSPACES", "~/.cache/obliviator/workspaces")
+    if root.lower() in ("off", "0", "none", ""):
+        return None
+    return Path(os.path.expanduser(root))
+
+
+def enabled() -> bool:
+    return workspace_root() is not None
+
+
+def _link_or_copy(source: Path, target: Path):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def shared_run_dir(root: Path, key: str, entry_dir: Path) -> Path:
+    """
+    Creates <root>/<key> with the cached build's binaries at the paths the host
+    expects. Callers hold the build store's lock (see ContentStore.link).
+    """
+    run_dir = root / key
+    staging_dir = root / f".{key}.{os.getpid()}.{threading.get_ident()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    shutil.rmtree(run_dir, ignore_errors=True)
+    try:
+        for name, rel_path in ARTIFACTS.items():
+            (staging_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(entry_dir / name, staging_dir / rel_path)
+        os.replace(staging_dir, run_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return run_dir
+
+
+@contextmanager
+def job_workspace(code_dir: Path, make_args: Sequence[str] = (), extra_key: Sequence[str] = ()) -> Iterator[Path]:
+    """
+    Yields a directory to run code_dir's operator from, built from its current
+    sources with make_args, that no other job modifies while this one runs.
+    """
+    root = workspace_root()
+    root.mkdir(parents=True, exist_ok=True)
+    for _ in range(LINK_ATTEMPTS):
+        key, entry_dir, hit = build_entry(code_dir, make_args, extra_key)
+        if key is None:
+            break
+        store = get_store()
+        with store.use(key):
+            run_dir = root / key
+            # False if the entry was evicted since build_entry returned; it is then rebuilt.
+            if store.link(key, run_dir, lambda: shared_run_dir(root, key, entry_dir)):
+                print(f"Build cache {'hit' if hit else 'entry built'} ({key[:12]}): running from {run_dir}.")
+                yield run_dir
+                return
+    else:
+        raise RuntimeError(f"Build of {code_dir} was evicted from the build cache {LINK_ATTEMPTS} times before it could run")
+
+    private_dir = Path(tempfile.mkdtemp(prefix=f"{Path(code_dir).name}_{os.getpid()}_", dir=root))
+    try:
+        build_dir = private_dir / Path(code_dir).name
+        print(f"Building {code_dir} in a private copy ({build_dir})...")
+        build_copy(Path(code_dir), build_dir, make_args)
+        yield build_dir
+    finally:
+        shutil.rmtree(private_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or remove the shared per-build run directories.")
+    parser.add_argument("--clear", action="store_true", help="Remove every run directory (only while no job is running).")
+    args = parser.parse_args()
+
+    root = workspace_root()
+    if root is None:
+        print("Workspaces are disabled (OBLIVIATOR_WORKSPACES=off).")
+        return
+    run_dirs = sorted(path for path in root.glob("*") if path.is_dir()) if root.exists() else []
+    if args.clear:
+        for run_dir in run_dirs:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        print(f"Removed {len(run_dirs)} run directories from {root}.")
+        return
+    for run_dir in run_dirs:
+        print(run_dir)
+    print(f"{len(run_dirs)} run directories in {root}.")
+
+
+if __name__ == "__main__":
+    main()